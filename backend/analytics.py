@@ -0,0 +1,166 @@
+import numpy as np
+
+# Jours de bourse par an pour annualiser Sharpe et Sortino (rendements journaliers)
+TRADING_DAYS = 252
+MAX_CURVE_POINTS = 1000
+
+# Lignes de ANALYTICS_QUERY converties en un seul tableau structuré (symbol : VARCHAR(20))
+ROW_DTYPE = np.dtype([('ts', np.float64), ('pnl', np.float64), ('symbol', 'U20'), ('id', np.int64)])
+
+# Une seule requête : colonnes converties par MySQL (DOUBLE, secondes epoch) pour éviter
+# la conversion Decimal/datetime ligne par ligne côté Python
+ANALYTICS_QUERY = """
+    SELECT UNIX_TIMESTAMP(timestamp), CAST(COALESCE(pnl, 0) AS DOUBLE), symbol, id
+    FROM trades
+    WHERE challenge_id = %s
+    ORDER BY timestamp, id
+"""
+
+# Version de l'analyse : les trades ne sont jamais modifiés, seul le solde initial peut l'être
+ANALYTICS_VERSION_QUERY = """
+    SELECT c.user_id, c.initial_balance, c.updated_at,
+           (SELECT COUNT(*) FROM trades t WHERE t.challenge_id = c.id) AS n,
+           (SELECT MAX(t.id) FROM trades t WHERE t.challenge_id = c.id) AS last_id
+    FROM challenges c
+    WHERE c.id = %s
+"""
+
+
+def columns_from_rows(rows):
+    """Convertir les lignes (ts, pnl, symbol, id) du curseur en tableaux colonnes, en une passe C"""
+    table = np.array(rows, dtype=ROW_DTYPE)
+    return table['ts'], table['pnl'], table['symbol'], table['id']
+
+
+def merge_columns(archived, live):
+    """Colonnes (ts, pnl, symbol) des trades archivés (challenge_columns, ou None) et en base
+
+    Un trade encore en base après avoir été archivé (suppression pas encore validée,
+    archivage interrompu) n'est compté qu'une fois : la ligne en base est gardée.
+    """
+    if archived is None:
+        return live[:3]
+    keep = ~np.isin(archived[3], live[3])
+    ts, pnl, symbols, ids = (np.concatenate((a[keep], b)) for a, b in zip(archived, live))
+    order = np.lexsort((ids, ts))
+    return ts[order], pnl[order], symbols[order]
+
+
+def _factorize(symbols):
+    """(symboles distincts, code de chaque trade) en triant des entiers plutôt que des chaînes
+
+    Chaque chaîne est réduite à un hachage 64 bits calculé colonne par colonne ;
+    en cas de collision (vérifiée), on revient à np.unique sur les chaînes.
+    """
+    symbols = np.ascontiguousarray(symbols)
+    # Un caractère UCS-4 par colonne
+    chars = symbols.view(np.uint32).reshape(len(symbols), -1)
+    keys = np.zeros(len(symbols), dtype=np.uint64)
+    for position in range(chars.shape[1]):
+        column = chars[:, position]
+        if not column.any():
+            # Au-delà du plus long symbole, il ne reste que du remplissage
+            break
+        keys *= np.uint64(1000003)
+        keys += column
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    names = symbols[first]
+    if not np.array_equal(names[inverse], symbols):
+        names, inverse = np.unique(symbols, return_inverse=True)
+    return names, inverse
+
+
+def _ratio(numerator, denominator):
+    return float(numerator / denominator) if denominator else None
+
+
+def _curve(ts, equity, max_points):
+    """Courbe d'équité sous-échantillonnée, en gardant toujours le dernier point"""
+    if len(equity) > max_points:
+        idx = np.unique(np.linspace(0, len(equity) - 1, max_points).astype(np.int64))
+        ts, equity = ts[idx], equity[idx]
+    return [{'time': int(t), 'equity': round(e, 2)} for t, e in zip(ts.tolist(), equity.tolist())]
+
+
+def compute_analytics(initial_balance, ts, pnl, symbols, max_points=MAX_CURVE_POINTS):
+    """Statistiques de performance d'un défi, calculées sur des tableaux colonnes
+
+    `ts` (secondes epoch, triées), `pnl` et `symbols` décrivent les trades dans l'ordre.
+    Les jours sont des jours UTC ; Sharpe et Sortino portent sur les rendements
+    journaliers (PnL du jour / équité en début de jour), annualisés sur 252 jours.
+    """
+    initial_balance = float(initial_balance)
+    n = len(pnl)
+    if n == 0:
+        return {
+            'trades': 0, 'initialBalance': initial_balance, 'finalBalance': initial_balance,
+            'totalPnl': 0.0, 'equityCurve': [], 'maxDrawdown': 0.0, 'maxDrawdownPct': 0.0,
+            'dailyPnl': [], 'winRate': None, 'profitFactor': None, 'sharpe': None, 'sortino': None,
+            'bySymbol': [],
+        }
+
+    equity = initial_balance + np.cumsum(pnl)
+
+    # Drawdown : écart au plus haut précédent (solde initial compris)
+    peaks = np.maximum(np.maximum.accumulate(equity), initial_balance)
+    drawdown = peaks - equity
+    worst = int(np.argmax(drawdown))
+
+    wins = pnl > 0
+    losses = pnl < 0
+    gross_profit = pnl[wins].sum()
+    gross_loss = -pnl[losses].sum()
+
+    # PnL journalier : trades regroupés par jour UTC (ts triés, donc jours contigus)
+    days = (ts // 86400).astype(np.int64)
+    day_starts = np.concatenate(([0], np.flatnonzero(np.diff(days)) + 1))
+    day_values = days[day_starts]
+    daily_pnl = np.add.reduceat(pnl, day_starts)
+    day_end_equity = initial_balance + np.cumsum(daily_pnl)
+    day_start_equity = np.concatenate(([initial_balance], day_end_equity[:-1]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.where(day_start_equity > 0, daily_pnl / day_start_equity, 0.0)
+
+    sharpe = sortino = None
+    if len(returns) > 1:
+        mean = returns.mean()
+        std = returns.std(ddof=1)
+        downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2))
+        scale = np.sqrt(TRADING_DAYS)
+        sharpe = float(mean / std * scale) if std > 0 else None
+        sortino = float(mean / downside * scale) if downside > 0 else None
+
+    # Répartition par symbole : un passage bincount par agrégat
+    names, inverse = _factorize(symbols)
+    counts = np.bincount(inverse, minlength=len(names))
+    symbol_pnl = np.bincount(inverse, weights=pnl, minlength=len(names))
+    symbol_wins = np.bincount(inverse, weights=wins, minlength=len(names))
+    symbol_closed = np.bincount(inverse, weights=wins | losses, minlength=len(names))
+    by_symbol = sorted((
+        {
+            'symbol': name,
+            'trades': int(count),
+            'pnl': round(float(total), 2),
+            'winRate': _ratio(won, closed),
+        }
+        for name, count, total, won, closed in zip(
+            names.tolist(), counts.tolist(), symbol_pnl.tolist(), symbol_wins.tolist(), symbol_closed.tolist()
+        )
+    ), key=lambda item: item['pnl'], reverse=True)
+
+    return {
+        'trades': n,
+        'initialBalance': initial_balance,
+        'finalBalance': round(float(equity[-1]), 2),
+        'totalPnl': round(float(equity[-1] - initial_balance), 2),
+        'equityCurve': _curve(ts, equity, max_points),
+        'maxDrawdown': round(float(drawdown[worst]), 2),
+        'maxDrawdownPct': round(float(drawdown[worst] / peaks[worst] * 100), 2) if peaks[worst] > 0 else 0.0,
+        'dailyPnl': [{'time': int(day) * 86400, 'pnl': round(value, 2)}
+                     for day, value in zip(day_values.tolist(), daily_pnl.tolist())],
+        'winRate': _ratio(wins.sum(), wins.sum() + losses.sum()),
+        'profitFactor': _ratio(gross_profit, gross_loss),
+        'sharpe': sharpe,
+        'sortino': sortino,
+        'bySymbol': by_symbol,
+    }
@@ -1,16 +1,51 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import mysql.connector
 from mysql.connector import Error
 from datetime import datetime
-import bcrypt
 import os
+import tempfile
+import threading
+from functools import wraps
+from contextlib import ExitStack
 from dotenv import load_dotenv
 
+from db_pool import ConnectionPool, DatabaseUnavailable, PoolExhausted
+from db_router import DataSourceRouter, PinTable, Replica, parse_replicas
+from password_hashing import HasherBusy, PasswordHasher
+from market_data import BAR_RESOLUTIONS, MarketData, feed_allowed, make_feed, parse_networks, parse_ticks
+from positions import (
+    Position, PositionCache, challenge_positions_query,
+    load_positions, positions_saved, save_positions
+)
+from history_rollup import (
+    CLOSED_STATUSES, HistoryRollup, closed_challenge_ids
+)
+from last_login import LastLoginWriter
+from analytics import (
+    ANALYTICS_QUERY, ANALYTICS_VERSION_QUERY, columns_from_rows, compute_analytics, merge_columns
+)
+from sessions import SessionCache, SessionStore
+from response_cache import CachedBody, LRUCache, make_cache, user_challenges_key
+from http_conditional import compress_body, etag_matches, version_etag
+from trade_batch import (
+    BatchTooLarge, parse_trade_batch, validate_trade, validate_trade_batch,
+    insert_trade_rows, build_batch_response
+)
+from challenge_rules import (
+    lock_challenge_states, apply_trades, save_challenge_states, reset_challenge_state,
+    trade_days, load_daily_pnl
+)
+from trade_query import TradeHistoryQuery
+from trade_archive import TradeArchive
+from migrations import migrate
+from leaderboard import WINDOWS as LEADERBOARD_WINDOWS, Leaderboard
+from streaming import NDJSON_MIMETYPE, encode_rows, iter_batches, stream_format
+
 load_dotenv()
 
 app = Flask(__name__)
-CORS(app)  # Autoriser les requêtes cross-origin
+CORS(app, expose_headers=['X-Next-Cursor', 'X-Prev-Cursor', 'ETag'])  # Autoriser les requêtes cross-origin
 
 # Configuration de la base de données
 DB_CONFIG = {
@@ -20,17 +55,388 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', '123456')
 }
 
-def get_db_connection():
-    """Obtenir une connexion à la base de données"""
+# Configuration du pool de connexions (un pool par worker gunicorn)
+POOL_CONFIG = {
+    'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+    'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', '10')),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    'recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+    'pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+}
+
+# Réplicas en lecture (DB_REPLICAS=hôte[:port],...) pour les tableaux de bord d'un utilisateur ;
+# même base et mêmes identifiants que le primaire sauf DB_REPLICA_USER / DB_REPLICA_PASSWORD.
+# Les lectures d'un utilisateur restent sur le primaire DB_READ_YOUR_WRITES_SECONDS après ses écritures.
+REPLICA_CONFIG = {
+    'max_lag': float(os.getenv('DB_REPLICA_MAX_LAG', '2')),
+    'check_interval': float(os.getenv('DB_REPLICA_CHECK_INTERVAL', '2')),
+    'pin_seconds': float(os.getenv('DB_READ_YOUR_WRITES_SECONDS', '5'))
+}
+DB_REPLICAS = parse_replicas(os.getenv('DB_REPLICAS'))
+# Échéances partagées par les workers de la machine (fichier projeté en mémoire)
+DB_PIN_FILE = os.getenv('DB_PIN_FILE', os.path.join(tempfile.gettempdir(), f"tradesense-db-pins-{DB_CONFIG['database']}"))
+
+# Ingestion de trades par lots
+TRADE_BATCH_CHUNK_SIZE = int(os.getenv('TRADE_BATCH_CHUNK_SIZE', '500'))
+TRADE_BATCH_MAX_ITEMS = int(os.getenv('TRADE_BATCH_MAX_ITEMS', '10000'))
+
+# Classement matérialisé, resynchronisé avec les autres workers toutes les N secondes ;
+# chaque passage relit aussi les LEADERBOARD_SYNC_OVERLAP dernières secondes (transactions longues)
+LEADERBOARD_SYNC_INTERVAL = float(os.getenv('LEADERBOARD_SYNC_INTERVAL', '2'))
+LEADERBOARD_SYNC_OVERLAP = float(os.getenv('LEADERBOARD_SYNC_OVERLAP', '30'))
+leaderboard = Leaderboard(LEADERBOARD_SYNC_INTERVAL, LEADERBOARD_SYNC_OVERLAP)
+
+# Hachage bcrypt dans un pool de processus borné (coût configurable, 429 si saturé)
+password_hasher = PasswordHasher(
+    workers=int(os.getenv('HASH_POOL_WORKERS', '0')) or None,
+    max_pending=int(os.getenv('HASH_MAX_PENDING', '0')) or None,
+    rounds=int(os.getenv('BCRYPT_ROUNDS', '12')),
+    # Workers gunicorn de l'hôte (variable lue aussi par gunicorn pour son nombre de workers)
+    web_workers=int(os.getenv('WEB_CONCURRENCY', '1'))
+)
+
+# Jetons de session : cache LRU + TTL devant user_sessions
+# SESSION_AUTH_REQUIRED (défaut true) refuse sans jeton les routes d'un utilisateur ou d'un défi
+# et les trades ; false ne vérifie un jeton que s'il est présent (ancien frontend, sans jeton)
+SESSION_AUTH_REQUIRED = os.getenv('SESSION_AUTH_REQUIRED', 'true').lower() in ('1', 'true', 'yes')
+session_store = SessionStore(
+    SessionCache(
+        max_entries=int(os.getenv('SESSION_CACHE_SIZE', '10000')),
+        ttl=float(os.getenv('SESSION_CACHE_TTL', '300')),
+        negative_ttl=float(os.getenv('SESSION_NEGATIVE_TTL', '30'))
+    ),
+    session_ttl=int(os.getenv('SESSION_TTL', str(7 * 24 * 3600))),
+    sweep_interval=float(os.getenv('SESSION_SWEEP_INTERVAL', '300'))
+)
+
+# Cache des défis par utilisateur (LRU local, ou Redis si CHALLENGE_CACHE_URL=redis://...)
+challenge_cache = make_cache(
+    os.getenv('CHALLENGE_CACHE_URL'),
+    max_entries=int(os.getenv('CHALLENGE_CACHE_SIZE', '10000')),
+    ttl=float(os.getenv('CHALLENGE_CACHE_TTL', '300' if os.getenv('CHALLENGE_CACHE_URL') else '10'))
+)
+
+# Cotations en mémoire, alimentées par MARKET_FEED ('simulated', 'none' ou 'module:Classe')
+# TRADE_PRICE_SOURCE=market (défaut) : les trades sont exécutés au dernier prix connu, pas à celui
+# du client ; 'client' garde le prix envoyé (tests, démonstrations)
+MARKET_FEED = os.getenv('MARKET_FEED', 'simulated')
+MARKET_TICK_CAPACITY = int(os.getenv('MARKET_TICK_CAPACITY', '100000'))
+MARKET_QUOTE_MAX_AGE = float(os.getenv('MARKET_QUOTE_MAX_AGE', '10'))
+TRADE_PRICE_SOURCE = os.getenv('TRADE_PRICE_SOURCE', 'market').lower()
+# POST /api/market/ticks : réservé au flux interne (en-tête X-Feed-Token = MARKET_FEED_TOKEN,
+# adresse dans MARKET_FEED_ALLOWED) ; fermé si MARKET_FEED_TOKEN n'est pas défini
+MARKET_FEED_TOKEN = os.getenv('MARKET_FEED_TOKEN', '')
+MARKET_FEED_ALLOWED = parse_networks(os.getenv('MARKET_FEED_ALLOWED', '127.0.0.1,::1'))
+
+# PnL des trades calculé par appariement FIFO des lots (TRADE_PNL_SOURCE=client : PnL envoyé par le client)
+TRADE_PNL_SOURCE = os.getenv('TRADE_PNL_SOURCE', 'server').lower()
+position_cache = PositionCache(int(os.getenv('POSITION_CACHE_SIZE', '10000')))
+
+# Agrégation des défis terminés dans challenge_history (thread de fond par worker)
+HISTORY_ROLLUP_CONFIG = {
+    'batch_size': int(os.getenv('HISTORY_ROLLUP_BATCH', '500')),
+    'interval': float(os.getenv('HISTORY_ROLLUP_INTERVAL', '2')),
+    'sweep_interval': float(os.getenv('HISTORY_ROLLUP_SWEEP_INTERVAL', '300'))
+}
+
+# Dernière connexion des utilisateurs, écrite en différé par lots (un UPDATE par passage)
+LAST_LOGIN_CONFIG = {
+    'batch_size': int(os.getenv('LAST_LOGIN_BATCH', '1000')),
+    'interval': float(os.getenv('LAST_LOGIN_INTERVAL', '1'))
+}
+
+# Analyses par défi, gardées tant que leur version (nombre de trades, dernier id, solde initial) ne change pas
+analytics_cache = LRUCache(
+    max_entries=int(os.getenv('ANALYTICS_CACHE_SIZE', '1000')),
+    ttl=float(os.getenv('ANALYTICS_CACHE_TTL', '3600'))
+)
+
+_db_pool = None
+_db_pool_pid = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool():
+    """Obtenir le pool de connexions du processus courant"""
+    global _db_pool, _db_pool_pid
+    pid = os.getpid()
+    # Un pool hérité d'un fork (master gunicorn) ne doit pas être partagé entre workers
+    if _db_pool is None or _db_pool_pid != pid:
+        with _db_pool_lock:
+            if _db_pool is None or _db_pool_pid != pid:
+                _db_pool = ConnectionPool(lambda: mysql.connector.connect(**DB_CONFIG), **POOL_CONFIG)
+                _db_pool_pid = pid
+    return _db_pool
+
+_db_router = None
+_db_router_pid = None
+_db_router_lock = threading.Lock()
+
+def replica_connect(host, port):
+    config = {
+        **DB_CONFIG,
+        'host': host,
+        'port': port,
+        'user': os.getenv('DB_REPLICA_USER', DB_CONFIG['user']),
+        'password': os.getenv('DB_REPLICA_PASSWORD', DB_CONFIG['password'])
+    }
+    return lambda: mysql.connector.connect(**config)
+
+def get_db_router():
+    """Obtenir l'aiguillage primaire / réplicas du processus courant (contrôle des réplicas au premier appel)"""
+    global _db_router, _db_router_pid
+    pid = os.getpid()
+    if _db_router is None or _db_router_pid != pid:
+        with _db_router_lock:
+            if _db_router is None or _db_router_pid != pid:
+                replicas = [
+                    Replica(f'{host}:{port}', ConnectionPool(replica_connect(host, port), **POOL_CONFIG))
+                    for host, port in DB_REPLICAS
+                ]
+                router = DataSourceRouter(
+                    get_db_pool(), replicas, pins=PinTable(DB_PIN_FILE) if replicas else None, **REPLICA_CONFIG
+                )
+                router.start()
+                _db_router = router
+                _db_router_pid = pid
+    return _db_router
+
+_market = None
+_market_pid = None
+_market_lock = threading.Lock()
+
+def get_market():
+    """Obtenir les cotations du processus courant (le flux démarre au premier appel)"""
+    global _market, _market_pid
+    pid = os.getpid()
+    # Le thread du flux ne survit pas au fork : chaque worker démarre le sien
+    if _market is None or _market_pid != pid:
+        with _market_lock:
+            if _market is None or _market_pid != pid:
+                market = MarketData(MARKET_TICK_CAPACITY)
+                feed = make_feed(MARKET_FEED)
+                if feed is not None:
+                    feed.start(market)
+                _market = market
+                _market_pid = pid
+    return _market
+
+# Trades des défis terminés archivés en fichiers colonnes (python archive_trades.py)
+TRADE_ARCHIVE_DIR = os.getenv(
+    'TRADE_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive', 'trades')
+)
+
+
+_history_rollup = None
+_history_rollup_pid = None
+_history_rollup_lock = threading.Lock()
+
+def get_history_rollup():
+    """Obtenir l'agrégateur d'historique du processus courant (son thread démarre au premier appel)"""
+    global _history_rollup, _history_rollup_pid
+    pid = os.getpid()
+    if _history_rollup is None or _history_rollup_pid != pid:
+        with _history_rollup_lock:
+            if _history_rollup is None or _history_rollup_pid != pid:
+                rollup = HistoryRollup(**HISTORY_ROLLUP_CONFIG)
+                rollup.start(db_cursor)
+                _history_rollup = rollup
+                _history_rollup_pid = pid
+    return _history_rollup
+
+_last_login_writer = None
+_last_login_writer_pid = None
+_last_login_writer_lock = threading.Lock()
+
+def get_last_login_writer():
+    """Obtenir l'écrivain des dernières connexions du processus courant (son thread démarre au premier appel)"""
+    global _last_login_writer, _last_login_writer_pid
+    pid = os.getpid()
+    if _last_login_writer is None or _last_login_writer_pid != pid:
+        with _last_login_writer_lock:
+            if _last_login_writer is None or _last_login_writer_pid != pid:
+                writer = LastLoginWriter(**LAST_LOGIN_CONFIG)
+                writer.start(db_cursor)
+                _last_login_writer = writer
+                _last_login_writer_pid = pid
+    return _last_login_writer
+
+_trade_archive = None
+_trade_archive_pid = None
+_trade_archive_lock = threading.Lock()
+
+def get_trade_archive():
+    """Obtenir l'archive de trades du processus courant (manifeste relu quand il change)"""
+    global _trade_archive, _trade_archive_pid
+    pid = os.getpid()
+    if _trade_archive is None or _trade_archive_pid != pid:
+        with _trade_archive_lock:
+            if _trade_archive is None or _trade_archive_pid != pid:
+                _trade_archive = TradeArchive(TRADE_ARCHIVE_DIR)
+                _trade_archive_pid = pid
+    return _trade_archive.refresh()
+
+def market_priced(row):
+    """Remplacer le prix du client par la dernière cotation si TRADE_PRICE_SOURCE=market"""
+    if TRADE_PRICE_SOURCE != 'market':
+        return row, None
+    price = get_market().price(row[2], MARKET_QUOTE_MAX_AGE)
+    if price is None:
+        return None, f"Aucune cotation récente pour {row[2]}"
+    return row[:4] + (price,) + row[5:], None
+
+def load_trade_positions(cursor, rows):
+    """Positions touchées par les trades (index, ligne), à lire après le verrou des défis"""
+    if TRADE_PNL_SOURCE != 'server':
+        return None
+    return load_positions(cursor, [(row[1], row[2]) for _, row in rows], position_cache)
+
+def db_cursor(dictionary=False):
+    """Emprunter une connexion et un curseur du pool (à utiliser avec `with`)"""
+    return get_db_pool().cursor(dictionary=dictionary)
+
+def db_read_cursor(user_id, dictionary=False):
+    """Connexion de lecture des données de `user_id` : réplica, sauf juste après ses écritures"""
+    return get_db_router().read_cursor(user_id, dictionary=dictionary)
+
+def stream_query_response(query, params, fmt, transform=None, user_id=None, merge=None):
+    """Répondre en streaming (NDJSON ou tableau JSON) sans charger tout le résultat en mémoire
+
+    `merge` transforme les paquets lus (ex. fusion avec les trades archivés).
+    """
+    resources = ExitStack()
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except Error as e:
-        print(f"Erreur de connexion à MySQL: {e}")
+        connection, cursor = resources.enter_context(
+            db_read_cursor(user_id, dictionary=True) if user_id is not None else db_cursor(dictionary=True)
+        )
+        cursor.execute(query, params)
+    except BaseException:
+        resources.close()
+        raise
+    
+    mimetype = NDJSON_MIMETYPE if fmt == 'ndjson' else 'application/json'
+    batches = iter_batches(cursor) if merge is None else merge(iter_batches(cursor))
+    response = Response(encode_rows(batches, fmt, transform), mimetype=mimetype)
+    # La connexion reste empruntée jusqu'à la fin de l'envoi, même si le client se déconnecte
+    response.call_on_close(resources.close)
+    return response
+
+def db_unavailable(e, with_success=True):
+    """Réponse d'erreur lorsque le pool ne fournit pas de connexion"""
+    print(f"Erreur de connexion à MySQL: {e}")
+    body = {'error': 'Impossible de se connecter à la base de données'}
+    if with_success:
+        body = {'success': False, **body}
+    return jsonify(body), 503 if isinstance(e, PoolExhausted) else 500
+
+def hasher_busy(e):
+    """Réponse 429 lorsque trop de hachages de mot de passe sont en attente"""
+    print(f"Pool de hachage saturé: {e}")
+    response = jsonify({'success': False, 'error': 'Serveur occupé, réessayez dans un instant'})
+    response.headers['Retry-After'] = '1'
+    return response, 429
+
+def not_modified(etag):
+    """Réponse 304 : le client a déjà cette version, ni requête complète ni corps"""
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+def versioned_json(body, etag):
+    """Réponse JSON avec son ETag de version ; no-cache impose une revalidation à chaque sondage"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compresser (br/gzip) les réponses JSON complètes au-delà du seuil, selon Accept-Encoding"""
+    if response.status_code != 200 or response.direct_passthrough or response.is_streamed \
+            or 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+    body, encoding = compress_body(response.get_data(), request.headers.get('Accept-Encoding'), response.mimetype)
+    if encoding:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        # Chaque encodage est une représentation distincte : ETag suffixé (reconnu par etag_matches)
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
+def bearer_token():
+    """Jeton de session transmis dans l'en-tête Authorization: Bearer <jeton>"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token.strip():
+        return token.strip()
+    return None
+
+def authenticate():
+    """(user_id de la session, réponse d'erreur) ; (None, None) sans jeton si SESSION_AUTH_REQUIRED=false"""
+    token = bearer_token()
+    if token is None:
+        if SESSION_AUTH_REQUIRED:
+            return None, (jsonify({'success': False, 'error': 'Authentification requise'}), 401)
+        return None, None
+    try:
+        session_store.maybe_sweep(db_cursor)
+        session_user_id = session_store.validate(token, db_cursor)
+    except DatabaseUnavailable as e:
+        return None, db_unavailable(e)
+    except Exception as e:
+        print(f"Erreur de vérification de session: {e}")
+        return None, (jsonify({'success': False, 'error': 'Erreur serveur'}), 500)
+    if session_user_id is None:
+        return None, (jsonify({'success': False, 'error': 'Session invalide ou expirée'}), 401)
+    return session_user_id, None
+
+def forbidden(session_user_id, owner_ids):
+    """Réponse 403 si un des `owner_ids` n'est pas l'utilisateur de la session (None sans session)"""
+    if session_user_id is None or all(owner == session_user_id for owner in owner_ids):
         return None
+    return jsonify({'success': False, 'error': 'Accès refusé'}), 403
+
+def require_session(view):
+    """Vérifier que le jeton de session appartient à l'utilisateur `user_id` de la route"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        session_user_id, error = authenticate()
+        error = error or forbidden(session_user_id, [kwargs.get('user_id')])
+        if error:
+            return error
+        return view(*args, **kwargs)
+    return wrapper
+
+def require_challenge_owner(view):
+    """Vérifier que le jeton de session appartient au propriétaire du défi `challenge_id` de la route"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        session_user_id, error = authenticate()
+        if error:
+            return error
+        if session_user_id is not None:
+            try:
+                with db_cursor() as (connection, cursor):
+                    cursor.execute("SELECT user_id FROM challenges WHERE id = %s", (kwargs['challenge_id'],))
+                    owner = cursor.fetchone()
+            except DatabaseUnavailable as e:
+                return db_unavailable(e)
+            except Exception as e:
+                print(f"Erreur de vérification du propriétaire du défi: {e}")
+                return jsonify({'success': False, 'error': 'Erreur serveur'}), 500
+            if owner is None:
+                return jsonify({'success': False, 'error': 'Défi introuvable'}), 404
+            error = forbidden(session_user_id, [owner[0]])
+            if error:
+                return error
+        return view(*args, **kwargs)
+    return wrapper
 
 def initialize_tables():
-    """Initialiser les tables de la base de données si elles n'existent pas"""
+    """Amener le schéma de la base à la dernière version (migrations versionnées)"""
     try:
         connection = mysql.connector.connect(
             host=DB_CONFIG['host'],
@@ -42,118 +448,14 @@ def initialize_tables():
         # Sélectionner la base de données
         cursor.execute(f"USE {DB_CONFIG['database']};")
         
-        # Créer la table users si elle n'existe pas
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                email VARCHAR(255) UNIQUE NOT NULL,
-                name VARCHAR(255) NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                role ENUM('user', 'admin', 'super_admin') DEFAULT 'user',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-            );
-        """)
-        
-        # Créer la table challenges si elle n'existe pas
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS challenges (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                initial_balance DECIMAL(15,2) NOT NULL,
-                current_balance DECIMAL(15,2) NOT NULL,
-                status ENUM('active', 'passed', 'failed') DEFAULT 'active',
-                max_daily_loss DECIMAL(15,2) NOT NULL,
-                max_total_loss DECIMAL(15,2) NOT NULL,
-                profit_target DECIMAL(15,2) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            );
-        """)
-        
-        # Créer la table trades si elle n'existe pas
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS trades (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                challenge_id INT NOT NULL,
-                symbol VARCHAR(20) NOT NULL,
-                type ENUM('BUY', 'SELL') NOT NULL,
-                price DECIMAL(15,5) NOT NULL,
-                quantity INT NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                pnl DECIMAL(15,2) DEFAULT 0.00,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE
-            );
-        """)
-        
-        # Créer la table user_sessions si elle n'existe pas
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_sessions (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                session_token VARCHAR(255) UNIQUE NOT NULL,
-                expires_at TIMESTAMP NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            );
-        """)
-        
-        # Créer la table challenge_history si elle n'existe pas
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS challenge_history (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                challenge_id INT NOT NULL,
-                initial_balance DECIMAL(15,2) NOT NULL,
-                final_balance DECIMAL(15,2) NOT NULL,
-                status ENUM('passed', 'failed') NOT NULL,
-                duration_days INT,
-                profit_amount DECIMAL(15,2),
-                profit_percentage DECIMAL(5,2),
-                completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE
-            );
-        """)
-        
-        # Créer la table user_preferences si elle n'existe pas
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_preferences (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                language VARCHAR(10) DEFAULT 'fr',
-                theme VARCHAR(20) DEFAULT 'dark',
-                notifications_enabled BOOLEAN DEFAULT TRUE,
-                risk_level ENUM('low', 'medium', 'high') DEFAULT 'medium',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            );
-        """)
-        
-        # Créer la table user_achievements si elle n'existe pas
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_achievements (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                achievement_type VARCHAR(100) NOT NULL,
-                achievement_name VARCHAR(255) NOT NULL,
-                description TEXT,
-                earned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                progress_percentage INT DEFAULT 0,
-                is_completed BOOLEAN DEFAULT FALSE,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            );
-        """)
-        
-        connection.commit()
+        # Base à jour : une seule lecture de schema_migrations
+        applied = migrate(connection, cursor, DB_CONFIG['database'])
+        
         cursor.close()
         connection.close()
-        print("Tables initialisées avec succès")
-    except Error as e:
+        if applied:
+            print(f"Tables initialisées avec succès (migrations {', '.join(map(str, applied))})")
+    except (Error, RuntimeError) as e:
         print(f"Erreur lors de l'initialisation des tables: {e}")
 
 @app.route('/api/login', methods=['POST'])
@@ -163,50 +465,55 @@ def login():
         email = data.get('email')
         password = data.get('password')
         
-        connection = get_db_connection()
-        if connection is None:
-            return jsonify({'success': False, 'error': 'Impossible de se connecter à la base de données'}), 500
-            
-        cursor = connection.cursor(dictionary=True)
         query = "SELECT id, email, name, password_hash, role, created_at, updated_at FROM users WHERE email = %s"
-        cursor.execute(query, (email,))
-        user = cursor.fetchone()
-        
-        if user:
-            # Vérifier le mot de passe
-            if bcrypt.checkpw(password.encode('utf-8'), user['password_hash'].encode('utf-8')):
-                # Mettre à jour updated_at
-                update_query = "UPDATE users SET updated_at = NOW() WHERE id = %s"
-                cursor.execute(update_query, (user['id'],))
-                connection.commit()
-                
-                # Récupérer l'utilisateur mis à jour
-                cursor.execute(query, (email,))
-                updated_user = cursor.fetchone()
-                
-                # Formater les dates
-                updated_user['created_at'] = updated_user['created_at'].isoformat() if updated_user['created_at'] else None
-                updated_user['updated_at'] = updated_user['updated_at'].isoformat() if updated_user['updated_at'] else None
-                
-                # Retirer le hash du mot de passe pour le frontend
-                del updated_user['password_hash']
-                
-                cursor.close()
-                connection.close()
-                
-                return jsonify({
-                    'success': True,
-                    'user': updated_user
-                })
-            else:
-                cursor.close()
-                connection.close()
-                return jsonify({'success': False, 'error': 'Mot de passe invalide'}), 401
-        else:
-            cursor.close()
-            connection.close()
+        with db_cursor(dictionary=True) as (connection, cursor):
+            cursor.execute(query, (email,))
+            user = cursor.fetchone()
+        
+        if not user:
             return jsonify({'success': False, 'error': 'Email invalide'}), 401
+        
+        # Vérifier le mot de passe (pool de processus, sans garder de connexion empruntée)
+        if not password_hasher.verify(password, user['password_hash']):
+            return jsonify({'success': False, 'error': 'Mot de passe invalide'}), 401
+        
+        # Le coût bcrypt a changé depuis le dernier hachage : recalculer avec le mot de passe en clair
+        new_hash = None
+        if password_hasher.needs_rehash(user['password_hash']):
+            try:
+                new_hash = password_hasher.hash(password)
+            except HasherBusy:
+                # Pool saturé : la mise à niveau sera faite à une prochaine connexion
+                pass
+        
+        with db_cursor() as (connection, cursor):
+            # Seul le hash recalculé (rare) est écrit ici ; la date de connexion part en différé
+            if new_hash:
+                cursor.execute("UPDATE users SET password_hash = %s WHERE id = %s", (new_hash, user['id']))
+            
+            # Jeton de session pour les requêtes suivantes (sans renvoyer le mot de passe)
+            token = session_store.issue(cursor, user['id'])
+            connection.commit()
+        get_last_login_writer().record(user['id'])
+        
+        # Réponse construite depuis la ligne déjà lue (updated_at : dernière écriture connue)
+        user['created_at'] = user['created_at'].isoformat() if user['created_at'] else None
+        user['updated_at'] = user['updated_at'].isoformat() if user['updated_at'] else None
+        
+        # Retirer le hash du mot de passe pour le frontend
+        del user['password_hash']
+        
+        return jsonify({
+            'success': True,
+            'user': user,
+            'token': token,
+            'expiresIn': session_store.session_ttl
+        })
             
+    except HasherBusy as e:
+        return hasher_busy(e)
+    except DatabaseUnavailable as e:
+        return db_unavailable(e)
     except Exception as e:
         print(f"Erreur de login: {e}")
         return jsonify({'success': False, 'error': 'Erreur serveur'}), 500
@@ -219,47 +526,66 @@ def register():
         email = data.get('email')
         password = data.get('password')
         
-        connection = get_db_connection()
-        if connection is None:
-            return jsonify({'success': False, 'error': 'Impossible de se connecter à la base de données'}), 500
-            
-        cursor = connection.cursor()
-        
-        # Vérifier si l'email existe déjà
-        check_query = "SELECT id FROM users WHERE email = %s"
-        cursor.execute(check_query, (email,))
-        existing_user = cursor.fetchone()
+        with db_cursor() as (connection, cursor):
+            # Vérifier si l'email existe déjà
+            check_query = "SELECT id FROM users WHERE email = %s"
+            cursor.execute(check_query, (email,))
+            existing_user = cursor.fetchone()
         
         if existing_user:
-            cursor.close()
-            connection.close()
             return jsonify({'success': False, 'error': 'Email déjà utilisé'}), 400
         
-        # Hacher le mot de passe
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        # Hacher le mot de passe (pool de processus, sans garder de connexion empruntée)
+        hashed_password = password_hasher.hash(password)
         
-        # Insérer le nouvel utilisateur
-        insert_query = """
-            INSERT INTO users (email, name, password_hash, role, created_at, updated_at) 
-            VALUES (%s, %s, %s, 'user', NOW(), NOW())
-        """
-        cursor.execute(insert_query, (email, name, hashed_password))
-        user_id = cursor.lastrowid
-        connection.commit()
-        
-        cursor.close()
-        connection.close()
+        with db_cursor() as (connection, cursor):
+            # Insérer le nouvel utilisateur
+            insert_query = """
+                INSERT INTO users (email, name, password_hash, role, created_at, updated_at) 
+                VALUES (%s, %s, %s, 'user', NOW(), NOW())
+            """
+            try:
+                cursor.execute(insert_query, (email, name, hashed_password))
+            except mysql.connector.IntegrityError:
+                # Inscription concurrente avec le même email pendant le hachage
+                return jsonify({'success': False, 'error': 'Email déjà utilisé'}), 400
+            user_id = cursor.lastrowid
+            connection.commit()
         
         return jsonify({
             'success': True,
             'userId': user_id
         })
         
+    except HasherBusy as e:
+        return hasher_busy(e)
+    except DatabaseUnavailable as e:
+        return db_unavailable(e)
     except Exception as e:
         print(f"Erreur d'inscription: {e}")
         return jsonify({'success': False, 'error': 'Erreur serveur'}), 500
 
+@app.route('/api/logout', methods=['POST'])
+def logout():
+    try:
+        token = bearer_token()
+        if token is None:
+            return jsonify({'success': False, 'error': 'Authentification requise'}), 401
+        
+        with db_cursor() as (connection, cursor):
+            revoked = session_store.revoke(cursor, token)
+            connection.commit()
+        
+        return jsonify({'success': revoked})
+        
+    except DatabaseUnavailable as e:
+        return db_unavailable(e)
+    except Exception as e:
+        print(f"Erreur de déconnexion: {e}")
+        return jsonify({'success': False, 'error': 'Erreur serveur'}), 500
+
 @app.route('/api/user/<int:user_id>/challenges', methods=['POST'])
+@require_session
 def create_challenge(user_id):
     try:
         data = request.json
@@ -270,51 +596,43 @@ def create_challenge(user_id):
         max_total_loss = data.get('maxTotalLoss')
         profit_target = data.get('profitTarget')
         
-        connection = get_db_connection()
-        if connection is None:
-            return jsonify({'success': False, 'error': 'Impossible de se connecter à la base de données'}), 500
+        with db_cursor(dictionary=True) as (connection, cursor):
+            insert_query = """
+                INSERT INTO challenges (user_id, initial_balance, current_balance, status, 
+                                        max_daily_loss, max_total_loss, profit_target, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+            """
+            cursor.execute(insert_query, (user_id, initial_balance, current_balance, status, max_daily_loss, max_total_loss, profit_target))
+            challenge_id = cursor.lastrowid
+            connection.commit()
+            challenge_cache.delete(user_challenges_key(user_id))
+            get_db_router().note_write(user_id)
             
-        cursor = connection.cursor(dictionary=True)
-        
-        insert_query = """
-            INSERT INTO challenges (user_id, initial_balance, current_balance, status, 
-                                    max_daily_loss, max_total_loss, profit_target, created_at, updated_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
-        """
-        cursor.execute(insert_query, (user_id, initial_balance, current_balance, status, max_daily_loss, max_total_loss, profit_target))
-        challenge_id = cursor.lastrowid
-        connection.commit()
-        
-        select_query = """
-            SELECT id, user_id, initial_balance, current_balance, status, 
-                   max_daily_loss, max_total_loss, profit_target, created_at, updated_at
-            FROM challenges
-            WHERE id = %s
-        """
-        cursor.execute(select_query, (challenge_id,))
-        challenge = cursor.fetchone()
+            select_query = """
+                SELECT id, user_id, initial_balance, current_balance, status, 
+                       max_daily_loss, max_total_loss, profit_target, created_at, updated_at
+                FROM challenges
+                WHERE id = %s
+            """
+            cursor.execute(select_query, (challenge_id,))
+            challenge = cursor.fetchone()
         
         if challenge:
             challenge['created_at'] = challenge['created_at'].isoformat() if challenge['created_at'] else None
             challenge['updated_at'] = challenge['updated_at'].isoformat() if challenge['updated_at'] else None
         
-        cursor.close()
-        connection.close()
-        
         return jsonify({'success': True, 'challenge': challenge})
         
+    except DatabaseUnavailable as e:
+        return db_unavailable(e)
     except Exception as e:
         print(f"Erreur de création de défi: {e}")
         return jsonify({'success': False, 'error': 'Erreur serveur'}), 500
 
 @app.route('/api/user/<int:user_id>/challenges', methods=['GET'])
+@require_session
 def get_user_challenges(user_id):
     try:
-        connection = get_db_connection()
-        if connection is None:
-            return jsonify({'error': 'Impossible de se connecter à la base de données'}), 500
-            
-        cursor = connection.cursor(dictionary=True)
         query = """
             SELECT id, user_id, initial_balance, current_balance, status, 
                    max_daily_loss, max_total_loss, profit_target, created_at, updated_at
@@ -322,54 +640,93 @@ def get_user_challenges(user_id):
             WHERE user_id = %s
             ORDER BY created_at DESC
         """
-        cursor.execute(query, (user_id,))
-        challenges = cursor.fetchall()
         
-        # Formater les dates
-        for challenge in challenges:
-            challenge['created_at'] = challenge['created_at'].isoformat() if challenge['created_at'] else None
-            challenge['updated_at'] = challenge['updated_at'].isoformat() if challenge['updated_at'] else None
+        fmt = stream_format(request.headers.get('Accept'), request.args.get('stream'))
+        if fmt:
+            return stream_query_response(query, (user_id,), fmt, user_id=user_id)
         
-        cursor.close()
-        connection.close()
+        # Lecture à travers le cache : ni requête ni sérialisation tant que les défis n'ont pas changé
+        key = user_challenges_key(user_id)
+        cached = challenge_cache.get(key)
+        if cached is None:
+            generation = challenge_cache.generation(key)
+            with db_read_cursor(user_id, dictionary=True) as (connection, cursor):
+                cursor.execute(query, (user_id,))
+                challenges = cursor.fetchall()
+            
+            # Version des lignes : updated_at est à la seconde, solde et statut départagent
+            # deux modifications dans la même seconde
+            etag = version_etag('challenges', user_id, [
+                (c['id'], c['updated_at'], c['current_balance'], c['status']) for c in challenges
+            ])
+            
+            # Formater les dates
+            for challenge in challenges:
+                challenge['created_at'] = challenge['created_at'].isoformat() if challenge['created_at'] else None
+                challenge['updated_at'] = challenge['updated_at'].isoformat() if challenge['updated_at'] else None
+            
+            cached = CachedBody(etag, app.json.dumps(challenges).encode('utf-8'))
+            challenge_cache.set(key, cached, generation)
         
-        return jsonify(challenges)
+        if etag_matches(request.headers.get('If-None-Match'), cached.etag):
+            return not_modified(cached.etag)
+        return versioned_json(cached.body, cached.etag)
         
+    except DatabaseUnavailable as e:
+        return db_unavailable(e, with_success=False)
     except Exception as e:
         print(f"Erreur de récupération des défis: {e}")
         return jsonify({'error': 'Erreur serveur'}), 500
 
 @app.route('/api/user/<int:user_id>/trades', methods=['GET'])
+@require_session
 def get_user_trades(user_id):
     try:
-        connection = get_db_connection()
-        if connection is None:
-            return jsonify({'error': 'Impossible de se connecter à la base de données'}), 500
-            
-        cursor = connection.cursor(dictionary=True)
-        query = """
-            SELECT id, user_id, challenge_id, symbol, type, price, quantity, timestamp, pnl
-            FROM trades
-            WHERE user_id = %s
-            ORDER BY timestamp DESC
-        """
-        cursor.execute(query, (user_id,))
-        trades = cursor.fetchall()
+        try:
+            history = TradeHistoryQuery(user_id, request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Formater les dates
-        for trade in trades:
-            trade['timestamp'] = trade['timestamp'].isoformat() if trade['timestamp'] else None
+        # Trades en base fusionnés avec ceux des défis terminés archivés
+        archive = get_trade_archive()
         
-        cursor.close()
-        connection.close()
+        # Export complet en streaming : ni pagination ni matérialisation de l'historique
+        fmt = stream_format(request.headers.get('Accept'), request.args.get('stream'))
+        if fmt:
+            query, params = history.sql(paginate=False)
+            return stream_query_response(query, params, fmt, history.project, user_id=user_id,
+                                         merge=lambda batches: archive.merged_batches(batches, history))
         
-        return jsonify(trades)
+        with db_read_cursor(user_id, dictionary=True) as (connection, cursor):
+            # Les trades ne sont jamais modifiés : (nombre, dernier id, génération de l'archive) versionne l'historique
+            cursor.execute("SELECT COUNT(*) AS n, MAX(id) AS last_id FROM trades WHERE user_id = %s", (user_id,))
+            version = cursor.fetchone()
+            etag = version_etag('trades', user_id, request.query_string, version['n'], version['last_id'],
+                                archive.generation)
+            if etag_matches(request.headers.get('If-None-Match'), etag):
+                return not_modified(etag)
+            
+            query, params = history.sql()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
         
+        trades, next_cursor, prev_cursor = history.page(archive.merge_page(history, rows))
+        
+        response = versioned_json(app.json.dumps(trades), etag)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        if prev_cursor:
+            response.headers['X-Prev-Cursor'] = prev_cursor
+        return response
+        
+    except DatabaseUnavailable as e:
+        return db_unavailable(e, with_success=False)
     except Exception as e:
         print(f"Erreur de récupération des trades: {e}")
         return jsonify({'error': 'Erreur serveur'}), 500
 
 @app.route('/api/challenge/<int:challenge_id>', methods=['PUT'])
+@require_challenge_owner
 def update_challenge(challenge_id):
     try:
         data = request.json
@@ -378,12 +735,6 @@ def update_challenge(challenge_id):
         if not updates:
             return jsonify({'success': False, 'error': 'Aucune donnée à mettre à jour'}), 400
         
-        connection = get_db_connection()
-        if connection is None:
-            return jsonify({'success': False, 'error': 'Impossible de se connecter à la base de données'}), 500
-            
-        cursor = connection.cursor()
-        
         # Construire la requête de mise à jour
         set_clause = []
         values = []
@@ -406,56 +757,349 @@ def update_challenge(challenge_id):
         values.append(challenge_id)
         query = f"UPDATE challenges SET {', '.join(set_clause)} WHERE id = %s"
         
-        cursor.execute(query, values)
-        connection.commit()
+        with db_cursor() as (connection, cursor):
+            cursor.execute(query, values)
+            success = cursor.rowcount > 0
+            # Un solde modifié à la main invalide l'état suivi par le moteur de règles
+            if success and {'initialBalance', 'currentBalance', 'initial_balance', 'current_balance'} & updates.keys():
+                reset_challenge_state(cursor, challenge_id)
+            connection.commit()
+            if success:
+                cursor.execute("SELECT user_id FROM challenges WHERE id = %s", (challenge_id,))
+                owner = cursor.fetchone()
+                if owner:
+                    challenge_cache.delete(user_challenges_key(owner[0]))
+                    get_db_router().note_write(owner[0])
+            if success:
+                leaderboard.refresh(cursor, [challenge_id])
         
-        success = cursor.rowcount > 0
-        
-        cursor.close()
-        connection.close()
+        # Défi clôturé à la main (ex. bouton « terminer le défi »)
+        if success and updates.get('status') in CLOSED_STATUSES:
+            get_history_rollup().enqueue([challenge_id])
         
         return jsonify({'success': success})
         
+    except DatabaseUnavailable as e:
+        return db_unavailable(e)
     except Exception as e:
         print(f"Erreur de mise à jour du défi: {e}")
         return jsonify({'success': False, 'error': 'Erreur serveur'}), 500
 
+@app.route('/api/user/<int:user_id>/history', methods=['GET'])
+@require_session
+def get_user_history(user_id):
+    """Défis terminés de l'utilisateur, lus dans la table pré-agrégée challenge_history"""
+    try:
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+        with db_read_cursor(user_id, dictionary=True) as (connection, cursor):
+            cursor.execute("""
+                SELECT challenge_id, initial_balance, final_balance, status, duration_days,
+                       profit_amount, profit_percentage, completed_at
+                FROM challenge_history
+                WHERE user_id = %s
+                ORDER BY completed_at DESC
+                LIMIT %s
+            """, (user_id, limit))
+            history = cursor.fetchall()
+        
+        for row in history:
+            row['completed_at'] = row['completed_at'].isoformat() if row['completed_at'] else None
+        return jsonify(history)
+        
+    except DatabaseUnavailable as e:
+        return db_unavailable(e, with_success=False)
+    except Exception as e:
+        print(f"Erreur de récupération de l'historique: {e}")
+        return jsonify({'error': 'Erreur serveur'}), 500
+
+@app.route('/api/challenge/<int:challenge_id>/analytics', methods=['GET'])
+@require_challenge_owner
+def get_challenge_analytics(challenge_id):
+    try:
+        with db_cursor() as (connection, cursor):
+            # Requête de version sur index : l'analyse n'est recalculée qu'après un nouveau trade
+            cursor.execute(ANALYTICS_VERSION_QUERY, (challenge_id,))
+            version = cursor.fetchone()
+            if version is None:
+                return jsonify({'error': 'Défi introuvable'}), 404
+            # Instantané de l'archive : ETag et colonnes archivées lus à la même génération
+            archive = get_trade_archive()
+            etag = version_etag('analytics', challenge_id, *version[1:], archive.generation)
+            if etag_matches(request.headers.get('If-None-Match'), etag):
+                return not_modified(etag)
+            
+            cached = analytics_cache.get(challenge_id)
+            if cached is not None and cached.etag == etag:
+                return versioned_json(cached.body, etag)
+            
+            cursor.execute(ANALYTICS_QUERY, (challenge_id,))
+            rows = cursor.fetchall()
+        
+        ts, pnl, symbols = merge_columns(archive.challenge_columns(version[0], challenge_id), columns_from_rows(rows))
+        body = app.json.dumps({'challengeId': challenge_id, **compute_analytics(version[1], ts, pnl, symbols)})
+        analytics_cache.set(challenge_id, CachedBody(etag, body))
+        return versioned_json(body, etag)
+        
+    except DatabaseUnavailable as e:
+        return db_unavailable(e, with_success=False)
+    except Exception as e:
+        print(f"Erreur de calcul des statistiques du défi: {e}")
+        return jsonify({'error': 'Erreur serveur'}), 500
+
+@app.route('/api/challenge/<int:challenge_id>/positions', methods=['GET'])
+@require_challenge_owner
+def get_challenge_positions(challenge_id):
+    """Positions ouvertes et PnL réalisé par symbole ; PnL latent au dernier prix connu"""
+    try:
+        with db_cursor() as (connection, cursor):
+            cursor.execute(*challenge_positions_query(challenge_id))
+            rows = cursor.fetchall()
+        
+        market = get_market()
+        positions = []
+        unrealized = 0.0
+        for row in rows:
+            position = Position.from_row(row)
+            body = position.to_dict(market.price(position.symbol), open_lots=row[6] - row[5])
+            unrealized += body['unrealizedPnl'] or 0.0
+            positions.append(body)
+        return jsonify({
+            'challengeId': challenge_id,
+            'positions': positions,
+            'realizedPnl': round(sum(p['realizedPnl'] for p in positions), 2),
+            'unrealizedPnl': round(unrealized, 2)
+        })
+        
+    except DatabaseUnavailable as e:
+        return db_unavailable(e, with_success=False)
+    except Exception as e:
+        print(f"Erreur de récupération des positions: {e}")
+        return jsonify({'error': 'Erreur serveur'}), 500
+
 @app.route('/api/trade', methods=['POST'])
 def add_trade():
     try:
-        data = request.json
-        user_id = data.get('userId')
-        challenge_id = data.get('challengeId')
-        symbol = data.get('symbol')
-        trade_type = data.get('type')
-        price = data.get('price')
-        quantity = data.get('quantity')
-        pnl = data.get('pnl', 0)
-        
-        connection = get_db_connection()
-        if connection is None:
-            return jsonify({'success': False, 'error': 'Impossible de se connecter à la base de données'}), 500
+        session_user_id, denied = authenticate()
+        if denied:
+            return denied
+        row, error = validate_trade(request.json)
+        if not error:
+            row, error = market_priced(row)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        # Le défi doit en plus appartenir à row[0] (vérifié par apply_trades)
+        denied = forbidden(session_user_id, [row[0]])
+        if denied:
+            return denied
+        challenge_id = row[1]
+        
+        with db_cursor() as (connection, cursor):
+            # Verrouiller le défi : les règles sont évaluées et le statut basculé dans la même transaction
+            states = lock_challenge_states(cursor, [challenge_id])
+            days = trade_days([(0, row)])
+            load_daily_pnl(cursor, states, [(0, row)], days)
+            positions = load_trade_positions(cursor, [(0, row)])
+            errors = {}
+            kept = apply_trades(states, [(0, row)], errors, positions=positions, days=days)
+            if not kept:
+                return jsonify({'success': False, 'error': errors[0]}), 400
+            row = kept[0][1]
             
-        cursor = connection.cursor()
+            query = """
+                INSERT INTO trades (user_id, challenge_id, symbol, type, price, quantity, pnl)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """
+            cursor.execute(query, row)
+            trade_id = cursor.lastrowid
+            save_challenge_states(cursor, states.values())
+            if positions:
+                save_positions(cursor, positions.values())
+            connection.commit()
         
-        query = """
-            INSERT INTO trades (user_id, challenge_id, symbol, type, price, quantity, pnl)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(query, (user_id, challenge_id, symbol, trade_type, price, quantity, pnl))
-        connection.commit()
+        if positions:
+            positions_saved(positions.values(), position_cache)
+        get_history_rollup().enqueue(closed_challenge_ids(states.values()))
         
-        success = cursor.rowcount > 0
+        # Solde et statut du défi ont changé
+        challenge_cache.delete(user_challenges_key(row[0]))
+        get_db_router().note_write(row[0])
+        state = states[challenge_id]
+        leaderboard.record_trade(challenge_id, row[6], state.equity, state.status)
+        return jsonify({'success': True, 'tradeId': trade_id, 'pnl': float(row[6]), 'challenge': state.to_dict()})
         
-        cursor.close()
-        connection.close()
+    except DatabaseUnavailable as e:
+        return db_unavailable(e)
+    except Exception as e:
+        print(f"Erreur d'ajout de trade: {e}")
+        return jsonify({'success': False, 'error': 'Erreur serveur'}), 500
+
+@app.route('/api/trades/batch', methods=['POST'])
+def add_trades_batch():
+    try:
+        session_user_id, denied = authenticate()
+        if denied:
+            return denied
+        try:
+            items = parse_trade_batch(request.get_data(), request.content_type)
+            rows, errors = validate_trade_batch(items, TRADE_BATCH_MAX_ITEMS)
+        except BatchTooLarge as e:
+            return jsonify({'success': False, 'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'success': False, 'error': f"Lot invalide: {e}"}), 400
+        denied = forbidden(session_user_id, {row[0] for _, row in rows})
+        if denied:
+            return denied
         
-        return jsonify({'success': success})
+        if TRADE_PRICE_SOURCE == 'market':
+            priced = []
+            for index, row in rows:
+                row, error = market_priced(row)
+                if error:
+                    errors[index] = error
+                else:
+                    priced.append((index, row))
+            rows = priced
         
+        ids = {}
+        states = {}
+        if rows:
+            with db_cursor() as (connection, cursor):
+                states = lock_challenge_states(cursor, [row[1] for _, row in rows])
+                days = trade_days(rows)
+                load_daily_pnl(cursor, states, rows, days)
+                positions = load_trade_positions(cursor, rows)
+                rows = apply_trades(states, rows, errors, positions=positions, days=days)
+                # Une seule transaction pour tout le lot, découpé en INSERT multi-lignes
+                ids = insert_trade_rows(cursor, rows, TRADE_BATCH_CHUNK_SIZE)
+                save_challenge_states(cursor, states.values())
+                if positions:
+                    save_positions(cursor, positions.values())
+                connection.commit()
+            
+            if positions:
+                positions_saved(positions.values(), position_cache)
+            get_history_rollup().enqueue(closed_challenge_ids(states.values()))
+            for _, row in rows:
+                state = states[row[1]]
+                leaderboard.record_trade(row[1], row[6], state.equity, state.status)
+            challenge_cache.delete(*{user_challenges_key(state.user_id) for state in states.values() if state.dirty})
+            get_db_router().note_write(*{row[0] for _, row in rows})
+        
+        response = build_batch_response(len(items), ids, errors)
+        response['challenges'] = [state.to_dict() for state in states.values() if state.dirty]
+        return jsonify(response)
+        
+    except DatabaseUnavailable as e:
+        return db_unavailable(e)
     except Exception as e:
-        print(f"Erreur d'ajout de trade: {e}")
+        print(f"Erreur d'ajout de trades par lot: {e}")
         return jsonify({'success': False, 'error': 'Erreur serveur'}), 500
 
+@app.route('/api/leaderboard', methods=['GET'])
+def get_leaderboard():
+    try:
+        window = request.args.get('window', 'all')
+        if window not in LEADERBOARD_WINDOWS:
+            return jsonify({'error': f"window doit être l'un de: {', '.join(LEADERBOARD_WINDOWS)}"}), 400
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+        around = min(max(request.args.get('around', 5, type=int), 0), 50)
+        user_id = request.args.get('user_id', type=int)
+        
+        leaderboard.sync(db_cursor)
+        return jsonify(leaderboard.query(window, limit, user_id, around))
+        
+    except DatabaseUnavailable as e:
+        return db_unavailable(e, with_success=False)
+    except Exception as e:
+        print(f"Erreur de récupération du classement: {e}")
+        return jsonify({'error': 'Erreur serveur'}), 500
+
+@app.route('/api/market/quotes', methods=['GET'])
+def get_market_quotes():
+    market = get_market()
+    symbols = [s.strip() for s in request.args.get('symbols', '').split(',') if s.strip()] or market.symbols()
+    return jsonify([quote for quote in map(market.quote, symbols) if quote])
+
+@app.route('/api/market/quote/<symbol>', methods=['GET'])
+def get_market_quote(symbol):
+    quote = get_market().quote(symbol)
+    if quote is None:
+        return jsonify({'error': 'Symbole inconnu'}), 404
+    return jsonify(quote)
+
+@app.route('/api/market/bars/<symbol>', methods=['GET'])
+def get_market_bars(symbol):
+    """Bougies OHLCV (time en secondes epoch, value = close pour les séries en ligne)"""
+    resolution = request.args.get('resolution', '1m')
+    if resolution not in BAR_RESOLUTIONS:
+        return jsonify({'error': f"resolution doit être l'une de: {', '.join(BAR_RESOLUTIONS)}"}), 400
+    limit = min(max(request.args.get('limit', 500, type=int), 1), 5000)
+    bars = get_market().bars(symbol, resolution, request.args.get('from', type=int),
+                             request.args.get('to', type=int), limit)
+    if bars is None:
+        return jsonify({'error': 'Symbole inconnu'}), 404
+    return jsonify(bars)
+
+@app.route('/api/market/ticks', methods=['POST'])
+def ingest_market_ticks():
+    """Ticks externes {symbol, price, volume?, ts?} (ce worker seulement ; voir MARKET_FEED)"""
+    if not feed_allowed(MARKET_FEED_TOKEN, MARKET_FEED_ALLOWED, request.headers.get('X-Feed-Token'),
+                        request.remote_addr):
+        return jsonify({'success': False, 'error': 'Accès refusé'}), 403
+    try:
+        # Tout le lot est validé avant d'appliquer le premier tick
+        ticks = parse_ticks(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    market = get_market()
+    for tick in ticks:
+        market.ingest(tick['symbol'], tick['price'], tick['volume'], tick['ts'])
+    return jsonify({'success': True, 'ingested': len(ticks)})
+
+@app.route('/api/metrics/market', methods=['GET'])
+def market_metrics():
+    return jsonify(get_market().stats())
+
+@app.route('/api/metrics/history-rollup', methods=['GET'])
+def history_rollup_metrics():
+    return jsonify(get_history_rollup().stats())
+
+@app.route('/api/metrics/last-login', methods=['GET'])
+def last_login_metrics():
+    return jsonify(get_last_login_writer().stats())
+
+@app.route('/api/metrics/positions', methods=['GET'])
+def position_metrics():
+    return jsonify(position_cache.stats())
+
+@app.route('/api/metrics/analytics-cache', methods=['GET'])
+def analytics_cache_metrics():
+    return jsonify(analytics_cache.stats())
+
+@app.route('/api/metrics/trade-archive', methods=['GET'])
+def trade_archive_metrics():
+    return jsonify(get_trade_archive().stats())
+
+@app.route('/api/metrics/db-router', methods=['GET'])
+def db_router_metrics():
+    return jsonify(get_db_router().stats())
+
+@app.route('/api/metrics/db-pool', methods=['GET'])
+def db_pool_metrics():
+    return jsonify(get_db_pool().stats())
+
+@app.route('/api/metrics/password-hasher', methods=['GET'])
+def password_hasher_metrics():
+    return jsonify(password_hasher.stats())
+
+@app.route('/api/metrics/sessions', methods=['GET'])
+def session_metrics():
+    return jsonify(session_store.cache.stats())
+
+@app.route('/api/metrics/challenge-cache', methods=['GET'])
+def challenge_cache_metrics():
+    return jsonify(challenge_cache.stats())
+
 if __name__ == '__main__':
     # Initialiser les tables au démarrage
     initialize_tables()
@@ -0,0 +1,44 @@
+"""Déplacer les trades des défis terminés de la table `trades` vers l'archive en colonnes
+
+Les défis passés ou échoués depuis plus de `--min-age-days` jours sont traités par
+lots : leurs trades sont écrits dans TRADE_ARCHIVE_DIR (un répertoire par mois)
+puis supprimés de la base. L'historique et les analyses les relisent depuis
+l'archive. Relancer la commande après une interruption ne crée pas de doublons.
+
+La base ne gardant aucune copie, TRADE_ARCHIVE_DIR doit être défini explicitement et
+désigner un volume durable (sauvegardé) partagé par tous les serveurs ; sans lui,
+seul --status est accepté.
+
+Usage : python archive_trades.py [--min-age-days 30] [--batch-size 200] [--status]
+"""
+import argparse
+import os
+import time
+
+from app import TRADE_ARCHIVE_DIR, db_cursor
+from trade_archive import TradeArchive, archive_closed_challenges
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--min-age-days', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--status', action='store_true')
+    args = parser.parse_args()
+    if not args.status and not os.getenv('TRADE_ARCHIVE_DIR'):
+        parser.error("TRADE_ARCHIVE_DIR non défini : les trades archivés sont supprimés de MySQL, "
+                     "l'archive doit être sur un volume durable et partagé, pas dans le dépôt local")
+
+    archive = TradeArchive(TRADE_ARCHIVE_DIR)
+    if not args.status:
+        started = time.perf_counter()
+        challenges, moved = archive_closed_challenges(db_cursor, archive, args.min_age_days, args.batch_size)
+        print(f"{moved} trades de {challenges} défis archivés en {time.perf_counter() - started:.1f}s")
+
+    stats = archive.stats()
+    print(f"Archive : {stats['rows']} trades, {stats['parts']} parties, "
+          f"mois {', '.join(stats['months']) or 'aucun'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+from asgi_app import app
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app)
@@ -0,0 +1,789 @@
+from quart import Quart, Response, request, jsonify
+from quart_cors import cors
+import aiomysql
+import asyncio
+import os
+from functools import wraps
+from dotenv import load_dotenv
+
+from async_db_pool import AsyncConnectionPool
+from db_pool import DatabaseUnavailable, PoolExhausted
+from password_hashing import HasherBusy, PasswordHasher
+from trade_batch import TRADE_COLUMNS, validate_trade
+from challenge_rules import (
+    ChallengeState, lock_states_query, apply_trades, save_states_statements, RESET_STATE_QUERY,
+    trade_days, daily_pnl_query, daily_pnl_pairs, attach_daily_pnl
+)
+from trade_query import TradeHistoryQuery
+from trade_archive import TradeArchive
+from streaming import NDJSON_MIMETYPE, aencode_rows, aiter_batches, stream_format
+from positions import (
+    PositionCache, attach_lots, lots_query, position_statements, positions_query, positions_saved,
+    resolve_positions
+)
+from history_rollup import CLOSED_STATUSES, closed_challenge_ids, rollup_ids_query
+from last_login import LastLoginWriter, last_login_query
+from sessions import SessionCache, SessionStore
+from response_cache import make_cache, user_challenges_key
+from market_data import MarketData, feed_allowed, make_feed, parse_networks, parse_ticks
+from pubsub import ALL_TICKS_TOPIC, SSE_HEARTBEAT, Broker, LiveFeed, TickPublisher, symbol_topic, user_topic
+
+load_dotenv()
+
+# Variante asynchrone (ASGI) des routes /api/* de app.py : une requête en attente de MySQL
+# ne bloque plus un worker, seulement une coroutine.
+# Lancement : SERVER_MODE=async gunicorn (voir gunicorn.conf.py) ou `uvicorn asgi:app`
+app = Quart(__name__)
+app = cors(app, allow_origin='*', expose_headers=['X-Next-Cursor', 'X-Prev-Cursor'])
+
+# Même configuration que app.py
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'db': os.getenv('DB_NAME', 'examen'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', '123456')
+}
+
+# Pool asynchrone propre à chaque worker ; une seule boucle d'événements sert toutes les requêtes
+POOL_CONFIG = {
+    'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+    'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', '10')),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    'recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+    'pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+}
+
+# Correspondance des champs du frontend vers les colonnes de challenges
+CHALLENGE_FIELDS = {
+    'initialBalance': 'initial_balance',
+    'currentBalance': 'current_balance',
+    'maxDailyLoss': 'max_daily_loss',
+    'maxTotalLoss': 'max_total_loss',
+    'profitTarget': 'profit_target'
+}
+CHALLENGE_COLUMNS = ('initial_balance', 'current_balance', 'status',
+                     'max_daily_loss', 'max_total_loss', 'profit_target')
+
+# PnL des trades calculé par appariement FIFO des lots, comme dans app.py
+TRADE_PNL_SOURCE = os.getenv('TRADE_PNL_SOURCE', 'server').lower()
+position_cache = PositionCache(int(os.getenv('POSITION_CACHE_SIZE', '10000')))
+
+db_pool = AsyncConnectionPool(
+    lambda: aiomysql.connect(autocommit=False, **DB_CONFIG),
+    **POOL_CONFIG
+)
+
+# Hachage bcrypt dans un pool de processus borné, attendu sans bloquer la boucle d'événements
+password_hasher = PasswordHasher(
+    workers=int(os.getenv('HASH_POOL_WORKERS', '0')) or None,
+    max_pending=int(os.getenv('HASH_MAX_PENDING', '0')) or None,
+    rounds=int(os.getenv('BCRYPT_ROUNDS', '12')),
+    # Workers gunicorn de l'hôte (variable lue aussi par gunicorn pour son nombre de workers)
+    web_workers=int(os.getenv('WEB_CONCURRENCY', '1'))
+)
+
+# Diffusion SSE : files bornées par abonné, interrogation de la base toutes les STREAM_POLL_INTERVAL s
+STREAM_QUEUE_SIZE = int(os.getenv('STREAM_QUEUE_SIZE', '256'))
+STREAM_POLL_INTERVAL = float(os.getenv('STREAM_POLL_INTERVAL', '1'))
+# Fenêtre de relecture des trades et soldes dont le commit arrive après leur id / updated_at
+STREAM_OVERLAP = float(os.getenv('STREAM_OVERLAP', '30'))
+STREAM_TICK_INTERVAL = float(os.getenv('STREAM_TICK_INTERVAL', '0.25'))
+STREAM_HEARTBEAT = float(os.getenv('STREAM_HEARTBEAT', '15'))
+STREAM_MAX_SYMBOLS = 50
+# POST /api/market/ticks : réservé au flux interne (en-tête X-Feed-Token = MARKET_FEED_TOKEN,
+# adresse dans MARKET_FEED_ALLOWED) ; fermé si MARKET_FEED_TOKEN n'est pas défini
+MARKET_FEED_TOKEN = os.getenv('MARKET_FEED_TOKEN', '')
+MARKET_FEED_ALLOWED = parse_networks(os.getenv('MARKET_FEED_ALLOWED', '127.0.0.1,::1'))
+
+# Cotations en mémoire du worker, alimentées par MARKET_FEED comme dans app.py
+MARKET_FEED = os.getenv('MARKET_FEED', 'simulated')
+MARKET_TICK_CAPACITY = int(os.getenv('MARKET_TICK_CAPACITY', '100000'))
+MARKET_QUOTE_MAX_AGE = float(os.getenv('MARKET_QUOTE_MAX_AGE', '10'))
+TRADE_PRICE_SOURCE = os.getenv('TRADE_PRICE_SOURCE', 'market').lower()
+
+broker = Broker(STREAM_QUEUE_SIZE)
+live_feed = LiveFeed(broker, overlap=STREAM_OVERLAP)
+market = MarketData(MARKET_TICK_CAPACITY)
+market_feed = make_feed(MARKET_FEED)
+tick_publisher = TickPublisher(broker, market)
+
+# Dernière connexion des utilisateurs, écrite en différé par lots (un UPDATE par passage)
+last_login_writer = LastLoginWriter(
+    batch_size=int(os.getenv('LAST_LOGIN_BATCH', '1000')),
+    interval=float(os.getenv('LAST_LOGIN_INTERVAL', '1'))
+)
+
+# Trades des défis terminés archivés en fichiers colonnes (python archive_trades.py)
+trade_archive = TradeArchive(os.getenv(
+    'TRADE_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive', 'trades')
+))
+
+# Cache des défis de app.py (partagé si CHALLENGE_CACHE_URL=redis://...) : ce serveur ne le lit pas,
+# mais l'invalide après chaque écriture comme app.py
+challenge_cache = make_cache(
+    os.getenv('CHALLENGE_CACHE_URL'),
+    max_entries=int(os.getenv('CHALLENGE_CACHE_SIZE', '10000')),
+    ttl=float(os.getenv('CHALLENGE_CACHE_TTL', '300' if os.getenv('CHALLENGE_CACHE_URL') else '10'))
+)
+
+async def invalidate_challenges(*user_ids):
+    """Invalider les défis en cache des utilisateurs (client Redis bloquant : exécuté hors de la boucle)"""
+    keys = {user_challenges_key(user_id) for user_id in user_ids}
+    await asyncio.get_running_loop().run_in_executor(None, lambda: challenge_cache.delete(*keys))
+
+# Jetons de session : mêmes réglages et même table user_sessions que app.py
+SESSION_AUTH_REQUIRED = os.getenv('SESSION_AUTH_REQUIRED', 'true').lower() in ('1', 'true', 'yes')
+session_store = SessionStore(
+    SessionCache(
+        max_entries=int(os.getenv('SESSION_CACHE_SIZE', '10000')),
+        ttl=float(os.getenv('SESSION_CACHE_TTL', '300')),
+        negative_ttl=float(os.getenv('SESSION_NEGATIVE_TTL', '30'))
+    ),
+    session_ttl=int(os.getenv('SESSION_TTL', str(7 * 24 * 3600))),
+    sweep_interval=float(os.getenv('SESSION_SWEEP_INTERVAL', '300'))
+)
+
+def db_cursor(dictionary=False):
+    """Emprunter une connexion et un curseur du pool (à utiliser avec `async with`)"""
+    return db_pool.cursor(aiomysql.DictCursor if dictionary else None)
+
+def bearer_token():
+    """Jeton de session transmis dans l'en-tête Authorization: Bearer <jeton>"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token.strip():
+        return token.strip()
+    return None
+
+async def session_user(token):
+    """user_id du jeton (None si invalide) ; DatabaseUnavailable remonte à l'appelant"""
+    await session_store.amaybe_sweep(db_cursor)
+    return await session_store.avalidate(token, db_cursor)
+
+async def authenticate():
+    """(user_id de la session, réponse d'erreur) ; (None, None) sans jeton si SESSION_AUTH_REQUIRED=false"""
+    token = bearer_token()
+    if token is None:
+        if SESSION_AUTH_REQUIRED:
+            return None, (jsonify({'success': False, 'error': 'Authentification requise'}), 401)
+        return None, None
+    try:
+        session_user_id = await session_user(token)
+    except DatabaseUnavailable as e:
+        return None, db_unavailable(e)
+    except Exception as e:
+        print(f"Erreur de vérification de session: {e}")
+        return None, (jsonify({'success': False, 'error': 'Erreur serveur'}), 500)
+    if session_user_id is None:
+        return None, (jsonify({'success': False, 'error': 'Session invalide ou expirée'}), 401)
+    return session_user_id, None
+
+def forbidden(session_user_id, owner_ids):
+    """Réponse 403 si un des `owner_ids` n'est pas l'utilisateur de la session (None sans session)"""
+    if session_user_id is None or all(owner == session_user_id for owner in owner_ids):
+        return None
+    return jsonify({'success': False, 'error': 'Accès refusé'}), 403
+
+def require_session(view):
+    """Vérifier que le jeton de session appartient à l'utilisateur `user_id` de la route"""
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        session_user_id, error = await authenticate()
+        error = error or forbidden(session_user_id, [kwargs.get('user_id')])
+        if error:
+            return error
+        return await view(*args, **kwargs)
+    return wrapper
+
+def require_challenge_owner(view):
+    """Vérifier que le jeton de session appartient au propriétaire du défi `challenge_id` de la route"""
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        session_user_id, error = await authenticate()
+        if error:
+            return error
+        if session_user_id is not None:
+            try:
+                async with db_cursor() as (connection, cursor):
+                    await cursor.execute("SELECT user_id FROM challenges WHERE id = %s", (kwargs['challenge_id'],))
+                    owner = await cursor.fetchone()
+            except DatabaseUnavailable as e:
+                return db_unavailable(e)
+            except Exception as e:
+                print(f"Erreur de vérification du propriétaire du défi: {e}")
+                return jsonify({'success': False, 'error': 'Erreur serveur'}), 500
+            if owner is None:
+                return jsonify({'success': False, 'error': 'Défi introuvable'}), 404
+            error = forbidden(session_user_id, [owner[0]])
+            if error:
+                return error
+        return await view(*args, **kwargs)
+    return wrapper
+
+def format_dates(row):
+    row['created_at'] = row['created_at'].isoformat() if row['created_at'] else None
+    row['updated_at'] = row['updated_at'].isoformat() if row['updated_at'] else None
+    return row
+
+def db_unavailable(e, with_success=True):
+    """Réponse d'erreur lorsque le pool ne fournit pas de connexion"""
+    print(f"Erreur de connexion à MySQL: {e}")
+    body = {'error': 'Impossible de se connecter à la base de données'}
+    if with_success:
+        body = {'success': False, **body}
+    return jsonify(body), 503 if isinstance(e, PoolExhausted) else 500
+
+def hasher_busy(e):
+    """Réponse 429 lorsque trop de hachages de mot de passe sont en attente"""
+    print(f"Pool de hachage saturé: {e}")
+    response = jsonify({'success': False, 'error': 'Serveur occupé, réessayez dans un instant'})
+    response.headers['Retry-After'] = '1'
+    return response, 429
+
+async def load_trade_positions(cursor, rows):
+    """Positions touchées par les trades (index, ligne), à lire après le verrou des défis"""
+    if TRADE_PNL_SOURCE != 'server':
+        return None
+    pairs = sorted({(row[1], row[2]) for _, row in rows})
+    await cursor.execute(*positions_query(pairs))
+    positions, stale = resolve_positions(pairs, await cursor.fetchall(), position_cache)
+    if stale:
+        await cursor.execute(*lots_query(sorted(stale)))
+        attach_lots(stale, await cursor.fetchall())
+    return positions
+
+async def stream_query_response(query, params, fmt, transform=None, merge=None):
+    """Répondre en streaming (NDJSON ou tableau JSON) depuis un curseur non bufferisé
+
+    `merge` transforme les paquets lus (ex. fusion avec les trades archivés).
+    """
+    connection = await db_pool.acquire()
+    try:
+        cursor = await connection.cursor(aiomysql.SSDictCursor)
+        await cursor.execute(query, params)
+    except BaseException:
+        await db_pool.release(connection, discard=True)
+        raise
+
+    async def body():
+        completed = False
+        try:
+            batches = aiter_batches(cursor) if merge is None else merge(aiter_batches(cursor))
+            async for chunk in aencode_rows(batches, fmt, transform):
+                yield chunk
+            completed = True
+        finally:
+            # Client déconnecté en cours de route : fermer la connexion plutôt que lire le reste
+            if completed:
+                await cursor.close()
+            await db_pool.release(connection, discard=not completed)
+
+    mimetype = NDJSON_MIMETYPE if fmt == 'ndjson' else 'application/json'
+    return Response(body(), mimetype=mimetype)
+
+async def run_live_feed():
+    """Boucle de fond : publier trades et soldes aux abonnés de ce worker"""
+    while True:
+        await asyncio.sleep(STREAM_POLL_INTERVAL)
+        try:
+            async with db_cursor(dictionary=True) as (connection, cursor):
+                await live_feed.poll(cursor)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Erreur du flux temps réel: {e}")
+
+async def run_tick_publisher():
+    """Boucle de fond : publier les ticks du flux de marché aux abonnés de ce worker"""
+    while True:
+        await asyncio.sleep(STREAM_TICK_INTERVAL)
+        try:
+            tick_publisher.poll()
+        except Exception as e:
+            print(f"Erreur de publication des ticks: {e}")
+
+async def flush_last_logins():
+    """Écrire les dernières connexions en attente, un UPDATE par lot"""
+    while True:
+        batch = last_login_writer.take()
+        if not batch:
+            return
+        try:
+            async with db_cursor() as (connection, cursor):
+                await cursor.execute(*last_login_query(batch))
+                await connection.commit()
+        except Exception:
+            last_login_writer.restore(batch)
+            raise
+        last_login_writer.written(batch)
+
+async def run_last_login_writer():
+    while True:
+        await asyncio.sleep(last_login_writer.interval)
+        try:
+            await flush_last_logins()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Erreur d'enregistrement des dernières connexions: {e}")
+
+@app.before_serving
+async def start_live_feed():
+    loop = asyncio.get_running_loop()
+    # Le thread du flux est démarré dans le worker (après le fork)
+    if market_feed is not None:
+        market_feed.start(market)
+    app.live_feed_task = loop.create_task(run_live_feed())
+    app.tick_publisher_task = loop.create_task(run_tick_publisher())
+    app.last_login_task = loop.create_task(run_last_login_writer())
+
+@app.after_serving
+async def close_pool():
+    app.live_feed_task.cancel()
+    app.tick_publisher_task.cancel()
+    app.last_login_task.cancel()
+    if market_feed is not None:
+        market_feed.stop()
+    try:
+        await flush_last_logins()
+    except Exception as e:
+        print(f"Erreur d'enregistrement des dernières connexions: {e}")
+    await db_pool.close()
+    password_hasher.close()
+
+@app.route('/api/login', methods=['POST'])
+async def login():
+    try:
+        data = await request.get_json()
+        email = data.get('email')
+        password = data.get('password')
+
+        query = "SELECT id, email, name, password_hash, role, created_at, updated_at FROM users WHERE email = %s"
+        async with db_cursor(dictionary=True) as (connection, cursor):
+            await cursor.execute(query, (email,))
+            user = await cursor.fetchone()
+
+        if not user:
+            return jsonify({'success': False, 'error': 'Email invalide'}), 401
+
+        # Vérifier le mot de passe dans le pool de processus, hors de la boucle d'événements
+        if not await password_hasher.verify_async(password, user['password_hash']):
+            return jsonify({'success': False, 'error': 'Mot de passe invalide'}), 401
+
+        # Le coût bcrypt a changé depuis le dernier hachage : recalculer avec le mot de passe en clair
+        new_hash = None
+        if password_hasher.needs_rehash(user['password_hash']):
+            try:
+                new_hash = await password_hasher.hash_async(password)
+            except HasherBusy:
+                # Pool saturé : la mise à niveau sera faite à une prochaine connexion
+                pass
+
+        async with db_cursor() as (connection, cursor):
+            # Seul le hash recalculé (rare) est écrit ici ; la date de connexion part en différé
+            if new_hash:
+                await cursor.execute("UPDATE users SET password_hash = %s WHERE id = %s", (new_hash, user['id']))
+
+            # Jeton de session pour les requêtes suivantes (sans renvoyer le mot de passe)
+            token = await session_store.aissue(cursor, user['id'])
+            await connection.commit()
+        last_login_writer.record(user['id'])
+
+        # Réponse construite depuis la ligne déjà lue (updated_at : dernière écriture connue)
+        format_dates(user)
+
+        # Retirer le hash du mot de passe pour le frontend
+        del user['password_hash']
+
+        return jsonify({
+            'success': True,
+            'user': user,
+            'token': token,
+            'expiresIn': session_store.session_ttl
+        })
+
+    except HasherBusy as e:
+        return hasher_busy(e)
+    except DatabaseUnavailable as e:
+        return db_unavailable(e)
+    except Exception as e:
+        print(f"Erreur de login: {e}")
+        return jsonify({'success': False, 'error': 'Erreur serveur'}), 500
+
+@app.route('/api/register', methods=['POST'])
+async def register():
+    try:
+        data = await request.get_json()
+        name = data.get('name')
+        email = data.get('email')
+        password = data.get('password')
+
+        async with db_cursor() as (connection, cursor):
+            # Vérifier si l'email existe déjà
+            check_query = "SELECT id FROM users WHERE email = %s"
+            await cursor.execute(check_query, (email,))
+            existing_user = await cursor.fetchone()
+
+        if existing_user:
+            return jsonify({'success': False, 'error': 'Email déjà utilisé'}), 400
+
+        # Hacher le mot de passe dans le pool de processus
+        hashed_password = await password_hasher.hash_async(password)
+
+        async with db_cursor() as (connection, cursor):
+            # Insérer le nouvel utilisateur
+            insert_query = """
+                INSERT INTO users (email, name, password_hash, role, created_at, updated_at)
+                VALUES (%s, %s, %s, 'user', NOW(), NOW())
+            """
+            try:
+                await cursor.execute(insert_query, (email, name, hashed_password))
+            except aiomysql.IntegrityError:
+                # Inscription concurrente avec le même email pendant le hachage
+                return jsonify({'success': False, 'error': 'Email déjà utilisé'}), 400
+            user_id = cursor.lastrowid
+            await connection.commit()
+
+        return jsonify({
+            'success': True,
+            'userId': user_id
+        })
+
+    except HasherBusy as e:
+        return hasher_busy(e)
+    except DatabaseUnavailable as e:
+        return db_unavailable(e)
+    except Exception as e:
+        print(f"Erreur d'inscription: {e}")
+        return jsonify({'success': False, 'error': 'Erreur serveur'}), 500
+
+@app.route('/api/logout', methods=['POST'])
+async def logout():
+    try:
+        token = bearer_token()
+        if token is None:
+            return jsonify({'success': False, 'error': 'Authentification requise'}), 401
+
+        async with db_cursor() as (connection, cursor):
+            revoked = await session_store.arevoke(cursor, token)
+            await connection.commit()
+
+        return jsonify({'success': revoked})
+
+    except DatabaseUnavailable as e:
+        return db_unavailable(e)
+    except Exception as e:
+        print(f"Erreur de déconnexion: {e}")
+        return jsonify({'success': False, 'error': 'Erreur serveur'}), 500
+
+@app.route('/api/user/<int:user_id>/challenges', methods=['POST'])
+@require_session
+async def create_challenge(user_id):
+    try:
+        data = await request.get_json()
+        initial_balance = data.get('initialBalance')
+        current_balance = data.get('currentBalance', initial_balance)
+        status = data.get('status', 'active')
+        max_daily_loss = data.get('maxDailyLoss')
+        max_total_loss = data.get('maxTotalLoss')
+        profit_target = data.get('profitTarget')
+
+        async with db_cursor(dictionary=True) as (connection, cursor):
+            insert_query = """
+                INSERT INTO challenges (user_id, initial_balance, current_balance, status,
+                                        max_daily_loss, max_total_loss, profit_target, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+            """
+            await cursor.execute(insert_query, (user_id, initial_balance, current_balance, status, max_daily_loss, max_total_loss, profit_target))
+            challenge_id = cursor.lastrowid
+            await connection.commit()
+            await invalidate_challenges(user_id)
+
+            select_query = """
+                SELECT id, user_id, initial_balance, current_balance, status,
+                       max_daily_loss, max_total_loss, profit_target, created_at, updated_at
+                FROM challenges
+                WHERE id = %s
+            """
+            await cursor.execute(select_query, (challenge_id,))
+            challenge = await cursor.fetchone()
+
+        if challenge:
+            format_dates(challenge)
+
+        return jsonify({'success': True, 'challenge': challenge})
+
+    except DatabaseUnavailable as e:
+        return db_unavailable(e)
+    except Exception as e:
+        print(f"Erreur de création de défi: {e}")
+        return jsonify({'success': False, 'error': 'Erreur serveur'}), 500
+
+@app.route('/api/user/<int:user_id>/challenges', methods=['GET'])
+@require_session
+async def get_user_challenges(user_id):
+    try:
+        query = """
+            SELECT id, user_id, initial_balance, current_balance, status,
+                   max_daily_loss, max_total_loss, profit_target, created_at, updated_at
+            FROM challenges
+            WHERE user_id = %s
+            ORDER BY created_at DESC
+        """
+
+        fmt = stream_format(request.headers.get('Accept'), request.args.get('stream'))
+        if fmt:
+            return await stream_query_response(query, (user_id,), fmt)
+
+        async with db_cursor(dictionary=True) as (connection, cursor):
+            await cursor.execute(query, (user_id,))
+            challenges = await cursor.fetchall()
+
+        return jsonify([format_dates(challenge) for challenge in challenges])
+
+    except DatabaseUnavailable as e:
+        return db_unavailable(e, with_success=False)
+    except Exception as e:
+        print(f"Erreur de récupération des défis: {e}")
+        return jsonify({'error': 'Erreur serveur'}), 500
+
+@app.route('/api/user/<int:user_id>/trades', methods=['GET'])
+@require_session
+async def get_user_trades(user_id):
+    try:
+        try:
+            history = TradeHistoryQuery(user_id, request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Trades en base fusionnés avec ceux des défis terminés archivés (lecture mmap, sans attente)
+        archive = trade_archive.refresh()
+
+        fmt = stream_format(request.headers.get('Accept'), request.args.get('stream'))
+        if fmt:
+            query, params = history.sql(paginate=False)
+            return await stream_query_response(query, params, fmt, history.project,
+                                               merge=lambda batches: archive.amerged_batches(batches, history))
+
+        async with db_cursor(dictionary=True) as (connection, cursor):
+            query, params = history.sql()
+            await cursor.execute(query, params)
+            rows = list(await cursor.fetchall())
+
+        trades, next_cursor, prev_cursor = history.page(archive.merge_page(history, rows))
+
+        response = jsonify(trades)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        if prev_cursor:
+            response.headers['X-Prev-Cursor'] = prev_cursor
+        return response
+
+    except DatabaseUnavailable as e:
+        return db_unavailable(e, with_success=False)
+    except Exception as e:
+        print(f"Erreur de récupération des trades: {e}")
+        return jsonify({'error': 'Erreur serveur'}), 500
+
+@app.route('/api/challenge/<int:challenge_id>', methods=['PUT'])
+@require_challenge_owner
+async def update_challenge(challenge_id):
+    try:
+        data = await request.get_json()
+        # Seules les colonnes connues sont modifiables : les noms de champs vont dans le SQL
+        updates = {}
+        for field, value in data.items():
+            column = CHALLENGE_FIELDS.get(field, field)
+            if column in CHALLENGE_COLUMNS:
+                updates[column] = value
+
+        if not updates:
+            return jsonify({'success': False, 'error': 'Aucune donnée à mettre à jour'}), 400
+
+        set_clause = ', '.join(f"{column} = %s" for column in updates)
+        query = f"UPDATE challenges SET {set_clause} WHERE id = %s"
+
+        async with db_cursor() as (connection, cursor):
+            await cursor.execute(query, list(updates.values()) + [challenge_id])
+            success = cursor.rowcount > 0
+            # Un solde modifié à la main invalide l'état suivi par le moteur de règles
+            if success and {'initial_balance', 'current_balance'} & updates.keys():
+                await cursor.execute(RESET_STATE_QUERY, (challenge_id,))
+            if success and updates.get('status') in CLOSED_STATUSES:
+                await cursor.execute(*rollup_ids_query([challenge_id]))
+            await connection.commit()
+            if success:
+                await cursor.execute("SELECT user_id FROM challenges WHERE id = %s", (challenge_id,))
+                owner = await cursor.fetchone()
+                if owner:
+                    await invalidate_challenges(owner[0])
+
+        return jsonify({'success': success})
+
+    except DatabaseUnavailable as e:
+        return db_unavailable(e)
+    except Exception as e:
+        print(f"Erreur de mise à jour du défi: {e}")
+        return jsonify({'success': False, 'error': 'Erreur serveur'}), 500
+
+def market_priced(row):
+    """Remplacer le prix du client par la dernière cotation si TRADE_PRICE_SOURCE=market"""
+    if TRADE_PRICE_SOURCE != 'market':
+        return row, None
+    price = market.price(row[2], MARKET_QUOTE_MAX_AGE)
+    if price is None:
+        return None, f"Aucune cotation récente pour {row[2]}"
+    return row[:4] + (price,) + row[5:], None
+
+@app.route('/api/trade', methods=['POST'])
+async def add_trade():
+    try:
+        session_user_id, denied = await authenticate()
+        if denied:
+            return denied
+        row, error = validate_trade(await request.get_json())
+        if not error:
+            row, error = market_priced(row)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        # Le défi doit en plus appartenir à row[0] (vérifié par apply_trades)
+        denied = forbidden(session_user_id, [row[0]])
+        if denied:
+            return denied
+        challenge_id = row[1]
+
+        async with db_cursor() as (connection, cursor):
+            # Verrouiller le défi : les règles sont évaluées et le statut basculé dans la même transaction
+            await cursor.execute(*lock_states_query([challenge_id]))
+            states = {r[0]: ChallengeState.from_row(r) for r in await cursor.fetchall()}
+            days = trade_days([(0, row)])
+            await cursor.execute(*daily_pnl_query(daily_pnl_pairs([(0, row)], days)))
+            attach_daily_pnl(states, await cursor.fetchall())
+            positions = await load_trade_positions(cursor, [(0, row)])
+            errors = {}
+            kept = apply_trades(states, [(0, row)], errors, positions=positions, days=days)
+            if not kept:
+                return jsonify({'success': False, 'error': errors[0]}), 400
+            row = kept[0][1]
+
+            query = f"""
+                INSERT INTO trades ({', '.join(TRADE_COLUMNS)})
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """
+            await cursor.execute(query, row)
+            trade_id = cursor.lastrowid
+            for statement, params in save_states_statements(states.values()):
+                await cursor.executemany(statement, params)
+            if positions:
+                for statement, params in position_statements(positions.values()):
+                    await cursor.executemany(statement, params)
+            # Défi clôturé par ce trade : résumé écrit dans la même transaction (rare, une ligne)
+            closed = closed_challenge_ids(states.values())
+            if closed:
+                await cursor.execute(*rollup_ids_query(closed))
+            await connection.commit()
+
+        if positions:
+            positions_saved(positions.values(), position_cache)
+        # Solde et statut du défi ont changé
+        await invalidate_challenges(row[0])
+        return jsonify({'success': True, 'tradeId': trade_id, 'pnl': float(row[6]),
+                        'challenge': states[challenge_id].to_dict()})
+
+    except DatabaseUnavailable as e:
+        return db_unavailable(e)
+    except Exception as e:
+        print(f"Erreur d'ajout de trade: {e}")
+        return jsonify({'success': False, 'error': 'Erreur serveur'}), 500
+
+@app.route('/api/stream', methods=['GET'])
+async def stream_events():
+    """Flux Server-Sent Events : ticks des symboles demandés et événements d'un utilisateur
+
+    Les événements d'un utilisateur (trades, soldes) exigent toujours un jeton de session
+    de cet utilisateur : en-tête Authorization: Bearer, ou paramètre `token` (EventSource
+    ne peut pas envoyer d'en-têtes). Les ticks restent publics.
+    """
+    topics = []
+    user_id = request.args.get('user_id', type=int)
+    if user_id is not None:
+        token = bearer_token() or request.args.get('token')
+        if not token:
+            return jsonify({'success': False, 'error': 'Authentification requise'}), 401
+        try:
+            session_user_id = await session_user(token)
+        except DatabaseUnavailable as e:
+            return db_unavailable(e)
+        if session_user_id is None:
+            return jsonify({'success': False, 'error': 'Session invalide ou expirée'}), 401
+        if session_user_id != user_id:
+            return jsonify({'success': False, 'error': 'Accès refusé'}), 403
+        topics.append(user_topic(user_id))
+    symbols = [s.strip().upper() for s in request.args.get('symbols', '').split(',') if s.strip()]
+    if '*' in symbols:
+        topics.append(ALL_TICKS_TOPIC)
+    else:
+        topics.extend(symbol_topic(symbol) for symbol in symbols[:STREAM_MAX_SYMBOLS])
+    if not topics:
+        return jsonify({'error': 'Paramètre user_id ou symbols requis'}), 400
+
+    subscriber = broker.subscribe(topics)
+
+    async def body():
+        try:
+            # Délai de reconnexion conseillé au navigateur (EventSource)
+            yield b'retry: 3000\n\n'
+            while True:
+                batch = await subscriber.next_batch(STREAM_HEARTBEAT)
+                yield b''.join(batch) if batch else SSE_HEARTBEAT
+        finally:
+            broker.unsubscribe(subscriber)
+
+    response = Response(body(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Désactiver la mise en tampon des proxies (nginx)
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.timeout = None
+    return response
+
+@app.route('/api/market/ticks', methods=['POST'])
+async def publish_ticks():
+    """Ajouter un tick ou une liste de ticks {symbol, price, ...} aux cotations de ce worker"""
+    if not feed_allowed(MARKET_FEED_TOKEN, MARKET_FEED_ALLOWED, request.headers.get('X-Feed-Token'),
+                        request.remote_addr):
+        return jsonify({'success': False, 'error': 'Accès refusé'}), 403
+    try:
+        # Tout le lot est validé avant de publier le premier tick
+        ticks = parse_ticks(await request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    for tick in ticks:
+        market.ingest(tick['symbol'], tick['price'], tick['volume'], tick['ts'])
+    # Publiés tout de suite plutôt qu'au prochain passage de run_tick_publisher
+    delivered = tick_publisher.poll()
+    return jsonify({'success': True, 'published': len(ticks), 'delivered': delivered})
+
+@app.route('/api/metrics/stream', methods=['GET'])
+async def stream_metrics():
+    return jsonify(broker.stats())
+
+@app.route('/api/metrics/last-login', methods=['GET'])
+async def last_login_metrics():
+    return jsonify(last_login_writer.stats())
+
+@app.route('/api/metrics/sessions', methods=['GET'])
+async def session_metrics():
+    return jsonify(session_store.cache.stats())
+
+@app.route('/api/metrics/db-pool', methods=['GET'])
+async def db_pool_metrics():
+    return jsonify(db_pool.stats())
+
+@app.route('/api/metrics/password-hasher', methods=['GET'])
+async def password_hasher_metrics():
+    return jsonify(password_hasher.stats())
+
+if __name__ == '__main__':
+    # Les tables sont créées par app.py (initialize_tables) ; ce point d'entrée ne fait que servir
+    import uvicorn
+    port = int(os.environ.get('PORT', 5000))
+    uvicorn.run(app, host='0.0.0.0', port=port)
@@ -0,0 +1,205 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from db_pool import DatabaseUnavailable, PoolExhausted
+
+
+class _PoolEntry:
+    __slots__ = ('connection', 'created_at')
+
+    def __init__(self, connection, created_at):
+        self.connection = connection
+        self.created_at = created_at
+
+
+class AsyncConnectionPool:
+    """Équivalent asyncio de db_pool.ConnectionPool pour un pilote asynchrone (aiomysql)
+
+    Mêmes paramètres et mêmes métriques que le pool synchrone ; l'attente d'une
+    connexion libre suspend la coroutine au lieu de bloquer un thread.
+    """
+
+    def __init__(self, connect, pool_size=5, max_overflow=10, timeout=30.0,
+                 recycle=1800, pre_ping=True):
+        self._connect = connect
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        self._idle = deque()
+        self._checked_out = {}
+        self._opened = 0
+        self._cond = None
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._exhaustions = 0
+        self._recycled = 0
+        self._ping_failures = 0
+        self._connect_failures = 0
+
+    def _condition(self):
+        # Créée à la première utilisation, dans la boucle d'événements du worker
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def _open(self):
+        """Ouvrir une nouvelle connexion physique"""
+        try:
+            return _PoolEntry(await self._connect(), time.monotonic())
+        except Exception as e:
+            async with self._condition():
+                self._opened -= 1
+                self._connect_failures += 1
+                self._cond.notify()
+            raise DatabaseUnavailable(str(e)) from e
+
+    def _discard(self, entry):
+        try:
+            entry.connection.close()
+        except Exception:
+            pass
+
+    async def _is_usable(self, entry):
+        """Vérifier l'âge et l'état d'une connexion inactive avant de la prêter"""
+        if self.recycle is not None and self.recycle >= 0 and \
+                time.monotonic() - entry.created_at > self.recycle:
+            self._recycled += 1
+            return False
+        if self.pre_ping:
+            try:
+                await entry.connection.ping(reconnect=False)
+            except Exception:
+                self._ping_failures += 1
+                return False
+        return True
+
+    async def acquire(self):
+        """Emprunter une connexion, en attendant au plus `timeout` secondes"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        entry = None
+        cond = self._condition()
+        async with cond:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._opened < self.pool_size + self.max_overflow:
+                    self._opened += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._exhaustions += 1
+                    raise PoolExhausted(
+                        f"Pool épuisé ({self._opened} connexions occupées)"
+                    )
+                waited = True
+                try:
+                    await asyncio.wait_for(cond.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+        if entry is None:
+            entry = await self._open()
+        elif not await self._is_usable(entry):
+            # Remplacer la connexion périmée sans rendre la place au pool
+            self._discard(entry)
+            entry = await self._open()
+
+        wait_time = time.monotonic() - started
+        self._checked_out[id(entry.connection)] = entry
+        self._checkouts += 1
+        if waited:
+            self._waits += 1
+        self._wait_time_total += wait_time
+        self._wait_time_max = max(self._wait_time_max, wait_time)
+        return entry.connection
+
+    async def release(self, connection, discard=False):
+        """Rendre une connexion au pool en terminant sa transaction éventuelle"""
+        entry = self._checked_out.pop(id(connection), None)
+        if entry is None:
+            return
+
+        if not discard:
+            try:
+                # Terminer la transaction implicite pour ne pas garder un instantané périmé
+                await connection.rollback()
+            except Exception:
+                discard = True
+
+        async with self._condition():
+            if discard or len(self._idle) >= self.pool_size:
+                self._opened -= 1
+                keep = False
+            else:
+                self._idle.append(entry)
+                keep = True
+            self._cond.notify()
+
+        if not keep:
+            self._discard(entry)
+
+    @asynccontextmanager
+    async def connection(self):
+        """Emprunter une connexion pour la durée d'un bloc `async with`"""
+        connection = await self.acquire()
+        discard = False
+        try:
+            yield connection
+        except asyncio.CancelledError:
+            # Requête annulée (client déconnecté) : l'état du protocole est inconnu
+            discard = True
+            raise
+        finally:
+            await self.release(connection, discard=discard)
+
+    @asynccontextmanager
+    async def cursor(self, cursor_class=None):
+        """Emprunter une connexion et un curseur, tous deux rendus même en cas d'erreur"""
+        async with self.connection() as connection:
+            cursor = await connection.cursor(cursor_class) if cursor_class else await connection.cursor()
+            try:
+                yield connection, cursor
+            finally:
+                try:
+                    await cursor.close()
+                except Exception:
+                    pass
+
+    async def close(self):
+        """Fermer toutes les connexions inactives"""
+        async with self._condition():
+            entries = list(self._idle)
+            self._idle.clear()
+            self._opened -= len(entries)
+        for entry in entries:
+            self._discard(entry)
+
+    def stats(self):
+        """Métriques d'utilisation du pool"""
+        return {
+            'pool_size': self.pool_size,
+            'max_overflow': self.max_overflow,
+            'opened': self._opened,
+            'idle': len(self._idle),
+            'checked_out': len(self._checked_out),
+            'checkouts': self._checkouts,
+            'waits': self._waits,
+            'wait_time_total_ms': round(self._wait_time_total * 1000, 3),
+            'wait_time_max_ms': round(self._wait_time_max * 1000, 3),
+            'exhaustions': self._exhaustions,
+            'recycled': self._recycled,
+            'ping_failures': self._ping_failures,
+            'connect_failures': self._connect_failures,
+        }
@@ -0,0 +1,29 @@
+"""Remplir challenge_history pour les défis déjà terminés
+
+Les défis terminés sont découpés en tranches d'ids, agrégées en parallèle
+(un INSERT ... SELECT par tranche). Relancer la commande ne crée pas de doublons.
+
+Usage : python backfill_history.py [--workers 4] [--chunk-size 5000]
+"""
+import argparse
+import time
+
+from app import db_cursor, initialize_tables
+from history_rollup import backfill
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    # Crée l'index unique de challenge_history s'il manque
+    initialize_tables()
+    started = time.perf_counter()
+    chunks, inserted = backfill(db_cursor, args.workers, args.chunk_size)
+    print(f"{inserted} lignes d'historique créées ({chunks} tranches) en {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
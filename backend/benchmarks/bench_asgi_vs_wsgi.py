@@ -0,0 +1,129 @@
+"""Charge comparée : gunicorn workers synchrones (Flask) vs workers uvicorn (Quart/ASGI)
+
+Simule le trafic des tableaux de bord : beaucoup de connexions clientes, chacune
+envoyant GET /api/user/<id>/challenges puis /trades?limit=20 et restant inactive
+`--think` ms entre deux requêtes. Le serveur est lancé avec gunicorn.conf.py, une
+fois par mode, avec le même nombre de workers et la base MySQL configurée par DB_*.
+
+Usage : python benchmarks/bench_asgi_vs_wsgi.py [--modes sync,async] [--clients 50,200,1000]
+        [--workers 2] [--think 200] [--duration 10] [--user-id 1]
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(mode, port, workers):
+    env = dict(os.environ, SERVER_MODE=mode, WEB_CONCURRENCY=str(workers))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{port}', '--backlog', '2048'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            asyncio.run(asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), 1))
+            return process
+        except (OSError, asyncio.TimeoutError):
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"Le serveur ({mode}) ne répond pas")
+
+
+async def read_response(reader):
+    """Lire une réponse HTTP/1.1 à Content-Length ; retourne (statut, connexion à fermer)"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length:
+        await reader.readexactly(length)
+    return status, headers.get('connection', '').lower() == 'close'
+
+
+async def client(port, paths, think, stop, stats):
+    reader = writer = None
+    index = 0
+    while not stop.is_set():
+        path = paths[index % len(paths)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                stats['connects'] += 1
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+            status, close = await read_response(reader)
+            stats['latencies'].append(time.perf_counter() - started)
+            if status >= 500:
+                stats['errors'] += 1
+            if close:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            stats['errors'] += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+        await asyncio.sleep(think)
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(port, clients, think, duration, user_id):
+    paths = [f'/api/user/{user_id}/challenges', f'/api/user/{user_id}/trades?limit=20']
+    stop = asyncio.Event()
+    stats = {'latencies': [], 'errors': 0, 'connects': 0}
+    tasks = [asyncio.create_task(client(port, paths, think, stop, stats)) for _ in range(clients)]
+    await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    return stats
+
+
+def percentile(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modes', default='sync,async')
+    parser.add_argument('--clients', default='50,200,1000')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--think', type=float, default=200, help='pause entre requêtes (ms)')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--user-id', type=int, default=1)
+    parser.add_argument('--port', type=int, default=5066)
+    args = parser.parse_args()
+
+    print(f"{'mode':>6} {'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'erreurs':>8} {'connexions':>11}")
+    for mode in args.modes.split(','):
+        process = start_server(mode, args.port, args.workers)
+        try:
+            for clients in [int(c) for c in args.clients.split(',')]:
+                stats = asyncio.run(run_load(args.port, clients, args.think / 1000, args.duration, args.user_id))
+                latencies = stats['latencies']
+                print(f"{mode:>6} {clients:>8} {len(latencies) / args.duration:>8.0f} "
+                      f"{percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f} "
+                      f"{stats['errors']:>8} {stats['connects']:>11}")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Statistiques d'un défi : NumPy vectorisé vs boucle Python sur des dictionnaires
+
+Génère des trades synthétiques (lignes (ts, pnl, symbol) comme les renvoie
+ANALYTICS_QUERY) et mesure la conversion en colonnes puis le calcul complet
+(courbe d'équité, drawdown, PnL journalier, Sharpe/Sortino, répartition par symbole).
+
+Usage : python benchmarks/bench_challenge_analytics.py [--sizes 10000,100000,1000000]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import TRADING_DAYS, columns_from_rows, compute_analytics
+
+
+def make_rows(n):
+    rng = random.Random(42)
+    symbols = ['AAPL', 'TSLA', 'BTC-USD', 'IAM', 'ATW']
+    start = 1700000000
+    # Environ 200 trades par jour
+    return [(start + i * 432 // 1, round(rng.gauss(0.5, 20), 2), rng.choice(symbols), i + 1) for i in range(n)]
+
+
+def python_analytics(initial_balance, rows):
+    """Implémentation de référence ligne par ligne (ce que le calcul vectorisé remplace)"""
+    trades = [{'ts': ts, 'pnl': pnl, 'symbol': symbol} for ts, pnl, symbol, _ in rows]
+    equity = initial_balance
+    peak = initial_balance
+    max_dd = 0.0
+    curve = []
+    daily = defaultdict(float)
+    per_symbol = defaultdict(lambda: {'trades': 0, 'pnl': 0.0, 'wins': 0, 'closed': 0})
+    wins = losses = 0
+    gross_profit = gross_loss = 0.0
+    for trade in trades:
+        equity += trade['pnl']
+        curve.append(equity)
+        peak = max(peak, equity)
+        max_dd = max(max_dd, peak - equity)
+        daily[trade['ts'] // 86400] += trade['pnl']
+        stats = per_symbol[trade['symbol']]
+        stats['trades'] += 1
+        stats['pnl'] += trade['pnl']
+        if trade['pnl'] > 0:
+            wins += 1
+            gross_profit += trade['pnl']
+            stats['wins'] += 1
+            stats['closed'] += 1
+        elif trade['pnl'] < 0:
+            losses += 1
+            gross_loss -= trade['pnl']
+            stats['closed'] += 1
+    returns = []
+    balance = initial_balance
+    for day in sorted(daily):
+        returns.append(daily[day] / balance)
+        balance += daily[day]
+    mean = sum(returns) / len(returns)
+    std = math.sqrt(sum((r - mean) ** 2 for r in returns) / (len(returns) - 1))
+    return {'maxDrawdown': max_dd, 'winRate': wins / (wins + losses),
+            'profitFactor': gross_profit / gross_loss, 'sharpe': mean / std * math.sqrt(TRADING_DAYS)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    args = parser.parse_args()
+
+    print(f"{'trades':>9} {'colonnes':>10} {'NumPy':>9} {'Python':>9}")
+    for n in [int(s) for s in args.sizes.split(',')]:
+        rows = make_rows(n)
+
+        started = time.perf_counter()
+        ts, pnl, symbols, _ = columns_from_rows(rows)
+        columns = time.perf_counter() - started
+        started = time.perf_counter()
+        result = compute_analytics(100000, ts, pnl, symbols)
+        vectorized = time.perf_counter() - started
+
+        started = time.perf_counter()
+        reference = python_analytics(100000, rows)
+        python = time.perf_counter() - started
+
+        assert abs(result['maxDrawdown'] - round(reference['maxDrawdown'], 2)) < 0.01
+        assert abs(result['sharpe'] - reference['sharpe']) < 1e-6
+        print(f"{n:>9} {columns * 1e3:>8.1f}ms {vectorized * 1e3:>7.1f}ms {python * 1e3:>7.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
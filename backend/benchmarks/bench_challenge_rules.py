@@ -0,0 +1,52 @@
+"""Débit du moteur de règles : trades appliqués par seconde sur de nombreux défis
+
+Usage : python benchmarks/bench_challenge_rules.py [--challenges N] [--trades N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from challenge_rules import ChallengeState, apply_trades
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--challenges', type=int, default=10000)
+    parser.add_argument('--trades', type=int, default=500000)
+    parser.add_argument('--batch', type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    states = {
+        cid: ChallengeState(cid, cid, 10000, 10000, 'active', 500, 1000, 1000)
+        for cid in range(1, args.challenges + 1)
+    }
+    rows = [
+        (i, (cid, cid, 'AAPL', 'BUY', 100.0, 1, round(rng.uniform(-80, 80), 2)))
+        for i, cid in enumerate(rng.randint(1, args.challenges) for _ in range(args.trades))
+    ]
+
+    start_day = date(2024, 1, 1)
+    errors = {}
+    applied = 0
+    started = time.perf_counter()
+    for offset in range(0, len(rows), args.batch):
+        day = start_day + timedelta(days=offset * 10 // len(rows))
+        applied += len(apply_trades(states, rows[offset:offset + args.batch], errors, day))
+    elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for state in states.values():
+        statuses[state.status] = statuses.get(state.status, 0) + 1
+    print(f"{args.trades} trades sur {args.challenges} défis en {elapsed:.3f} s")
+    print(f"{args.trades / elapsed:,.0f} trades/s ({applied} appliqués, {len(errors)} refusés)")
+    print(f"Statuts finaux: {statuses}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Octets transmis et coût CPU par réponse : identité, gzip, brotli ; ETag de version vs hachage du corps
+
+Sérialise un historique de trades synthétique (format de GET /api/user/<id>/trades)
+et mesure, pour chaque taille, la taille du corps et le temps CPU par réponse.
+
+Usage : python benchmarks/bench_http_compression.py [--sizes 10,100,1000,10000] [--repeat 200]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_conditional import MIN_COMPRESS_SIZE, brotli, compress_body, version_etag
+
+
+def make_trades(n):
+    rng = random.Random(42)
+    symbols = ['AAPL', 'TSLA', 'EURUSD', 'BTCUSD', 'IAM', 'ATW']
+    return [{
+        'id': 100000 + i,
+        'user_id': 3,
+        'challenge_id': 31,
+        'symbol': rng.choice(symbols),
+        'type': rng.choice(['BUY', 'SELL']),
+        'price': str(round(rng.uniform(10, 500), 5)),
+        'quantity': rng.randint(1, 100),
+        'timestamp': f'2024-03-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:00',
+        'pnl': str(round(rng.uniform(-50, 50), 2)),
+    } for i in range(n)]
+
+
+def cpu_per_call(fn, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10,100,1000,10000')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    encodings = [('identité', ''), ('gzip', 'gzip')]
+    if brotli is not None:
+        encodings.append(('brotli', 'br'))
+    else:
+        print('(paquet brotli non installé : brotli ignoré)')
+    print(f"seuil de compression : {MIN_COMPRESS_SIZE} octets\n")
+    print(f"{'trades':>7} {'encodage':>9} {'octets':>9} {'ratio':>6} {'µs CPU':>9}")
+
+    for n in [int(s) for s in args.sizes.split(',')]:
+        trades = make_trades(n)
+        body = json.dumps(trades).encode('utf-8')
+        repeat = max(args.repeat * 100 // max(n, 100), 5)
+        for label, accept in encodings:
+            compressed, _ = compress_body(body, accept)
+            cost = cpu_per_call(lambda: compress_body(body, accept), repeat)
+            print(f"{n:>7} {label:>9} {len(compressed):>9} {len(body) / len(compressed):>6.1f} {cost:>9.1f}")
+
+        # Réponse 304 : calculer l'ETag de version au lieu de sérialiser et hacher le corps
+        version_cost = cpu_per_call(lambda: version_etag('trades', 3, b'limit=100', n, 100000 + n), repeat)
+        body_cost = cpu_per_call(lambda: hashlib.sha1(json.dumps(trades).encode('utf-8')).hexdigest(), repeat)
+        print(f"{n:>7} {'ETag':>9} version {version_cost:.1f} µs vs sérialisation + SHA-1 {body_cost:.1f} µs\n")
+
+
+if __name__ == '__main__':
+    main()
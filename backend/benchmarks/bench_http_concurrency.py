@@ -0,0 +1,101 @@
+"""Débit du serveur sans base selon la concurrence : séquentiel vs pool de threads + keep-alive
+
+Lance simple_server_no_db.py dans un répertoire temporaire et mesure les req/s
+de GET /api/user/<id>/trades et POST /api/trade (sur un autre utilisateur, pour que la
+liste lue ne grossisse pas) avec des clients http.client persistants.
+
+Usage : python benchmarks/bench_http_concurrency.py [--workers 0,16] [--clients 1,4,16,64] [--duration 3]
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TRADE = json.dumps({'userId': 1, 'challengeId': 11, 'symbol': 'AAPL', 'type': 'BUY',
+                    'price': 100.0, 'quantity': 1, 'pnl': 0}).encode()
+
+
+def start_server(port, workers, workdir):
+    env = dict(os.environ, HTTP_WORKERS=str(workers))
+    code = f"import simple_server_no_db as s; s.run(port={port})"
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=workdir, env=dict(env, PYTHONPATH=BACKEND_DIR),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/user/3/challenges')
+            connection.getresponse().read()
+            connection.close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('Le serveur ne répond pas')
+
+
+def client_loop(port, method, path, body, stop, counts, index):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    headers = {'Content-Type': 'application/json'} if body else {}
+    done = 0
+    while not stop.is_set():
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.will_close:
+                connection.close()
+            done += 1
+        except (OSError, http.client.HTTPException):
+            connection.close()
+    connection.close()
+    counts[index] = done
+
+
+def measure(port, method, path, body, clients, duration):
+    stop = threading.Event()
+    counts = [0] * clients
+    threads = [threading.Thread(target=client_loop, args=(port, method, path, body, stop, counts, i))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / duration
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', default='0,16')
+    parser.add_argument('--clients', default='1,4,16,64')
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'clients':>8} {'GET req/s':>12} {'POST req/s':>12}")
+    for workers in [int(w) for w in args.workers.split(',')]:
+        workdir = tempfile.mkdtemp(prefix='bench_http_')
+        process = start_server(args.port, workers, workdir)
+        try:
+            for clients in [int(c) for c in args.clients.split(',')]:
+                get_rate = measure(args.port, 'GET', '/api/user/3/trades', None, clients, args.duration)
+                post_rate = measure(args.port, 'POST', '/api/trade', TRADE, clients, args.duration)
+                print(f"{workers:>8} {clients:>8} {get_rate:>12.0f} {post_rate:>12.0f}")
+        finally:
+            process.terminate()
+            process.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Latence de la partie base de données du login : ancien chemin vs lecture unique + écriture différée
+
+MySQL n'est pas nécessaire : chaque execute/commit attend `--rtt` ms (aller-retour
+réseau simulé) et un verrou par utilisateur reproduit le verrou de ligne pris par
+l'UPDATE jusqu'au commit. La vérification bcrypt, identique dans les deux cas,
+n'est pas mesurée.
+
+- ancien : SELECT, UPDATE updated_at + commit, SELECT, INSERT session + commit
+- nouveau : SELECT, INSERT session + commit ; updated_at par LastLoginWriter
+
+Usage : python benchmarks/bench_login_round_trips.py [--rtt 0.5] [--clients 32] [--logins 200] [--users 50]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from last_login import LastLoginWriter
+
+
+class SimulatedDatabase:
+    def __init__(self, rtt):
+        self.rtt = rtt
+        self.row_locks = {}
+        self.statements = 0
+        self._lock = threading.Lock()
+
+    def row_lock(self, user_id):
+        with self._lock:
+            return self.row_locks.setdefault(user_id, threading.Lock())
+
+    @contextmanager
+    def cursor(self):
+        yield SimulatedConnection(self), SimulatedCursor(self)
+
+
+class SimulatedConnection:
+    def __init__(self, db):
+        self.db = db
+        self.held = []
+
+    def commit(self):
+        time.sleep(self.db.rtt)
+        for lock in self.held:
+            lock.release()
+        self.held = []
+
+
+class SimulatedCursor:
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, sql, params=()):
+        time.sleep(self.db.rtt)
+        with self.db._lock:
+            self.db.statements += 1
+
+
+def old_login(db, user_id):
+    with db.cursor() as (connection, cursor):
+        cursor.execute("SELECT ... FROM users WHERE email = %s", (user_id,))
+    with db.cursor() as (connection, cursor):
+        lock = db.row_lock(user_id)
+        lock.acquire()
+        connection.held.append(lock)
+        cursor.execute("UPDATE users SET updated_at = NOW() WHERE id = %s", (user_id,))
+        connection.commit()
+        cursor.execute("SELECT ... FROM users WHERE email = %s", (user_id,))
+        cursor.execute("INSERT INTO user_sessions ...", (user_id,))
+        connection.commit()
+
+
+def new_login(db, user_id, writer):
+    with db.cursor() as (connection, cursor):
+        cursor.execute("SELECT ... FROM users WHERE email = %s", (user_id,))
+    with db.cursor() as (connection, cursor):
+        cursor.execute("INSERT INTO user_sessions ...", (user_id,))
+        connection.commit()
+    writer.record(user_id)
+
+
+def run(login, clients, logins, users):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(seed):
+        rng = random.Random(seed)
+        local = []
+        for _ in range(logins):
+            started = time.perf_counter()
+            login(rng.randrange(users))
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return (len(latencies) / elapsed, latencies[len(latencies) // 2] * 1000,
+            latencies[int(len(latencies) * 0.99)] * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rtt', type=float, default=0.5, help='aller-retour simulé en ms')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--users', type=int, default=50)
+    args = parser.parse_args()
+    rtt = args.rtt / 1000
+
+    print(f"{'chemin':>8} {'logins/s':>10} {'p50':>9} {'p99':>9} {'requêtes/login':>15}")
+    db = SimulatedDatabase(rtt)
+    throughput, p50, p99 = run(lambda user_id: old_login(db, user_id), args.clients, args.logins, args.users)
+    total = args.clients * args.logins
+    print(f"{'ancien':>8} {throughput:>10.0f} {p50:>7.2f}ms {p99:>7.2f}ms {db.statements / total:>15.2f}")
+
+    db = SimulatedDatabase(rtt)
+    writer = LastLoginWriter(interval=0.05)
+    writer.start(db.cursor)
+    throughput, p50, p99 = run(lambda user_id: new_login(db, user_id, writer), args.clients, args.logins, args.users)
+    writer.flush(db.cursor)
+    print(f"{'nouveau':>8} {throughput:>10.0f} {p50:>7.2f}ms {p99:>7.2f}ms {db.statements / total:>15.2f}")
+    stats = writer.stats()
+    print(f"dernières connexions : {stats['recorded']} signalées, {stats['written']} écrites "
+          f"en {stats['batches']} UPDATE ({stats['coalesced']} regroupées)")
+
+
+if __name__ == '__main__':
+    main()
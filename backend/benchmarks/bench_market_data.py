@@ -0,0 +1,58 @@
+"""Coût des opérations du moteur de cotations en mémoire (market_data.py)
+
+Mesure l'ingestion d'un tick (anneau de ticks + trois résolutions de bougies),
+la lecture d'une cotation et la lecture d'une plage de bougies, après le
+préremplissage du flux simulé.
+
+Usage : python benchmarks/bench_market_data.py [--ticks 200000] [--repeat 20000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from market_data import DEFAULT_PRICES, MarketData, SimulatedFeed
+
+
+def per_call(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ticks', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=20000)
+    args = parser.parse_args()
+
+    market = MarketData()
+    feed = SimulatedFeed()
+    started = time.perf_counter()
+    feed.start(market)
+    feed.stop()
+    print(f"préremplissage : {feed.backfill} pas x {len(DEFAULT_PRICES)} symboles "
+          f"en {(time.perf_counter() - started) * 1e3:.0f} ms")
+
+    symbols = list(DEFAULT_PRICES)
+    base = time.time()
+    started = time.perf_counter()
+    for i in range(args.ticks):
+        market.ingest(symbols[i % len(symbols)], 100 + (i % 97) * 0.01, 1, base + i * 0.01)
+    ingest = (time.perf_counter() - started) / args.ticks * 1e6
+    print(f"ingestion : {ingest:.2f} µs/tick ({1e6 / ingest:,.0f} ticks/s sur un thread)")
+
+    print(f"cotation : {per_call(lambda: market.quote('AAPL'), args.repeat):.2f} µs")
+    print(f"prix d'exécution : {per_call(lambda: market.price('AAPL', 10), args.repeat):.2f} µs")
+    repeat = max(args.repeat // 10, 100)
+    for resolution, limit in (('1s', 300), ('1m', 500), ('1h', 500)):
+        bars = market.bars('AAPL', resolution, limit=limit)
+        cost = per_call(lambda: market.bars('AAPL', resolution, limit=limit), repeat)
+        print(f"bougies {resolution} ({len(bars)}) : {cost:.1f} µs")
+
+
+if __name__ == '__main__':
+    main()
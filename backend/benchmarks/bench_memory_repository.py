@@ -0,0 +1,80 @@
+"""Latence des recherches du serveur sans base : dépôt indexé vs parcours linéaires d'origine
+
+Usage : python benchmarks/bench_memory_repository.py [--users N] [--sizes 100,10000,1000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_repository import InMemoryRepository
+
+
+def build(users, trades):
+    repo = InMemoryRepository()
+    for user_id in range(1, users + 1):
+        repo.add_user({'id': user_id, 'email': f'user{user_id}@example.com', 'name': f'User {user_id}',
+                       'role': 'user', 'password': 'password'})
+        repo.create_default_challenge(user_id, '2024-01-01T00:00:00')
+    repo.next_id = users + 1
+    for i in range(trades):
+        user_id = i % users + 1
+        repo.add_trade({'id': repo.allocate_id(), 'user_id': user_id, 'challenge_id': user_id * 10 + 1,
+                        'symbol': 'AAPL', 'type': 'BUY', 'price': 100.0, 'quantity': 1,
+                        'timestamp': '2024-01-01T00:00:00', 'pnl': 0})
+    return repo
+
+
+def linear_login(repo, email):
+    for user in repo.users.values():
+        if user['email'] == email:
+            return user
+
+
+def linear_challenge(repo, challenge_id):
+    for user_challenges in repo.challenges.values():
+        for challenge in user_challenges:
+            if challenge['id'] == challenge_id:
+                return challenge
+
+
+def linear_trades(repo, user_id):
+    trades = []
+    for trade_list in repo.trades.values():
+        trades.extend([t for t in trade_list if t['user_id'] == user_id])
+    return trades
+
+
+def timed(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--sizes', default='100,10000,100000,1000000')
+    args = parser.parse_args()
+
+    target = args.users // 2
+    email = f'user{target}@example.com'
+    print(f"{'trades':>9} | {'login idx':>10} {'login lin':>10} | {'défi idx':>9} {'défi lin':>9} "
+          f"| {'trades idx':>10} {'trades lin':>11}  (µs)")
+    for size in (int(s) for s in args.sizes.split(',')):
+        repo = build(args.users, size)
+        linear_iterations = max(1, 200000 // max(size, 1))
+        print(f"{size:>9} | "
+              f"{timed(lambda: repo.find_user_by_email(email), 10000):>10.2f} "
+              f"{timed(lambda: linear_login(repo, email), 200):>10.2f} | "
+              f"{timed(lambda: repo.find_challenge(target * 10 + 1), 10000):>9.2f} "
+              f"{timed(lambda: linear_challenge(repo, target * 10 + 1), 200):>9.2f} | "
+              f"{timed(lambda: repo.get_user_trades(target), 10000):>10.2f} "
+              f"{timed(lambda: linear_trades(repo, target), linear_iterations):>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
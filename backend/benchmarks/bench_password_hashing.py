@@ -0,0 +1,80 @@
+"""Débit de vérification bcrypt (connexions/s) selon le nombre de processus du pool de hachage
+
+Simule une vague de connexions : `--clients` threads appellent PasswordHasher.verify
+en boucle ; les appels refusés par la contre-pression (HasherBusy -> 429) sont comptés.
+Comparé à la vérification en ligne (bcrypt.checkpw dans le thread, sans pool).
+
+Usage : python benchmarks/bench_password_hashing.py [--rounds 12] [--workers 1,2,4,8]
+        [--clients 32] [--duration 5]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt
+
+from password_hashing import HasherBusy, PasswordHasher
+
+PASSWORD = 'password'
+
+
+def run(verify, clients, duration, rounds):
+    stop = threading.Event()
+    counts = [[0, 0] for _ in range(clients)]
+
+    def client(index, hashed):
+        while not stop.is_set():
+            try:
+                verify(PASSWORD, hashed)
+                counts[index][0] += 1
+            except HasherBusy:
+                counts[index][1] += 1
+                # Un client refusé (429) réessaie après Retry-After, raccourci ici
+                time.sleep(0.01)
+
+    hashed = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+    threads = [threading.Thread(target=client, args=(i, hashed)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(c[0] for c in counts) / duration, sum(c[1] for c in counts)
+
+
+def inline_verify(password, hashed):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=12)
+    cores = os.cpu_count() or 1
+    parser.add_argument('--workers', default=','.join(str(n) for n in (1, 2, 4, 8, 16) if n <= cores) or '1')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--max-pending', type=int, default=0, help='0 = 4 x workers')
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"bcrypt coût {args.rounds}, {cores} cœurs, {args.clients} clients")
+    print(f"{'mode':>12} {'login/s':>10} {'refus 429':>10}")
+    rate, _ = run(inline_verify, args.clients, args.duration, args.rounds)
+    print(f"{'en ligne':>12} {rate:>10.1f} {'-':>10}")
+    for workers in [int(w) for w in args.workers.split(',')]:
+        hasher = PasswordHasher(workers=workers, max_pending=args.max_pending or None, rounds=args.rounds)
+        # Démarrer les processus avant la mesure
+        hasher.verify(PASSWORD, bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(4)).decode('utf-8'))
+        try:
+            rate, rejected = run(hasher.verify, args.clients, args.duration, args.rounds)
+        finally:
+            hasher.close()
+        print(f"{f'pool x{workers}':>12} {rate:>10.1f} {rejected:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""PnL FIFO incrémental (positions.Position) vs recalcul depuis tout l'historique
+
+Pour chaque taille d'historique, mesure le coût d'un trade supplémentaire :
+mise à jour incrémentale de la position (plus les ordres d'enregistrement)
+contre rejeu FIFO de tous les trades du symbole, ce que ferait un calcul sans état.
+
+Usage : python benchmarks/bench_position_engine.py [--sizes 1000,10000,100000] [--repeat 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from positions import Position, position_statements
+
+
+def make_trades(n, seed=42):
+    rng = random.Random(seed)
+    trades = []
+    for _ in range(n):
+        # Légèrement acheteur : des lots restent ouverts et la file grandit
+        trade_type = 'BUY' if rng.random() < 0.55 else 'SELL'
+        trades.append((trade_type, rng.randint(1, 50), round(rng.uniform(90, 110), 2)))
+    return trades
+
+
+def replay_fifo(trades):
+    """PnL réalisé du dernier trade en rejouant tout l'historique (lots dans une deque)"""
+    lots = deque()
+    quantity = 0
+    realized = 0.0
+    for trade_type, qty, price in trades:
+        sign = 1 if trade_type == 'BUY' else -1
+        realized = 0.0
+        if quantity * sign < 0:
+            matched = min(qty, abs(quantity))
+            remaining = matched
+            while remaining:
+                lot_qty, lot_price = lots[0]
+                taken = min(lot_qty, remaining)
+                realized += taken * (price - lot_price) * (1 if quantity > 0 else -1)
+                remaining -= taken
+                if taken == lot_qty:
+                    lots.popleft()
+                else:
+                    lots[0] = (lot_qty - taken, lot_price)
+            quantity += sign * matched
+            qty -= matched
+        if qty:
+            lots.append((qty, price))
+            quantity += sign * qty
+    return realized
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'historique':>10} {'lots ouverts':>12} {'incrémental':>12} {'rejeu complet':>14}")
+    for n in [int(s) for s in args.sizes.split(',')]:
+        history = make_trades(n)
+        extra = make_trades(args.repeat, seed=7)
+        position = Position(1, 'AAPL')
+        for trade in history:
+            position.apply(*trade)
+        position._saved()
+
+        started = time.perf_counter()
+        for trade in extra:
+            pnl = position.apply(*trade)
+            position_statements([position])
+            position._saved()
+        incremental = (time.perf_counter() - started) / len(extra) * 1e6
+
+        # Vérifier le dernier PnL contre le rejeu, puis mesurer le rejeu sur quelques trades
+        expected = replay_fifo(history + extra)
+        assert abs(float(pnl) - expected) < 0.01, (pnl, expected)
+        sample = max(len(extra) // 100, 3)
+        started = time.perf_counter()
+        for i in range(sample):
+            replay_fifo(history + extra[:i + 1])
+        replay = (time.perf_counter() - started) / sample * 1e6
+
+        print(f"{n:>10} {len(position.lots):>12} {incremental:>10.1f}µs {replay:>12.0f}µs")
+
+
+if __name__ == '__main__':
+    main()
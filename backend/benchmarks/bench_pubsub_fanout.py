@@ -0,0 +1,111 @@
+"""Diffusion SSE vers N abonnés dans une seule boucle asyncio (un worker ASGI)
+
+Chaque abonné a sa tâche consommatrice, comme une réponse GET /api/stream ; un
+producteur publie des ticks (clé = symbole) au débit demandé. Mesure le coût d'une
+publication, les livraisons par seconde, la latence publication -> consommation et,
+avec --slow, ce que la fusion par clé et la file bornée épargnent aux clients lents.
+
+Usage : python benchmarks/bench_pubsub_fanout.py [--subscribers 10000] [--rate 20] [--seconds 5]
+                                                 [--symbols 20] [--slow 0.1] [--slow-delay 0.5]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pubsub import ALL_TICKS_TOPIC, Broker, symbol_topic
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+async def consume(subscriber, published_at, latencies, delay):
+    while True:
+        batch = await subscriber.next_batch()
+        now = time.perf_counter()
+        for payload in batch:
+            # L'id SSE (première ligne) identifie la publication
+            event_id = int(payload[4:payload.index(b'\n')])
+            latencies.append(now - published_at[event_id])
+        if delay:
+            await asyncio.sleep(delay)
+
+
+async def run(args):
+    rng = random.Random(42)
+    broker = Broker(args.queue_size)
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    published_at = {}
+    latencies = []
+
+    tasks = []
+    slow_count = int(args.subscribers * args.slow)
+    for i in range(args.subscribers):
+        if i % 10 == 0:
+            topics = [ALL_TICKS_TOPIC]
+        else:
+            topics = [symbol_topic(s) for s in rng.sample(symbols, min(3, len(symbols)))]
+        subscriber = broker.subscribe(topics)
+        delay = args.slow_delay if i < slow_count else 0
+        tasks.append(asyncio.create_task(consume(subscriber, published_at, latencies, delay)))
+    await asyncio.sleep(0)
+
+    interval = 1.0 / args.rate
+    publish_cost = []
+    sequence = 0
+    started = time.perf_counter()
+    deadline = started + args.seconds
+    while time.perf_counter() < deadline:
+        for symbol in symbols:
+            tick = {'symbol': symbol, 'price': round(rng.uniform(10, 500), 5), 'ts': time.time()}
+            t0 = time.perf_counter()
+            # Même numérotation que Broker : une publication par sujet ayant des abonnés
+            for topic in (symbol_topic(symbol), ALL_TICKS_TOPIC):
+                if broker._topics.get(topic):
+                    sequence += 1
+                    published_at[sequence] = t0
+                    broker.publish(topic, 'tick', tick, key=symbol)
+            publish_cost.append(time.perf_counter() - t0)
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - started) % interval))
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(args.slow_delay + 0.1)
+
+    stats = broker.stats()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    print(f"abonnés : {args.subscribers} ({slow_count} lents, {args.slow_delay}s par lot), "
+          f"{args.symbols} symboles, {args.rate} ticks/s/symbole, file {args.queue_size}")
+    print(f"publications : {stats['published']} en {elapsed:.1f}s, "
+          f"coût d'un tick (tous abonnés) p50 {percentile(publish_cost, 0.5) * 1e3:.2f} ms "
+          f"p99 {percentile(publish_cost, 0.99) * 1e3:.2f} ms")
+    print(f"livrés : {stats['delivered']} ({stats['delivered'] / elapsed:,.0f}/s), "
+          f"fusionnés : {stats['coalesced']}, abandonnés : {stats['dropped']}")
+    print(f"latence publication -> consommateur : p50 {percentile(latencies, 0.5) * 1e3:.1f} ms "
+          f"p99 {percentile(latencies, 0.99) * 1e3:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--subscribers', type=int, default=10000)
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--rate', type=float, default=5, help='ticks par seconde et par symbole')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--queue-size', type=int, default=256)
+    parser.add_argument('--slow', type=float, default=0.1, help='fraction de consommateurs lents')
+    parser.add_argument('--slow-delay', type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Coût du routage par requête : table compilée (http_routing.Router) vs chaîne if/elif
+
+La chaîne reproduit l'ancien do_GET des serveurs stdlib (urlparse, split('/'),
+comparaisons positionnelles) étendue à `--routes` routes paramétrées ; la
+requête résolue est la dernière de la chaîne, cas le plus défavorable.
+
+Usage : python benchmarks/bench_router_dispatch.py [--routes 6,30,100] [--requests 200000]
+"""
+import argparse
+import os
+import sys
+import time
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_routing import Router
+
+
+def resources(n):
+    return [f'resource{i}' for i in range(n)]
+
+
+def legacy_dispatch(names, path):
+    """Routage historique : chaque requête réanalyse le chemin puis teste les routes une à une"""
+    parsed_path = urlparse(path)
+    path_parts = parsed_path.path.split('/')
+    if len(path_parts) >= 4 and path_parts[1] == 'api' and path_parts[2] == 'user':
+        user_id = int(path_parts[3])
+        query = {k: v[0] for k, v in parse_qs(parsed_path.query).items()}
+        for name in names:
+            if len(path_parts) >= 5 and path_parts[4] == name:
+                return name, user_id, query
+    return None
+
+
+def make_router(names):
+    return Router([('GET', f'/api/user/<int:user_id>/{name}', name) for name in names]
+                  + [('POST', f'/api/{name}', name) for name in names])
+
+
+def measure(function, paths, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for path in paths:
+            function(path)
+    return (time.perf_counter() - started) / (repeat * len(paths)) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--routes', default='6,30,100')
+    parser.add_argument('--requests', type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"{'routes':>6} {'if/elif':>10} {'table':>10} {'table statique':>15}")
+    for n in [int(s) for s in args.routes.split(',')]:
+        names = resources(n)
+        router = make_router(names)
+        paths = [f'/api/user/{user_id}/{names[-1]}' for user_id in range(1, 101)]
+        static_paths = [f'/api/{names[-1]}'] * 100
+        repeat = max(args.requests // len(paths), 1)
+
+        # Les deux routages doivent trouver la même route et les mêmes paramètres
+        match = router.match('GET', paths[0])
+        assert legacy_dispatch(names, paths[0]) == (match.handler, match.params['user_id'], match.query)
+
+        legacy = measure(lambda path: legacy_dispatch(names, path), paths, repeat)
+        table = measure(lambda path: router.match('GET', path).query, paths, repeat)
+        static = measure(lambda path: router.match('POST', path), static_paths, repeat)
+        print(f"{n:>6} {legacy:>8.0f}ns {table:>8.0f}ns {static:>13.0f}ns")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Lectures dans l'archive de trades en colonnes (fichiers .npy projetés en mémoire)
+
+MySQL n'est pas nécessaire : des trades synthétiques (lignes de archive_rows_query)
+sont archivés dans un répertoire temporaire, puis on mesure :
+
+- colonnes d'un défi pour les analyses : tranches mmap vs columns_from_rows sur les lignes
+- page d'historique (limit 100) et export complet d'un utilisateur
+- taille sur disque par trade
+
+Usage : python benchmarks/bench_trade_archive.py [--trades 1000000] [--users 1000] [--months 12]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import columns_from_rows
+from trade_archive import TradeArchive
+from trade_query import TradeHistoryQuery
+
+START = 1704067200  # 2024-01-01
+
+
+def make_rows(n, users, months):
+    rng = random.Random(42)
+    symbols = ['AAPL', 'TSLA', 'BTC-USD', 'IAM', 'ATW']
+    span = months * 30 * 86400
+    rows = []
+    for i in range(1, n + 1):
+        ts = START + i * span // n
+        user_id = rng.randrange(1, users + 1)
+        rows.append((i, user_id, user_id * 4 + rng.randrange(4), rng.choice(symbols), rng.choice(('BUY', 'SELL')),
+                     rng.randrange(10 ** 5, 10 ** 8), rng.randrange(1, 100), ts, ts, rng.randrange(-10 ** 5, 10 ** 5)))
+    return rows
+
+
+def timed(fn, repeat=20):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trades', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--months', type=int, default=12)
+    args = parser.parse_args()
+
+    rows = make_rows(args.trades, args.users, args.months)
+    root = tempfile.mkdtemp(prefix='trade-archive-')
+    try:
+        archive = TradeArchive(root)
+        started = time.perf_counter()
+        archive.append(rows)
+        print(f"archivage de {len(rows)} trades : {time.perf_counter() - started:.1f}s")
+        size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files)
+        print(f"taille sur disque : {size / len(rows):.1f} octets/trade ({size / 2 ** 20:.1f} Mo)")
+
+        user_id = rows[0][1]
+        challenge_id = rows[0][2]
+        # Lignes telles que les renverrait ANALYTICS_QUERY pour ce défi
+        analytics_rows = [(float(r[7]), r[9] / 100, r[3], r[0]) for r in rows if r[2] == challenge_id]
+        ms, _ = timed(lambda: columns_from_rows(analytics_rows))
+        print(f"colonnes d'un défi ({len(analytics_rows)} trades) : lignes -> colonnes {ms:.2f}ms", end='')
+        snapshot = archive.refresh()
+        ms, _ = timed(lambda: snapshot.challenge_columns(user_id, challenge_id))
+        print(f", archive {ms:.2f}ms")
+
+        history = TradeHistoryQuery(user_id, {'limit': '100'})
+        ms, page = timed(lambda: snapshot.history_rows(history))
+        print(f"page d'historique ({len(page)} lignes) : {ms:.2f}ms")
+        ms, count = timed(lambda: sum(1 for _ in snapshot.history_rows(history, paginate=False)), repeat=5)
+        print(f"export complet d'un utilisateur ({count} lignes) : {ms:.2f}ms")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+# État courant de chaque défi, mis à jour à chaque trade sans relire la table trades
+CHALLENGE_STATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS challenge_state (
+        challenge_id INT PRIMARY KEY,
+        equity DECIMAL(15,2) NOT NULL,
+        day_start_equity DECIMAL(15,2) NOT NULL,
+        trading_day DATE NOT NULL,
+        peak_equity DECIMAL(15,2) NOT NULL,
+        realized_pnl DECIMAL(15,2) NOT NULL DEFAULT 0.00,
+        trade_count INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE
+    );
+"""
+
+# PnL réalisé par défi et par journée de trading : le contrôle de perte journalière
+# lit une seule ligne (clé primaire) au lieu de sommer les trades depuis le début du jour
+CHALLENGE_DAILY_PNL_TABLE = """
+    CREATE TABLE IF NOT EXISTS challenge_daily_pnl (
+        challenge_id INT NOT NULL,
+        trading_day DATE NOT NULL,
+        start_equity DECIMAL(15,2) NOT NULL,
+        realized_pnl DECIMAL(15,2) NOT NULL DEFAULT 0.00,
+        trade_count INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (challenge_id, trading_day),
+        FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE
+    );
+"""
+
+# Fuseau de changement de journée : UTC par défaut (crypto, actions US),
+# heure de Casablanca pour les valeurs de la Bourse de Casablanca
+TRADING_DAY_TZ = os.getenv('TRADING_DAY_TZ', 'UTC')
+SYMBOL_TIMEZONES = os.getenv('SYMBOL_TIMEZONES', 'IAM=Africa/Casablanca,ATW=Africa/Casablanca')
+
+STATE_COLUMNS = (
+    'c.id', 'c.user_id', 'c.initial_balance', 'c.current_balance', 'c.status',
+    'c.max_daily_loss', 'c.max_total_loss', 'c.profit_target',
+    's.equity', 's.day_start_equity', 's.trading_day', 's.peak_equity',
+    's.realized_pnl', 's.trade_count'
+)
+
+
+def to_decimal(value):
+    """Convertir un montant (float JSON, int, Decimal MySQL) sans erreur d'arrondi binaire"""
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+class TradingCalendar:
+    """Journée de trading d'un trade selon le fuseau de son symbole"""
+
+    def __init__(self, default_tz='UTC', symbol_timezones=None):
+        self.default_tz = ZoneInfo(default_tz)
+        self.symbol_timezones = {symbol.upper(): ZoneInfo(tz) for symbol, tz in (symbol_timezones or {}).items()}
+
+    @classmethod
+    def from_spec(cls, default_tz, spec):
+        """Calendrier depuis 'SYM=Zone/Ville,SYM2=Zone/Ville' (format de SYMBOL_TIMEZONES)"""
+        symbol_timezones = {}
+        for item in (spec or '').split(','):
+            symbol, _, tz = item.partition('=')
+            if symbol.strip() and tz.strip():
+                symbol_timezones[symbol.strip()] = tz.strip()
+        return cls(default_tz, symbol_timezones)
+
+    def day_for(self, symbol, now=None):
+        tz = self.symbol_timezones.get(symbol.upper(), self.default_tz)
+        return (now or datetime.now(timezone.utc)).astimezone(tz).date()
+
+
+calendar = TradingCalendar.from_spec(TRADING_DAY_TZ, SYMBOL_TIMEZONES)
+
+
+def trade_days(rows, now=None):
+    """Journée de trading de chaque trade (index, ligne), calculée à un instant unique"""
+    now = now or datetime.now(timezone.utc)
+    return {index: calendar.day_for(row[2], now) for index, row in rows}
+
+
+class DailyPnl:
+    """Accumulateur d'une journée de trading d'un défi (ligne de challenge_daily_pnl)"""
+
+    __slots__ = ('start_equity', 'pnl', 'trade_count', 'dirty')
+
+    def __init__(self, start_equity, pnl=0, trade_count=0):
+        self.start_equity = to_decimal(start_equity)
+        self.pnl = to_decimal(pnl)
+        self.trade_count = trade_count
+        self.dirty = False
+
+
+class ChallengeState:
+    """Solde courant, solde de début de journée, plus haut et PnL réalisé d'un défi"""
+
+    __slots__ = (
+        'challenge_id', 'user_id', 'initial_balance', 'status',
+        'max_daily_loss', 'max_total_loss', 'profit_target',
+        'equity', 'day_start_equity', 'trading_day', 'peak_equity',
+        'realized_pnl', 'trade_count', 'days', 'failure_reason', 'dirty'
+    )
+
+    def __init__(self, challenge_id, user_id, initial_balance, equity, status,
+                 max_daily_loss, max_total_loss, profit_target,
+                 day_start_equity=None, trading_day=None, peak_equity=None,
+                 realized_pnl=None, trade_count=0):
+        self.challenge_id = challenge_id
+        self.user_id = user_id
+        self.initial_balance = to_decimal(initial_balance)
+        self.status = status
+        self.max_daily_loss = to_decimal(max_daily_loss)
+        self.max_total_loss = to_decimal(max_total_loss)
+        self.profit_target = to_decimal(profit_target)
+        self.equity = to_decimal(equity)
+        self.day_start_equity = to_decimal(day_start_equity) if day_start_equity is not None else self.equity
+        self.trading_day = trading_day
+        self.peak_equity = to_decimal(peak_equity) if peak_equity is not None else max(self.equity, self.initial_balance)
+        self.realized_pnl = to_decimal(realized_pnl) if realized_pnl is not None else self.equity - self.initial_balance
+        self.trade_count = trade_count or 0
+        self.days = {}
+        self.failure_reason = None
+        self.dirty = False
+
+    @classmethod
+    def from_row(cls, row):
+        """Construire l'état depuis une ligne lue avec STATE_COLUMNS
+
+        Sans ligne challenge_state, l'état est initialisé depuis le solde du défi.
+        """
+        (challenge_id, user_id, initial_balance, current_balance, status,
+         max_daily_loss, max_total_loss, profit_target,
+         equity, day_start_equity, trading_day, peak_equity, realized_pnl, trade_count) = row
+        if equity is None:
+            return cls(challenge_id, user_id, initial_balance, current_balance, status,
+                       max_daily_loss, max_total_loss, profit_target)
+        return cls(challenge_id, user_id, initial_balance, equity, status,
+                   max_daily_loss, max_total_loss, profit_target,
+                   day_start_equity, trading_day, peak_equity, realized_pnl, trade_count)
+
+    def day(self, trading_day):
+        """Accumulateur de la journée, créé au solde courant s'il n'a pas été chargé"""
+        bucket = self.days.get(trading_day)
+        if bucket is None:
+            if trading_day == self.trading_day:
+                # État antérieur à challenge_daily_pnl : repartir du solde de début de journée suivi
+                bucket = DailyPnl(self.day_start_equity, self.equity - self.day_start_equity)
+            else:
+                bucket = DailyPnl(self.equity)
+            self.days[trading_day] = bucket
+        return bucket
+
+    def apply(self, pnl, trading_day):
+        """Appliquer le PnL d'un trade en O(1) et retourner le nouveau statut s'il change
+
+        La perte journalière est celle de la journée du trade (fuseau de son symbole) :
+        deux trades de part et d'autre de minuit à Casablanca et en UTC peuvent compter
+        pour deux journées différentes.
+        """
+        pnl = to_decimal(pnl)
+        bucket = self.day(trading_day)
+        bucket.pnl += pnl
+        bucket.trade_count += 1
+        bucket.dirty = True
+        if self.trading_day is None or trading_day >= self.trading_day:
+            self.trading_day = trading_day
+            self.day_start_equity = bucket.start_equity
+
+        self.equity += pnl
+        self.realized_pnl += pnl
+        self.trade_count += 1
+        self.dirty = True
+        if self.equity > self.peak_equity:
+            self.peak_equity = self.equity
+
+        if self.status != 'active':
+            return None
+
+        if -bucket.pnl >= self.max_daily_loss:
+            self.failure_reason = 'max_daily_loss'
+            self.status = 'failed'
+        elif self.initial_balance - self.equity >= self.max_total_loss:
+            self.failure_reason = 'max_total_loss'
+            self.status = 'failed'
+        elif self.equity - self.initial_balance >= self.profit_target:
+            self.status = 'passed'
+        else:
+            return None
+        return self.status
+
+    def to_dict(self):
+        return {
+            'id': self.challenge_id,
+            'status': self.status,
+            'currentBalance': float(self.equity),
+            'dayStartBalance': float(self.day_start_equity),
+            'peakBalance': float(self.peak_equity),
+            'dayPnl': float(self.days[self.trading_day].pnl) if self.trading_day in self.days else None,
+            'realizedPnl': float(self.realized_pnl),
+            'tradeCount': self.trade_count,
+            'failureReason': self.failure_reason
+        }
+
+
+def lock_states_query(challenge_ids):
+    """Requête SELECT ... FOR UPDATE de l'état des défis, ou None s'il n'y a aucun id
+
+    Les verrous sont pris dans l'ordre des ids pour éviter les interblocages
+    entre lots concurrents.
+    """
+    challenge_ids = sorted(set(challenge_ids))
+    if not challenge_ids:
+        return None
+    placeholders = ', '.join(['%s'] * len(challenge_ids))
+    query = (
+        f"SELECT {', '.join(STATE_COLUMNS)} FROM challenges c "
+        f"LEFT JOIN challenge_state s ON s.challenge_id = c.id "
+        f"WHERE c.id IN ({placeholders}) ORDER BY c.id FOR UPDATE"
+    )
+    return query, challenge_ids
+
+
+def lock_challenge_states(cursor, challenge_ids):
+    """Lire et verrouiller (FOR UPDATE) l'état des défis jusqu'au commit
+
+    Le curseur doit retourner des tuples.
+    """
+    statement = lock_states_query(challenge_ids)
+    if statement is None:
+        return {}
+    cursor.execute(*statement)
+    return {row[0]: ChallengeState.from_row(row) for row in cursor.fetchall()}
+
+
+def daily_pnl_query(pairs):
+    """Lecture des accumulateurs (défi, journée) demandés, par clé primaire"""
+    pairs = sorted(set(pairs))
+    if not pairs:
+        return None
+    placeholders = ', '.join(['(%s, %s)'] * len(pairs))
+    return (
+        "SELECT challenge_id, trading_day, start_equity, realized_pnl, trade_count FROM challenge_daily_pnl "
+        f"WHERE (challenge_id, trading_day) IN ({placeholders})",
+        [value for pair in pairs for value in pair]
+    )
+
+
+def daily_pnl_pairs(rows, days):
+    return [(row[1], days[index]) for index, row in rows]
+
+
+def attach_daily_pnl(states, daily_rows):
+    for challenge_id, trading_day, start_equity, realized_pnl, trade_count in daily_rows:
+        state = states.get(challenge_id)
+        if state is not None:
+            state.days[trading_day] = DailyPnl(start_equity, realized_pnl, trade_count)
+
+
+def load_daily_pnl(cursor, states, rows, days):
+    """Charger les journées touchées par les trades (après le verrou des défis)"""
+    statement = daily_pnl_query(daily_pnl_pairs(rows, days))
+    if statement is not None:
+        cursor.execute(*statement)
+        attach_daily_pnl(states, cursor.fetchall())
+
+
+def apply_trades(states, rows, errors, trading_day=None, positions=None, days=None):
+    """Appliquer dans l'ordre les trades d'un lot à l'état des défis verrouillés
+
+    `rows` contient des couples (index, ligne) au format de trade_batch.TRADE_COLUMNS.
+    Les trades refusés sont ajoutés à `errors` ; les trades acceptés sont retournés.
+    Avec `positions` ((défi, symbole) -> positions.Position), le PnL de chaque trade
+    accepté est calculé par appariement FIFO et remplace celui de la ligne.
+    La journée de chaque trade vient de `days` (voir trade_days), sinon de `trading_day`.
+    """
+    if days is None and trading_day is None:
+        days = trade_days(rows)
+    kept = []
+    for index, row in rows:
+        user_id, challenge_id, pnl = row[0], row[1], row[6]
+        state = states.get(challenge_id)
+        if state is None:
+            errors[index] = 'Défi introuvable'
+        elif state.user_id != user_id:
+            errors[index] = "Le défi n'appartient pas à cet utilisateur"
+        elif state.status != 'active':
+            errors[index] = f"Défi terminé ({state.status})"
+        else:
+            if positions is not None:
+                pnl = positions[(challenge_id, row[2])].apply(row[3], row[5], row[4])
+                row = row[:6] + (pnl,)
+            state.apply(pnl, days[index] if days is not None else trading_day)
+            kept.append((index, row))
+    return kept
+
+
+def save_states_statements(states):
+    """Ordres (requête, lignes) pour executemany qui enregistrent les états modifiés"""
+    states = [s for s in states if s.dirty]
+    if not states:
+        return []
+    return [
+        (
+            """
+            INSERT INTO challenge_state (challenge_id, equity, day_start_equity, trading_day,
+                                         peak_equity, realized_pnl, trade_count)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE equity = VALUES(equity), day_start_equity = VALUES(day_start_equity),
+                                    trading_day = VALUES(trading_day), peak_equity = VALUES(peak_equity),
+                                    realized_pnl = VALUES(realized_pnl), trade_count = VALUES(trade_count)
+            """,
+            [(s.challenge_id, s.equity, s.day_start_equity, s.trading_day,
+              s.peak_equity, s.realized_pnl, s.trade_count) for s in states]
+        ),
+        (
+            """
+            INSERT INTO challenge_daily_pnl (challenge_id, trading_day, start_equity, realized_pnl, trade_count)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE realized_pnl = VALUES(realized_pnl), trade_count = VALUES(trade_count)
+            """,
+            [(s.challenge_id, day, bucket.start_equity, bucket.pnl, bucket.trade_count)
+             for s in states for day, bucket in s.days.items() if bucket.dirty]
+        ),
+        (
+            "UPDATE challenges SET current_balance = %s, status = %s WHERE id = %s",
+            [(s.equity, s.status, s.challenge_id) for s in states]
+        )
+    ]
+
+
+def save_challenge_states(cursor, states):
+    """Enregistrer l'état et répercuter solde et statut sur la table challenges"""
+    for query, params in save_states_statements(states):
+        cursor.executemany(query, params)
+
+
+RESET_STATE_QUERY = "DELETE FROM challenge_state WHERE challenge_id = %s"
+
+
+def reset_challenge_state(cursor, challenge_id):
+    """Oublier l'état suivi après une modification manuelle des soldes du défi"""
+    cursor.execute(RESET_STATE_QUERY, (challenge_id,))
@@ -0,0 +1,200 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class DatabaseUnavailable(Exception):
+    """Aucune connexion à la base de données n'a pu être obtenue"""
+
+
+class PoolExhausted(DatabaseUnavailable):
+    """Toutes les connexions du pool sont occupées au-delà du délai d'attente"""
+
+
+class _PoolEntry:
+    __slots__ = ('connection', 'created_at')
+
+    def __init__(self, connection, created_at):
+        self.connection = connection
+        self.created_at = created_at
+
+
+class ConnectionPool:
+    """Pool de connexions réutilisables avec débordement, contrôle de santé et recyclage"""
+
+    def __init__(self, connect, pool_size=5, max_overflow=10, timeout=30.0,
+                 recycle=1800, pre_ping=True):
+        self._connect = connect
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        self._idle = deque()
+        self._checked_out = {}
+        self._opened = 0
+        self._cond = threading.Condition()
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._exhaustions = 0
+        self._recycled = 0
+        self._ping_failures = 0
+        self._connect_failures = 0
+
+    def _open(self):
+        """Ouvrir une nouvelle connexion physique"""
+        try:
+            return _PoolEntry(self._connect(), time.monotonic())
+        except Exception as e:
+            with self._cond:
+                self._opened -= 1
+                self._connect_failures += 1
+                self._cond.notify()
+            raise DatabaseUnavailable(str(e)) from e
+
+    def _discard(self, entry):
+        try:
+            entry.connection.close()
+        except Exception:
+            pass
+
+    def _is_usable(self, entry):
+        """Vérifier l'âge et l'état d'une connexion inactive avant de la prêter"""
+        if self.recycle is not None and self.recycle >= 0 and \
+                time.monotonic() - entry.created_at > self.recycle:
+            with self._cond:
+                self._recycled += 1
+            return False
+        if self.pre_ping:
+            try:
+                alive = entry.connection.is_connected()
+            except Exception:
+                alive = False
+            if not alive:
+                with self._cond:
+                    self._ping_failures += 1
+                return False
+        return True
+
+    def acquire(self):
+        """Emprunter une connexion, en attendant au plus `timeout` secondes"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        entry = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._opened < self.pool_size + self.max_overflow:
+                    self._opened += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._exhaustions += 1
+                    raise PoolExhausted(
+                        f"Pool épuisé ({self._opened} connexions occupées)"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+        if entry is None:
+            entry = self._open()
+        elif not self._is_usable(entry):
+            # Remplacer la connexion périmée sans rendre la place au pool
+            self._discard(entry)
+            entry = self._open()
+
+        wait_time = time.monotonic() - started
+        with self._cond:
+            self._checked_out[id(entry.connection)] = entry
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+            self._wait_time_total += wait_time
+            self._wait_time_max = max(self._wait_time_max, wait_time)
+        return entry.connection
+
+    def release(self, connection, discard=False):
+        """Rendre une connexion au pool en terminant sa transaction éventuelle"""
+        with self._cond:
+            entry = self._checked_out.pop(id(connection), None)
+        if entry is None:
+            return
+
+        if not discard:
+            try:
+                # Terminer la transaction implicite pour ne pas garder un instantané périmé
+                connection.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            if discard or len(self._idle) >= self.pool_size:
+                self._opened -= 1
+                keep = False
+            else:
+                self._idle.append(entry)
+                keep = True
+            self._cond.notify()
+
+        if not keep:
+            self._discard(entry)
+
+    @contextmanager
+    def connection(self):
+        """Emprunter une connexion pour la durée d'un bloc `with`"""
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            # release() annule toute transaction laissée ouverte par une exception
+            self.release(connection)
+
+    @contextmanager
+    def cursor(self, dictionary=False):
+        """Emprunter une connexion et un curseur, tous deux rendus même en cas d'erreur"""
+        with self.connection() as connection:
+            cursor = connection.cursor(dictionary=dictionary)
+            try:
+                yield connection, cursor
+            finally:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+    def close(self):
+        """Fermer toutes les connexions inactives"""
+        with self._cond:
+            entries = list(self._idle)
+            self._idle.clear()
+            self._opened -= len(entries)
+        for entry in entries:
+            self._discard(entry)
+
+    def stats(self):
+        """Métriques d'utilisation du pool"""
+        with self._cond:
+            return {
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'opened': self._opened,
+                'idle': len(self._idle),
+                'checked_out': len(self._checked_out),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time_total_ms': round(self._wait_time_total * 1000, 3),
+                'wait_time_max_ms': round(self._wait_time_max * 1000, 3),
+                'exhaustions': self._exhaustions,
+                'recycled': self._recycled,
+                'ping_failures': self._ping_failures,
+                'connect_failures': self._connect_failures,
+            }
@@ -0,0 +1,227 @@
+import itertools
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from db_pool import DatabaseUnavailable
+
+_PIN = struct.Struct('d')
+
+
+class PinTable:
+    """Échéances « lire sur le primaire » par utilisateur, partagées entre les workers
+
+    Table de taille fixe indexée par user_id modulo `slots`, dans un fichier projeté
+    en mémoire (tous les workers gunicorn de la machine voient les mêmes échéances),
+    ou en mémoire locale sans `path`. Deux utilisateurs sur la même case ne font
+    qu'envoyer quelques lectures de plus au primaire.
+    """
+
+    def __init__(self, path=None, slots=65536):
+        self.slots = slots
+        size = slots * _PIN.size
+        if path is None:
+            self._buffer = bytearray(size)
+        else:
+            with open(path, 'a+b') as f:
+                if os.fstat(f.fileno()).st_size < size:
+                    f.truncate(size)
+                self._buffer = mmap.mmap(f.fileno(), size)
+
+    def pin(self, user_id, until):
+        offset = (user_id % self.slots) * _PIN.size
+        if _PIN.unpack_from(self._buffer, offset)[0] < until:
+            _PIN.pack_into(self._buffer, offset, until)
+
+    def pinned(self, user_id, now=None):
+        until = _PIN.unpack_from(self._buffer, (user_id % self.slots) * _PIN.size)[0]
+        return until > (now or time.time())
+
+
+class Replica:
+    """Pool d'un réplica et son état (santé, retard de réplication)"""
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.healthy = False
+        self.lag = None
+        self.checked_at = None
+        self.error = None
+        self.reads = 0
+        self.failures = 0
+
+
+def replication_lag(cursor):
+    """Retard du réplica en secondes, None s'il ne réplique pas (ou si la réplication est arrêtée)"""
+    try:
+        cursor.execute("SHOW REPLICA STATUS")
+    except Exception:
+        # MySQL < 8.0.22 et MariaDB
+        cursor.execute("SHOW SLAVE STATUS")
+    columns = [d[0] for d in cursor.description or ()]
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    status = dict(zip(columns, rows[0]))
+    lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+    return None if lag is None else float(lag)
+
+
+class DataSourceRouter:
+    """Aiguillage des lectures entre le primaire et des réplicas
+
+    Les lectures vont aux réplicas sains à tour de rôle ; un réplica est écarté
+    s'il ne répond pas ou si son retard dépasse `max_lag` secondes (vérifié toutes
+    les `check_interval` secondes par un thread), et les lectures reviennent au
+    primaire s'il n'en reste aucun. Après une écriture, `note_write` épingle les
+    lectures de l'utilisateur sur le primaire pendant `pin_seconds` secondes : il
+    relit toujours ses propres écritures. `max_lag` négatif désactive le contrôle
+    du retard (réplicas sans réplication configurée, ex. deux instances de test).
+    """
+
+    def __init__(self, primary, replicas=(), max_lag=2.0, check_interval=2.0, pin_seconds=5.0, pins=None):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.pin_seconds = pin_seconds
+        # Sans réplica, tout est lu sur le primaire : pas de table d'échéances
+        self.pins = pins or PinTable(slots=65536 if self.replicas else 1)
+        self._cycle = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._primary_reads = 0
+        self._pinned_reads = 0
+        self._fallbacks = 0
+
+    def note_write(self, *user_ids):
+        if not self.replicas:
+            return
+        until = time.time() + self.pin_seconds
+        for user_id in user_ids:
+            self.pins.pin(user_id, until)
+
+    def pick(self, user_id=None):
+        """Réplica à utiliser pour une lecture, ou None pour le primaire"""
+        if not self.replicas:
+            return None
+        if user_id is not None and self.pins.pinned(user_id):
+            with self._lock:
+                self._pinned_reads += 1
+            return None
+        count = len(self.replicas)
+        start = next(self._cycle)
+        for offset in range(count):
+            replica = self.replicas[(start + offset) % count]
+            if replica.healthy:
+                return replica
+        with self._lock:
+            self._fallbacks += 1
+        return None
+
+    @contextmanager
+    def read_cursor(self, user_id=None, dictionary=False):
+        """Connexion et curseur de lecture (réplica, ou primaire en repli) pour un bloc `with`"""
+        replica = self.pick(user_id)
+        connection = None
+        if replica is not None:
+            try:
+                connection = replica.pool.acquire()
+            except DatabaseUnavailable as e:
+                # Réplica injoignable : écarté jusqu'au prochain contrôle réussi
+                self.mark_down(replica, e)
+        if connection is None:
+            with self._lock:
+                self._primary_reads += 1
+            with self.primary.cursor(dictionary=dictionary) as pair:
+                yield pair
+            return
+
+        with self._lock:
+            replica.reads += 1
+        try:
+            cursor = connection.cursor(dictionary=dictionary)
+            try:
+                yield connection, cursor
+            finally:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+        finally:
+            replica.pool.release(connection)
+
+    def mark_down(self, replica, error):
+        with self._lock:
+            replica.healthy = False
+            replica.failures += 1
+            replica.error = str(error)
+
+    def check(self, replica):
+        """Mesurer santé et retard d'un réplica"""
+        try:
+            with replica.pool.cursor() as (connection, cursor):
+                # max_lag < 0 : seule la disponibilité compte
+                lag = replication_lag(cursor) if self.max_lag >= 0 else 0.0
+        except Exception as e:
+            self.mark_down(replica, e)
+            return
+        with self._lock:
+            replica.lag = lag
+            replica.checked_at = time.time()
+            if lag is None:
+                replica.healthy = False
+                replica.error = 'réplication arrêtée ou non configurée'
+            else:
+                replica.healthy = self.max_lag < 0 or lag <= self.max_lag
+                replica.error = None if replica.healthy else f'retard de {lag:.0f} s'
+
+    def check_all(self):
+        for replica in self.replicas:
+            self.check(replica)
+
+    def start(self):
+        """Premier contrôle immédiat, puis thread de contrôle périodique (un par processus)"""
+        if not self.replicas:
+            return
+        self.check_all()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.check_interval)
+            self.check_all()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'primary_reads': self._primary_reads,
+                'pinned_reads': self._pinned_reads,
+                'fallbacks': self._fallbacks,
+                'max_lag': self.max_lag,
+                'pin_seconds': self.pin_seconds,
+                'replicas': [{
+                    'name': replica.name,
+                    'healthy': replica.healthy,
+                    'lag': replica.lag,
+                    'reads': replica.reads,
+                    'failures': replica.failures,
+                    'error': replica.error,
+                    'pool': replica.pool.stats(),
+                } for replica in self.replicas],
+            }
+
+
+def parse_replicas(spec):
+    """'hôte[:port],hôte[:port]' -> [(hôte, port)] (port par défaut 3306)"""
+    replicas = []
+    for item in (spec or '').split(','):
+        host, _, port = item.strip().partition(':')
+        if host:
+            replicas.append((host, int(port or 3306)))
+    return replicas
@@ -0,0 +1,29 @@
+import os
+
+# Mode de service choisi au démarrage :
+#   sync  : Flask (app.py) sur des workers gthread, GUNICORN_THREADS requêtes à la fois par worker
+#   async : Quart (asgi_app.py) sur des workers uvicorn, une boucle d'événements par worker
+SERVER_MODE = os.getenv('SERVER_MODE', 'sync').lower()
+
+if SERVER_MODE == 'async':
+    wsgi_app = 'asgi:app'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'wsgi:app'
+    # Plusieurs requêtes par worker : les hachages bcrypt d'un worker s'exécutent en parallèle
+    # dans son pool de processus, et HASH_MAX_PENDING (429) peut être atteint. Avec un worker
+    # `sync` (une requête à la fois), ni l'un ni l'autre ne servirait.
+    worker_class = 'gthread'
+    threads = int(os.getenv('GUNICORN_THREADS', '8'))
+
+
+def on_starting(server):
+    """Migrations du schéma appliquées une fois par le master, avant le fork des workers"""
+    from migrate import run_migrations
+    try:
+        applied = run_migrations()
+        if applied:
+            print(f"Migrations appliquées: {', '.join(map(str, applied))}")
+    except Exception as e:
+        # Base injoignable au démarrage : les workers démarrent quand même (503 jusqu'au retour de MySQL)
+        print(f"Erreur lors des migrations: {e}")
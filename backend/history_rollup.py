@@ -0,0 +1,189 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Une ligne d'historique par défi : l'agrégation est idempotente (rejouable, workers concurrents)
+HISTORY_UNIQUE_INDEXES = {
+    'uq_challenge_history_challenge': ('challenge_id',),
+}
+HISTORY_INDEXES = {
+    'idx_challenge_history_user_completed': ('user_id', 'completed_at'),
+}
+# Recherche des défis terminés sans ligne d'historique (rattrapage, backfill)
+CHALLENGE_STATUS_INDEXES = {
+    'idx_challenges_status': ('status', 'id'),
+}
+
+CLOSED_STATUSES = ('passed', 'failed')
+
+# Résumé calculé par MySQL depuis la ligne du défi : aucune donnée ne transite par Python.
+# updated_at du défi tient lieu de date de clôture (dernier changement : solde et statut).
+_ROLLUP_INSERT = """
+    INSERT INTO challenge_history (user_id, challenge_id, initial_balance, final_balance, status,
+                                   duration_days, profit_amount, profit_percentage, completed_at)
+    SELECT c.user_id, c.id, c.initial_balance, c.current_balance, c.status,
+           GREATEST(DATEDIFF(c.updated_at, c.created_at), 0),
+           c.current_balance - c.initial_balance,
+           LEAST(GREATEST(ROUND((c.current_balance - c.initial_balance) / NULLIF(c.initial_balance, 0) * 100, 2),
+                          -999.99), 999.99),
+           c.updated_at
+    FROM challenges c
+    WHERE c.status IN ('passed', 'failed') AND {condition}
+    ON DUPLICATE KEY UPDATE challenge_id = challenge_history.challenge_id
+"""
+
+MISSING_HISTORY_QUERY = """
+    SELECT c.id FROM challenges c
+    LEFT JOIN challenge_history h ON h.challenge_id = c.id
+    WHERE c.status IN ('passed', 'failed') AND h.id IS NULL
+    ORDER BY c.id
+    LIMIT %s
+"""
+
+CLOSED_RANGE_QUERY = "SELECT MIN(id), MAX(id) FROM challenges WHERE status IN ('passed', 'failed')"
+
+
+def rollup_ids_query(challenge_ids):
+    """INSERT ... SELECT des résumés des défis donnés (ignorés s'ils sont encore actifs)"""
+    placeholders = ', '.join(['%s'] * len(challenge_ids))
+    return _ROLLUP_INSERT.format(condition=f"c.id IN ({placeholders})"), list(challenge_ids)
+
+
+def rollup_range_query(first_id, end_id):
+    """INSERT ... SELECT des résumés des défis terminés d'ids dans [first_id, end_id)"""
+    return _ROLLUP_INSERT.format(condition="c.id >= %s AND c.id < %s"), (first_id, end_id)
+
+
+def closed_challenge_ids(states):
+    """Défis passés à 'passed' ou 'failed' dans la transaction (seuls les défis actifs reçoivent des trades)"""
+    return [s.challenge_id for s in states if s.dirty and s.status in CLOSED_STATUSES]
+
+
+class HistoryRollup:
+    """Agrégation en tâche de fond des défis terminés dans challenge_history
+
+    Les requêtes de trade signalent les défis qui viennent de se terminer avec
+    `enqueue` ; un thread les agrège par lots de `batch_size` au plus toutes les
+    `interval` secondes. Toutes les `sweep_interval` secondes, les défis terminés
+    sans historique (écrits par un autre serveur, file perdue au redémarrage)
+    sont rattrapés.
+    """
+
+    def __init__(self, batch_size=500, interval=2.0, sweep_interval=300.0):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.sweep_interval = sweep_interval
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._swept_at = None
+        self._thread = None
+        self._inserted = 0
+        self._batches = 0
+        self._errors = 0
+
+    def enqueue(self, challenge_ids):
+        if not challenge_ids:
+            return
+        with self._lock:
+            self._pending.update(challenge_ids)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def take(self):
+        """Retirer de la file au plus `batch_size` défis"""
+        with self._lock:
+            batch = []
+            while self._pending and len(batch) < self.batch_size:
+                batch.append(self._pending.pop())
+            return batch
+
+    def sweep_due(self):
+        return self._swept_at is None or time.monotonic() - self._swept_at >= self.sweep_interval
+
+    def run_once(self, cursor_factory):
+        """Agréger la file puis, si c'est l'heure, rattraper les défis oubliés ; retourne le nombre de lignes"""
+        inserted = 0
+        while True:
+            batch = self.take()
+            if not batch:
+                break
+            try:
+                with cursor_factory() as (connection, cursor):
+                    cursor.execute(*rollup_ids_query(batch))
+                    connection.commit()
+                    inserted += cursor.rowcount
+                self._batches += 1
+            except Exception:
+                # Remettre le lot en file : il sera retenté au prochain passage
+                self.enqueue(batch)
+                raise
+
+        if self.sweep_due():
+            self._swept_at = time.monotonic()
+            while True:
+                with cursor_factory() as (connection, cursor):
+                    cursor.execute(MISSING_HISTORY_QUERY, (self.batch_size,))
+                    missing = [row[0] for row in cursor.fetchall()]
+                    if not missing:
+                        break
+                    cursor.execute(*rollup_ids_query(missing))
+                    connection.commit()
+                    inserted += cursor.rowcount
+                self._batches += 1
+                if len(missing) < self.batch_size:
+                    break
+
+        self._inserted += inserted
+        return inserted
+
+    def start(self, cursor_factory):
+        """Démarrer le thread d'agrégation (un par processus)"""
+        self._thread = threading.Thread(target=self._run, args=(cursor_factory,), daemon=True)
+        self._thread.start()
+
+    def _run(self, cursor_factory):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.run_once(cursor_factory)
+            except Exception as e:
+                self._errors += 1
+                print(f"Erreur d'agrégation de l'historique des défis: {e}")
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'inserted': self._inserted,
+            'batches': self._batches,
+            'errors': self._errors,
+        }
+
+
+def backfill(cursor_factory, workers=4, chunk_size=5000):
+    """Agréger tous les défis terminés, par tranches d'ids traitées en parallèle
+
+    Chaque tranche est un seul INSERT ... SELECT validé séparément ; une tranche
+    déjà agrégée ne change rien. Retourne (tranches, lignes insérées).
+    """
+    with cursor_factory() as (connection, cursor):
+        cursor.execute(CLOSED_RANGE_QUERY)
+        first_id, last_id = cursor.fetchone()
+    if first_id is None:
+        return 0, 0
+
+    def run_chunk(bounds):
+        with cursor_factory() as (connection, cursor):
+            cursor.execute(*rollup_range_query(*bounds))
+            connection.commit()
+            return cursor.rowcount
+
+    chunks = [(start, min(start + chunk_size, last_id + 1))
+              for start in range(first_id, last_id + 1, chunk_size)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        inserted = sum(executor.map(run_chunk, chunks))
+    return len(chunks), inserted
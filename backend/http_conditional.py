@@ -0,0 +1,85 @@
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# En dessous de ce seuil, l'en-tête et le coût CPU de la compression ne valent pas le gain
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson')
+ENCODINGS = ('br', 'gzip')
+
+
+def version_etag(*parts):
+    """ETag fort dérivé des versions des lignes (ids, updated_at, compteurs), sans lire le corps"""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:32]
+
+
+def quote_etag(etag, encoding=None):
+    """Valeur d'en-tête ETag ; chaque encodage du corps est une représentation distincte"""
+    return f'"{etag}-{encoding}"' if encoding else f'"{etag}"'
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match désigne-t-il cette version, quel que soit l'encodage reçu par le client ?"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        for encoding in ENCODINGS:
+            if candidate.endswith('-' + encoding):
+                candidate = candidate[:-len(encoding) - 1]
+                break
+        if candidate == etag:
+            return True
+    return False
+
+
+def negotiate_encoding(accept_encoding):
+    """Choisir 'br' (si disponible) ou 'gzip' d'après Accept-Encoding, ou None"""
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+
+    candidates = ['gzip']
+    if brotli is not None:
+        candidates.insert(0, 'br')
+    best = None
+    for encoding in candidates:
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (encoding, q)
+    return best[0] if best else None
+
+
+def compress_body(body, accept_encoding, content_type='application/json', min_size=MIN_COMPRESS_SIZE):
+    """Compresser le corps si le client l'accepte et s'il dépasse le seuil ; retourne (corps, encodage)"""
+    if len(body) < min_size or not (content_type or '').startswith(COMPRESSIBLE_TYPES):
+        return body, None
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), 'gzip'
+    return body, None
@@ -0,0 +1,139 @@
+from urllib.parse import parse_qs, unquote
+
+# Convertisseurs des paramètres de chemin (même syntaxe que Flask : <int:user_id>)
+# Un segment refusé ne correspond pas à la route : 404, comme Flask, plutôt qu'une erreur 500
+CONVERTERS = {
+    'int': lambda segment: int(segment) if segment.isascii() and segment.isdigit() else None,
+    'str': lambda segment: unquote(segment) if segment else None,
+}
+
+
+class RouteMatch:
+    """Résultat de Router.match : statut (200, 404 ou 405), handler, paramètres et query string"""
+
+    __slots__ = ('status', 'handler', 'params', 'query_string', 'allowed')
+
+    def __init__(self, status, handler=None, params=None, query_string='', allowed=()):
+        self.status = status
+        self.handler = handler
+        self.params = params
+        self.query_string = query_string
+        self.allowed = allowed
+
+    @property
+    def query(self):
+        """Paramètres de la query string (première valeur de chaque clé)"""
+        if not self.query_string:
+            return {}
+        return {k: v[0] for k, v in parse_qs(self.query_string).items()}
+
+
+class _Node:
+    __slots__ = ('static', 'param', 'methods')
+
+    def __init__(self):
+        self.static = {}
+        # (nom, convertisseur, noeud) : un seul paramètre possible par position
+        self.param = None
+        self.methods = None
+
+
+class Router:
+    """Table de routage compilée une fois au démarrage
+
+    Les chemins sans paramètre sont résolus par une seule recherche dans un dict ;
+    les autres descendent un arbre de segments (segment fixe prioritaire sur un
+    paramètre, sans retour arrière). Le coût ne dépend pas du nombre de routes.
+    """
+
+    def __init__(self, routes=()):
+        self._root = _Node()
+        self._static = {}
+        for method, template, handler in routes:
+            self.add(method, template, handler)
+
+    def add(self, method, template, handler):
+        if not template.startswith('/'):
+            raise ValueError(f"Route invalide: {template}")
+        node = self._root
+        dynamic = False
+        for segment in template.split('/')[1:]:
+            if segment.startswith('<') and segment.endswith('>'):
+                converter, _, name = segment[1:-1].rpartition(':')
+                converter = converter or 'str'
+                if converter not in CONVERTERS:
+                    raise ValueError(f"Convertisseur inconnu '{converter}' dans {template}")
+                if node.param is None:
+                    node.param = (name, CONVERTERS[converter], _Node())
+                elif node.param[0] != name or node.param[1] is not CONVERTERS[converter]:
+                    raise ValueError(f"Paramètre en conflit dans {template}")
+                node = node.param[2]
+                dynamic = True
+            else:
+                node = node.static.setdefault(segment, _Node())
+        if node.methods is None:
+            node.methods = {}
+        if method in node.methods:
+            raise ValueError(f"Route déjà définie: {method} {template}")
+        node.methods[method] = handler
+        if not dynamic:
+            self._static[template] = node.methods
+
+    def match(self, method, target):
+        """Résoudre `target` (chemin et query string de la ligne de requête) pour `method`"""
+        path, _, query_string = target.partition('?')
+        params = {}
+        methods = self._static.get(path)
+        if methods is None:
+            node = self._root
+            for segment in path.split('/')[1:]:
+                child = node.static.get(segment)
+                if child is None:
+                    if node.param is None:
+                        return NOT_FOUND
+                    name, convert, child = node.param
+                    value = convert(segment)
+                    if value is None:
+                        return NOT_FOUND
+                    params[name] = value
+                node = child
+            methods = node.methods
+            if methods is None:
+                return NOT_FOUND
+        handler = methods.get(method)
+        if handler is None:
+            return RouteMatch(405, allowed=tuple(sorted(methods)))
+        return RouteMatch(200, handler, params, query_string)
+
+
+NOT_FOUND = RouteMatch(404)
+
+
+class RoutedRequestHandler:
+    """Mixin de BaseHTTPRequestHandler : GET/POST/PUT/DELETE passent par la table `routes`
+
+    Le handler de la route est appelé avec les paramètres du chemin ; la query string
+    est disponible dans `self.query_string` et, décodée, dans `self.query`.
+    """
+
+    routes = Router()
+
+    def _dispatch(self):
+        match = self.routes.match(self.command, self.path)
+        if match.status == 404:
+            self.send_error(404)
+        elif match.status == 405:
+            # Corps éventuel non lu : sur une connexion persistante, il serait pris pour la requête suivante
+            self.close_connection = True
+            self.send_response(405)
+            self.send_header('Allow', ', '.join(match.allowed + ('OPTIONS',)))
+            self.send_header('Content-Length', '0')
+            self.send_header('Connection', 'close')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+        else:
+            self.query_string = match.query_string
+            self.query = match.query
+            match.handler(self, **match.params)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _dispatch
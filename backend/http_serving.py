@@ -0,0 +1,114 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer
+
+
+class ThreadPoolHTTPServer(HTTPServer):
+    """HTTPServer dont les connexions sont servies par un pool borné de threads
+
+    Au plus `workers` connexions sont traitées en parallèle et `backlog` attendent
+    dans la file ; au-delà, la boucle d'acceptation se bloque et les nouveaux
+    clients restent dans la file d'attente TCP du noyau (contre-pression).
+
+    Une connexion keep-alive inactive garde son thread jusqu'à la requête suivante :
+    au plus `max_idle` connexions (par défaut la moitié des threads, toujours moins
+    que `workers`) restent ouvertes entre deux requêtes, et aucune dès qu'une
+    connexion attend un thread (voir PooledRequestHandler).
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class, workers=16, backlog=64, max_idle=None):
+        self.request_queue_size = max(backlog, 5)
+        super().__init__(server_address, handler_class)
+        self.workers = workers
+        self.max_idle = min(workers // 2 if max_idle is None else max_idle, workers - 1)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._idle = 0
+        self._slots = threading.BoundedSemaphore(workers + backlog)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='http-worker')
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        with self._lock:
+            self._queued += 1
+        try:
+            self._executor.submit(self._process_request_worker, request, client_address)
+        except RuntimeError:
+            # Pool arrêté pendant l'arrêt du serveur
+            with self._lock:
+                self._queued -= 1
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def hold_idle(self):
+        """Réserver une place de connexion inactive ; False si le pool est saturé ou la limite atteinte"""
+        with self._lock:
+            if self._queued or self._idle >= self.max_idle:
+                return False
+            self._idle += 1
+            return True
+
+    def release_idle(self):
+        with self._lock:
+            self._idle -= 1
+
+    def _process_request_worker(self, request, client_address):
+        with self._lock:
+            self._queued -= 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+
+class PooledRequestHandler:
+    """Mixin de BaseHTTPRequestHandler : keep-alive seulement si le serveur a un thread à y consacrer
+
+    Décidé à l'envoi des en-têtes : sinon la réponse porte `Connection: close` et le
+    client sait qu'il doit rouvrir une connexion. La place réservée couvre l'attente
+    et le traitement de la requête suivante, et se libère à la réponse suivante.
+    Le serveur séquentiel (sans `hold_idle`) ferme toujours la connexion.
+    """
+
+    _idle_held = False
+
+    def end_headers(self):
+        self._release_idle()
+        if not self.close_connection:
+            hold_idle = getattr(self.server, 'hold_idle', None)
+            if hold_idle is not None and hold_idle():
+                self._idle_held = True
+            else:
+                self.send_header('Connection', 'close')
+        super().end_headers()
+
+    def finish(self):
+        try:
+            super().finish()
+        finally:
+            self._release_idle()
+
+    def _release_idle(self):
+        if self._idle_held:
+            self._idle_held = False
+            self.server.release_idle()
+
+
+def make_server(port, handler_class, workers, max_idle=None):
+    """Serveur multi-thread avec `workers` threads, ou séquentiel (HTTPServer) si workers <= 0
+
+    `max_idle` : connexions keep-alive inactives gardées au plus (défaut workers // 2).
+    """
+    if workers and workers > 0:
+        return ThreadPoolHTTPServer(('', port), handler_class, workers=workers, max_idle=max_idle)
+    return HTTPServer(('', port), handler_class)
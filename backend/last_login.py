@@ -0,0 +1,108 @@
+import atexit
+import threading
+
+
+def last_login_query(user_ids):
+    """Un seul UPDATE pour toutes les connexions en attente (updated_at = date de dernière connexion)"""
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    return f"UPDATE users SET updated_at = NOW() WHERE id IN ({placeholders})", list(user_ids)
+
+
+class LastLoginWriter:
+    """Enregistrement différé et regroupé de la dernière connexion des utilisateurs
+
+    Le login ne fait plus d'UPDATE : il signale l'utilisateur avec `record` et un
+    thread écrit toutes les `interval` secondes un UPDATE par lot de `batch_size`
+    utilisateurs. Plusieurs connexions d'un même utilisateur entre deux passages
+    n'en font qu'une ; la date enregistrée est celle de l'écriture, donc en retard
+    d'au plus `interval` secondes.
+    """
+
+    def __init__(self, batch_size=1000, interval=1.0):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._recorded = 0
+        self._coalesced = 0
+        self._written = 0
+        self._batches = 0
+        self._errors = 0
+
+    def record(self, user_id):
+        with self._lock:
+            self._recorded += 1
+            if user_id in self._pending:
+                self._coalesced += 1
+                return
+            self._pending.add(user_id)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def take(self):
+        """Retirer de la file au plus `batch_size` utilisateurs"""
+        with self._lock:
+            batch = []
+            while self._pending and len(batch) < self.batch_size:
+                batch.append(self._pending.pop())
+            return batch
+
+    def restore(self, batch):
+        """Remettre en file un lot dont l'écriture a échoué"""
+        with self._lock:
+            self._pending.update(batch)
+            self._errors += 1
+
+    def written(self, batch):
+        with self._lock:
+            self._written += len(batch)
+            self._batches += 1
+
+    def flush(self, cursor_factory):
+        """Écrire toute la file ; retourne le nombre d'utilisateurs mis à jour"""
+        total = 0
+        while True:
+            batch = self.take()
+            if not batch:
+                return total
+            try:
+                with cursor_factory() as (connection, cursor):
+                    cursor.execute(*last_login_query(batch))
+                    connection.commit()
+            except Exception:
+                self.restore(batch)
+                raise
+            self.written(batch)
+            total += len(batch)
+
+    def start(self, cursor_factory):
+        """Démarrer le thread d'écriture (un par processus) ; la file est vidée à l'arrêt"""
+        self._thread = threading.Thread(target=self._run, args=(cursor_factory,), daemon=True)
+        self._thread.start()
+        atexit.register(self._flush_quietly, cursor_factory)
+
+    def _flush_quietly(self, cursor_factory):
+        try:
+            self.flush(cursor_factory)
+        except Exception as e:
+            print(f"Erreur d'enregistrement des dernières connexions: {e}")
+
+    def _run(self, cursor_factory):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._flush_quietly(cursor_factory)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'recorded': self._recorded,
+                'coalesced': self._coalesced,
+                'written': self._written,
+                'batches': self._batches,
+                'errors': self._errors,
+            }
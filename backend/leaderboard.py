@@ -0,0 +1,260 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sortedcontainers import SortedList
+
+WINDOWS = ('all', 'daily', 'weekly')
+
+
+def window_starts(now=None):
+    """Début (UTC, naïf) de la journée et de la semaine en cours"""
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_start = day_start - timedelta(days=day_start.weekday())
+    return day_start, week_start
+
+
+def utc_epoch(value):
+    """Secondes epoch d'un datetime UTC naïf, comparées en SQL via FROM_UNIXTIME"""
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+class RankedBoard:
+    """Classement trié par score décroissant : mise à jour en O(log n), lecture en O(log n + k)"""
+
+    def __init__(self):
+        self._keys = {}
+        self._sorted = SortedList()
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def set(self, challenge_id, score):
+        old = self._keys.get(challenge_id)
+        if old is not None:
+            if old[0] == -score:
+                return
+            self._sorted.remove(old)
+        key = (-score, challenge_id)
+        self._keys[challenge_id] = key
+        self._sorted.add(key)
+
+    def remove(self, challenge_id):
+        key = self._keys.pop(challenge_id, None)
+        if key is not None:
+            self._sorted.remove(key)
+
+    def clear(self):
+        self._keys.clear()
+        self._sorted.clear()
+
+    def rank(self, challenge_id):
+        """Rang (à partir de 0) d'un défi, ou None s'il n'est pas classé"""
+        key = self._keys.get(challenge_id)
+        return None if key is None else self._sorted.index(key)
+
+    def slice(self, start, stop):
+        start = max(start, 0)
+        return [(start + offset, cid, -neg_score)
+                for offset, (neg_score, cid) in enumerate(self._sorted.islice(start, stop))]
+
+
+class Leaderboard:
+    """Classements matérialisés (tout temps, jour, semaine) par pourcentage de profit des défis
+
+    Les écritures locales (add_trade, update_challenge) sont appliquées immédiatement ;
+    les écritures des autres workers sont rattrapées par `sync` à partir de
+    `challenges.updated_at`, sans jamais reparcourir toute la table.
+
+    `updated_at` est fixé à l'exécution de l'UPDATE, pas au commit : une transaction
+    plus longue que l'intervalle de synchronisation serait manquée. Chaque `sync`
+    relit donc les `overlap` dernières secondes (durée maximale d'une transaction) ;
+    le rechargement recopie l'état de la base et peut être rejoué sans effet de bord.
+    """
+
+    def __init__(self, sync_interval=2.0, overlap=30.0):
+        self.sync_interval = sync_interval
+        self.overlap = overlap
+        self._boards = {window: RankedBoard() for window in WINDOWS}
+        self._challenges = {}
+        self._user_challenges = {}
+        self._window_pnl = {'daily': {}, 'weekly': {}}
+        self._periods = window_starts()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._watermark = None
+        self._synced_at = None
+
+    def _roll_windows(self, now=None):
+        """Vider les classements journalier / hebdomadaire au changement de période"""
+        day_start, week_start = window_starts(now)
+        if day_start != self._periods[0]:
+            self._boards['daily'].clear()
+            self._window_pnl['daily'].clear()
+        if week_start != self._periods[1]:
+            self._boards['weekly'].clear()
+            self._window_pnl['weekly'].clear()
+        self._periods = (day_start, week_start)
+
+    def _score(self, challenge_id, window):
+        info = self._challenges[challenge_id]
+        initial = info['initial_balance'] or 1.0
+        if window == 'all':
+            profit = info['balance'] - info['initial_balance']
+        else:
+            profit = self._window_pnl[window].get(challenge_id, 0.0)
+        return profit, round(profit / initial * 100, 4)
+
+    def upsert_challenge(self, challenge_id, user_id, name, initial_balance, balance, status):
+        with self._lock:
+            self._challenges[challenge_id] = {
+                'user_id': user_id,
+                'name': name,
+                'initial_balance': float(initial_balance),
+                'balance': float(balance),
+                'status': status
+            }
+            self._user_challenges.setdefault(user_id, set()).add(challenge_id)
+            self._boards['all'].set(challenge_id, self._score(challenge_id, 'all')[1])
+
+    def set_window_pnl(self, challenge_id, daily_pnl, weekly_pnl):
+        with self._lock:
+            self._roll_windows()
+            for window, pnl in (('daily', daily_pnl), ('weekly', weekly_pnl)):
+                if pnl is None:
+                    self._window_pnl[window].pop(challenge_id, None)
+                    self._boards[window].remove(challenge_id)
+                else:
+                    self._window_pnl[window][challenge_id] = float(pnl)
+                    self._boards[window].set(challenge_id, self._score(challenge_id, window)[1])
+
+    def record_trade(self, challenge_id, pnl, balance, status):
+        """Appliquer un trade local sans requête supplémentaire"""
+        with self._lock:
+            info = self._challenges.get(challenge_id)
+            if info is None:
+                # Défi inconnu de ce worker : il sera chargé par la prochaine synchronisation
+                return
+            self._roll_windows()
+            info['balance'] = float(balance)
+            info['status'] = status
+            self._boards['all'].set(challenge_id, self._score(challenge_id, 'all')[1])
+            for window in ('daily', 'weekly'):
+                pnls = self._window_pnl[window]
+                pnls[challenge_id] = pnls.get(challenge_id, 0.0) + float(pnl)
+                self._boards[window].set(challenge_id, self._score(challenge_id, window)[1])
+
+    def remove_challenge(self, challenge_id):
+        with self._lock:
+            info = self._challenges.pop(challenge_id, None)
+            if info is not None:
+                self._user_challenges.get(info['user_id'], set()).discard(challenge_id)
+            for window in WINDOWS:
+                self._boards[window].remove(challenge_id)
+            for pnls in self._window_pnl.values():
+                pnls.pop(challenge_id, None)
+
+    def _entry(self, rank, challenge_id, window):
+        info = self._challenges[challenge_id]
+        profit, percentage = self._score(challenge_id, window)
+        return {
+            'rank': rank + 1,
+            'challengeId': challenge_id,
+            'userId': info['user_id'],
+            'name': info['name'],
+            'status': info['status'],
+            'profit': round(profit, 2),
+            'profitPercentage': percentage
+        }
+
+    def query(self, window='all', limit=10, user_id=None, around=5):
+        """Top N et, si `user_id` est fourni, le voisinage du meilleur défi de l'utilisateur"""
+        with self._lock:
+            self._roll_windows()
+            board = self._boards[window]
+            result = {
+                'window': window,
+                'total': len(board),
+                'entries': [self._entry(r, cid, window) for r, cid, _ in board.slice(0, limit)]
+            }
+            if user_id is not None:
+                ranks = [board.rank(cid) for cid in self._user_challenges.get(user_id, ())]
+                ranks = [r for r in ranks if r is not None]
+                if ranks:
+                    best = min(ranks)
+                    result['me'] = {
+                        'rank': best + 1,
+                        'entries': [self._entry(r, cid, window)
+                                    for r, cid, _ in board.slice(best - around, best + around + 1)]
+                    }
+                else:
+                    result['me'] = None
+            return result
+
+    def refresh(self, cursor, challenge_ids=None, since=None):
+        """Recharger depuis MySQL les défis donnés, modifiés depuis `since`, ou tous"""
+        query = """
+            SELECT c.id, c.user_id, u.name, c.initial_balance, c.current_balance, c.status
+            FROM challenges c JOIN users u ON u.id = c.user_id
+        """
+        params = []
+        if challenge_ids is not None:
+            if not challenge_ids:
+                return
+            query += f" WHERE c.id IN ({', '.join(['%s'] * len(challenge_ids))})"
+            params = list(challenge_ids)
+        elif since is not None:
+            query += " WHERE c.updated_at >= %s"
+            params = [since]
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        for challenge_id, user_id, name, initial_balance, balance, status in rows:
+            self.upsert_challenge(challenge_id, user_id, name, initial_balance, balance, status)
+        if challenge_ids is not None:
+            for challenge_id in set(challenge_ids) - {row[0] for row in rows}:
+                self.remove_challenge(challenge_id)
+
+        # PnL des fenêtres glissantes, seulement pour les défis rechargés. Les bornes sont calculées
+        # en UTC : FROM_UNIXTIME les convertit dans le fuseau de la session, celui de `timestamp`
+        day_start, week_start = (utc_epoch(start) for start in window_starts())
+        ids = [row[0] for row in rows]
+        for offset in range(0, len(ids), 1000):
+            chunk = ids[offset:offset + 1000]
+            cursor.execute(
+                f"""
+                SELECT challenge_id, COUNT(CASE WHEN timestamp >= FROM_UNIXTIME(%s) THEN 1 END),
+                       SUM(CASE WHEN timestamp >= FROM_UNIXTIME(%s) THEN pnl ELSE 0 END), SUM(pnl)
+                FROM trades
+                WHERE challenge_id IN ({', '.join(['%s'] * len(chunk))}) AND timestamp >= FROM_UNIXTIME(%s)
+                GROUP BY challenge_id
+                """,
+                [day_start, day_start] + chunk + [week_start]
+            )
+            traded = {}
+            for challenge_id, daily_count, daily_pnl, weekly_pnl in cursor.fetchall():
+                traded[challenge_id] = (daily_pnl if daily_count else None, weekly_pnl)
+            for challenge_id in chunk:
+                self.set_window_pnl(challenge_id, *traded.get(challenge_id, (None, None)))
+
+    def sync(self, cursor_factory, force=False):
+        """Rattraper les modifications faites par les autres workers, au plus toutes les `sync_interval` s"""
+        now = time.monotonic()
+        if not force and self._synced_at is not None and now - self._synced_at < self.sync_interval:
+            return
+        # Un seul thread synchronise ; les autres servent le classement courant
+        if not self._sync_lock.acquire(blocking=self._synced_at is None):
+            return
+        try:
+            with cursor_factory() as (connection, cursor):
+                cursor.execute("SELECT NOW()")
+                watermark = cursor.fetchone()[0]
+                since = self._watermark
+                if since is not None:
+                    # Transactions ouvertes avant le dernier passage et validées depuis
+                    since -= timedelta(seconds=self.overlap)
+                self.refresh(cursor, since=since)
+            self._watermark = watermark
+            self._synced_at = time.monotonic()
+        finally:
+            self._sync_lock.release()
@@ -0,0 +1,354 @@
+import hmac
+import importlib
+import ipaddress
+import math
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Résolutions des bougies (secondes) et nombre de bougies conservées pour chacune
+BAR_RESOLUTIONS = {'1s': 1, '1m': 60, '1h': 3600}
+BAR_CAPACITY = {'1s': 3600, '1m': 24 * 60, '1h': 90 * 24}
+
+# Prix de référence des actifs affichés par le frontend (services/marketDataService.ts)
+DEFAULT_PRICES = {
+    'AAPL': 189.45,
+    'TSLA': 248.5,
+    'BTC-USD': 65230.5,
+    'IAM': 92.5,
+    'ATW': 465.2,
+}
+
+
+class TickRing:
+    """Derniers ticks d'un symbole dans des tableaux NumPy circulaires de taille fixe"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, dtype=np.float64)
+        self.price = np.zeros(capacity, dtype=np.float64)
+        self.volume = np.zeros(capacity, dtype=np.float64)
+        self.count = 0
+        self._next = 0
+
+    def append(self, ts, price, volume):
+        i = self._next
+        self.ts[i] = ts
+        self.price[i] = price
+        self.volume[i] = volume
+        self._next = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def last(self):
+        """(ts, prix, volume) du dernier tick, ou None"""
+        if not self.count:
+            return None
+        i = self._next - 1
+        return float(self.ts[i]), float(self.price[i]), float(self.volume[i])
+
+    def _order(self):
+        # Indices du plus ancien au plus récent
+        return (np.arange(self.count) + (self._next - self.count)) % self.capacity
+
+    def since(self, start_ts, limit=None):
+        """Ticks (ts, prix, volume) de date >= start_ts, en ordre chronologique"""
+        order = self._order()
+        first = int(np.searchsorted(self.ts[order], start_ts, side='left'))
+        order = order[first:]
+        if limit is not None:
+            order = order[-limit:]
+        return self.ts[order], self.price[order], self.volume[order]
+
+
+class BarRing:
+    """Bougies OHLCV d'une résolution, agrégées au fil des ticks dans des tableaux circulaires"""
+
+    def __init__(self, resolution, capacity):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.start = np.zeros(capacity, dtype=np.int64)
+        self.open = np.zeros(capacity, dtype=np.float64)
+        self.high = np.zeros(capacity, dtype=np.float64)
+        self.low = np.zeros(capacity, dtype=np.float64)
+        self.close = np.zeros(capacity, dtype=np.float64)
+        self.volume = np.zeros(capacity, dtype=np.float64)
+        self.count = 0
+        self._next = 0
+        self._current = None
+
+    def update(self, ts, price, volume):
+        """Intégrer un tick ; les dates doivent être croissantes (voir SymbolBook.ingest)"""
+        start = int(ts // self.resolution) * self.resolution
+        if start == self._current:
+            i = self._next - 1
+            if price > self.high[i]:
+                self.high[i] = price
+            if price < self.low[i]:
+                self.low[i] = price
+            self.close[i] = price
+            self.volume[i] += volume
+            return
+        # Nouvelle bougie : écrase la plus ancienne si l'anneau est plein
+        i = self._next
+        self.start[i] = start
+        self.open[i] = self.high[i] = self.low[i] = self.close[i] = price
+        self.volume[i] = volume
+        self._next = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        self._current = start
+
+    def range(self, start=None, end=None, limit=None):
+        """Bougies dont le début est dans [start, end], en ordre chronologique"""
+        order = (np.arange(self.count) + (self._next - self.count)) % self.capacity
+        starts = self.start[order]
+        lo = 0 if start is None else int(np.searchsorted(starts, start, side='left'))
+        hi = len(order) if end is None else int(np.searchsorted(starts, end, side='right'))
+        order = order[lo:hi]
+        if limit is not None:
+            order = order[-limit:]
+        return [
+            {'time': t, 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v, 'value': c}
+            for t, o, h, l, c, v in zip(
+                self.start[order].tolist(), self.open[order].tolist(), self.high[order].tolist(),
+                self.low[order].tolist(), self.close[order].tolist(), self.volume[order].tolist()
+            )
+        ]
+
+    def first_open(self):
+        if not self.count:
+            return None
+        return float(self.open[(self._next - self.count) % self.capacity])
+
+
+class SymbolBook:
+    """Ticks et bougies d'un symbole, protégés par un verrou propre au symbole"""
+
+    def __init__(self, symbol, tick_capacity):
+        self.symbol = symbol
+        self.ticks = TickRing(tick_capacity)
+        self.bars = {name: BarRing(resolution, BAR_CAPACITY[name])
+                     for name, resolution in BAR_RESOLUTIONS.items()}
+        self.lock = threading.Lock()
+        # Numéro du dernier tick reçu (deux ticks peuvent avoir la même date)
+        self.seq = 0
+
+    def ingest(self, ts, price, volume):
+        with self.lock:
+            last = self.ticks.last()
+            # Un tick en retard est daté du dernier tick : les anneaux restent triés
+            if last is not None and ts < last[0]:
+                ts = last[0]
+            self.ticks.append(ts, price, volume)
+            self.seq += 1
+            for bars in self.bars.values():
+                bars.update(ts, price, volume)
+
+
+class MarketData:
+    """Cotations en mémoire : ticks récents, dernière cotation et bougies 1s/1m/1h par symbole
+
+    Chaque worker a la sienne, alimentée par un flux (voir make_feed). Lire une
+    cotation ne coûte qu'un verrou et quelques lectures de tableaux.
+    """
+
+    def __init__(self, tick_capacity=100000):
+        self.tick_capacity = tick_capacity
+        self._books = {}
+        self._lock = threading.Lock()
+        self._ticks = 0
+
+    def _book(self, symbol, create=False):
+        book = self._books.get(symbol)
+        if book is None and create:
+            with self._lock:
+                book = self._books.get(symbol)
+                if book is None:
+                    book = self._books[symbol] = SymbolBook(symbol, self.tick_capacity)
+        return book
+
+    def ingest(self, symbol, price, volume=0.0, ts=None):
+        """Enregistrer un tick (ts en secondes epoch, maintenant par défaut)"""
+        price = float(price)
+        if not math.isfinite(price) or price <= 0:
+            raise ValueError('price invalide')
+        self._book(symbol.upper(), create=True).ingest(
+            time.time() if ts is None else float(ts), price, float(volume or 0.0)
+        )
+        self._ticks += 1
+
+    def symbols(self):
+        return sorted(self._books)
+
+    def quote(self, symbol):
+        """Dernière cotation et variation depuis la plus ancienne bougie 1m conservée, ou None"""
+        book = self._book(symbol.upper())
+        if book is None:
+            return None
+        with book.lock:
+            last = book.ticks.last()
+            reference = book.bars['1m'].first_open()
+        if last is None:
+            return None
+        ts, price, _ = last
+        return {
+            'symbol': book.symbol,
+            'price': price,
+            'change': round((price / reference - 1) * 100, 2) if reference else 0.0,
+            'timestamp': datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+            'age': max(time.time() - ts, 0.0),
+        }
+
+    def last_tick(self, symbol):
+        """(ts, prix, volume, numéro) du dernier tick d'un symbole, ou None"""
+        book = self._book(symbol.upper())
+        if book is None:
+            return None
+        with book.lock:
+            last = book.ticks.last()
+            return None if last is None else last + (book.seq,)
+
+    def price(self, symbol, max_age=None):
+        """Dernier prix si le tick a moins de `max_age` secondes, sinon None"""
+        book = self._book(symbol.upper())
+        if book is None:
+            return None
+        with book.lock:
+            last = book.ticks.last()
+        if last is None or (max_age is not None and time.time() - last[0] > max_age):
+            return None
+        return last[1]
+
+    def bars(self, symbol, resolution, start=None, end=None, limit=None):
+        """Bougies d'un symbole ; None si le symbole est inconnu"""
+        if resolution not in BAR_RESOLUTIONS:
+            raise ValueError(f"resolution doit être l'une de: {', '.join(BAR_RESOLUTIONS)}")
+        book = self._book(symbol.upper())
+        if book is None:
+            return None
+        with book.lock:
+            return book.bars[resolution].range(start, end, limit)
+
+    def stats(self):
+        return {
+            'symbols': len(self._books),
+            'ticks': self._ticks,
+            'tick_capacity': self.tick_capacity,
+        }
+
+
+class SimulatedFeed:
+    """Flux local de ticks simulés autour de DEFAULT_PRICES, pour le développement et les tests
+
+    Le prix d'un symbole au pas k est une fonction déterministe de (symbole, k) :
+    tous les workers affichent les mêmes cotations sans se coordonner. Au démarrage,
+    `backfill` pas passés sont rejoués pour que les graphiques aient un historique.
+    """
+
+    def __init__(self, prices=None, interval=1.0, volatility=0.002, backfill=3600):
+        self.prices = dict(prices or DEFAULT_PRICES)
+        self.interval = interval
+        self.volatility = volatility
+        self.backfill = backfill
+        self._stop = threading.Event()
+        self._thread = None
+
+    def tick(self, symbol, step):
+        """(prix, volume) du symbole au pas `step`"""
+        rng = random.Random(f"{symbol}:{step}")
+        phase = (sum(symbol.encode('utf-8')) % 360) * math.pi / 180
+        # Oscillations lentes bornées (pas de dérive) plus un bruit par pas
+        offset = sum(
+            amplitude * self.volatility * math.sin(2 * math.pi * step / period + phase)
+            for amplitude, period in ((3, 60), (10, 900), (30, 14400))
+        )
+        offset += rng.gauss(0, self.volatility)
+        return round(self.prices[symbol] * math.exp(offset), 5), rng.randint(1, 100)
+
+    def start(self, market):
+        now = int(time.time() / self.interval)
+        for step in range(now - self.backfill, now):
+            for symbol in self.prices:
+                price, volume = self.tick(symbol, step)
+                market.ingest(symbol, price, volume, step * self.interval)
+        self._thread = threading.Thread(target=self._run, args=(market, now), daemon=True)
+        self._thread.start()
+
+    def _run(self, market, step):
+        while not self._stop.is_set():
+            for symbol in self.prices:
+                price, volume = self.tick(symbol, step)
+                market.ingest(symbol, price, volume, step * self.interval)
+            step += 1
+            self._stop.wait(max(step * self.interval - time.time(), 0))
+
+    def stop(self):
+        self._stop.set()
+
+
+# Flux connus par nom ; MARKET_FEED accepte aussi 'module:Classe' pour un flux externe
+FEEDS = {
+    'simulated': SimulatedFeed,
+}
+
+
+def make_feed(spec):
+    """Instancier le flux désigné par `spec`, ou None ('' / 'none' : ticks reçus par l'API seulement)
+
+    Un flux expose start(market), qui appelle market.ingest(...) pour chaque tick, et stop().
+    """
+    if not spec or spec == 'none':
+        return None
+    if spec in FEEDS:
+        return FEEDS[spec]()
+    module_name, _, class_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def parse_ticks(data, max_ticks=10000):
+    """Valider tout le corps de POST /api/market/ticks avant d'appliquer le moindre tick
+
+    Retourne [{symbol, price, volume, ts}] normalisés ; ValueError au premier tick invalide.
+    """
+    ticks = data if isinstance(data, list) else [data]
+    if len(ticks) > max_ticks:
+        raise ValueError(f"Au plus {max_ticks} ticks par requête")
+    parsed = []
+    for tick in ticks:
+        if not isinstance(tick, dict) or not isinstance(tick.get('symbol'), str) or not tick['symbol'].strip():
+            raise ValueError('Chaque tick doit avoir symbol et price')
+        symbol = tick['symbol'].strip().upper()
+        try:
+            price = float(tick.get('price'))
+            volume = float(tick.get('volume') or 0.0)
+            ts = None if tick.get('ts') is None else float(tick['ts'])
+        except (TypeError, ValueError):
+            raise ValueError(f"price, volume ou ts invalide pour {symbol}")
+        if not math.isfinite(price) or price <= 0 or not math.isfinite(volume) or volume < 0 \
+                or (ts is not None and not math.isfinite(ts)):
+            raise ValueError(f"price, volume ou ts invalide pour {symbol}")
+        parsed.append({'symbol': symbol, 'price': price, 'volume': volume, 'ts': ts})
+    return parsed
+
+
+def parse_networks(spec):
+    """'127.0.0.1,10.0.0.0/8,::1' -> réseaux autorisés"""
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in (spec or '').split(',') if item.strip()]
+
+
+def feed_allowed(secret, networks, token, remote_addr):
+    """Ticks acceptés seulement du flux interne : secret partagé et adresse autorisée
+
+    Sans secret configuré, l'ingestion par l'API est fermée.
+    """
+    if not secret or not token or not hmac.compare_digest(token.encode('utf-8'), secret.encode('utf-8')):
+        return False
+    try:
+        address = ipaddress.ip_address(remote_addr or '')
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
@@ -0,0 +1,171 @@
+import threading
+import time
+
+CHALLENGE_FIELDS = {
+    'initialBalance': 'initial_balance',
+    'currentBalance': 'current_balance',
+    'status': 'status',
+    'maxDailyLoss': 'max_daily_loss',
+    'maxTotalLoss': 'max_total_loss',
+    'profitTarget': 'profit_target'
+}
+
+
+def now_iso():
+    return time.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def _as_key(user_id):
+    """Normaliser un id reçu en JSON (entier ou chaîne numérique) en clé d'index"""
+    if isinstance(user_id, str) and user_id.isdigit():
+        return int(user_id)
+    return user_id
+
+
+class InMemoryRepository:
+    """Stockage en mémoire des utilisateurs, défis et trades avec index secondaires
+
+    Toutes les recherches des routes (email, id de défi, trades d'un utilisateur)
+    sont des accès dictionnaire en O(1) au lieu de parcours complets. Si `journal`
+    est défini, chaque mutation lui est transmise pour être journalisée.
+    Les serveurs multi-thread prennent `lock` autour de chaque lecture-modification.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.journal = None
+        self.users = {}
+        self.challenges = {}
+        self.trades = {}
+        self.next_id = 1
+        self._users_by_email = {}
+        self._challenges_by_id = {}
+        # Version des défis et des trades de chaque utilisateur, incrémentée à chaque mutation
+        self._versions = {}
+
+    def load(self, users, challenges, trades, next_id):
+        """Remplacer le contenu et reconstruire les index"""
+        self.users = {int(k): v for k, v in users.items()}
+        self.challenges = {int(k): v for k, v in challenges.items()}
+        self.trades = {}
+        for key, trade_list in trades.items():
+            self.trades.setdefault(_as_key(key), []).extend(trade_list)
+        self.next_id = next_id
+        self._users_by_email = {user['email']: user for user in self.users.values()}
+        self._challenges_by_id = {
+            challenge['id']: challenge
+            for user_challenges in self.challenges.values()
+            for challenge in user_challenges
+        }
+        self._versions = {}
+
+    def _record(self, op, **payload):
+        if self.journal is not None:
+            self.journal({'op': op, **payload})
+
+    def apply(self, record):
+        """Rejouer une mutation journalisée"""
+        op = record['op']
+        if op == 'add_user':
+            self.add_user(record['user'])
+            self.next_id = max(self.next_id, record['user']['id'] + 1)
+        elif op == 'add_challenge':
+            self.add_challenge(record['challenge'])
+        elif op == 'update_challenge':
+            self.update_challenge(record['id'], record['updates'], record['updated_at'])
+        elif op == 'add_trade':
+            self.add_trade(record['trade'])
+            self.next_id = max(self.next_id, record['trade']['id'] + 1)
+
+    def to_dict(self):
+        return {
+            'users': self.users,
+            'challenges': self.challenges,
+            'trades': self.trades,
+            'next_id': self.next_id
+        }
+
+    def _bump(self, kind, user_id):
+        key = (kind, _as_key(user_id))
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def version(self, kind, user_id):
+        """Version courante ('challenges' ou 'trades') d'un utilisateur, pour les ETags"""
+        return self._versions.get((kind, _as_key(user_id)), 0)
+
+    def allocate_id(self):
+        allocated = self.next_id
+        self.next_id += 1
+        return allocated
+
+    # Utilisateurs
+
+    def find_user_by_email(self, email):
+        return self._users_by_email.get(email)
+
+    def add_user(self, user):
+        previous = self.users.get(user['id'])
+        if previous is not None:
+            self._users_by_email.pop(previous['email'], None)
+        self.users[user['id']] = user
+        self._users_by_email[user['email']] = user
+        self._record('add_user', user=user)
+        return user
+
+    # Défis
+
+    def get_user_challenges(self, user_id):
+        return self.challenges.get(user_id, [])
+
+    def has_challenges(self, user_id):
+        return user_id in self.challenges
+
+    def find_challenge(self, challenge_id):
+        return self._challenges_by_id.get(challenge_id)
+
+    def add_challenge(self, challenge):
+        self.challenges.setdefault(challenge['user_id'], []).append(challenge)
+        self._challenges_by_id[challenge['id']] = challenge
+        self._bump('challenges', challenge['user_id'])
+        self._record('add_challenge', challenge=challenge)
+        return challenge
+
+    def create_default_challenge(self, user_id, timestamp=None):
+        """Créer le défi initial d'un utilisateur (10 000 de solde)"""
+        timestamp = timestamp or now_iso()
+        return self.add_challenge({
+            'id': user_id * 10 + 1,
+            'user_id': user_id,
+            'initial_balance': 10000,
+            'current_balance': 10000,
+            'status': 'active',
+            'max_daily_loss': 500,
+            'max_total_loss': 1000,
+            'profit_target': 1000,
+            'created_at': timestamp,
+            'updated_at': timestamp
+        })
+
+    def update_challenge(self, challenge_id, updates, updated_at=None):
+        """Appliquer les champs reçus du frontend ; retourne le défi ou None s'il est introuvable"""
+        challenge = self._challenges_by_id.get(challenge_id)
+        if challenge is None:
+            return None
+        updates = {key: value for key, value in updates.items() if key in CHALLENGE_FIELDS}
+        for key, value in updates.items():
+            challenge[CHALLENGE_FIELDS[key]] = value
+        challenge['updated_at'] = updated_at or now_iso()
+        self._bump('challenges', challenge['user_id'])
+        self._record('update_challenge', id=challenge_id, updates=updates, updated_at=challenge['updated_at'])
+        return challenge
+
+    # Trades
+
+    def get_user_trades(self, user_id):
+        return self.trades.get(_as_key(user_id), [])
+
+    def add_trade(self, trade):
+        self.trades.setdefault(_as_key(trade['user_id']), []).append(trade)
+        self._bump('trades', trade['user_id'])
+        self._record('add_trade', trade=trade)
+        return trade
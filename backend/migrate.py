@@ -0,0 +1,76 @@
+"""Appliquer les migrations du schéma et vérifier les plans des requêtes fréquentes
+
+Lancé automatiquement par le master gunicorn avant le démarrage des workers
+(gunicorn.conf.py) ; peut aussi être lancé à la main ou en intégration continue.
+
+Usage : python migrate.py [--status] [--check]
+  --status : versions appliquées
+  --check  : EXPLAIN des requêtes fréquentes ; code de sortie 1 si un plan régresse
+             (index attendu non utilisé, parcours complet ou filesort)
+"""
+import argparse
+import os
+import sys
+
+import mysql.connector
+from dotenv import load_dotenv
+
+from migrations import MIGRATIONS, applied_versions, check_query_plans, migrate
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'database': os.getenv('DB_NAME', 'examen'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', '123456')
+}
+
+
+def connect():
+    return mysql.connector.connect(**DB_CONFIG)
+
+
+def run_migrations():
+    """Amener la base à la dernière version ; retourne les versions appliquées"""
+    connection = connect()
+    try:
+        cursor = connection.cursor()
+        applied = migrate(connection, cursor, DB_CONFIG['database'])
+        cursor.close()
+        return applied
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--status', action='store_true')
+    parser.add_argument('--check', action='store_true')
+    args = parser.parse_args()
+
+    if not args.status:
+        applied = run_migrations()
+        print(f"{len(applied)} migration(s) appliquée(s)" if applied else "Schéma à jour")
+
+    connection = connect()
+    try:
+        cursor = connection.cursor()
+        if args.status:
+            applied = applied_versions(cursor) or set()
+            for version, name, _ in MIGRATIONS:
+                print(f"{version:>4} {'appliquée' if version in applied else 'en attente':<11} {name}")
+
+        failed = False
+        if args.check:
+            for name, status, detail in check_query_plans(cursor):
+                print(f"{status:<11} {name:<36} {detail}")
+                failed = failed or status == 'régression'
+        cursor.close()
+    finally:
+        connection.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,352 @@
+"""Migrations versionnées du schéma MySQL
+
+Chaque migration est appliquée une seule fois et enregistrée dans schema_migrations ;
+au démarrage, une base à jour ne coûte qu'une lecture de cette table. MySQL valide
+implicitement chaque ordre DDL : les migrations sont donc écrites pour pouvoir être
+rejouées sans effet (IF NOT EXISTS, colonnes et index créés seulement s'ils manquent)
+si un démarrage est interrompu au milieu de l'une d'elles.
+
+Un nouvel index ou une nouvelle table = une nouvelle entrée à la fin de MIGRATIONS,
+jamais la modification d'une migration déjà appliquée.
+"""
+from trade_query import TRADE_INDEXES, drop_indexes, ensure_indexes
+from challenge_rules import CHALLENGE_STATE_TABLE, CHALLENGE_DAILY_PNL_TABLE
+from positions import POSITIONS_TABLE, POSITION_LOTS_TABLE
+from sessions import SESSION_INDEXES
+from pubsub import LIVE_FEED_INDEXES
+from history_rollup import CHALLENGE_STATUS_INDEXES, HISTORY_INDEXES, HISTORY_UNIQUE_INDEXES
+
+SCHEMA_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+# Verrou consultatif : un seul processus (master gunicorn, autre instance) migre à la fois
+MIGRATION_LOCK_TIMEOUT = 60
+
+USERS_TABLE = """
+    CREATE TABLE IF NOT EXISTS users (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        email VARCHAR(255) UNIQUE NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        password_hash VARCHAR(255) NOT NULL,
+        role ENUM('user', 'admin', 'super_admin') DEFAULT 'user',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    );
+"""
+
+CHALLENGES_TABLE = """
+    CREATE TABLE IF NOT EXISTS challenges (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        initial_balance DECIMAL(15,2) NOT NULL,
+        current_balance DECIMAL(15,2) NOT NULL,
+        status ENUM('active', 'passed', 'failed') DEFAULT 'active',
+        max_daily_loss DECIMAL(15,2) NOT NULL,
+        max_total_loss DECIMAL(15,2) NOT NULL,
+        profit_target DECIMAL(15,2) NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    );
+"""
+
+TRADES_TABLE = """
+    CREATE TABLE IF NOT EXISTS trades (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        challenge_id INT NOT NULL,
+        symbol VARCHAR(20) NOT NULL,
+        type ENUM('BUY', 'SELL') NOT NULL,
+        price DECIMAL(15,5) NOT NULL,
+        quantity INT NOT NULL,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        pnl DECIMAL(15,2) DEFAULT 0.00,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+        FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE
+    );
+"""
+
+USER_SESSIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS user_sessions (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        session_token VARCHAR(255) UNIQUE NOT NULL,
+        expires_at TIMESTAMP NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    );
+"""
+
+CHALLENGE_HISTORY_TABLE = """
+    CREATE TABLE IF NOT EXISTS challenge_history (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        challenge_id INT NOT NULL,
+        initial_balance DECIMAL(15,2) NOT NULL,
+        final_balance DECIMAL(15,2) NOT NULL,
+        status ENUM('passed', 'failed') NOT NULL,
+        duration_days INT,
+        profit_amount DECIMAL(15,2),
+        profit_percentage DECIMAL(5,2),
+        completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+        FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE
+    );
+"""
+
+USER_PREFERENCES_TABLE = """
+    CREATE TABLE IF NOT EXISTS user_preferences (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        language VARCHAR(10) DEFAULT 'fr',
+        theme VARCHAR(20) DEFAULT 'dark',
+        notifications_enabled BOOLEAN DEFAULT TRUE,
+        risk_level ENUM('low', 'medium', 'high') DEFAULT 'medium',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    );
+"""
+
+USER_ACHIEVEMENTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS user_achievements (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        achievement_type VARCHAR(100) NOT NULL,
+        achievement_name VARCHAR(255) NOT NULL,
+        description TEXT,
+        earned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        progress_percentage INT DEFAULT 0,
+        is_completed BOOLEAN DEFAULT FALSE,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    );
+"""
+
+# Liste des défis d'un utilisateur (ORDER BY created_at DESC) sans filesort
+CHALLENGE_INDEXES = {
+    'idx_challenges_user_created': ('user_id', 'created_at'),
+}
+
+# Colonnes à ajouter (si absentes) ou à rendre facultatives (si présentes) pour amener une base
+# créée par create_tables.sql ou setup_database.bat au schéma de l'application
+LEGACY_COLUMNS = {
+    'users': {
+        'add': {
+            'name': "VARCHAR(255) NOT NULL DEFAULT ''",
+            'password_hash': "VARCHAR(255) NOT NULL DEFAULT ''",
+            'updated_at': "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP",
+        },
+        'relax': {
+            'username': 'VARCHAR(80) NULL',
+            'password': 'VARCHAR(200) NULL',
+        },
+    },
+    'challenges': {
+        'add': {
+            'max_daily_loss': 'DECIMAL(15,2) NULL',
+            'updated_at': "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP",
+        },
+        'relax': {
+            'name': 'VARCHAR(100) NULL',
+        },
+    },
+    'trades': {
+        'add': {
+            'pnl': 'DECIMAL(15,2) DEFAULT 0.00',
+        },
+        'relax': {},
+    },
+}
+
+# Statuts et rôles en majuscules (VARCHAR) convertis vers les ENUM en minuscules
+LEGACY_ENUMS = {
+    ('users', 'role'): "ENUM('user', 'admin', 'super_admin') DEFAULT 'user'",
+    ('challenges', 'status'): "ENUM('active', 'passed', 'failed') DEFAULT 'active'",
+}
+
+# Index des anciens scripts, redondants avec les index composites (même première colonne)
+LEGACY_INDEXES = {
+    'users': ('idx_user_email',),
+    'challenges': ('idx_challenge_user',),
+    'trades': ('idx_trade_user', 'idx_trade_challenge', 'idx_trade_timestamp', 'idx_trades_challenge_ts'),
+}
+
+
+def table_columns(cursor, database, table):
+    """{colonne: type de données} d'une table existante"""
+    cursor.execute(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = %s AND table_name = %s",
+        (database, table)
+    )
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+
+def create_tables(cursor, database):
+    for statement in (
+        USERS_TABLE, CHALLENGES_TABLE, TRADES_TABLE, CHALLENGE_STATE_TABLE, CHALLENGE_DAILY_PNL_TABLE,
+        POSITIONS_TABLE, POSITION_LOTS_TABLE, USER_SESSIONS_TABLE, CHALLENGE_HISTORY_TABLE,
+        USER_PREFERENCES_TABLE, USER_ACHIEVEMENTS_TABLE
+    ):
+        cursor.execute(statement)
+
+
+def converge_legacy_schema(cursor, database):
+    """Aligner les tables créées par les anciens scripts SQL (sans effet sur une base à jour)
+
+    La quantité des trades reste en DECIMAL si c'est son type : la passer en INT
+    tronquerait les quantités fractionnaires déjà enregistrées.
+    """
+    added = set()
+    for table, changes in LEGACY_COLUMNS.items():
+        columns = table_columns(cursor, database, table)
+        for column, definition in changes['add'].items():
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                added.add((table, column))
+        for column, definition in changes['relax'].items():
+            if column in columns:
+                cursor.execute(f"ALTER TABLE {table} MODIFY COLUMN {column} {definition}")
+                if (table, column) == ('users', 'username'):
+                    cursor.execute("UPDATE users SET name = username WHERE name = '' AND username IS NOT NULL")
+                if (table, column) == ('users', 'password'):
+                    # Seuls les hash bcrypt sont repris ; les autres comptes (mots de passe en clair
+                    # des données d'exemple) gardent un hash vide, refusé à la connexion (401)
+                    cursor.execute(
+                        "UPDATE users SET password_hash = password "
+                        "WHERE password_hash = '' AND password LIKE '$2_$__$%'"
+                    )
+
+    if ('challenges', 'max_daily_loss') in added:
+        # Défis sans limite journalière : la limite totale, seule appliquée jusque-là
+        cursor.execute("UPDATE challenges SET max_daily_loss = max_total_loss")
+        cursor.execute("ALTER TABLE challenges MODIFY COLUMN max_daily_loss DECIMAL(15,2) NOT NULL")
+
+    for (table, column), definition in LEGACY_ENUMS.items():
+        if table_columns(cursor, database, table).get(column) != 'enum':
+            cursor.execute(f"UPDATE {table} SET {column} = LOWER({column})")
+            cursor.execute(f"ALTER TABLE {table} MODIFY COLUMN {column} {definition}")
+
+
+def create_indexes(cursor, database):
+    """Index composites des requêtes fréquentes, puis retrait des index devenus redondants"""
+    ensure_indexes(cursor, database, 'trades', TRADE_INDEXES)
+    ensure_indexes(cursor, database, 'challenges', CHALLENGE_INDEXES)
+    ensure_indexes(cursor, database, 'challenges', LIVE_FEED_INDEXES)
+    ensure_indexes(cursor, database, 'challenges', CHALLENGE_STATUS_INDEXES)
+    ensure_indexes(cursor, database, 'user_sessions', SESSION_INDEXES)
+    ensure_indexes(cursor, database, 'challenge_history', HISTORY_UNIQUE_INDEXES, unique=True)
+    ensure_indexes(cursor, database, 'challenge_history', HISTORY_INDEXES)
+    for table, names in LEGACY_INDEXES.items():
+        drop_indexes(cursor, database, table, names)
+
+
+MIGRATIONS = [
+    (1, 'tables de base', create_tables),
+    (2, 'convergence des schémas de create_tables.sql et setup_database.bat', converge_legacy_schema),
+    (3, 'index composites des requêtes fréquentes', create_indexes),
+]
+
+
+def applied_versions(cursor):
+    cursor.execute("SHOW TABLES LIKE 'schema_migrations'")
+    if not cursor.fetchall():
+        return None
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(connection, cursor, database, migrations=MIGRATIONS):
+    """Appliquer dans l'ordre les migrations manquantes ; retourne les versions appliquées"""
+    applied = applied_versions(cursor)
+    if applied is not None and all(version in applied for version, _, _ in migrations):
+        return []
+
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (f'schema_migrations:{database}', MIGRATION_LOCK_TIMEOUT))
+    if cursor.fetchall()[0][0] != 1:
+        raise RuntimeError('Migrations en cours dans un autre processus')
+    try:
+        cursor.execute(SCHEMA_MIGRATIONS_TABLE)
+        # Relire sous le verrou : un autre processus a pu migrer entre-temps
+        applied = applied_versions(cursor) or set()
+        done = []
+        for version, name, apply in migrations:
+            if version in applied:
+                continue
+            apply(cursor, database)
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            connection.commit()
+            print(f"Migration {version} appliquée: {name}")
+            done.append(version)
+        return done
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (f'schema_migrations:{database}',))
+        cursor.fetchall()
+
+
+# Requêtes fréquentes et index attendus dans leur plan d'exécution (migrate.py --check)
+HOT_QUERIES = [
+    ('login', 'users', ('email',),
+     "SELECT id, email, name, password_hash, role, created_at, updated_at FROM users WHERE email = %s",
+     ('check@example.com',)),
+    ('défis d\'un utilisateur', 'challenges', ('idx_challenges_user_created',),
+     "SELECT id, status, current_balance, created_at FROM challenges WHERE user_id = %s ORDER BY created_at DESC",
+     (1,)),
+    ('historique des trades', 'trades', ('idx_trades_user_ts',),
+     "SELECT id, symbol, timestamp FROM trades WHERE user_id = %s ORDER BY timestamp DESC, id DESC LIMIT 101",
+     (1,)),
+    ('historique des trades par défi', 'trades', ('idx_trades_user_challenge_ts',),
+     "SELECT id, symbol, timestamp FROM trades WHERE user_id = %s AND challenge_id = %s "
+     "ORDER BY timestamp DESC, id DESC LIMIT 101",
+     (1, 1)),
+    ('historique des trades par symbole', 'trades', ('idx_trades_user_symbol_ts',),
+     "SELECT id, symbol, timestamp FROM trades WHERE user_id = %s AND symbol = %s "
+     "ORDER BY timestamp DESC, id DESC LIMIT 101",
+     (1, 'AAPL')),
+    ('version des trades', 'trades', ('idx_trades_user_ts', 'idx_trades_user_challenge_ts', 'idx_trades_user_symbol_ts'),
+     "SELECT COUNT(*), MAX(id) FROM trades WHERE user_id = %s",
+     (1,)),
+    ('analyses d\'un défi', 'trades', ('idx_trades_challenge_ts_pnl',),
+     "SELECT UNIX_TIMESTAMP(timestamp), pnl, symbol FROM trades WHERE challenge_id = %s ORDER BY timestamp, id",
+     (1,)),
+    ('historique des défis terminés', 'challenge_history', ('idx_challenge_history_user_completed',),
+     "SELECT challenge_id, final_balance FROM challenge_history WHERE user_id = %s ORDER BY completed_at DESC LIMIT 50",
+     (1,)),
+    ('session', 'user_sessions', ('session_token',),
+     "SELECT user_id FROM user_sessions WHERE session_token = %s AND expires_at > NOW()",
+     ('0' * 64,)),
+]
+
+# En dessous, l'optimiseur peut préférer un parcours complet à l'index : plan non vérifié
+MIN_CHECKED_ROWS = 1000
+
+
+def check_query_plans(cursor, queries=HOT_QUERIES, min_rows=MIN_CHECKED_ROWS):
+    """EXPLAIN de chaque requête fréquente : [(nom, statut, détail)], statut 'ok', 'ignoré' ou 'régression'
+
+    Régression : index attendu non utilisé, parcours complet de la table ou filesort.
+    """
+    results = []
+    for name, table, expected, sql, params in queries:
+        cursor.execute("EXPLAIN " + sql, params)
+        columns = [d[0] for d in cursor.description]
+        plan = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        step = next((row for row in plan if row.get('table') == table), None)
+        if step is None:
+            results.append((name, 'régression', f'{table} absente du plan'))
+            continue
+        key = step.get('key')
+        extra = step.get('Extra') or ''
+        detail = f"type={step.get('type')} key={key} rows={step.get('rows')} extra={extra}"
+        if key in expected and 'Using filesort' not in extra:
+            results.append((name, 'ok', detail))
+        elif (step.get('rows') or 0) < min_rows:
+            results.append((name, 'ignoré', detail))
+        else:
+            results.append((name, 'régression', detail))
+    return results
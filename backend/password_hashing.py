@@ -0,0 +1,126 @@
+import asyncio
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+_COST_PATTERN = re.compile(r'^\$2[abxy]?\$(\d{2})\$')
+
+
+class HasherBusy(Exception):
+    """Trop de hachages en attente : la requête doit être refusée (429)"""
+
+
+def _hashpw(password, rounds):
+    # Exécutées dans les processus du pool : fonctions de module pour être sérialisables
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _checkpw(password, hashed):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+def hash_cost(hashed):
+    """Facteur de coût d'un hash bcrypt ($2b$12$... -> 12), ou None s'il est illisible"""
+    match = _COST_PATTERN.match(hashed or '')
+    return int(match.group(1)) if match else None
+
+
+def default_workers(web_workers=1):
+    """Processus bcrypt par worker web : les cœurs de l'hôte partagés entre ses `web_workers` workers"""
+    return max(1, (os.cpu_count() or 1) // max(web_workers, 1))
+
+
+class PasswordHasher:
+    """Pool de processus dédié à bcrypt, borné en nombre de hachages en attente
+
+    bcrypt consomme plusieurs centaines de ms de CPU au coût par défaut : l'exécuter
+    dans des processus séparés libère les workers web (et le GIL). Au-delà de
+    `max_pending` hachages en cours ou en file, `HasherBusy` est levée immédiatement
+    au lieu de laisser la file grossir. Chaque worker web a son pool : sans `workers`,
+    il en prend sa part (cœurs / `web_workers`) pour ne pas surcharger l'hôte.
+    """
+
+    def __init__(self, workers=None, max_pending=None, rounds=12, timeout=30.0, web_workers=1):
+        self.workers = workers or default_workers(web_workers)
+        self.max_pending = max_pending or self.workers * 4
+        self.rounds = rounds
+        self.timeout = timeout
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pending = 0
+        self._rejected = 0
+        self._completed = 0
+
+    def _get_executor(self):
+        pid = os.getpid()
+        # Un pool hérité d'un fork (master gunicorn) n'est pas utilisable dans le worker
+        if self._executor is None or self._pid != pid:
+            with self._lock:
+                if self._executor is None or self._pid != pid:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    self._pid = pid
+        return self._executor
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+        self._slots.release()
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HasherBusy(f"{self.max_pending} hachages déjà en attente")
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def hash(self, password):
+        return self._submit(_hashpw, password, self.rounds).result(self.timeout)
+
+    def verify(self, password, hashed):
+        # Hash vide ou illisible (compte repris d'un ancien schéma) : identifiants invalides
+        if hash_cost(hashed) is None:
+            return False
+        return self._submit(_checkpw, password, hashed).result(self.timeout)
+
+    async def hash_async(self, password):
+        return await asyncio.wait_for(asyncio.wrap_future(self._submit(_hashpw, password, self.rounds)), self.timeout)
+
+    async def verify_async(self, password, hashed):
+        if hash_cost(hashed) is None:
+            return False
+        return await asyncio.wait_for(asyncio.wrap_future(self._submit(_checkpw, password, hashed)), self.timeout)
+
+    def needs_rehash(self, hashed):
+        """Le hash a-t-il été calculé avec un autre coût que le coût configuré ?"""
+        return hash_cost(hashed) != self.rounds
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'rounds': self.rounds,
+                'pending': self._pending,
+                'completed': self._completed,
+                'rejected': self._rejected,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,368 @@
+import threading
+from array import array
+from collections import OrderedDict
+from decimal import Decimal, ROUND_HALF_EVEN
+
+from challenge_rules import to_decimal
+
+# Prix stockés en entiers de 1e-5 (DECIMAL(15,5) de trades.price) : calculs de PnL exacts
+PRICE_SCALE = 100000
+PRICE_QUANTUM = Decimal('0.00001')
+PNL_QUANTUM = Decimal('0.01')
+
+# Position nette par (défi, symbole) ; seq repère les lots ouverts dans position_lots
+POSITIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS challenge_positions (
+        challenge_id INT NOT NULL,
+        symbol VARCHAR(20) NOT NULL,
+        quantity INT NOT NULL,
+        cost_basis DECIMAL(24,5) NOT NULL,
+        realized_pnl DECIMAL(20,5) NOT NULL DEFAULT 0,
+        head_seq BIGINT NOT NULL,
+        next_seq BIGINT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (challenge_id, symbol),
+        FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE
+    );
+"""
+
+# Lots ouverts, consommés du plus ancien (seq le plus petit) au plus récent
+POSITION_LOTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS position_lots (
+        challenge_id INT NOT NULL,
+        symbol VARCHAR(20) NOT NULL,
+        seq BIGINT NOT NULL,
+        quantity INT NOT NULL,
+        price DECIMAL(15,5) NOT NULL,
+        PRIMARY KEY (challenge_id, symbol, seq),
+        FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE
+    );
+"""
+
+
+def to_price_units(price):
+    return int(to_decimal(price).quantize(PRICE_QUANTUM, rounding=ROUND_HALF_EVEN) * PRICE_SCALE)
+
+
+def from_units(units, quantum=PRICE_QUANTUM):
+    return (Decimal(units) / PRICE_SCALE).quantize(quantum, rounding=ROUND_HALF_EVEN)
+
+
+class LotQueue:
+    """File FIFO de lots (quantité, prix en unités) dans deux tableaux compacts
+
+    Les lots consommés ne sont pas retirés un à un : `head` avance et la partie
+    morte n'est supprimée que lorsqu'elle dépasse la moitié des tableaux, soit
+    un coût amorti O(1) par lot.
+    """
+
+    __slots__ = ('quantities', 'prices', 'head', 'head_seq')
+
+    def __init__(self, head_seq=0):
+        self.quantities = array('q')
+        self.prices = array('q')
+        self.head = 0
+        self.head_seq = head_seq
+
+    def __len__(self):
+        return len(self.quantities) - self.head
+
+    @property
+    def next_seq(self):
+        return self.head_seq + len(self)
+
+    def push(self, quantity, price_units):
+        """Ajouter un lot et retourner son seq"""
+        self.quantities.append(quantity)
+        self.prices.append(price_units)
+        return self.next_seq - 1
+
+    def consume(self, quantity):
+        """Retirer `quantity` des plus anciens lots ; retourne leur coût total en unités"""
+        cost = 0
+        quantities, prices = self.quantities, self.prices
+        while quantity:
+            available = quantities[self.head]
+            taken = available if available <= quantity else quantity
+            cost += taken * prices[self.head]
+            quantity -= taken
+            if taken == available:
+                self.head += 1
+                self.head_seq += 1
+            else:
+                quantities[self.head] = available - taken
+        if self.head > 32 and self.head * 2 > len(quantities):
+            del quantities[:self.head]
+            del prices[:self.head]
+            self.head = 0
+        return cost
+
+    def head_lot(self):
+        """(seq, quantité restante) du plus ancien lot ouvert, ou None"""
+        if not len(self):
+            return None
+        return self.head_seq, self.quantities[self.head]
+
+
+class Position:
+    """Position nette d'un défi sur un symbole, appariement FIFO des achats et ventes
+
+    `quantity` est signée (positive : acheteur, négative : vendeur à découvert) ;
+    `cost` est le coût des lots ouverts en unités de prix. Chaque trade coûte O(1)
+    amorti. Les changements depuis le dernier enregistrement sont notés pour que
+    `position_statements` n'écrive que les lots ajoutés, consommés ou entamés.
+    """
+
+    __slots__ = ('challenge_id', 'symbol', 'quantity', 'cost', 'realized', 'lots',
+                 '_saved_head_seq', '_pushed', '_head_touched', 'dirty')
+
+    def __init__(self, challenge_id, symbol, quantity=0, cost=0, realized=0, head_seq=0):
+        self.challenge_id = challenge_id
+        self.symbol = symbol
+        self.quantity = quantity
+        self.cost = cost
+        self.realized = realized
+        self.lots = LotQueue(head_seq)
+        self._saved_head_seq = head_seq
+        self._pushed = []
+        self._head_touched = False
+        self.dirty = False
+
+    @classmethod
+    def from_row(cls, row):
+        """Position depuis (challenge_id, symbol, quantity, cost_basis, realized_pnl, head_seq, next_seq)"""
+        challenge_id, symbol, quantity, cost_basis, realized_pnl, head_seq, _ = row
+        return cls(challenge_id, symbol, quantity, to_price_units(cost_basis),
+                   to_price_units(realized_pnl), head_seq)
+
+    def version(self):
+        """(quantité, seq de tête, seq suivant) : égaux en base et en mémoire => mêmes lots ouverts"""
+        return self.quantity, self.lots.head_seq, self.lots.next_seq
+
+    def apply(self, trade_type, quantity, price):
+        """Appliquer un trade et retourner son PnL réalisé (Decimal arrondi au centime)"""
+        price_units = to_price_units(price)
+        sign = 1 if trade_type == 'BUY' else -1
+        realized = 0
+        if self.quantity * sign < 0:
+            # Le trade réduit (voire retourne) la position : appariement FIFO
+            matched = min(quantity, abs(self.quantity))
+            cost = self.lots.consume(matched)
+            self._head_touched = True
+            self.cost -= cost
+            realized = (matched * price_units - cost) * (1 if self.quantity > 0 else -1)
+            self.quantity += sign * matched
+            quantity -= matched
+        if quantity:
+            seq = self.lots.push(quantity, price_units)
+            self._pushed.append((seq, quantity, price_units))
+            self.cost += quantity * price_units
+            self.quantity += sign * quantity
+        self.realized += realized
+        self.dirty = True
+        return from_units(realized, PNL_QUANTUM)
+
+    def average_cost(self):
+        if not self.quantity:
+            return None
+        return from_units(self.cost // abs(self.quantity))
+
+    def unrealized(self, mark_price):
+        """PnL latent de la position au prix `mark_price`"""
+        if not self.quantity:
+            return Decimal('0.00')
+        value = abs(self.quantity) * to_price_units(mark_price)
+        return from_units((value - self.cost) * (1 if self.quantity > 0 else -1), PNL_QUANTUM)
+
+    def to_dict(self, mark_price=None, open_lots=None):
+        average_cost = self.average_cost()
+        return {
+            'symbol': self.symbol,
+            'quantity': self.quantity,
+            'side': 'LONG' if self.quantity > 0 else 'SHORT' if self.quantity < 0 else 'FLAT',
+            'averageCost': float(average_cost) if average_cost is not None else None,
+            'openLots': len(self.lots) if open_lots is None else open_lots,
+            'realizedPnl': float(from_units(self.realized, PNL_QUANTUM)),
+            'markPrice': mark_price,
+            'unrealizedPnl': float(self.unrealized(mark_price)) if mark_price is not None else None,
+        }
+
+    def _saved(self):
+        self._saved_head_seq = self.lots.head_seq
+        self._pushed = []
+        self._head_touched = False
+        self.dirty = False
+
+
+class PositionCache:
+    """Positions gardées en mémoire entre deux trades, revalidées par leur version en base
+
+    Un autre worker qui a modifié la position change sa version : elle est alors
+    relue depuis position_lots. `get` retire la position du cache : la requête
+    qui la modifie en est seule détentrice jusqu'à `positions_saved`, après le
+    commit (le verrou FOR UPDATE est déjà relâché à ce moment). Une transaction
+    annulée ne la remet pas : elle sera relue.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._loads = 0
+
+    def get(self, key, version):
+        with self._lock:
+            position = self._entries.pop(key, None)
+            if position is not None and position.version() == version:
+                self._hits += 1
+                return position
+            self._loads += 1
+            return None
+
+    def put(self, position):
+        with self._lock:
+            key = (position.challenge_id, position.symbol)
+            self._entries[key] = position
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self._hits, 'loads': self._loads}
+
+
+def _pairs_clause(pairs):
+    return ', '.join(['(%s, %s)'] * len(pairs)), [value for pair in pairs for value in pair]
+
+
+def positions_query(pairs):
+    """Lecture des positions (défi, symbole) demandées"""
+    placeholders, params = _pairs_clause(pairs)
+    return (
+        "SELECT challenge_id, symbol, quantity, cost_basis, realized_pnl, head_seq, next_seq "
+        f"FROM challenge_positions WHERE (challenge_id, symbol) IN ({placeholders})",
+        params
+    )
+
+
+def challenge_positions_query(challenge_id):
+    return (
+        "SELECT challenge_id, symbol, quantity, cost_basis, realized_pnl, head_seq, next_seq "
+        "FROM challenge_positions WHERE challenge_id = %s ORDER BY symbol",
+        (challenge_id,)
+    )
+
+
+def lots_query(pairs):
+    """Lecture des lots ouverts des positions à recharger, dans l'ordre FIFO"""
+    placeholders, params = _pairs_clause(pairs)
+    return (
+        "SELECT challenge_id, symbol, seq, quantity, price FROM position_lots "
+        f"WHERE (challenge_id, symbol) IN ({placeholders}) ORDER BY challenge_id, symbol, seq",
+        params
+    )
+
+
+def resolve_positions(pairs, rows, cache):
+    """Positions à partir des lignes challenge_positions et du cache
+
+    Retourne (positions par (défi, symbole), positions dont les lots sont à relire).
+    """
+    positions = {}
+    stale = {}
+    by_key = {(row[0], row[1]): row for row in rows}
+    for key in pairs:
+        row = by_key.get(key)
+        if row is None:
+            positions[key] = Position(*key)
+            continue
+        position = cache.get(key, (row[2], row[5], row[6]))
+        if position is None:
+            position = stale[key] = Position.from_row(row)
+        positions[key] = position
+    return positions, stale
+
+
+def attach_lots(stale, lot_rows):
+    """Remplir les files des positions relues avec leurs lots (lignes triées par seq)"""
+    for challenge_id, symbol, _, quantity, price in lot_rows:
+        position = stale.get((challenge_id, symbol))
+        if position is not None:
+            position.lots.quantities.append(quantity)
+            position.lots.prices.append(to_price_units(price))
+
+
+def load_positions(cursor, pairs, cache):
+    """Charger les positions (défi, symbole) ; seules celles absentes du cache relisent leurs lots"""
+    pairs = sorted(set(pairs))
+    if not pairs:
+        return {}
+    cursor.execute(*positions_query(pairs))
+    positions, stale = resolve_positions(pairs, cursor.fetchall(), cache)
+    if stale:
+        cursor.execute(*lots_query(sorted(stale)))
+        attach_lots(stale, cursor.fetchall())
+    return positions
+
+
+def position_statements(positions):
+    """Ordres (requête, lignes) pour executemany qui enregistrent les positions modifiées
+
+    Par position : lots ajoutés, suppression des lots entièrement consommés, quantité
+    restante du lot de tête entamé, puis la ligne de synthèse.
+    """
+    positions = [p for p in positions if p.dirty]
+    if not positions:
+        return []
+    inserts = [(p.challenge_id, p.symbol, seq, quantity, from_units(price))
+               for p in positions for seq, quantity, price in p._pushed]
+    deletes = [(p.challenge_id, p.symbol, p.lots.head_seq)
+               for p in positions if p.lots.head_seq != p._saved_head_seq]
+    heads = [(quantity, p.challenge_id, p.symbol, seq)
+             for p in positions if p._head_touched
+             for seq, quantity in [p.lots.head_lot() or (None, None)] if seq is not None]
+    statements = []
+    if inserts:
+        statements.append((
+            "INSERT INTO position_lots (challenge_id, symbol, seq, quantity, price) VALUES (%s, %s, %s, %s, %s)",
+            inserts
+        ))
+    if deletes:
+        statements.append((
+            "DELETE FROM position_lots WHERE challenge_id = %s AND symbol = %s AND seq < %s",
+            deletes
+        ))
+    if heads:
+        statements.append((
+            "UPDATE position_lots SET quantity = %s WHERE challenge_id = %s AND symbol = %s AND seq = %s",
+            heads
+        ))
+    statements.append((
+        """
+        INSERT INTO challenge_positions (challenge_id, symbol, quantity, cost_basis, realized_pnl,
+                                         head_seq, next_seq)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE quantity = VALUES(quantity), cost_basis = VALUES(cost_basis),
+                                realized_pnl = VALUES(realized_pnl), head_seq = VALUES(head_seq),
+                                next_seq = VALUES(next_seq)
+        """,
+        [(p.challenge_id, p.symbol, p.quantity, from_units(p.cost), from_units(p.realized),
+          p.lots.head_seq, p.lots.next_seq) for p in positions]
+    ))
+    return statements
+
+
+def save_positions(cursor, positions):
+    """Enregistrer les positions modifiées (l'appelant commit puis appelle `positions_saved`)"""
+    for query, params in position_statements(positions):
+        cursor.executemany(query, params)
+
+
+def positions_saved(positions, cache):
+    """Après le commit : marquer les positions modifiées comme enregistrées et les remettre en cache"""
+    for position in positions:
+        if position.dirty:
+            position._saved()
+        cache.put(position)
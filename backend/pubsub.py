@@ -0,0 +1,291 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from streaming import json_default
+
+# Index du suivi des soldes modifiés (LiveFeed.poll)
+LIVE_FEED_INDEXES = {
+    'idx_challenges_updated_at': ('updated_at',),
+}
+
+# Commentaire SSE envoyé aux abonnés inactifs pour garder la connexion (proxies, navigateurs)
+SSE_HEARTBEAT = b': ping\n\n'
+
+
+def sse_event(event_type, data, event_id=None):
+    """Encoder un événement Server-Sent Events"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append("data: " + json.dumps(data, default=json_default, separators=(',', ':')))
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+class Subscriber:
+    """File bornée d'un abonné, avec fusion des événements de même clé
+
+    Un événement avec une clé (ex. ('tick', 'AAPL')) remplace celui encore en
+    attente pour la même clé : un client lent reçoit le dernier prix, pas tout
+    l'historique. Si la file est pleine, l'événement le plus ancien est abandonné.
+    """
+
+    __slots__ = ('topics', 'maxsize', '_queue', '_ready', 'delivered', 'coalesced', 'dropped', 'closed')
+
+    def __init__(self, topics, maxsize=256):
+        self.topics = frozenset(topics)
+        self.maxsize = maxsize
+        self._queue = OrderedDict()
+        self._ready = asyncio.Event()
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.closed = False
+
+    def push(self, key, payload):
+        queue = self._queue
+        if key in queue:
+            queue[key] = payload
+            self.coalesced += 1
+        else:
+            if len(queue) >= self.maxsize:
+                queue.popitem(last=False)
+                self.dropped += 1
+            queue[key] = payload
+        self._ready.set()
+
+    async def next_batch(self, timeout=None):
+        """Attendre puis vider la file ; liste vide si `timeout` expire sans événement"""
+        if not self._queue:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        batch = list(self._queue.values())
+        self._queue.clear()
+        self.delivered += len(batch)
+        return batch
+
+
+class Broker:
+    """Diffusion en mémoire (boucle asyncio du worker) des événements vers les abonnés SSE
+
+    Chaque événement est sérialisé une seule fois puis déposé dans la file de chaque
+    abonné du sujet : la publication coûte O(abonnés) insertions de dictionnaire.
+    À appeler uniquement depuis la boucle d'événements.
+    """
+
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self._topics = {}
+        self._sequence = itertools.count(1)
+        self._published = 0
+
+    def subscribe(self, topics, maxsize=None):
+        subscriber = Subscriber(topics, maxsize or self.queue_size)
+        for topic in subscriber.topics:
+            self._topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscriber.closed = True
+        for topic in subscriber.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def publish(self, topic, event_type, data, key=None):
+        """Publier un événement ; `key` active la fusion pour les abonnés en retard"""
+        subscribers = self._topics.get(topic)
+        if not subscribers:
+            return 0
+        event_id = next(self._sequence)
+        payload = sse_event(event_type, data, event_id)
+        queue_key = (event_type, key) if key is not None else event_id
+        for subscriber in subscribers:
+            subscriber.push(queue_key, payload)
+        self._published += 1
+        return len(subscribers)
+
+    def has_topics(self, prefix):
+        return any(topic.startswith(prefix) for topic in self._topics)
+
+    def stats(self):
+        subscribers = {s for subs in self._topics.values() for s in subs}
+        return {
+            'topics': len(self._topics),
+            'subscribers': len(subscribers),
+            'published': self._published,
+            'delivered': sum(s.delivered for s in subscribers),
+            'coalesced': sum(s.coalesced for s in subscribers),
+            'dropped': sum(s.dropped for s in subscribers),
+        }
+
+
+def user_topic(user_id):
+    return f"user:{user_id}"
+
+
+# Sujet des abonnés à tous les symboles
+ALL_TICKS_TOPIC = 'ticks:*'
+
+
+def symbol_topic(symbol):
+    return f"ticks:{symbol}"
+
+
+class LiveFeed:
+    """Publie les nouveaux trades et les soldes modifiés en interrogeant la base
+
+    Une requête par intervalle et par worker, quel que soit le nombre de clients
+    abonnés, et les écritures faites par n'importe quel serveur (Flask, ASGI) sont
+    vues. Les trades sont suivis par id, les défis par updated_at (filigrane NOW()).
+
+    Un id d'auto-incrément ou un updated_at est attribué à l'exécution de l'ordre,
+    mais la ligne n'est visible qu'au commit : une transaction plus lente apparaît
+    sous le dernier id lu ou avant le filigrane. Les ids manquants sous le dernier
+    id lu sont donc relus pendant `overlap` secondes (ids perdus par un rollback :
+    abandonnés ensuite), et les défis sont relus sur `overlap` secondes avant le
+    filigrane, publiés seulement si leur version (updated_at, solde, statut) change.
+    """
+
+    TRADE_COLUMNS = "id, user_id, challenge_id, symbol, type, price, quantity, timestamp, pnl"
+    TRADES_QUERY = f"""
+        SELECT {TRADE_COLUMNS}
+        FROM trades
+        WHERE id > %s
+        ORDER BY id
+        LIMIT %s
+    """
+    CHALLENGES_QUERY = """
+        SELECT id, user_id, current_balance, status, updated_at
+        FROM challenges
+        WHERE updated_at >= %s
+    """
+    # Ids relus par requête ; au-delà de MAX_GAPS, les plus anciens trous sont abandonnés
+    GAP_BATCH = 1000
+    MAX_GAPS = 10000
+
+    def __init__(self, broker, batch_size=1000, overlap=30.0):
+        self.broker = broker
+        self.batch_size = batch_size
+        self.overlap = overlap
+        self._last_trade_id = None
+        self._watermark = None
+        # id manquant -> échéance (monotonic) de sa dernière relecture
+        self._gaps = OrderedDict()
+        # id du défi -> (updated_at, solde, statut) déjà publiés dans la fenêtre
+        self._versions = {}
+        self.late_trades = 0
+
+    def _reset(self):
+        self._last_trade_id = None
+        self._gaps.clear()
+        self._versions.clear()
+
+    def _publish_trade(self, trade):
+        self.broker.publish(user_topic(trade['user_id']), 'trade', trade)
+
+    def _note_gaps(self, first, last, now):
+        """Ids de `first` à `last` inclus pas encore visibles : à relire jusqu'à now + overlap"""
+        deadline = now + self.overlap
+        for trade_id in range(max(first, last - self.MAX_GAPS + 1), last + 1):
+            self._gaps[trade_id] = deadline
+        while len(self._gaps) > self.MAX_GAPS:
+            self._gaps.popitem(last=False)
+
+    async def _poll_gaps(self, cursor, now):
+        for trade_id in [trade_id for trade_id, deadline in self._gaps.items() if deadline < now]:
+            del self._gaps[trade_id]
+        published = 0
+        ids = list(self._gaps)
+        for offset in range(0, len(ids), self.GAP_BATCH):
+            chunk = ids[offset:offset + self.GAP_BATCH]
+            await cursor.execute(
+                f"SELECT {self.TRADE_COLUMNS} FROM trades WHERE id IN ({', '.join(['%s'] * len(chunk))}) ORDER BY id",
+                chunk
+            )
+            for trade in await cursor.fetchall():
+                del self._gaps[trade['id']]
+                self._publish_trade(trade)
+                self.late_trades += 1
+                published += 1
+        return published
+
+    async def poll(self, cursor, now=None):
+        """Publier les changements depuis le dernier appel ; retourne le nombre d'événements"""
+        if not self.broker.has_topics('user:'):
+            # Personne n'écoute : repartir de maintenant au prochain abonné
+            self._reset()
+            return 0
+
+        now = time.monotonic() if now is None else now
+        await cursor.execute("SELECT COALESCE(MAX(id), 0) AS last_id, NOW() AS now FROM trades")
+        head = await cursor.fetchone()
+        if self._last_trade_id is None:
+            self._last_trade_id = head['last_id']
+            self._watermark = head['now']
+            return 0
+
+        published = await self._poll_gaps(cursor, now) if self._gaps else 0
+        if head['last_id'] > self._last_trade_id:
+            await cursor.execute(self.TRADES_QUERY, (self._last_trade_id, self.batch_size))
+            for trade in await cursor.fetchall():
+                if trade['id'] > self._last_trade_id + 1:
+                    self._note_gaps(self._last_trade_id + 1, trade['id'] - 1, now)
+                self._publish_trade(trade)
+                self._last_trade_id = trade['id']
+                published += 1
+
+        since = self._watermark - timedelta(seconds=self.overlap)
+        await cursor.execute(self.CHALLENGES_QUERY, (since,))
+        for challenge in await cursor.fetchall():
+            version = (challenge['updated_at'], challenge['current_balance'], challenge['status'])
+            if self._versions.get(challenge['id']) == version:
+                continue
+            self._versions[challenge['id']] = version
+            # Seul le dernier solde compte pour un client en retard
+            self.broker.publish(user_topic(challenge['user_id']), 'challenge', challenge, key=challenge['id'])
+            published += 1
+        self._watermark = head['now']
+        # Versions sorties de la fenêtre : ces lignes ne seront plus relues
+        floor = self._watermark - timedelta(seconds=self.overlap)
+        for challenge_id in [cid for cid, version in self._versions.items() if version[0] < floor]:
+            del self._versions[challenge_id]
+        return published
+
+
+class TickPublisher:
+    """Publie aux abonnés SSE les derniers ticks de la MarketData du worker
+
+    Le flux (MARKET_FEED) alimente MarketData depuis son thread ; la boucle
+    d'événements relève ici le dernier tick de chaque symbole, publié s'il n'a
+    pas encore été vu (clé = symbole : fusion pour les clients lents).
+    """
+
+    def __init__(self, broker, market):
+        self.broker = broker
+        self.market = market
+        self._published = {}
+
+    def poll(self):
+        """Publier les nouveaux ticks ; retourne le nombre de livraisons"""
+        if not self.broker.has_topics('ticks:'):
+            return 0
+        delivered = 0
+        for symbol in self.market.symbols():
+            last = self.market.last_tick(symbol)
+            if last is None or self._published.get(symbol) == last[3]:
+                continue
+            self._published[symbol] = last[3]
+            tick = {'symbol': symbol, 'price': last[1], 'volume': last[2], 'ts': last[0]}
+            delivered += self.broker.publish(symbol_topic(symbol), 'tick', tick, key=symbol)
+            delivered += self.broker.publish(ALL_TICKS_TOPIC, 'tick', tick, key=symbol)
+        return delivered
@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CachedBody:
+    """Corps JSON déjà sérialisé et son ETag de version"""
+
+    __slots__ = ('etag', 'body')
+
+    def __init__(self, etag, body):
+        self.etag = etag
+        self.body = body
+
+
+class LRUCache:
+    """Cache en mémoire du processus, borné en nombre d'entrées, avec TTL
+
+    Chaque worker a le sien : une invalidation n'est vue que localement, les
+    autres workers se rattrapent au plus `ttl` secondes plus tard.
+
+    Pour ne pas remettre en cache un résultat lu avant une écriture concurrente,
+    l'appelant prend `generation(key)` avant sa requête et la passe à `set` : la valeur
+    est ignorée si une invalidation a eu lieu entre-temps dans ce processus.
+    """
+
+    def __init__(self, max_entries=10000, ttl=10.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def generation(self, key=None):
+        return self._invalidations
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._invalidations:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        if not keys:
+            return
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            self._invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'lru',
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'invalidations': self._invalidations,
+            }
+
+
+# Écrire la valeur (KEYS[2]) seulement si la génération (KEYS[1]) vaut encore ARGV[1]
+SET_IF_GENERATION = """
+local current = redis.call('GET', KEYS[1]) or '0'
+if current ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+# Durée de vie d'un compteur de génération, bien plus longue qu'une requête : s'il expire
+# entre `generation` et `set`, le compteur relu (0) diffère et l'écriture est ignorée
+GENERATION_TTL = 86400
+
+
+class RedisCache:
+    """Cache partagé par tous les workers dans un serveur compatible Redis
+
+    Les invalidations sont vues immédiatement par tous les workers. L'ETag et le
+    corps sont stockés dans une seule valeur : `etag` + '\\n' + corps.
+
+    Chaque clé a un compteur de génération partagé (`gen:<clé>`), incrémenté par
+    `delete` dans la même transaction que la suppression. `set` n'écrit (script Lua,
+    atomique) que si le compteur n'a pas bougé depuis `generation(key)` : un résultat
+    lu avant l'invalidation d'un autre worker n'est jamais remis en cache.
+    """
+
+    def __init__(self, url, ttl=300.0, prefix='tradesense:'):
+        import redis
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._set_if_generation = self._client.register_script(SET_IF_GENERATION)
+        self._lock = threading.Lock()
+        self._invalidations = 0
+        self._hits = 0
+        self._misses = 0
+        self._errors = 0
+
+    def _generation_key(self, key):
+        return self.prefix + 'gen:' + key
+
+    def generation(self, key=None):
+        if key is None:
+            return None
+        try:
+            return int(self._client.get(self._generation_key(key)) or 0)
+        except Exception as e:
+            self._errors += 1
+            print(f"Erreur de lecture du cache Redis: {e}")
+            # Jamais égale au compteur : le résultat ne sera pas mis en cache
+            return -1
+
+    def get(self, key):
+        try:
+            raw = self._client.get(self.prefix + key)
+        except Exception as e:
+            # Redis indisponible : se comporter comme un cache vide plutôt qu'échouer
+            self._errors += 1
+            print(f"Erreur de lecture du cache Redis: {e}")
+            return None
+        if raw is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        etag, _, body = raw.partition(b'\n')
+        return CachedBody(etag.decode('ascii'), body)
+
+    def set(self, key, value, generation=None):
+        raw = value.etag.encode('ascii') + b'\n' + value.body
+        try:
+            if generation is None:
+                self._client.set(self.prefix + key, raw, ex=max(int(self.ttl), 1))
+            else:
+                self._set_if_generation(keys=[self._generation_key(key), self.prefix + key],
+                                        args=[generation, raw, max(int(self.ttl), 1)])
+        except Exception as e:
+            self._errors += 1
+            print(f"Erreur d'écriture du cache Redis: {e}")
+
+    def delete(self, *keys):
+        if not keys:
+            return
+        with self._lock:
+            self._invalidations += 1
+        try:
+            pipeline = self._client.pipeline(transaction=True)
+            for key in keys:
+                pipeline.incr(self._generation_key(key))
+                pipeline.expire(self._generation_key(key), GENERATION_TTL)
+            pipeline.delete(*[self.prefix + key for key in keys])
+            pipeline.execute()
+        except Exception as e:
+            # Sans invalidation, l'entrée expirera au bout de `ttl`
+            self._errors += 1
+            print(f"Erreur d'invalidation du cache Redis: {e}")
+
+    def stats(self):
+        return {
+            'backend': 'redis',
+            'ttl': self.ttl,
+            'hits': self._hits,
+            'misses': self._misses,
+            'invalidations': self._invalidations,
+            'errors': self._errors,
+        }
+
+
+def make_cache(url=None, max_entries=10000, ttl=10.0):
+    """Cache Redis si `url` (redis://...) est fourni et le paquet redis installé, sinon LRU local"""
+    if url:
+        try:
+            return RedisCache(url, ttl=ttl)
+        except ImportError:
+            print("Paquet redis non installé : cache en mémoire utilisé")
+    return LRUCache(max_entries=max_entries, ttl=ttl)
+
+
+def user_challenges_key(user_id):
+    return f"challenges:{user_id}"
@@ -0,0 +1,236 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+# Résultat de SessionCache.get quand le jeton n'est pas en cache
+MISS = object()
+
+# Index pour le balayage des sessions expirées
+SESSION_INDEXES = {
+    'idx_user_sessions_expires': ('expires_at',),
+}
+
+
+ISSUE_QUERY = (
+    "INSERT INTO user_sessions (user_id, session_token, expires_at) "
+    "VALUES (%s, %s, NOW() + INTERVAL %s SECOND)"
+)
+VALIDATE_QUERY = (
+    "SELECT user_id, TIMESTAMPDIFF(SECOND, NOW(), expires_at) FROM user_sessions "
+    "WHERE session_token = %s AND expires_at > NOW()"
+)
+REVOKE_QUERY = "DELETE FROM user_sessions WHERE session_token = %s"
+SWEEP_QUERY = "DELETE FROM user_sessions WHERE expires_at <= NOW() LIMIT %s"
+
+
+def hash_token(token):
+    """Seul le SHA-256 du jeton est stocké : une fuite de la table ne donne aucune session"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class SessionCache:
+    """Cache LRU + TTL des jetons de session, devant la table user_sessions
+
+    Les jetons valides restent au plus `ttl` secondes (et jamais au-delà de leur
+    expiration) ; les jetons inconnus ou expirés sont mémorisés `negative_ttl`
+    secondes dans un LRU séparé, pour qu'un flot de jetons invalides ne chasse
+    pas les sessions actives ni ne frappe la base à chaque requête.
+    """
+
+    def __init__(self, max_entries=10000, ttl=300.0, max_negative=10000, negative_ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_negative = max_negative
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._negative = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+
+    def get(self, token_hash, now=None):
+        """user_id en cache, None si le jeton est connu invalide, MISS sinon"""
+        now = now or time.time()
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is not None:
+                user_id, valid_until = entry
+                if valid_until > now:
+                    self._entries.move_to_end(token_hash)
+                    self._hits += 1
+                    return user_id
+                del self._entries[token_hash]
+            valid_until = self._negative.get(token_hash)
+            if valid_until is not None:
+                if valid_until > now:
+                    self._negative_hits += 1
+                    return None
+                del self._negative[token_hash]
+            self._misses += 1
+            return MISS
+
+    def put(self, token_hash, user_id, expires_in, now=None):
+        now = now or time.time()
+        with self._lock:
+            self._negative.pop(token_hash, None)
+            self._entries[token_hash] = (user_id, now + min(expires_in, self.ttl))
+            self._entries.move_to_end(token_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put_negative(self, token_hash, now=None):
+        now = now or time.time()
+        with self._lock:
+            self._entries.pop(token_hash, None)
+            self._negative[token_hash] = now + self.negative_ttl
+            self._negative.move_to_end(token_hash)
+            while len(self._negative) > self.max_negative:
+                self._negative.popitem(last=False)
+
+    def purge_expired(self, now=None):
+        """Retirer en une passe toutes les entrées expirées ; retourne leur nombre"""
+        now = now or time.time()
+        with self._lock:
+            expired = [key for key, (_, valid_until) in self._entries.items() if valid_until <= now]
+            for key in expired:
+                del self._entries[key]
+            expired_negative = [key for key, valid_until in self._negative.items() if valid_until <= now]
+            for key in expired_negative:
+                del self._negative[key]
+            return len(expired) + len(expired_negative)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'negative_entries': len(self._negative),
+                'hits': self._hits,
+                'negative_hits': self._negative_hits,
+                'misses': self._misses,
+            }
+
+
+class SessionStore:
+    """Émission, validation et révocation des jetons de session (table user_sessions)
+
+    Une requête authentifiée coûte une recherche dans le cache ; la base n'est lue
+    qu'au premier passage d'un jeton dans ce worker. Une révocation faite par un
+    autre worker y est visible au plus `cache.ttl` secondes plus tard. Les méthodes
+    préfixées par `a` sont les variantes asynchrones (curseurs aiomysql).
+    """
+
+    def __init__(self, cache, session_ttl=7 * 24 * 3600, sweep_interval=300.0, sweep_batch=1000):
+        self.cache = cache
+        self.session_ttl = session_ttl
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        self._sweep_lock = threading.Lock()
+        self._swept_at = time.monotonic()
+
+    def _new_session(self, user_id):
+        """(jeton en clair, paramètres de ISSUE_QUERY)"""
+        token = secrets.token_urlsafe(32)
+        token_hash = hash_token(token)
+        self.cache.put(token_hash, user_id, self.session_ttl)
+        return token, (user_id, token_hash, self.session_ttl)
+
+    def _remember(self, token_hash, row):
+        if row is None:
+            self.cache.put_negative(token_hash)
+            return None
+        self.cache.put(token_hash, row[0], row[1])
+        return row[0]
+
+    def issue(self, cursor, user_id):
+        """Créer une session et retourner le jeton en clair (l'appelant commit)"""
+        token, params = self._new_session(user_id)
+        cursor.execute(ISSUE_QUERY, params)
+        return token
+
+    async def aissue(self, cursor, user_id):
+        token, params = self._new_session(user_id)
+        await cursor.execute(ISSUE_QUERY, params)
+        return token
+
+    def validate(self, token, cursor_factory):
+        """user_id propriétaire du jeton, ou None s'il est inconnu ou expiré"""
+        token_hash = hash_token(token)
+        user_id = self.cache.get(token_hash)
+        if user_id is not MISS:
+            return user_id
+
+        with cursor_factory() as (connection, cursor):
+            cursor.execute(VALIDATE_QUERY, (token_hash,))
+            row = cursor.fetchone()
+        return self._remember(token_hash, row)
+
+    async def avalidate(self, token, cursor_factory):
+        token_hash = hash_token(token)
+        user_id = self.cache.get(token_hash)
+        if user_id is not MISS:
+            return user_id
+
+        async with cursor_factory() as (connection, cursor):
+            await cursor.execute(VALIDATE_QUERY, (token_hash,))
+            row = await cursor.fetchone()
+        return self._remember(token_hash, row)
+
+    def revoke(self, cursor, token):
+        """Supprimer une session (l'appelant commit) ; retourne True si elle existait"""
+        token_hash = hash_token(token)
+        cursor.execute(REVOKE_QUERY, (token_hash,))
+        self.cache.put_negative(token_hash)
+        return cursor.rowcount > 0
+
+    async def arevoke(self, cursor, token):
+        token_hash = hash_token(token)
+        await cursor.execute(REVOKE_QUERY, (token_hash,))
+        self.cache.put_negative(token_hash)
+        return cursor.rowcount > 0
+
+    def _sweep_due(self):
+        """Vrai si c'est l'heure de balayer et que ce thread a pris le verrou (à relâcher)"""
+        if time.monotonic() - self._swept_at < self.sweep_interval:
+            return False
+        # Un seul thread balaie ; les autres continuent sans attendre
+        if not self._sweep_lock.acquire(blocking=False):
+            return False
+        self._swept_at = time.monotonic()
+        self.cache.purge_expired()
+        return True
+
+    def maybe_sweep(self, cursor_factory):
+        """Supprimer par paquets les sessions expirées, au plus toutes les `sweep_interval` s"""
+        if not self._sweep_due():
+            return 0
+        try:
+            deleted = 0
+            with cursor_factory() as (connection, cursor):
+                while True:
+                    cursor.execute(SWEEP_QUERY, (self.sweep_batch,))
+                    connection.commit()
+                    deleted += cursor.rowcount
+                    if cursor.rowcount < self.sweep_batch:
+                        break
+            return deleted
+        finally:
+            self._sweep_lock.release()
+
+    async def amaybe_sweep(self, cursor_factory):
+        if not self._sweep_due():
+            return 0
+        try:
+            deleted = 0
+            async with cursor_factory() as (connection, cursor):
+                while True:
+                    await cursor.execute(SWEEP_QUERY, (self.sweep_batch,))
+                    await connection.commit()
+                    deleted += cursor.rowcount
+                    if cursor.rowcount < self.sweep_batch:
+                        break
+            return deleted
+        finally:
+            self._sweep_lock.release()
@@ -29,56 +29,13 @@ if %errorlevel% neq 0 (
 echo Database 'examen' created successfully!
 
 echo Creating tables...
-mysql -h localhost -u root -p123456 examen -e "
-CREATE TABLE IF NOT EXISTS users (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    username VARCHAR(80) UNIQUE NOT NULL,
-    email VARCHAR(120) UNIQUE NOT NULL,
-    password VARCHAR(200) NOT NULL,
-    role VARCHAR(20) DEFAULT 'USER',
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
-CREATE TABLE IF NOT EXISTS challenges (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    name VARCHAR(100) NOT NULL,
-    user_id INT NOT NULL,
-    initial_balance DECIMAL(15, 2) NOT NULL,
-    current_balance DECIMAL(15, 2) NOT NULL,
-    profit_target DECIMAL(15, 2) NOT NULL,
-    max_total_loss DECIMAL(15, 2) NOT NULL,
-    status VARCHAR(20) DEFAULT 'ACTIVE',
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
-CREATE TABLE IF NOT EXISTS trades (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    user_id INT NOT NULL,
-    challenge_id INT NOT NULL,
-    symbol VARCHAR(20) NOT NULL,
-    type ENUM('BUY', 'SELL') NOT NULL,
-    price DECIMAL(15, 6) NOT NULL,
-    quantity DECIMAL(15, 6) NOT NULL,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
-CREATE INDEX IF NOT EXISTS idx_user_email ON users(email);
-CREATE INDEX IF NOT EXISTS idx_challenge_user ON challenges(user_id);
-CREATE INDEX IF NOT EXISTS idx_trade_user ON trades(user_id);
-CREATE INDEX IF NOT EXISTS idx_trade_challenge ON trades(challenge_id);
-
-INSERT IGNORE INTO users (username, email, password, role) VALUES 
-('admin_user', 'admin@example.com', 'password123', 'ADMIN'),
-('super_admin_user', 'superadmin@example.com', 'password123', 'SUPER_ADMIN'),
-('john_doe', 'john@example.com', 'password123', 'USER');
-"
+python migrate.py
 
 if %errorlevel% equ 0 (
     echo.
     echo Database setup completed successfully!
     echo Database: examen
-    echo Tables created: users, challenges, trades
-    echo Sample data inserted for testing
+    echo Tables and indexes created by the schema migrations, see: python migrate.py --status
     echo.
     echo You can now see these tables in MySQL Workbench under the 'examen' database.
 ) else (
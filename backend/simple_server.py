@@ -4,10 +4,26 @@ from mysql.connector import Error
 from datetime import datetime
 import hashlib
 import os
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler
 import cgi
 
+from trade_batch import (
+    parse_trade_batch, validate_trade, validate_trade_batch,
+    insert_trade_rows, build_batch_response
+)
+from challenge_rules import (
+    lock_challenge_states, apply_trades, save_challenge_states, reset_challenge_state,
+    trade_days, load_daily_pnl
+)
+from trade_query import TradeHistoryQuery
+from trade_archive import TradeArchive
+from migrations import migrate
+from streaming import NDJSON_MIMETYPE, encode_rows, iter_batches, json_default, stream_format, write_chunks
+from http_serving import PooledRequestHandler, make_server
+from http_routing import RoutedRequestHandler, Router
+from positions import PositionCache, load_positions, positions_saved, save_positions
+from http_conditional import compress_body, etag_matches, quote_etag, version_etag
+
 # Configuration de la base de données
 DB_CONFIG = {
     'host': 'localhost',
@@ -16,6 +32,31 @@ DB_CONFIG = {
     'password': '123456'
 }
 
+# Serveur HTTP : threads de traitement (0 = séquentiel) et délai keep-alive
+HTTP_WORKERS = int(os.environ.get('HTTP_WORKERS', 16))
+KEEP_ALIVE_TIMEOUT = 5
+# Connexions keep-alive inactives gardées au plus (chacune occupe un thread) ; défaut HTTP_WORKERS // 2
+HTTP_MAX_IDLE = int(os.environ['HTTP_MAX_IDLE']) if os.environ.get('HTTP_MAX_IDLE') else None
+
+# Ingestion de trades par lots
+TRADE_BATCH_CHUNK_SIZE = 500
+TRADE_BATCH_MAX_ITEMS = 10000
+
+# PnL des trades calculé par appariement FIFO des lots ('client' : PnL envoyé par le client)
+TRADE_PNL_SOURCE = os.environ.get('TRADE_PNL_SOURCE', 'server').lower()
+position_cache = PositionCache()
+
+# Trades des défis terminés archivés en fichiers colonnes (python archive_trades.py)
+trade_archive = TradeArchive(os.environ.get(
+    'TRADE_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive', 'trades')
+))
+
+def load_trade_positions(cursor, rows):
+    """Positions touchées par les trades (index, ligne), à lire après le verrou des défis"""
+    if TRADE_PNL_SOURCE != 'server':
+        return None
+    return load_positions(cursor, [(row[1], row[2]) for _, row in rows], position_cache)
+
 def get_db_connection():
     """Obtenir une connexion à la base de données"""
     try:
@@ -26,7 +67,7 @@ def get_db_connection():
         return None
 
 def initialize_tables():
-    """Initialiser les tables de la base de données si elles n'existent pas"""
+    """Amener le schéma de la base à la dernière version (migrations versionnées)"""
     try:
         connection = mysql.connector.connect(
             host=DB_CONFIG['host'],
@@ -38,108 +79,99 @@ def initialize_tables():
         # Sélectionner la base de données
         cursor.execute(f"USE {DB_CONFIG['database']};")
         
-        # Créer la table users si elle n'existe pas
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                email VARCHAR(255) UNIQUE NOT NULL,
-                name VARCHAR(255) NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                role ENUM('user', 'admin', 'super_admin') DEFAULT 'user',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-            );
-        """)
-        
-        # Créer la table challenges si elle n'existe pas
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS challenges (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                initial_balance DECIMAL(15,2) NOT NULL,
-                current_balance DECIMAL(15,2) NOT NULL,
-                status ENUM('active', 'passed', 'failed') DEFAULT 'active',
-                max_daily_loss DECIMAL(15,2) NOT NULL,
-                max_total_loss DECIMAL(15,2) NOT NULL,
-                profit_target DECIMAL(15,2) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            );
-        """)
-        
-        # Créer la table trades si elle n'existe pas
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS trades (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                challenge_id INT NOT NULL,
-                symbol VARCHAR(20) NOT NULL,
-                type ENUM('BUY', 'SELL') NOT NULL,
-                price DECIMAL(15,5) NOT NULL,
-                quantity INT NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                pnl DECIMAL(15,2) DEFAULT 0.00,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE
-            );
-        """)
+        # Base à jour : une seule lecture de schema_migrations
+        applied = migrate(connection, cursor, DB_CONFIG['database'])
         
-        connection.commit()
         cursor.close()
         connection.close()
-        print("Tables initialisées avec succès")
+        if applied:
+            print(f"Tables initialisées avec succès (migrations {', '.join(map(str, applied))})")
         return True
-    except Error as e:
+    except (Error, RuntimeError) as e:
         print(f"Erreur lors de l'initialisation des tables: {e}")
         return False
 
-class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
-    def _set_headers(self, content_type='application/json'):
-        self.send_response(200)
+class SimpleHTTPRequestHandler(PooledRequestHandler, RoutedRequestHandler, BaseHTTPRequestHandler):
+    # HTTP/1.1 : connexions persistantes (keep-alive), chaque réponse porte sa longueur
+    protocol_version = 'HTTP/1.1'
+    # Délai d'inactivité avant de fermer une connexion persistante (gardée seulement si un thread est libre)
+    timeout = KEEP_ALIVE_TIMEOUT
+    # En-têtes et corps partent en deux écritures : sans TCP_NODELAY, Nagle + ACK retardé ajoutent ~40 ms
+    disable_nagle_algorithm = True
+
+    def _set_headers(self, content_type='application/json', content_length=0, headers=None, status=200):
+        self.send_response(status)
         self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(content_length))
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, If-None-Match')
+        self.send_header('Access-Control-Expose-Headers', 'ETag, X-Next-Cursor, X-Prev-Cursor')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
 
-    def do_OPTIONS(self):
-        self._set_headers()
+    def _send_json(self, payload, headers=None, etag=None):
+        body = json.dumps(payload, default=json_default).encode()
+        headers = dict(headers or {})
+        # Compression br/gzip négociée au-delà du seuil
+        body, encoding = compress_body(body, self.headers.get('Accept-Encoding'))
+        headers['Vary'] = 'Accept-Encoding'
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        if etag:
+            headers['ETag'] = quote_etag(etag, encoding)
+            headers['Cache-Control'] = 'no-cache'
+        self._set_headers(content_length=len(body), headers=headers)
+        self.wfile.write(body)
 
-    def do_POST(self):
-        if self.path == '/api/login':
-            self.handle_login()
-        elif self.path == '/api/register':
-            self.handle_register()
-        elif self.path == '/api/trade':
-            self.handle_add_trade()
-        else:
-            self.send_error(404)
+    def _not_modified(self, etag):
+        """Répondre 304 si If-None-Match désigne la version `etag` ; retourne True si c'est le cas"""
+        if not etag_matches(self.headers.get('If-None-Match'), etag):
+            return False
+        self.send_response(304)
+        self.send_header('ETag', quote_etag(etag))
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Expose-Headers', 'ETag, X-Next-Cursor, X-Prev-Cursor')
+        self.end_headers()
+        return True
 
-    def do_GET(self):
-        parsed_path = urlparse(self.path)
-        path_parts = parsed_path.path.split('/')
-        
-        if len(path_parts) >= 4 and path_parts[1] == 'api' and path_parts[2] == 'user':
-            user_id = int(path_parts[3])
-            if len(path_parts) >= 5 and path_parts[4] == 'challenges':
-                self.handle_get_user_challenges(user_id)
-            elif len(path_parts) >= 5 and path_parts[4] == 'trades':
-                self.handle_get_user_trades(user_id)
+    def _stream_query(self, sql, params, fmt, transform=None, merge=None):
+        """Envoyer le résultat d'une requête au fil de la lecture du curseur (paquets transformés par `merge`)"""
+        connection = get_db_connection()
+        if connection is None:
+            response = {'error': 'Impossible de se connecter à la base de données'}
+            self._send_json(response)
+            return
+        
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(sql, params)
+            
+            # En HTTP/1.0 la fin du corps est signalée par la fermeture de la connexion
+            chunked = self.request_version == 'HTTP/1.1' and self.protocol_version == 'HTTP/1.1'
+            self.send_response(200)
+            self.send_header('Content-type', NDJSON_MIMETYPE if fmt == 'ndjson' else 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            if chunked:
+                self.send_header('Transfer-Encoding', 'chunked')
             else:
-                self.send_error(404)
-        else:
-            self.send_error(404)
+                self.close_connection = True
+            self.end_headers()
+            
+            batches = iter_batches(cursor) if merge is None else merge(iter_batches(cursor))
+            write_chunks(self.wfile, encode_rows(batches, fmt, transform), chunked)
+        finally:
+            try:
+                cursor.close()
+            except Error:
+                pass
+            connection.close()
 
-    def do_PUT(self):
-        parsed_path = urlparse(self.path)
-        path_parts = parsed_path.path.split('/')
-        
-        if len(path_parts) >= 4 and path_parts[1] == 'api' and path_parts[2] == 'challenge':
-            challenge_id = int(path_parts[3])
-            self.handle_update_challenge(challenge_id)
-        else:
-            self.send_error(404)
+    def do_OPTIONS(self):
+        self._set_headers()
 
     def handle_login(self):
         content_length = int(self.headers['Content-Length'])
@@ -151,9 +183,8 @@ class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
         
         connection = get_db_connection()
         if connection is None:
-            self._set_headers()
             response = {'success': False, 'error': 'Impossible de se connecter à la base de données'}
-            self.wfile.write(json.dumps(response).encode())
+            self._send_json(response)
             return
             
         cursor = connection.cursor(dictionary=True)
@@ -183,21 +214,18 @@ class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
                 cursor.close()
                 connection.close()
                 
-                self._set_headers()
                 response = {'success': True, 'user': updated_user}
-                self.wfile.write(json.dumps(response).encode())
+                self._send_json(response)
             else:
                 cursor.close()
                 connection.close()
-                self._set_headers()
                 response = {'success': False, 'error': 'Mot de passe invalide'}
-                self.wfile.write(json.dumps(response).encode())
+                self._send_json(response)
         else:
             cursor.close()
             connection.close()
-            self._set_headers()
             response = {'success': False, 'error': 'Email invalide'}
-            self.wfile.write(json.dumps(response).encode())
+            self._send_json(response)
 
     def handle_register(self):
         content_length = int(self.headers['Content-Length'])
@@ -210,9 +238,8 @@ class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
         
         connection = get_db_connection()
         if connection is None:
-            self._set_headers()
             response = {'success': False, 'error': 'Impossible de se connecter à la base de données'}
-            self.wfile.write(json.dumps(response).encode())
+            self._send_json(response)
             return
             
         cursor = connection.cursor()
@@ -225,9 +252,8 @@ class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
         if existing_user:
             cursor.close()
             connection.close()
-            self._set_headers()
             response = {'success': False, 'error': 'Email déjà utilisé'}
-            self.wfile.write(json.dumps(response).encode())
+            self._send_json(response)
             return
         
         # Insérer le nouvel utilisateur
@@ -242,67 +268,102 @@ class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
         cursor.close()
         connection.close()
         
-        self._set_headers()
         response = {'success': True, 'userId': user_id}
-        self.wfile.write(json.dumps(response).encode())
+        self._send_json(response)
 
     def handle_get_user_challenges(self, user_id):
-        connection = get_db_connection()
-        if connection is None:
-            self._set_headers()
-            response = {'error': 'Impossible de se connecter à la base de données'}
-            self.wfile.write(json.dumps(response).encode())
-            return
-            
-        cursor = connection.cursor(dictionary=True)
-        query = """
+        query = self.query
+        sql = """
             SELECT id, user_id, initial_balance, current_balance, status, 
                    max_daily_loss, max_total_loss, profit_target, created_at, updated_at
             FROM challenges 
             WHERE user_id = %s
             ORDER BY created_at DESC
         """
-        cursor.execute(query, (user_id,))
+        
+        fmt = stream_format(self.headers.get('Accept'), query.get('stream'))
+        if fmt:
+            self._stream_query(sql, (user_id,), fmt)
+            return
+        
+        connection = get_db_connection()
+        if connection is None:
+            response = {'error': 'Impossible de se connecter à la base de données'}
+            self._send_json(response)
+            return
+            
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(sql, (user_id,))
         challenges = cursor.fetchall()
         
+        cursor.close()
+        connection.close()
+        
+        # Version des lignes (updated_at à la seconde, départagé par solde et statut) : pas de sérialisation si inchangé
+        etag = version_etag('challenges', user_id, [
+            (c['id'], c['updated_at'], c['current_balance'], c['status']) for c in challenges
+        ])
+        if self._not_modified(etag):
+            return
+        
         # Formater les dates
         for challenge in challenges:
             challenge['created_at'] = challenge['created_at'].isoformat() if challenge['created_at'] else None
             challenge['updated_at'] = challenge['updated_at'].isoformat() if challenge['updated_at'] else None
         
-        cursor.close()
-        connection.close()
-        
-        self._set_headers()
-        self.wfile.write(json.dumps(challenges).encode())
+        self._send_json(challenges, etag=etag)
 
     def handle_get_user_trades(self, user_id):
+        query = self.query
+        try:
+            history = TradeHistoryQuery(user_id, query)
+        except ValueError as e:
+            response = {'error': str(e)}
+            self._send_json(response)
+            return
+        
+        # Trades en base fusionnés avec ceux des défis terminés archivés
+        archive = trade_archive.refresh()
+        
+        # Export complet en streaming : ni pagination ni matérialisation de l'historique
+        fmt = stream_format(self.headers.get('Accept'), query.get('stream'))
+        if fmt:
+            sql, params = history.sql(paginate=False)
+            self._stream_query(sql, params, fmt, history.project,
+                               merge=lambda batches: archive.merged_batches(batches, history))
+            return
+        
         connection = get_db_connection()
         if connection is None:
-            self._set_headers()
             response = {'error': 'Impossible de se connecter à la base de données'}
-            self.wfile.write(json.dumps(response).encode())
+            self._send_json(response)
             return
             
         cursor = connection.cursor(dictionary=True)
-        query = """
-            SELECT id, user_id, challenge_id, symbol, type, price, quantity, timestamp, pnl
-            FROM trades
-            WHERE user_id = %s
-            ORDER BY timestamp DESC
-        """
-        cursor.execute(query, (user_id,))
-        trades = cursor.fetchall()
-        
-        # Formater les dates
-        for trade in trades:
-            trade['timestamp'] = trade['timestamp'].isoformat() if trade['timestamp'] else None
+        try:
+            # Les trades ne sont jamais modifiés : (nombre, dernier id, génération de l'archive) versionne l'historique
+            cursor.execute("SELECT COUNT(*) AS n, MAX(id) AS last_id FROM trades WHERE user_id = %s", (user_id,))
+            version = cursor.fetchone()
+            etag = version_etag('trades', user_id, self.query_string.encode(), version['n'], version['last_id'],
+                                archive.generation)
+            if self._not_modified(etag):
+                return
+            
+            sql, params = history.sql()
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            connection.close()
         
-        cursor.close()
-        connection.close()
+        trades, next_cursor, prev_cursor = history.page(archive.merge_page(history, rows))
         
-        self._set_headers()
-        self.wfile.write(json.dumps(trades).encode())
+        headers = {}
+        if next_cursor:
+            headers['X-Next-Cursor'] = next_cursor
+        if prev_cursor:
+            headers['X-Prev-Cursor'] = prev_cursor
+        self._send_json(trades, headers, etag=etag)
 
     def handle_update_challenge(self, challenge_id):
         content_length = int(self.headers['Content-Length'])
@@ -311,16 +372,14 @@ class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
         updates = {k: v for k, v in data.items() if k != 'id'}
         
         if not updates:
-            self._set_headers()
             response = {'success': False, 'error': 'Aucune donnée à mettre à jour'}
-            self.wfile.write(json.dumps(response).encode())
+            self._send_json(response)
             return
         
         connection = get_db_connection()
         if connection is None:
-            self._set_headers()
             response = {'success': False, 'error': 'Impossible de se connecter à la base de données'}
-            self.wfile.write(json.dumps(response).encode())
+            self._send_json(response)
             return
             
         cursor = connection.cursor()
@@ -348,58 +407,136 @@ class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
         query = f"UPDATE challenges SET {', '.join(set_clause)} WHERE id = %s"
         
         cursor.execute(query, values)
-        connection.commit()
-        
         success = cursor.rowcount > 0
+        # Un solde modifié à la main invalide l'état suivi par le moteur de règles
+        if success and {'initialBalance', 'currentBalance', 'initial_balance', 'current_balance'} & updates.keys():
+            reset_challenge_state(cursor, challenge_id)
+        connection.commit()
         
         cursor.close()
         connection.close()
         
-        self._set_headers()
         response = {'success': success}
-        self.wfile.write(json.dumps(response).encode())
+        self._send_json(response)
 
     def handle_add_trade(self):
         content_length = int(self.headers['Content-Length'])
         post_data = self.rfile.read(content_length)
         data = json.loads(post_data.decode('utf-8'))
         
-        user_id = data.get('userId')
-        challenge_id = data.get('challengeId')
-        symbol = data.get('symbol')
-        trade_type = data.get('type')
-        price = data.get('price')
-        quantity = data.get('quantity')
-        pnl = data.get('pnl', 0)
+        row, error = validate_trade(data)
+        if error:
+            response = {'success': False, 'error': error}
+            self._send_json(response)
+            return
+        challenge_id = row[1]
         
         connection = get_db_connection()
         if connection is None:
-            self._set_headers()
             response = {'success': False, 'error': 'Impossible de se connecter à la base de données'}
-            self.wfile.write(json.dumps(response).encode())
+            self._send_json(response)
             return
             
         cursor = connection.cursor()
+        try:
+            # Verrouiller le défi : les règles sont évaluées et le statut basculé dans la même transaction
+            states = lock_challenge_states(cursor, [challenge_id])
+            days = trade_days([(0, row)])
+            load_daily_pnl(cursor, states, [(0, row)], days)
+            positions = load_trade_positions(cursor, [(0, row)])
+            errors = {}
+            kept = apply_trades(states, [(0, row)], errors, positions=positions, days=days)
+            if kept:
+                row = kept[0][1]
+                query = """
+                    INSERT INTO trades (user_id, challenge_id, symbol, type, price, quantity, pnl)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """
+                cursor.execute(query, row)
+                trade_id = cursor.lastrowid
+                save_challenge_states(cursor, states.values())
+                if positions:
+                    save_positions(cursor, positions.values())
+                connection.commit()
+                if positions:
+                    positions_saved(positions.values(), position_cache)
+                response = {'success': True, 'tradeId': trade_id, 'pnl': float(row[6]),
+                            'challenge': states[challenge_id].to_dict()}
+            else:
+                connection.rollback()
+                response = {'success': False, 'error': errors[0]}
+        except Error as e:
+            connection.rollback()
+            print(f"Erreur d'ajout de trade: {e}")
+            response = {'success': False, 'error': 'Erreur serveur'}
+        finally:
+            cursor.close()
+            connection.close()
         
-        query = """
-            INSERT INTO trades (user_id, challenge_id, symbol, type, price, quantity, pnl)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(query, (user_id, challenge_id, symbol, trade_type, price, quantity, pnl))
-        connection.commit()
+        self._send_json(response)
+
+    def handle_add_trades_batch(self):
+        content_length = int(self.headers['Content-Length'])
+        post_data = self.rfile.read(content_length)
         
-        success = cursor.rowcount > 0
+        try:
+            items = parse_trade_batch(post_data, self.headers.get('Content-Type', ''))
+            rows, errors = validate_trade_batch(items, TRADE_BATCH_MAX_ITEMS)
+        except ValueError as e:
+            response = {'success': False, 'error': f"Lot invalide: {e}"}
+            self._send_json(response)
+            return
         
-        cursor.close()
-        connection.close()
+        ids = {}
+        states = {}
+        if rows:
+            connection = get_db_connection()
+            if connection is None:
+                response = {'success': False, 'error': 'Impossible de se connecter à la base de données'}
+                self._send_json(response)
+                return
+            
+            cursor = connection.cursor()
+            try:
+                states = lock_challenge_states(cursor, [row[1] for _, row in rows])
+                days = trade_days(rows)
+                load_daily_pnl(cursor, states, rows, days)
+                positions = load_trade_positions(cursor, rows)
+                rows = apply_trades(states, rows, errors, positions=positions, days=days)
+                # Une seule transaction pour tout le lot, découpé en INSERT multi-lignes
+                ids = insert_trade_rows(cursor, rows, TRADE_BATCH_CHUNK_SIZE)
+                save_challenge_states(cursor, states.values())
+                if positions:
+                    save_positions(cursor, positions.values())
+                connection.commit()
+                if positions:
+                    positions_saved(positions.values(), position_cache)
+            except Error as e:
+                connection.rollback()
+                print(f"Erreur d'ajout de trades par lot: {e}")
+                response = {'success': False, 'error': 'Erreur serveur'}
+                self._send_json(response)
+                return
+            finally:
+                cursor.close()
+                connection.close()
         
-        self._set_headers()
-        response = {'success': success}
-        self.wfile.write(json.dumps(response).encode())
+        response = build_batch_response(len(items), ids, errors)
+        response['challenges'] = [state.to_dict() for state in states.values() if state.dirty]
+        self._send_json(response)
+
+SimpleHTTPRequestHandler.routes = Router([
+    ('POST', '/api/login', SimpleHTTPRequestHandler.handle_login),
+    ('POST', '/api/register', SimpleHTTPRequestHandler.handle_register),
+    ('POST', '/api/trade', SimpleHTTPRequestHandler.handle_add_trade),
+    ('POST', '/api/trades/batch', SimpleHTTPRequestHandler.handle_add_trades_batch),
+    ('GET', '/api/user/<int:user_id>/challenges', SimpleHTTPRequestHandler.handle_get_user_challenges),
+    ('GET', '/api/user/<int:user_id>/trades', SimpleHTTPRequestHandler.handle_get_user_trades),
+    ('PUT', '/api/challenge/<int:challenge_id>', SimpleHTTPRequestHandler.handle_update_challenge),
+])
 
-def run(server_class=HTTPServer, handler_class=SimpleHTTPRequestHandler, port=5000):
-    server_address = ('', port)
-    httpd = server_class(server_address, handler_class)
+def run(handler_class=SimpleHTTPRequestHandler, port=5000, workers=HTTP_WORKERS):
+    httpd = make_server(port, handler_class, workers, HTTP_MAX_IDLE)
     print(f'Server démarré sur le port {port}')
     print('Appuyez sur Ctrl+C pour arrêter le serveur')
     httpd.serve_forever()
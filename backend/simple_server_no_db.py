@@ -1,45 +1,66 @@
 import json
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import urlparse
+from http.server import BaseHTTPRequestHandler
 import threading
 import time
 import os
 
-# Fichier pour stocker les données de manière persistante
+from memory_repository import InMemoryRepository
+from wal_store import WriteAheadLog
+from http_serving import PooledRequestHandler, make_server
+from http_routing import RoutedRequestHandler, Router
+from http_conditional import compress_body, etag_matches, quote_etag, version_etag
+
+# Fichier pour stocker les données de manière persistante (instantané compacté)
 DATA_FILE = 'users_data.json'
+# Journal des mutations, rejoué au démarrage par-dessus l'instantané
+LOG_FILE = 'users_data.log'
+# Nombre de mutations journalisées avant de réécrire l'instantané
+WAL_COMPACT_THRESHOLD = int(os.environ.get('WAL_COMPACT_THRESHOLD', 10000))
+
+# Serveur HTTP : threads de traitement (0 = séquentiel) et délai keep-alive
+HTTP_WORKERS = int(os.environ.get('HTTP_WORKERS', 16))
+KEEP_ALIVE_TIMEOUT = 5
+# Connexions keep-alive inactives gardées au plus (chacune occupe un thread) ; défaut HTTP_WORKERS // 2
+HTTP_MAX_IDLE = int(os.environ['HTTP_MAX_IDLE']) if os.environ.get('HTTP_MAX_IDLE') else None
+
+# Les versions du dépôt repartent de zéro à chaque démarrage : l'identifiant de démarrage
+# empêche un ETag d'avant le redémarrage de correspondre à d'autres données
+BOOT_ID = os.urandom(8).hex()
+
+# Dépôt en mémoire indexé (email, id de défi, trades par utilisateur)
+repo = InMemoryRepository()
+
+wal = WriteAheadLog(DATA_FILE, LOG_FILE, compact_threshold=WAL_COMPACT_THRESHOLD)
+
+def load_snapshot(data):
+    repo.load(
+        data.get('users', {}),
+        data.get('challenges', {}),
+        data.get('trades', {}),
+        data.get('next_id', 1)
+    )
 
-# Charger les données depuis le fichier ou initialiser avec des données par défaut
+# Charger l'instantané et rejouer le journal, ou initialiser avec des données par défaut
 def load_data():
-    global users_db, challenges_db, trades_db, next_id
-    
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r') as f:
-                data = json.load(f)
-                users_db = data.get('users', {})
-                challenges_db = data.get('challenges', {})
-                trades_db = data.get('trades', {})
-                next_id = data.get('next_id', 1)
-                
-                # Convertir les clés en entiers
-                users_db = {int(k): v for k, v in users_db.items()}
-                challenges_db = {int(k): v for k, v in challenges_db.items()}
-                trades_db = {int(k): v for k, v in trades_db.items()}
-                
-                print("Données chargées depuis le fichier")
-        except Exception as e:
-            print(f"Erreur lors du chargement des données: {e}")
+    try:
+        if wal.open(load_snapshot, repo.apply):
+            print("Données chargées depuis le fichier")
+        else:
             initialize_default_data()
-    else:
+            wal.compact(repo.to_dict())
+    except ValueError as e:
+        # Instantané ou journal corrompu : mis de côté (jamais écrasé) avant de repartir des données par défaut.
+        # Une erreur de lecture (OSError) n'est pas rattrapée : le serveur ne démarre pas.
+        moved = wal.quarantine()
+        print(f"ERREUR: données illisibles ({e}) ; fichiers mis de côté: {', '.join(moved)}")
         initialize_default_data()
-        save_data()
+        wal.reset()
+        wal.compact(repo.to_dict())
+    # Toute mutation ultérieure du dépôt est journalisée
+    repo.journal = wal.append
 
 def initialize_default_data():
-    global users_db, challenges_db, trades_db, next_id
-    users_db = {}
-    challenges_db = {}
-    trades_db = {}
-    next_id = 1
+    repo.load({}, {}, {}, 1)
     
     # Ajouter les utilisateurs de démonstration
     demo_users = [
@@ -73,97 +94,80 @@ def initialize_default_data():
     ]
     
     for user in demo_users:
-        user_id = user['id']
-        users_db[user_id] = user
+        repo.add_user(user)
         
         # Créer des défis initiaux
-        challenges_db[user_id] = [
-            {
-                'id': user_id * 10 + 1,
-                'user_id': user_id,
-                'initial_balance': 10000,
-                'current_balance': 10000,
-                'status': 'active',
-                'max_daily_loss': 500,
-                'max_total_loss': 1000,
-                'profit_target': 1000,
-                'created_at': '2024-01-01T00:00:00',
-                'updated_at': '2024-01-01T00:00:00'
-            }
-        ]
+        repo.create_default_challenge(user['id'], '2024-01-01T00:00:00')
+    
+    # Les nouveaux ids ne doivent pas écraser les comptes de démonstration
+    repo.next_id = max(repo.users) + 1
 
 def save_data():
+    """Attendre que les mutations journalisées soient durables, et compacter si besoin"""
     try:
-        data = {
-            'users': users_db,
-            'challenges': challenges_db,
-            'trades': trades_db,
-            'next_id': next_id
-        }
-        with open(DATA_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
-        print("Données sauvegardées dans le fichier")
+        # Hors verrou : les écrivains concurrents partagent le même fsync
+        wal.sync()
+        if wal.should_compact():
+            # Sous verrou : l'instantané doit correspondre exactement au dernier numéro journalisé
+            with repo.lock:
+                if wal.should_compact():
+                    wal.compact(repo.to_dict())
+                    print("Instantané des données réécrit")
     except Exception as e:
         print(f"Erreur lors de la sauvegarde des données: {e}")
 
 # Charger les données au démarrage
 load_data()
 
-class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
-    def _set_headers(self, content_type='application/json'):
-        self.send_response(200)
+class SimpleHTTPRequestHandler(PooledRequestHandler, RoutedRequestHandler, BaseHTTPRequestHandler):
+    # HTTP/1.1 : connexions persistantes (keep-alive), chaque réponse porte sa longueur
+    protocol_version = 'HTTP/1.1'
+    # Délai d'inactivité avant de fermer une connexion persistante (gardée seulement si un thread est libre)
+    timeout = KEEP_ALIVE_TIMEOUT
+    # En-têtes et corps partent en deux écritures : sans TCP_NODELAY, Nagle + ACK retardé ajoutent ~40 ms
+    disable_nagle_algorithm = True
+
+    def _set_headers(self, content_type='application/json', content_length=0, headers=None, status=200):
+        self.send_response(status)
         self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(content_length))
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, If-None-Match')
+        self.send_header('Access-Control-Expose-Headers', 'ETag')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
 
-    def do_OPTIONS(self):
-        self._set_headers()
-
-    def do_POST(self):
-        if self.path == '/api/login':
-            self.handle_login()
-        elif self.path == '/api/register':
-            self.handle_register()
-        elif self.path == '/api/trade':
-            self.handle_add_trade()
-        else:
-            self.send_error(404)
+    def _send_json(self, payload, headers=None, etag=None):
+        body = json.dumps(payload).encode()
+        headers = dict(headers or {})
+        # Compression br/gzip négociée au-delà du seuil
+        body, encoding = compress_body(body, self.headers.get('Accept-Encoding'))
+        headers['Vary'] = 'Accept-Encoding'
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        if etag:
+            headers['ETag'] = quote_etag(etag, encoding)
+            headers['Cache-Control'] = 'no-cache'
+        self._set_headers(content_length=len(body), headers=headers)
+        self.wfile.write(body)
 
-    def do_GET(self):
-        parsed_path = urlparse(self.path)
-        path_parts = parsed_path.path.split('/')
-        
-        if len(path_parts) >= 4 and path_parts[1] == 'api' and path_parts[2] == 'user':
-            try:
-                user_id = int(path_parts[3])
-                if len(path_parts) >= 5 and path_parts[4] == 'challenges':
-                    self.handle_get_user_challenges(user_id)
-                elif len(path_parts) >= 5 and path_parts[4] == 'trades':
-                    self.handle_get_user_trades(user_id)
-                else:
-                    self.send_error(404)
-            except ValueError:
-                self.send_error(400)
-        else:
-            self.send_error(404)
+    def _not_modified(self, etag):
+        """Répondre 304 si If-None-Match désigne la version `etag` ; retourne True si c'est le cas"""
+        if not etag_matches(self.headers.get('If-None-Match'), etag):
+            return False
+        self.send_response(304)
+        self.send_header('ETag', quote_etag(etag))
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Expose-Headers', 'ETag')
+        self.end_headers()
+        return True
 
-    def do_PUT(self):
-        parsed_path = urlparse(self.path)
-        path_parts = parsed_path.path.split('/')
-        
-        if len(path_parts) >= 4 and path_parts[1] == 'api' and path_parts[2] == 'challenge':
-            try:
-                challenge_id = int(path_parts[3])
-                self.handle_update_challenge(challenge_id)
-            except ValueError:
-                # Handle non-numeric challenge IDs gracefully
-                self._set_headers()
-                response = {'success': False, 'error': 'Invalid challenge ID'}
-                self.wfile.write(json.dumps(response).encode())
-        else:
-            self.send_error(404)
+    def do_OPTIONS(self):
+        self._set_headers()
 
     def handle_login(self):
         content_length = int(self.headers['Content-Length'])
@@ -174,11 +178,9 @@ class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
         password = data.get('password')
         
         # Vérifier dans la base de données
-        user_found = None
-        for user in users_db.values():
-            if user['email'] == email and user.get('password') == password:
-                user_found = user
-                break
+        user_found = repo.find_user_by_email(email)
+        if user_found and user_found.get('password') != password:
+            user_found = None
         
         if user_found:
             user_data = {
@@ -192,32 +194,20 @@ class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
             
             # Créer des défis initiaux si nécessaire
             user_id = user_data['id']
-            if user_id not in challenges_db:
-                challenges_db[user_id] = [
-                    {
-                        'id': user_id * 10 + 1,
-                        'user_id': user_id,
-                        'initial_balance': 10000,
-                        'current_balance': 10000,
-                        'status': 'active',
-                        'max_daily_loss': 500,
-                        'max_total_loss': 1000,
-                        'profit_target': 1000,
-                        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
-                        'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S')
-                    }
-                ]
+            with repo.lock:
+                created = not repo.has_challenges(user_id)
+                if created:
+                    repo.create_default_challenge(user_id)
+            if created:
                 save_data()
             
             print(f"Connexion réussie pour l'utilisateur: {user_data['email']}")
-            self._set_headers()
             response = {'success': True, 'user': user_data}
-            self.wfile.write(json.dumps(response).encode())
+            self._send_json(response)
         else:
             print(f"Tentative de connexion échouée pour: {email}")
-            self._set_headers()
             response = {'success': False, 'error': 'Email ou mot de passe invalide'}
-            self.wfile.write(json.dumps(response).encode())
+            self._send_json(response)
 
     def handle_register(self):
         content_length = int(self.headers['Content-Length'])
@@ -230,25 +220,11 @@ class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
         
         # Validation des données
         if not name or not email or not password:
-            self._set_headers()
             response = {'success': False, 'error': 'Tous les champs sont requis'}
-            self.wfile.write(json.dumps(response).encode())
-            return
-        
-        # Vérifier si l'email existe déjà
-        if any(user['email'] == email for user in users_db.values()):
-            self._set_headers()
-            response = {'success': False, 'error': 'Email déjà utilisé'}
-            self.wfile.write(json.dumps(response).encode())
+            self._send_json(response)
             return
         
-        # Créer un nouvel utilisateur
-        global next_id
-        user_id = next_id
-        next_id += 1
-        
         user_data = {
-            'id': user_id,
             'email': email,
             'name': name,
             'role': 'user',
@@ -257,30 +233,26 @@ class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
             'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S')
         }
         
-        users_db[user_id] = user_data
-        print(f"Nouvel utilisateur enregistré: {name} ({email}) avec ID: {user_id}")
+        # Vérification de l'email et création sous le même verrou
+        with repo.lock:
+            exists = repo.find_user_by_email(email) is not None
+            if not exists:
+                # Créer un nouvel utilisateur
+                user_id = user_data['id'] = repo.allocate_id()
+                repo.add_user(user_data)
+                
+                # Créer des défis initiaux
+                repo.create_default_challenge(user_id)
         
-        # Créer des défis initiaux
-        challenge_id = user_id * 10 + 1
-        challenges_db[user_id] = [
-            {
-                'id': challenge_id,
-                'user_id': user_id,
-                'initial_balance': 10000,
-                'current_balance': 10000,
-                'status': 'active',
-                'max_daily_loss': 500,
-                'max_total_loss': 1000,
-                'profit_target': 1000,
-                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
-                'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S')
-            }
-        ]
+        if exists:
+            response = {'success': False, 'error': 'Email déjà utilisé'}
+            self._send_json(response)
+            return
+        print(f"Nouvel utilisateur enregistré: {name} ({email}) avec ID: {user_id}")
         
         # Sauvegarder les données
         save_data()
         
-        self._set_headers()
         response = {
             'success': True, 
             'userId': user_id,
@@ -294,21 +266,31 @@ class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
             },
             'message': 'Utilisateur enregistré avec succès'
         }
-        self.wfile.write(json.dumps(response).encode())
+        self._send_json(response)
 
     def handle_get_user_challenges(self, user_id):
-        challenges = challenges_db.get(user_id, [])
+        # Version lue sous verrou, réponse 304 écrite hors verrou
+        with repo.lock:
+            etag = version_etag('challenges', user_id, BOOT_ID, repo.version('challenges', user_id))
+        if self._not_modified(etag):
+            return
+        with repo.lock:
+            etag = version_etag('challenges', user_id, BOOT_ID, repo.version('challenges', user_id))
+            challenges = list(repo.get_user_challenges(user_id))
         
-        self._set_headers()
-        self.wfile.write(json.dumps(challenges).encode())
+        self._send_json(challenges, etag=etag)
 
     def handle_get_user_trades(self, user_id):
-        trades = []
-        for trade_list in trades_db.values():
-            trades.extend([t for t in trade_list if t['user_id'] == user_id])
+        # Version lue sous verrou, réponse 304 écrite hors verrou
+        with repo.lock:
+            etag = version_etag('trades', user_id, BOOT_ID, repo.version('trades', user_id))
+        if self._not_modified(etag):
+            return
+        with repo.lock:
+            etag = version_etag('trades', user_id, BOOT_ID, repo.version('trades', user_id))
+            trades = list(repo.get_user_trades(user_id))
         
-        self._set_headers()
-        self.wfile.write(json.dumps(trades).encode())
+        self._send_json(trades, etag=etag)
 
     def handle_update_challenge(self, challenge_id):
         content_length = int(self.headers['Content-Length'])
@@ -316,45 +298,22 @@ class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
         data = json.loads(post_data.decode('utf-8'))
         
         # Trouver et mettre à jour le défi
-        updated = False
-        for user_challenges in challenges_db.values():
-            for challenge in user_challenges:
-                if challenge['id'] == challenge_id:
-                    for key, value in data.items():
-                        if key == 'initialBalance':
-                            challenge['initial_balance'] = value
-                        elif key == 'currentBalance':
-                            challenge['current_balance'] = value
-                        elif key == 'status':
-                            challenge['status'] = value
-                        elif key == 'maxDailyLoss':
-                            challenge['max_daily_loss'] = value
-                        elif key == 'maxTotalLoss':
-                            challenge['max_total_loss'] = value
-                        elif key == 'profitTarget':
-                            challenge['profit_target'] = value
-                    
-                    challenge['updated_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
-                    updated = True
-                    break
-            if updated:
-                break
+        with repo.lock:
+            updated = repo.update_challenge(challenge_id, data) is not None
         
         if updated:
             save_data()
         
-        self._set_headers()
         response = {'success': updated}
-        self.wfile.write(json.dumps(response).encode())
+        self._send_json(response)
 
     def handle_add_trade(self):
         content_length = int(self.headers['Content-Length'])
         post_data = self.rfile.read(content_length)
         data = json.loads(post_data.decode('utf-8'))
         
-        global next_id
-        trade_id = next_id
-        next_id += 1
+        with repo.lock:
+            trade_id = repo.allocate_id()
         
         trade_data = {
             'id': trade_id,
@@ -369,25 +328,33 @@ class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
         }
         
         # Stocker le trade
-        user_id = data.get('userId')
-        if user_id not in trades_db:
-            trades_db[user_id] = []
-        trades_db[user_id].append(trade_data)
+        with repo.lock:
+            repo.add_trade(trade_data)
         
         # Sauvegarder les données
         save_data()
         
-        self._set_headers()
         response = {'success': True}
-        self.wfile.write(json.dumps(response).encode())
+        self._send_json(response)
+
+SimpleHTTPRequestHandler.routes = Router([
+    ('POST', '/api/login', SimpleHTTPRequestHandler.handle_login),
+    ('POST', '/api/register', SimpleHTTPRequestHandler.handle_register),
+    ('POST', '/api/trade', SimpleHTTPRequestHandler.handle_add_trade),
+    ('GET', '/api/user/<int:user_id>/challenges', SimpleHTTPRequestHandler.handle_get_user_challenges),
+    ('GET', '/api/user/<int:user_id>/trades', SimpleHTTPRequestHandler.handle_get_user_trades),
+    ('PUT', '/api/challenge/<int:challenge_id>', SimpleHTTPRequestHandler.handle_update_challenge),
+])
 
-def run(server_class=HTTPServer, handler_class=SimpleHTTPRequestHandler, port=5000):
-    server_address = ('', port)
-    httpd = server_class(server_address, handler_class)
+def run(handler_class=SimpleHTTPRequestHandler, port=5000, workers=HTTP_WORKERS):
+    httpd = make_server(port, handler_class, workers, HTTP_MAX_IDLE)
     print(f'Serveur backend démarré sur le port {port}')
     print('Serveur en cours d\'exécution...')
     print('Appuyez sur Ctrl+C pour arrêter le serveur')
-    httpd.serve_forever()
+    try:
+        httpd.serve_forever()
+    finally:
+        wal.close()
 
 if __name__ == '__main__':
     run()
\ No newline at end of file
@@ -0,0 +1,103 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_FETCH_SIZE = 500
+
+
+def stream_format(accept, stream_param):
+    """Déterminer le mode de streaming demandé : 'ndjson', 'json' ou None"""
+    if NDJSON_MIMETYPE in (accept or ''):
+        return 'ndjson'
+    if stream_param in ('1', 'true', 'yes'):
+        return 'json'
+    if stream_param == 'ndjson':
+        return 'ndjson'
+    return None
+
+
+def json_default(value):
+    """Sérialiser les types renvoyés par MySQL comme le fait jsonify"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Type non sérialisable: {type(value).__name__}")
+
+
+def iter_batches(cursor, size=STREAM_FETCH_SIZE):
+    """Lire un curseur non bufferisé par paquets de `size` lignes"""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+
+def _encode_batch(dumps, rows, fmt, transform, first):
+    if transform is not None:
+        rows = [transform(row) for row in rows]
+    if fmt == 'ndjson':
+        return ''.join(dumps(row) + '\n' for row in rows).encode('utf-8')
+    body = ','.join(dumps(row) for row in rows)
+    return (body if first else ',' + body).encode('utf-8')
+
+
+def encode_rows(batches, fmt, transform=None):
+    """Encoder les paquets de lignes en morceaux d'octets NDJSON ou tableau JSON
+
+    Un morceau est produit par paquet pour limiter le nombre d'écritures réseau.
+    """
+    dumps = json.JSONEncoder(default=json_default, ensure_ascii=False).encode
+    first = True
+
+    if fmt == 'json':
+        # Envoyer l'ouverture du tableau tout de suite : le premier octet part avant la requête complète
+        yield b'['
+
+    for rows in batches:
+        yield _encode_batch(dumps, rows, fmt, transform, first)
+        first = False
+
+    if fmt == 'json':
+        yield b']'
+
+
+async def aiter_batches(cursor, size=STREAM_FETCH_SIZE):
+    """Version asynchrone de iter_batches pour un curseur aiomysql non bufferisé"""
+    while True:
+        rows = await cursor.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+
+async def aencode_rows(batches, fmt, transform=None):
+    """Version asynchrone de encode_rows"""
+    dumps = json.JSONEncoder(default=json_default, ensure_ascii=False).encode
+    first = True
+
+    if fmt == 'json':
+        yield b'['
+
+    async for rows in batches:
+        yield _encode_batch(dumps, rows, fmt, transform, first)
+        first = False
+
+    if fmt == 'json':
+        yield b']'
+
+
+def write_chunks(wfile, chunks, chunked):
+    """Écrire les morceaux sur la socket, en Transfer-Encoding chunked si HTTP/1.1"""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if chunked:
+            wfile.write(b'%x\r\n' % len(chunk) + chunk + b'\r\n')
+        else:
+            wfile.write(chunk)
+        wfile.flush()
+    if chunked:
+        wfile.write(b'0\r\n\r\n')
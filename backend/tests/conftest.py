@@ -0,0 +1,8 @@
+"""Configuration pytest : les modules du backend sont à plat dans backend/
+
+Usage (depuis backend/) : python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
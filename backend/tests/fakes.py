@@ -0,0 +1,68 @@
+"""Connexions MySQL factices pour les tests du pool et de l'aiguillage (sans serveur)"""
+import threading
+import time
+
+
+class FakeCursor:
+    description = ()
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, source):
+        self.source = source
+        self.owner = None
+        self.closed = False
+
+    def is_connected(self):
+        return not self.closed
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakeServer:
+    """Fabrique de connexions d'une source ; `down` simule un serveur injoignable"""
+
+    def __init__(self, name, down=False):
+        self.name = name
+        self.down = down
+        self.connections = []
+        self._lock = threading.Lock()
+
+    def connect(self):
+        if self.down:
+            raise ConnectionRefusedError(f'{self.name} injoignable')
+        connection = FakeConnection(self.name)
+        with self._lock:
+            self.connections.append(connection)
+        return connection
+
+
+def use(connection):
+    """Occuper la connexion un instant ; échoue si un autre thread l'utilise déjà"""
+    me = threading.get_ident()
+    assert connection.owner is None, 'connexion prêtée à deux threads'
+    assert not connection.closed
+    connection.owner = me
+    time.sleep(0)
+    assert connection.owner == me
+    connection.owner = None
+    return connection.source
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from analytics import _factorize, columns_from_rows, compute_analytics, merge_columns
+
+DAY = 86400
+
+
+def test_empty_challenge():
+    result = compute_analytics(10000, *columns_from_rows([])[:3])
+    assert result['trades'] == 0
+    assert result['finalBalance'] == 10000.0
+    assert result['sharpe'] is None
+
+
+def test_statistics_on_small_history():
+    rows = [
+        (0 * DAY + 10, 100.0, 'AAPL', 1),
+        (0 * DAY + 20, -50.0, 'TSLA', 2),
+        (1 * DAY + 10, -200.0, 'AAPL', 3),
+        (2 * DAY + 10, 0.0, 'IAM', 4),
+        (2 * DAY + 20, 300.0, 'TSLA', 5),
+    ]
+    result = compute_analytics(1000, *columns_from_rows(rows)[:3])
+    assert result['finalBalance'] == 1150.0
+    assert result['totalPnl'] == 150.0
+    # Plus haut 1100 après le premier trade, plus bas 850 ensuite
+    assert result['maxDrawdown'] == 250.0
+    assert result['maxDrawdownPct'] == pytest.approx(22.73)
+    assert result['dailyPnl'] == [{'time': 0, 'pnl': 50.0}, {'time': DAY, 'pnl': -200.0},
+                                  {'time': 2 * DAY, 'pnl': 300.0}]
+    # Trade à PnL nul : ni gain ni perte
+    assert result['winRate'] == pytest.approx(0.5)
+    assert result['profitFactor'] == pytest.approx(400 / 250)
+
+    returns = np.array([50 / 1000, -200 / 1050, 300 / 850])
+    assert result['sharpe'] == pytest.approx(returns.mean() / returns.std(ddof=1) * np.sqrt(252))
+    assert result['bySymbol'] == [
+        {'symbol': 'TSLA', 'trades': 2, 'pnl': 250.0, 'winRate': 0.5},
+        {'symbol': 'IAM', 'trades': 1, 'pnl': 0.0, 'winRate': None},
+        {'symbol': 'AAPL', 'trades': 2, 'pnl': -100.0, 'winRate': 0.5},
+    ]
+
+
+def test_equity_curve_is_downsampled_keeping_last_point():
+    n = 5000
+    rows = [(i * 60, 1.0, 'AAPL', i) for i in range(n)]
+    curve = compute_analytics(0, *columns_from_rows(rows)[:3], max_points=100)['equityCurve']
+    assert len(curve) == 100
+    assert curve[-1] == {'time': (n - 1) * 60, 'equity': float(n)}
+
+
+def test_merge_counts_archived_and_live_trade_once():
+    archived = columns_from_rows([(10, 1.0, 'AAPL', 1), (30, 2.0, 'AAPL', 3)])
+    live = columns_from_rows([(20, 4.0, 'IAM', 2), (30, 2.0, 'AAPL', 3), (40, 8.0, 'IAM', 4)])
+    ts, pnl, symbols = merge_columns(archived, live)
+    assert ts.tolist() == [10, 20, 30, 40]
+    assert pnl.sum() == 15.0
+    assert symbols.tolist() == ['AAPL', 'IAM', 'AAPL', 'IAM']
+    assert len(merge_columns(None, live)) == 3
+
+
+def test_factorize_matches_unique():
+    rng = np.random.default_rng(3)
+    symbols = np.array(['AAPL', 'TSLA', 'BTC-USD', 'IAM', 'ATW', 'A'])[rng.integers(0, 6, 1000)].astype('U20')
+    names, inverse = _factorize(symbols)
+    assert sorted(names.tolist()) == sorted(set(symbols.tolist()))
+    assert np.array_equal(names[inverse], symbols)
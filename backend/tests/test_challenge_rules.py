@@ -0,0 +1,84 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from challenge_rules import ChallengeState, TradingCalendar, apply_trades
+from positions import Position
+
+DAY = date(2024, 1, 2)
+
+
+def state(**overrides):
+    values = dict(challenge_id=1, user_id=10, initial_balance=10000, equity=10000, status='active',
+                  max_daily_loss=500, max_total_loss=1000, profit_target=1000)
+    values.update(overrides)
+    return ChallengeState(**values)
+
+
+def test_amounts_are_exact_decimals():
+    s = state()
+    for _ in range(10):
+        s.apply(0.1, DAY)
+    assert s.equity == Decimal('10001.0')
+    assert s.trade_count == 10
+
+
+def test_daily_loss_fails_challenge():
+    s = state()
+    assert s.apply(-300, DAY) is None
+    assert s.apply(-200, DAY) == 'failed'
+    assert s.failure_reason == 'max_daily_loss'
+    # Un défi terminé ne change plus de statut
+    assert s.apply(5000, DAY) is None
+    assert s.status == 'failed'
+
+
+def test_daily_loss_resets_on_next_day():
+    s = state()
+    s.apply(-400, DAY)
+    assert s.apply(-400, date(2024, 1, 3)) is None
+    assert s.day_start_equity == Decimal('9600')
+    assert s.apply(-400, date(2024, 1, 4)) == 'failed'
+    assert s.failure_reason == 'max_total_loss'
+
+
+def test_profit_target_passes_challenge():
+    s = state()
+    s.apply(600, DAY)
+    assert s.apply(400, DAY) == 'passed'
+    assert s.peak_equity == Decimal('11000')
+    assert s.to_dict()['dayPnl'] == 1000.0
+
+
+def test_from_row_without_state_starts_from_balance():
+    row = (1, 10, 10000, 9500, 'active', 500, 1000, 1000) + (None,) * 6
+    s = ChallengeState.from_row(row)
+    assert s.equity == Decimal('9500')
+    assert s.realized_pnl == Decimal('-500')
+    assert s.peak_equity == Decimal('10000')
+
+
+def test_calendar_uses_symbol_timezone():
+    calendar = TradingCalendar.from_spec('UTC', 'IAM=Africa/Casablanca, bad, =x')
+    # 23h30 UTC le 1er janvier : déjà le 2 à Casablanca (UTC+1)
+    now = datetime(2024, 1, 1, 23, 30, tzinfo=timezone.utc)
+    assert calendar.day_for('AAPL', now) == date(2024, 1, 1)
+    assert calendar.day_for('iam', now) == date(2024, 1, 2)
+
+
+def test_apply_trades_rejects_and_uses_fifo_pnl():
+    states = {1: state(), 2: state(challenge_id=2, status='passed')}
+    positions = {(1, 'AAPL'): Position(1, 'AAPL')}
+    # (user_id, challenge_id, symbol, type, price, quantity, pnl) comme trade_batch.TRADE_COLUMNS
+    rows = [
+        (0, (10, 1, 'AAPL', 'BUY', '100', 10, 0)),
+        (1, (10, 1, 'AAPL', 'SELL', '90', 10, 999)),
+        (2, (11, 1, 'AAPL', 'BUY', '100', 1, 0)),
+        (3, (10, 2, 'AAPL', 'BUY', '100', 1, 0)),
+        (4, (10, 3, 'AAPL', 'BUY', '100', 1, 0)),
+    ]
+    errors = {}
+    kept = apply_trades(states, rows, errors, trading_day=DAY, positions=positions)
+    assert [index for index, _ in kept] == [0, 1]
+    assert kept[1][1][6] == Decimal('-100.00')
+    assert states[1].equity == Decimal('9900.00')
+    assert sorted(errors) == [2, 3, 4]
@@ -0,0 +1,71 @@
+"""Pool de connexions sous accès concurrents (connexions factices, sans MySQL)
+
+CONCURRENCY_THREADS (32) et CONCURRENCY_ROUNDS (200) augmentent la charge :
+  CONCURRENCY_THREADS=200 CONCURRENCY_ROUNDS=2000 python -m pytest tests/test_db_pool.py
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from db_pool import ConnectionPool, DatabaseUnavailable, PoolExhausted
+from fakes import FakeServer, use
+
+THREADS = int(os.getenv('CONCURRENCY_THREADS', '32'))
+ROUNDS = int(os.getenv('CONCURRENCY_ROUNDS', '200'))
+
+
+def test_pool_never_shares_or_exceeds_its_size():
+    server = FakeServer('primary')
+    pool = ConnectionPool(server.connect, pool_size=4, max_overflow=2, timeout=10)
+    peak = [0]
+    lock = threading.Lock()
+
+    def work(_):
+        for _ in range(ROUNDS):
+            with pool.connection() as connection:
+                with lock:
+                    peak[0] = max(peak[0], pool.stats()['checked_out'])
+                use(connection)
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        for future in [executor.submit(work, n) for n in range(THREADS)]:
+            future.result()
+    stats = pool.stats()
+    assert peak[0] <= 6
+    assert stats['checkouts'] == THREADS * ROUNDS
+    assert stats['checked_out'] == 0
+    assert stats['opened'] == stats['idle'] <= 4
+    assert stats['exhaustions'] == 0
+    # Connexions de débordement fermées au retour, pas de fuite
+    assert sum(not connection.closed for connection in server.connections) == stats['idle']
+
+
+def test_pool_exhaustion_and_connect_failures():
+    server = FakeServer('primary')
+    pool = ConnectionPool(server.connect, pool_size=1, max_overflow=0, timeout=0.05)
+    held = pool.acquire()
+    with pytest.raises(PoolExhausted):
+        pool.acquire()
+    pool.release(held)
+    assert pool.acquire() is held
+
+    down = ConnectionPool(FakeServer('down', down=True).connect, pool_size=1, max_overflow=0, timeout=0.05)
+    for _ in range(3):
+        # La place réservée est rendue : pas d'épuisement après des échecs de connexion
+        with pytest.raises(DatabaseUnavailable) as error:
+            down.acquire()
+        assert not isinstance(error.value, PoolExhausted)
+    assert down.stats()['opened'] == 0
+    assert down.stats()['connect_failures'] == 3
+
+
+def test_stale_connections_are_replaced():
+    server = FakeServer('primary')
+    pool = ConnectionPool(server.connect, pool_size=2, max_overflow=0, timeout=1, recycle=None)
+    connection = pool.acquire()
+    pool.release(connection)
+    connection.closed = True
+    assert pool.acquire() is not connection
+    assert pool.stats()['ping_failures'] == 1
@@ -0,0 +1,80 @@
+"""Aiguillage primaire/réplicas sous accès concurrents (connexions factices, sans MySQL)
+
+CONCURRENCY_THREADS (32) et CONCURRENCY_ROUNDS (200) augmentent la charge :
+  CONCURRENCY_THREADS=200 CONCURRENCY_ROUNDS=2000 python -m pytest tests/test_db_router.py
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from db_pool import ConnectionPool
+from db_router import DataSourceRouter, PinTable, Replica
+from fakes import FakeServer, use
+
+THREADS = int(os.getenv('CONCURRENCY_THREADS', '32'))
+ROUNDS = int(os.getenv('CONCURRENCY_ROUNDS', '200'))
+
+
+def run_threads(work):
+    with ThreadPoolExecutor(THREADS) as executor:
+        return [future.result() for future in [executor.submit(work, n) for n in range(THREADS)]]
+
+
+def make_router(*replica_servers, pin_seconds=5.0):
+    primary = ConnectionPool(FakeServer('primary').connect, pool_size=4, max_overflow=4, timeout=10)
+    replicas = [Replica(server.name, ConnectionPool(server.connect, pool_size=4, max_overflow=4, timeout=10))
+                for server in replica_servers]
+    router = DataSourceRouter(primary, replicas, max_lag=-1, pin_seconds=pin_seconds, pins=PinTable(slots=1024))
+    router.check_all()
+    return router
+
+
+def test_router_spreads_reads_and_keeps_writers_on_primary():
+    router = make_router(FakeServer('replica-1'), FakeServer('replica-2'))
+    # Utilisateurs impairs : viennent d'écrire, lisent sur le primaire
+    router.note_write(*range(1, 2 * THREADS, 2))
+
+    def work(n):
+        sources = []
+        for _ in range(ROUNDS):
+            with router.read_cursor(user_id=n) as (connection, cursor):
+                sources.append(use(connection))
+        return n, set(sources)
+
+    for user_id, sources in run_threads(work):
+        assert sources == ({'primary'} if user_id % 2 else {'replica-1', 'replica-2'})
+
+    stats = router.stats()
+    reads = [replica['reads'] for replica in stats['replicas']]
+    assert stats['primary_reads'] == stats['pinned_reads'] == (THREADS // 2) * ROUNDS
+    assert sum(reads) == (THREADS - THREADS // 2) * ROUNDS
+    # Tour de rôle : répartition équilibrée entre les deux réplicas
+    assert abs(reads[0] - reads[1]) <= THREADS
+    assert all(replica['pool']['checked_out'] == 0 for replica in stats['replicas'])
+
+
+def test_router_falls_back_to_primary_when_a_replica_goes_down():
+    flaky = FakeServer('replica-1')
+    router = make_router(flaky, FakeServer('replica-2'))
+    router.replicas[0].pool.close()
+    flaky.down = True
+
+    def work(n):
+        sources = set()
+        for _ in range(ROUNDS):
+            with router.read_cursor(user_id=n) as (connection, cursor):
+                sources.add(use(connection))
+        return sources
+
+    seen = set().union(*run_threads(work))
+    assert 'replica-1' not in seen
+    assert router.replicas[0].healthy is False
+    assert router.stats()['replicas'][0]['failures'] >= 1
+
+    router.replicas[1].healthy = False
+    with router.read_cursor(user_id=1) as (connection, cursor):
+        assert connection.source == 'primary'
+    assert router.stats()['fallbacks'] >= 1
+
+    flaky.down = False
+    router.check_all()
+    assert router.replicas[0].healthy is True
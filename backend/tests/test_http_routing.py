@@ -0,0 +1,89 @@
+import pytest
+
+from http_routing import RoutedRequestHandler, Router
+
+
+def handler(name):
+    return lambda *args, **kwargs: name
+
+
+@pytest.fixture
+def router():
+    return Router([
+        ('GET', '/api/challenges', handler('challenges')),
+        ('POST', '/api/challenges', handler('create')),
+        ('GET', '/api/user/<int:user_id>/trades', handler('trades')),
+        ('GET', '/api/user/<int:user_id>/stats', handler('stats')),
+        ('GET', '/api/user/me/trades', handler('my_trades')),
+        ('GET', '/api/market/<symbol>', handler('quote')),
+    ])
+
+
+def test_static_route_and_query(router):
+    match = router.match('GET', '/api/challenges?user_id=3&user_id=4&x=')
+    assert match.status == 200
+    assert match.handler() == 'challenges'
+    assert match.params == {}
+    assert match.query == {'user_id': '3'}
+
+
+def test_converters(router):
+    match = router.match('GET', '/api/user/42/trades')
+    assert (match.handler(), match.params) == ('trades', {'user_id': 42})
+    assert router.match('GET', '/api/market/BTC%2DUSD').params == {'symbol': 'BTC-USD'}
+    # Segment fixe prioritaire sur le paramètre
+    assert router.match('GET', '/api/user/me/trades').handler() == 'my_trades'
+
+
+@pytest.mark.parametrize('target', ['/api/user/abc/trades', '/api/user/٣/trades', '/api/user/1/unknown',
+                                    '/api/user/1', '/api/market/', '/nope'])
+def test_not_found(router, target):
+    assert router.match('GET', target).status == 404
+
+
+def test_method_not_allowed(router):
+    match = router.match('DELETE', '/api/challenges')
+    assert match.status == 405
+    assert match.allowed == ('GET', 'POST')
+    assert router.match('POST', '/api/user/1/trades').allowed == ('GET',)
+
+
+@pytest.mark.parametrize('route', [
+    ('GET', 'api/x', None),
+    ('GET', '/api/<float:x>', None),
+    ('GET', '/api/user/<user>/x', None),
+    ('GET', '/api/challenges', None),
+])
+def test_invalid_routes(router, route):
+    with pytest.raises(ValueError):
+        router.add(*route)
+
+
+class RecordingHandler(RoutedRequestHandler):
+    """Remplace les écritures de BaseHTTPRequestHandler par une liste d'en-têtes"""
+
+    def __init__(self, routes, command, path):
+        self.routes = routes
+        self.command = command
+        self.path = path
+        self.close_connection = False
+        self.headers_sent = []
+
+    def send_response(self, code):
+        self.status = code
+
+    def send_header(self, name, value):
+        self.headers_sent.append((name, value))
+
+    def end_headers(self):
+        pass
+
+
+def test_method_not_allowed_closes_connection(router):
+    # Le corps de la requête refusée n'est pas lu : la connexion ne doit pas être réutilisée
+    handler = RecordingHandler(router, 'PUT', '/api/challenges')
+    handler._dispatch()
+    assert handler.status == 405
+    assert handler.close_connection
+    assert ('Connection', 'close') in handler.headers_sent
+    assert ('Allow', 'GET, POST, OPTIONS') in handler.headers_sent
@@ -0,0 +1,85 @@
+"""Connexions keep-alive du serveur à pool de threads : une connexion inactive ne bloque pas les autres"""
+import http.client
+import threading
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from http_serving import PooledRequestHandler, ThreadPoolHTTPServer
+
+
+class Handler(PooledRequestHandler, BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    timeout = 5
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(workers, max_idle=None):
+        server = ThreadPoolHTTPServer(('127.0.0.1', 0), Handler, workers=workers, max_idle=max_idle)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def get(server):
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=2)
+    connection.request('GET', '/')
+    response = connection.getresponse()
+    assert response.read() == b'ok'
+    return connection, response.getheader('Connection')
+
+
+def test_idle_connections_are_capped(serve):
+    server = serve(workers=4, max_idle=1)
+    first, header = get(server)
+    assert header is None
+    # Limite atteinte : la réponse annonce la fermeture au lieu de garder un thread inactif
+    second, header = get(server)
+    assert header == 'close'
+    # La connexion gardée reste utilisable pour la requête suivante
+    first.request('GET', '/')
+    assert first.getresponse().read() == b'ok'
+    first.close()
+    second.close()
+
+
+def test_single_worker_never_holds_an_idle_connection(serve):
+    server = serve(workers=1, max_idle=4)
+    assert server.max_idle == 0
+    first, header = get(server)
+    assert header == 'close'
+    # Le seul thread est libre : une autre connexion est servie sans attendre le délai keep-alive
+    second, header = get(server)
+    assert header == 'close'
+    first.close()
+    second.close()
+
+
+def test_saturated_pool_closes_after_response(serve):
+    server = serve(workers=4, max_idle=3)
+    with server._lock:
+        server._queued += 1
+    try:
+        connection, header = get(server)
+        assert header == 'close'
+    finally:
+        with server._lock:
+            server._queued -= 1
+    connection.close()
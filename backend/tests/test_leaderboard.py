@@ -0,0 +1,84 @@
+"""Synchronisation du classement : fenêtre de recouvrement et bornes des périodes en UTC"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from leaderboard import Leaderboard, utc_epoch, window_starts
+
+
+class FakeDatabase:
+    """Défis et PnL de fenêtre servis à `refresh` ; garde les paramètres de chaque requête"""
+
+    def __init__(self, now):
+        self.now = now
+        self.challenges = {}
+        self.window_pnl = {}
+        self.queries = []
+
+    @contextmanager
+    def cursor(self):
+        yield None, FakeCursor(self)
+
+
+class FakeCursor:
+    def __init__(self, database):
+        self.database = database
+        self.rows = []
+
+    def execute(self, sql, params=None):
+        db = self.database
+        db.queries.append((sql, params))
+        if 'NOW()' in sql:
+            self.rows = [(db.now,)]
+        elif 'FROM challenges' in sql:
+            since = params[0] if params else None
+            self.rows = [row for updated_at, row in db.challenges.values() if since is None or updated_at >= since]
+        else:
+            self.rows = [(cid,) + db.window_pnl[cid] for cid in params[2:-1] if cid in db.window_pnl]
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_sync_rereads_the_overlap_window():
+    start = datetime(2024, 3, 1, 12, 0, 0)
+    db = FakeDatabase(start)
+    db.challenges[1] = (start, (1, 10, 'Ann', 1000, 1100, 'active'))
+    board = Leaderboard(sync_interval=0, overlap=30)
+    board.sync(db.cursor)
+    assert board.query()['entries'][0]['profit'] == 100
+
+    # Transaction de 20 s : updated_at antérieur au dernier NOW(), validée après le passage
+    db.now = start + timedelta(seconds=5)
+    db.challenges[2] = (start - timedelta(seconds=20), (2, 20, 'Bob', 1000, 1300, 'active'))
+    board.sync(db.cursor)
+    since = [params for sql, params in db.queries if 'FROM challenges' in sql][-1][0]
+    assert since == start - timedelta(seconds=30)
+    assert [entry['challengeId'] for entry in board.query()['entries']] == [2, 1]
+
+
+def test_resync_is_idempotent():
+    now = datetime(2024, 3, 1, 12, 0, 0)
+    db = FakeDatabase(now)
+    db.challenges[1] = (now, (1, 10, 'Ann', 1000, 1100, 'active'))
+    db.window_pnl[1] = (2, 40.0, 100.0)
+    board = Leaderboard(sync_interval=0, overlap=30)
+    for _ in range(3):
+        board.sync(db.cursor, force=True)
+    assert board.query('daily')['entries'][0]['profit'] == 40
+    assert board.query('weekly')['entries'][0]['profit'] == 100
+    assert board.query('all')['total'] == 1
+
+
+def test_window_bounds_are_utc_epochs():
+    db = FakeDatabase(datetime(2024, 3, 1, 12, 0, 0))
+    db.challenges[1] = (db.now, (1, 10, 'Ann', 1000, 1100, 'active'))
+    Leaderboard().sync(db.cursor)
+    sql, params = db.queries[-1]
+    day_start, week_start = window_starts()
+    # Convertis par FROM_UNIXTIME dans le fuseau de la session MySQL, comme la colonne
+    assert 'timestamp >= FROM_UNIXTIME(%s)' in sql
+    assert params == [utc_epoch(day_start), utc_epoch(day_start), 1, utc_epoch(week_start)]
+    assert utc_epoch(datetime(1970, 1, 2)) == 86400
@@ -0,0 +1,77 @@
+"""Index et mutations du dépôt en mémoire de simple_server_no_db.py"""
+import copy
+
+from memory_repository import InMemoryRepository
+
+
+def make_repository():
+    repo = InMemoryRepository()
+    repo.load(
+        {'1': {'id': 1, 'email': 'john@example.com', 'name': 'John'}},
+        {'1': [{'id': 11, 'user_id': 1, 'current_balance': 10000, 'status': 'active'}]},
+        {'1': [{'id': 100, 'user_id': 1, 'symbol': 'AAPL'}]},
+        101,
+    )
+    return repo
+
+
+def test_load_builds_indexes_from_json_keys():
+    repo = make_repository()
+    assert repo.find_user_by_email('john@example.com')['id'] == 1
+    assert repo.find_user_by_email('nobody@example.com') is None
+    assert repo.find_challenge(11)['user_id'] == 1
+    assert repo.has_challenges(1) and not repo.has_challenges(2)
+    # Id de la route en chaîne ou en entier : même trades
+    assert repo.get_user_trades('1') == repo.get_user_trades(1) == [{'id': 100, 'user_id': 1, 'symbol': 'AAPL'}]
+
+
+def test_add_user_replaces_email_index():
+    repo = make_repository()
+    repo.add_user({'id': 1, 'email': 'john.doe@example.com', 'name': 'John'})
+    assert repo.find_user_by_email('john@example.com') is None
+    assert repo.find_user_by_email('john.doe@example.com')['name'] == 'John'
+    assert repo.allocate_id() == 101
+    assert repo.allocate_id() == 102
+
+
+def test_mutations_bump_versions_and_keep_indexes():
+    repo = make_repository()
+    challenges, trades = repo.version('challenges', 1), repo.version('trades', '1')
+
+    challenge = repo.create_default_challenge(2, '2024-01-01T00:00:00')
+    assert repo.find_challenge(21) is challenge
+    assert repo.get_user_challenges(2) == [challenge]
+    assert repo.version('challenges', 2) == 1
+
+    updated = repo.update_challenge(11, {'currentBalance': 9500, 'status': 'failed', 'id': 99}, '2024-01-02T00:00:00')
+    assert updated['current_balance'] == 9500 and updated['status'] == 'failed'
+    # Champ non modifiable ignoré
+    assert updated['id'] == 11 and repo.find_challenge(99) is None
+    assert repo.update_challenge(404, {'status': 'passed'}) is None
+    assert repo.version('challenges', 1) == challenges + 1
+
+    repo.add_trade({'id': 101, 'user_id': '1', 'symbol': 'TSLA'})
+    assert [t['id'] for t in repo.get_user_trades(1)] == [100, 101]
+    assert repo.version('trades', 1) == trades + 1
+
+
+def test_journal_replay_rebuilds_the_same_state():
+    repo = make_repository()
+    snapshot = copy.deepcopy(repo.to_dict())
+    records = []
+    repo.journal = records.append
+
+    user_id = repo.allocate_id()
+    repo.add_user({'id': user_id, 'email': 'jane@example.com', 'name': 'Jane'})
+    repo.create_default_challenge(user_id, '2024-01-01T00:00:00')
+    repo.update_challenge(user_id * 10 + 1, {'currentBalance': 10250}, '2024-01-03T00:00:00')
+    repo.add_trade({'id': repo.allocate_id(), 'user_id': user_id, 'symbol': 'IAM'})
+    assert [r['op'] for r in records] == ['add_user', 'add_challenge', 'update_challenge', 'add_trade']
+
+    replayed = InMemoryRepository()
+    replayed.load(snapshot['users'], snapshot['challenges'], snapshot['trades'], snapshot['next_id'])
+    for record in copy.deepcopy(records):
+        replayed.apply(record)
+    assert replayed.to_dict() == repo.to_dict()
+    assert replayed.find_user_by_email('jane@example.com')['id'] == user_id
+    assert replayed.find_challenge(user_id * 10 + 1)['current_balance'] == 10250
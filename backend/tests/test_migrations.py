@@ -0,0 +1,176 @@
+"""Migrations et plans des requêtes fréquentes sur une vraie base MySQL
+
+Chaque test crée puis supprime une base temporaire `tradesense_test_<pid>` ; ils sont
+ignorés si mysql.connector n'est pas installé ou si le serveur est injoignable.
+Connexion : TEST_DB_HOST (localhost), TEST_DB_PORT (3306), TEST_DB_USER (root),
+TEST_DB_PASSWORD (vide) ; l'utilisateur doit pouvoir créer des bases.
+"""
+import os
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+mysql = pytest.importorskip('mysql.connector')
+
+from migrations import MIGRATIONS, check_query_plans, migrate  # noqa: E402
+
+DB_CONFIG = {
+    'host': os.getenv('TEST_DB_HOST', 'localhost'),
+    'port': int(os.getenv('TEST_DB_PORT', '3306')),
+    'user': os.getenv('TEST_DB_USER', 'root'),
+    'password': os.getenv('TEST_DB_PASSWORD', ''),
+}
+
+# Assez de lignes pour que check_query_plans vérifie chaque plan (MIN_CHECKED_ROWS)
+USERS = 2000
+TRADES_PER_USER = 10
+
+BCRYPT_HASH = '$2a$10$' + 'N9qo8uLOickgx2ZMRZoMye' + 'IjZAgcfl7p92ldGxad68LJZdL17lhWy'
+
+LEGACY_TABLES = [
+    """
+    CREATE TABLE users (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(80) UNIQUE NOT NULL,
+        email VARCHAR(120) UNIQUE NOT NULL,
+        password VARCHAR(200) NOT NULL,
+        role VARCHAR(20) DEFAULT 'USER',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE challenges (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        user_id INT NOT NULL,
+        initial_balance DECIMAL(15, 2) NOT NULL,
+        current_balance DECIMAL(15, 2) NOT NULL,
+        profit_target DECIMAL(15, 2) NOT NULL,
+        max_total_loss DECIMAL(15, 2) NOT NULL,
+        status VARCHAR(20) DEFAULT 'ACTIVE',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE trades (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        challenge_id INT NOT NULL,
+        symbol VARCHAR(20) NOT NULL,
+        type ENUM('BUY', 'SELL') NOT NULL,
+        price DECIMAL(15, 6) NOT NULL,
+        quantity DECIMAL(15, 6) NOT NULL,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+        FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE
+    )
+    """,
+    "CREATE INDEX idx_user_email ON users(email)",
+    "CREATE INDEX idx_challenge_user ON challenges(user_id)",
+    "CREATE INDEX idx_trade_user ON trades(user_id)",
+]
+
+
+@pytest.fixture
+def database():
+    """(connexion, curseur, nom) d'une base vide, supprimée après le test"""
+    try:
+        connection = mysql.connect(**DB_CONFIG)
+    except mysql.Error as e:
+        pytest.skip(f"MySQL indisponible : {e}")
+    name = f"tradesense_test_{os.getpid()}"
+    cursor = connection.cursor(buffered=True)
+    cursor.execute(f"DROP DATABASE IF EXISTS {name}")
+    cursor.execute(f"CREATE DATABASE {name} CHARACTER SET utf8mb4")
+    connection.database = name
+    try:
+        yield connection, cursor, name
+    finally:
+        cursor.execute(f"DROP DATABASE IF EXISTS {name}")
+        cursor.close()
+        connection.close()
+
+
+def seed(connection, cursor):
+    """Utilisateurs, défis, trades, historique et sessions en volume réaliste"""
+    rng = random.Random(7)
+    start = datetime(2024, 1, 1)
+    cursor.executemany(
+        "INSERT INTO users (email, name, password_hash) VALUES (%s, %s, %s)",
+        [(f'user{i}@example.com', f'User {i}', BCRYPT_HASH) for i in range(1, USERS + 1)]
+    )
+    statuses = [rng.choice(('active', 'passed', 'failed')) for _ in range(USERS)]
+    cursor.executemany(
+        "INSERT INTO challenges (user_id, initial_balance, current_balance, status, max_daily_loss, "
+        "max_total_loss, profit_target, created_at) VALUES (%s, 10000, 10000, %s, 500, 1000, 1000, %s)",
+        [(i, statuses[i - 1], start + timedelta(hours=i)) for i in range(1, USERS + 1)]
+    )
+    cursor.executemany(
+        "INSERT INTO trades (user_id, challenge_id, symbol, type, price, quantity, timestamp, pnl) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+        [
+            (i, i, rng.choice(('AAPL', 'TSLA', 'BTC-USD', 'IAM')), rng.choice(('BUY', 'SELL')),
+             rng.uniform(10, 1000), rng.randrange(1, 100), start + timedelta(minutes=i * TRADES_PER_USER + n),
+             rng.uniform(-50, 50))
+            for i in range(1, USERS + 1) for n in range(TRADES_PER_USER)
+        ]
+    )
+    cursor.executemany(
+        "INSERT INTO challenge_history (user_id, challenge_id, initial_balance, final_balance, status, completed_at) "
+        "VALUES (%s, %s, 10000, 10000, %s, %s)",
+        [(i, i, statuses[i - 1], start + timedelta(days=1, hours=i))
+         for i in range(1, USERS + 1) if statuses[i - 1] != 'active']
+    )
+    cursor.executemany(
+        "INSERT INTO user_sessions (user_id, session_token, expires_at) VALUES (%s, %s, %s)",
+        [(i, os.urandom(32).hex(), datetime.now() + timedelta(days=1)) for i in range(1, USERS + 1)]
+    )
+    connection.commit()
+    cursor.execute("ANALYZE TABLE users, challenges, trades, challenge_history, user_sessions")
+
+
+def test_migrate_fresh_database_then_noop(database):
+    connection, cursor, name = database
+    assert migrate(connection, cursor, name) == [version for version, _, _ in MIGRATIONS]
+    assert migrate(connection, cursor, name) == []
+
+
+def test_hot_queries_use_their_index(database):
+    connection, cursor, name = database
+    migrate(connection, cursor, name)
+    seed(connection, cursor)
+
+    results = check_query_plans(cursor)
+    assert [(query, status) for query, status, _ in results if status != 'ok'] == []
+
+
+def test_legacy_schema_converges(database):
+    connection, cursor, name = database
+    for statement in LEGACY_TABLES:
+        cursor.execute(statement)
+    cursor.executemany(
+        "INSERT INTO users (username, email, password, role) VALUES (%s, %s, %s, %s)",
+        [('john_doe', 'john@example.com', BCRYPT_HASH, 'USER'),
+         ('jane_smith', 'jane@example.com', 'hashed_password_123', 'ADMIN')]
+    )
+    cursor.execute(
+        "INSERT INTO challenges (name, user_id, initial_balance, current_balance, profit_target, max_total_loss, status) "
+        "VALUES ('Demo', 1, 10000, 10000, 1000, 500, 'PASSED')"
+    )
+    connection.commit()
+
+    migrate(connection, cursor, name)
+
+    cursor.execute("SELECT email, name, password_hash, role FROM users ORDER BY id")
+    assert cursor.fetchall() == [
+        ('john@example.com', 'john_doe', BCRYPT_HASH, 'user'),
+        # Mot de passe en clair : pas de hash repris, la connexion sera refusée
+        ('jane@example.com', 'jane_smith', '', 'admin'),
+    ]
+    cursor.execute("SELECT status, max_daily_loss FROM challenges")
+    assert cursor.fetchall() == [('passed', 500)]
+    cursor.execute("SHOW INDEX FROM trades WHERE Key_name = 'idx_trade_user'")
+    assert cursor.fetchall() == []
+    assert migrate(connection, cursor, name) == []
@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip('bcrypt')
+
+from password_hashing import PasswordHasher, default_workers, hash_cost  # noqa: E402
+
+
+def test_hash_cost():
+    assert hash_cost('$2b$12$' + 'a' * 53) == 12
+    assert hash_cost('') is None
+    assert hash_cost(None) is None
+
+
+def test_unreadable_hash_is_invalid_credentials():
+    hasher = PasswordHasher(workers=1)
+    try:
+        # Comptes repris d'un ancien schéma : refus (401) sans passer par bcrypt
+        assert hasher.verify('password', '') is False
+        assert hasher.verify('password', 'hashed_password_123') is False
+        assert hasher.stats()['completed'] == 0
+    finally:
+        hasher.close()
+
+
+def test_default_workers_share_the_host(monkeypatch):
+    monkeypatch.setattr('os.cpu_count', lambda: 8)
+    assert default_workers() == 8
+    assert default_workers(4) == 2
+    assert default_workers(16) == 1
+    assert PasswordHasher(web_workers=4).workers == 2
+    assert PasswordHasher(workers=3, web_workers=4).workers == 3
@@ -0,0 +1,73 @@
+from decimal import Decimal
+
+from positions import LotQueue, Position, PositionCache, position_statements, positions_saved, to_price_units
+
+
+def test_fifo_realizes_oldest_lots_first():
+    p = Position(1, 'AAPL')
+    assert p.apply('BUY', 10, '100') == Decimal('0.00')
+    assert p.apply('BUY', 10, '110') == Decimal('0.00')
+    # 15 vendus : 10 à 100 puis 5 à 110
+    assert p.apply('SELL', 15, '120') == Decimal('250.00')
+    assert p.quantity == 5
+    assert p.average_cost() == Decimal('110.00000')
+    assert p.unrealized('100') == Decimal('-50.00')
+    assert len(p.lots) == 1
+
+
+def test_sell_through_zero_opens_short():
+    p = Position(1, 'TSLA')
+    p.apply('BUY', 5, '200.5')
+    assert p.apply('SELL', 8, '201') == Decimal('2.50')
+    assert p.quantity == -3
+    assert p.to_dict(mark_price=190)['side'] == 'SHORT'
+    # Rachat du découvert plus bas : gain
+    assert p.apply('BUY', 3, '190') == Decimal('33.00')
+    assert p.quantity == 0
+    assert p.average_cost() is None
+
+
+def test_prices_are_exact_units():
+    assert to_price_units('0.1') + to_price_units('0.2') == to_price_units('0.3')
+    p = Position(1, 'BTC-USD')
+    p.apply('BUY', 3, '0.1')
+    assert p.apply('SELL', 3, '0.2') == Decimal('0.30')
+
+
+def test_lot_queue_compacts_consumed_lots():
+    lots = LotQueue()
+    for n in range(100):
+        lots.push(1, n)
+    assert lots.consume(80) == sum(range(80))
+    assert len(lots) == 20
+    assert lots.head == 0 and len(lots.quantities) == 20
+    assert lots.head_lot() == (80, 1)
+    assert lots.next_seq == 100
+
+
+def test_statements_write_only_changes():
+    p = Position(1, 'AAPL')
+    p.apply('BUY', 10, '100')
+    p.apply('BUY', 10, '110')
+    statements = position_statements([p, Position(1, 'IAM')])
+    assert [sql.split()[0] for sql, _ in statements] == ['INSERT', 'INSERT']
+    assert statements[0][1] == [(1, 'AAPL', 0, 10, Decimal('100.00000')), (1, 'AAPL', 1, 10, Decimal('110.00000'))]
+
+    p._saved()
+    p.apply('SELL', 12, '120')
+    statements = dict((sql.split()[0], params) for sql, params in position_statements([p]))
+    assert statements['DELETE'] == [(1, 'AAPL', 1)]
+    assert statements['UPDATE'] == [(8, 1, 'AAPL', 1)]
+
+
+def test_cache_hands_a_position_to_one_request():
+    cache = PositionCache()
+    p = Position(1, 'AAPL')
+    p.apply('BUY', 1, '100')
+    positions_saved([p], cache)
+    assert cache.get((1, 'AAPL'), p.version()) is p
+    # Tant qu'elle n'est pas rendue après le commit, une autre requête la relit en base
+    assert cache.get((1, 'AAPL'), p.version()) is None
+    positions_saved([p], cache)
+    assert cache.get((1, 'AAPL'), (0, 0, 0)) is None
+    assert cache.stats() == {'entries': 0, 'hits': 1, 'loads': 2}
@@ -0,0 +1,127 @@
+"""Diffusion SSE : trades et soldes visibles seulement au commit, ticks du flux de marché"""
+import asyncio
+from datetime import datetime, timedelta
+
+from market_data import MarketData
+from pubsub import Broker, LiveFeed, TickPublisher, symbol_topic, user_topic
+
+NOW = datetime(2024, 1, 1, 12, 0, 0)
+
+
+class FakeDatabase:
+    """Trades et défis ; une ligne n'est lue qu'une fois « validée » (committed)"""
+
+    def __init__(self):
+        self.now = NOW
+        self.trades = {}
+        self.challenges = {}
+
+    def trade(self, trade_id, user_id=1, committed=True):
+        self.trades[trade_id] = ({'id': trade_id, 'user_id': user_id}, committed)
+
+    def challenge(self, challenge_id, balance, updated_at, committed=True, user_id=1):
+        self.challenges[challenge_id] = ({'id': challenge_id, 'user_id': user_id, 'current_balance': balance,
+                                          'status': 'active', 'updated_at': updated_at}, committed)
+
+    def commit_all(self):
+        self.trades = {k: (row, True) for k, (row, _) in self.trades.items()}
+        self.challenges = {k: (row, True) for k, (row, _) in self.challenges.items()}
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    async def execute(self, sql, params=()):
+        trades = sorted((row for row, committed in self.db.trades.values() if committed), key=lambda r: r['id'])
+        if 'MAX(id)' in sql:
+            self.rows = [{'last_id': max([r['id'] for r in trades], default=0), 'now': self.db.now}]
+        elif 'id IN' in sql:
+            self.rows = [r for r in trades if r['id'] in params]
+        elif 'FROM trades' in sql:
+            self.rows = [r for r in trades if r['id'] > params[0]][:params[1]]
+        else:
+            self.rows = [row for row, committed in self.db.challenges.values()
+                         if committed and row['updated_at'] >= params[0]]
+
+    async def fetchone(self):
+        return self.rows[0]
+
+    async def fetchall(self):
+        return self.rows
+
+
+def events(subscriber):
+    async def drain():
+        return await subscriber.next_batch(0)
+    return [payload.split(b'\n')[1] for payload in asyncio.run(drain())]
+
+
+def test_trade_committed_after_a_higher_id_is_published():
+    db = FakeDatabase()
+    broker = Broker()
+    subscriber = broker.subscribe([user_topic(1)])
+    feed = LiveFeed(broker, overlap=30)
+    cursor = FakeCursor(db)
+    poll = lambda now: asyncio.run(feed.poll(cursor, now))  # noqa: E731
+
+    assert poll(0) == 0
+    db.trade(1, committed=False)
+    db.trade(2)
+    assert poll(1) == 1
+    db.commit_all()
+    # Trade 1 relu parmi les trous, publié une seule fois
+    assert poll(2) == 1
+    assert poll(3) == 0
+    assert events(subscriber) == [b'event: trade'] * 2
+    assert feed.late_trades == 1
+
+
+def test_missing_ids_are_dropped_after_the_overlap():
+    db = FakeDatabase()
+    feed = LiveFeed(Broker(), overlap=30)
+    feed.broker.subscribe([user_topic(1)])
+    cursor = FakeCursor(db)
+    asyncio.run(feed.poll(cursor, 0))
+    db.trade(5)
+    asyncio.run(feed.poll(cursor, 1))
+    assert list(feed._gaps) == [1, 2, 3, 4]
+    asyncio.run(feed.poll(cursor, 40))
+    assert not feed._gaps
+
+
+def test_balance_committed_after_the_watermark_is_published_once():
+    db = FakeDatabase()
+    broker = Broker()
+    subscriber = broker.subscribe([user_topic(1)])
+    feed = LiveFeed(broker, overlap=30)
+    cursor = FakeCursor(db)
+    asyncio.run(feed.poll(cursor, 0))
+
+    # updated_at pris avant le filigrane suivant, commit après sa lecture
+    db.challenge(7, 9500, NOW + timedelta(seconds=1), committed=False)
+    db.now = NOW + timedelta(seconds=2)
+    assert asyncio.run(feed.poll(cursor, 2)) == 0
+    db.commit_all()
+    db.now = NOW + timedelta(seconds=3)
+    assert asyncio.run(feed.poll(cursor, 3)) == 1
+    db.now = NOW + timedelta(seconds=4)
+    assert asyncio.run(feed.poll(cursor, 4)) == 0
+    assert events(subscriber) == [b'event: challenge']
+
+
+def test_market_ticks_reach_subscribers():
+    market = MarketData()
+    broker = Broker()
+    subscriber = broker.subscribe([symbol_topic('AAPL')])
+    publisher = TickPublisher(broker, market)
+    assert publisher.poll() == 0
+    market.ingest('AAPL', 190.5, 10, ts=100)
+    market.ingest('IAM', 120, 1, ts=100)
+    assert publisher.poll() == 1
+    assert publisher.poll() == 0
+    # Tick en retard, ramené à la date du précédent : publié quand même
+    market.ingest('AAPL', 191, 5, ts=50)
+    assert publisher.poll() == 1
+    assert events(subscriber) == [b'event: tick']
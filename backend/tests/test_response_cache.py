@@ -0,0 +1,49 @@
+"""Invalidation des caches de réponses pendant une lecture concurrente
+
+Le test Redis utilise le serveur de TEST_REDIS_URL (redis://localhost:6379/15 par défaut,
+base vidée) et est ignoré si le paquet redis manque ou si le serveur est injoignable.
+"""
+import os
+
+import pytest
+
+from response_cache import CachedBody, LRUCache, RedisCache, user_challenges_key
+
+BODY = CachedBody('"v1"', b'[]')
+
+
+def test_lru_skips_value_read_before_invalidation():
+    cache = LRUCache()
+    key = user_challenges_key(1)
+    generation = cache.generation(key)
+    cache.delete(key)
+    cache.set(key, BODY, generation)
+    assert cache.get(key) is None
+
+    cache.set(key, BODY, cache.generation(key))
+    assert cache.get(key).etag == '"v1"'
+
+
+@pytest.fixture
+def redis_caches():
+    """Deux caches Redis indépendants, comme deux workers gunicorn"""
+    redis = pytest.importorskip('redis')
+    url = os.getenv('TEST_REDIS_URL', 'redis://localhost:6379/15')
+    try:
+        redis.Redis.from_url(url).flushdb()
+    except redis.RedisError as e:
+        pytest.skip(f"Redis indisponible : {e}")
+    yield RedisCache(url, prefix='test:'), RedisCache(url, prefix='test:')
+    redis.Redis.from_url(url).flushdb()
+
+
+def test_redis_skips_value_read_before_other_worker_invalidation(redis_caches):
+    reader, writer = redis_caches
+    key = user_challenges_key(1)
+    generation = reader.generation(key)
+    writer.delete(key)
+    reader.set(key, BODY, generation)
+    assert writer.get(key) is None
+
+    reader.set(key, BODY, reader.generation(key))
+    assert writer.get(key).etag == '"v1"'
@@ -0,0 +1,137 @@
+"""Aller-retour dans l'archive en colonnes : mêmes lignes et même ordre que la requête MySQL"""
+import os
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from trade_archive import WALL_EPOCH, TradeArchive, row_key, to_wall
+from trade_query import TradeHistoryQuery, encode_cursor
+
+BASE = datetime(2024, 1, 1)
+
+
+def make_rows(n=3000):
+    """Lignes au format de archive_rows_query, sur trois mois"""
+    rng = random.Random(1)
+    rows = []
+    for i in range(1, n + 1):
+        wall = to_wall(BASE + timedelta(seconds=rng.randrange(0, 90 * 86400)))
+        rows.append((i, rng.randrange(1, 6), rng.randrange(1, 15), rng.choice(['AAPL', 'IAM', 'TSLA']),
+                     rng.choice(['BUY', 'SELL']), rng.randrange(1, 10 ** 8), rng.randrange(1, 100),
+                     wall - 3600, wall, None if i % 50 == 0 else rng.randrange(-10 ** 5, 10 ** 5)))
+    return rows
+
+
+def expected_keys(history, rows):
+    """Clés (timestamp, id) que renverrait history.sql() sans pagination"""
+    keys = []
+    for row in rows:
+        key = (WALL_EPOCH + timedelta(seconds=row[8]), row[0])
+        if row[1] != history.user_id:
+            continue
+        if history.challenge_id is not None and row[2] != history.challenge_id:
+            continue
+        if history.symbol and row[3] != history.symbol:
+            continue
+        if history.date_from and key[0] < history.date_from:
+            continue
+        if history.date_to and key[0] >= history.date_to:
+            continue
+        if history.before and not key < history.before:
+            continue
+        if history.after and not key > history.after:
+            continue
+        keys.append(key)
+    keys.sort(reverse=history.after is None)
+    return keys
+
+
+@pytest.fixture(scope='module')
+def archived(tmp_path_factory):
+    rows = make_rows()
+    archive = TradeArchive(str(tmp_path_factory.mktemp('archive')))
+    assert archive.append(rows[:1500]) == 1500
+    # Archivage rejoué en partie : les trades déjà archivés sont ignorés
+    assert archive.append(rows[1000:]) == 1500
+    return archive, rows
+
+
+def test_layout(archived):
+    archive, rows = archived
+    stats = archive.stats()
+    assert stats['rows'] == len(rows)
+    assert stats['months'] == ['2024-01', '2024-02', '2024-03']
+    assert archive.refresh().generation == 2
+
+
+@pytest.mark.parametrize('args', [
+    {},
+    {'challenge_id': '3'},
+    {'symbol': 'IAM', 'limit': '7'},
+    {'from': '2024-02-01', 'to': '2024-02-15'},
+    {'before': encode_cursor(BASE + timedelta(days=40), 1500)},
+    {'after': encode_cursor(BASE + timedelta(days=40), 1500), 'limit': '5'},
+])
+@pytest.mark.parametrize('user_id', [1, 3])
+def test_history_matches_sql_order(archived, args, user_id):
+    archive, rows = archived
+    snapshot = archive.refresh()
+    history = TradeHistoryQuery(user_id, args)
+    expected = expected_keys(history, rows)
+
+    assert [row_key(r) for r in snapshot.history_rows(history)] == expected[:history.limit + 1]
+    assert [row_key(r) for r in snapshot.history_rows(history, paginate=False)] == expected
+
+    # Trades pairs encore en base : fusion sans doublon, page et export
+    live = [{'id': r[0], 'timestamp': WALL_EPOCH + timedelta(seconds=r[8])} for r in rows if r[0] % 2 == 0]
+    live = sorted((row for row in live if row_key(row) in set(expected)),
+                  key=row_key, reverse=history.after is None)
+    assert [row_key(r) for r in snapshot.merge_page(history, live[:history.limit + 1])] == expected[:history.limit + 1]
+    batches = [live[i:i + 7] for i in range(0, len(live), 7)]
+    merged = [row_key(r) for batch in snapshot.merged_batches(iter(batches), history) for r in batch]
+    assert merged == expected
+
+
+def test_rows_keep_mysql_types(archived):
+    archive, rows = archived
+    source = {row[0]: row for row in rows}
+    for row in archive.refresh().history_rows(TradeHistoryQuery(2, {'limit': '100'})):
+        original = source[row['id']]
+        assert row['price'] == Decimal(original[5]).scaleb(-5)
+        assert row['pnl'] == (None if original[9] is None else Decimal(original[9]).scaleb(-2))
+        assert (row['symbol'], row['type'], row['quantity']) == original[3:5] + (original[6],)
+
+
+def test_challenge_columns(archived):
+    archive, rows = archived
+    ts, pnl, symbols, ids = archive.refresh().challenge_columns(2, 5)
+    selected = sorted((r[7], r[0]) for r in rows if r[1] == 2 and r[2] == 5)
+    assert list(zip(ts.tolist(), ids.tolist())) == [(float(t), i) for t, i in selected]
+    assert archive.refresh().challenge_columns(2, 999) is None
+    assert archive.refresh().archived_ids([1, 3000, 3001]) == {1, 3000}
+
+
+def test_snapshot_is_stable_while_archive_grows(tmp_path):
+    archive = TradeArchive(str(tmp_path))
+    rows = make_rows(200)
+    archive.append(rows[:100])
+    snapshot = archive.refresh()
+    archive.append(rows[100:])
+    assert sum(part.entry['rows'] for part in snapshot.parts) == 100
+    assert archive.refresh().generation == snapshot.generation + 1
+
+
+@pytest.mark.parametrize('quantity', [Decimal('2.5'), -1, 2 ** 31])
+def test_non_integer_quantity_aborts_before_writing(tmp_path, quantity):
+    archive = TradeArchive(str(tmp_path))
+    rows = make_rows(10)
+    rows[4] = rows[4][:6] + (quantity,) + rows[4][7:]
+    with pytest.raises(ValueError):
+        archive.append(rows)
+    assert archive.refresh().generation == 0
+    assert os.listdir(tmp_path) == []
+    # Quantité DECIMAL entière d'un ancien schéma : acceptée
+    rows[4] = rows[4][:6] + (Decimal('3.000'),) + rows[4][7:]
+    assert archive.append(rows) == 10
@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import pytest
+
+from trade_query import MAX_PAGE_SIZE, TradeHistoryQuery, decode_cursor, encode_cursor
+
+
+def trade(trade_id, minute):
+    return {'id': trade_id, 'timestamp': datetime(2024, 1, 1, 12, minute), 'symbol': 'AAPL'}
+
+
+def test_cursor_round_trip():
+    ts = datetime(2024, 3, 1, 9, 30, 15)
+    assert decode_cursor(encode_cursor(ts, 42)) == (ts, 42)
+
+
+@pytest.mark.parametrize('cursor', ['', '!!!', encode_cursor(datetime(2024, 1, 1), 1)[:-3]])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize('args', [
+    {'limit': 'abc'},
+    {'limit': '0'},
+    {'limit': str(MAX_PAGE_SIZE + 1)},
+    {'before': encode_cursor(datetime(2024, 1, 1), 1), 'after': encode_cursor(datetime(2024, 1, 1), 1)},
+    {'challenge_id': 'x'},
+    {'from': 'hier'},
+    {'fields': 'id,password_hash'},
+])
+def test_invalid_arguments(args):
+    with pytest.raises(ValueError):
+        TradeHistoryQuery(1, args)
+
+
+def test_sql_filters_and_keyset():
+    before = datetime(2024, 1, 1, 12, 30)
+    query = TradeHistoryQuery(7, {
+        'challenge_id': '3', 'symbol': 'AAPL', 'fields': 'symbol,pnl,symbol',
+        'before': encode_cursor(before, 10), 'limit': '20',
+    })
+    sql, params = query.sql()
+    assert sql.startswith('SELECT id, timestamp, symbol, pnl FROM trades WHERE user_id = %s AND challenge_id = %s')
+    assert '(timestamp < %s OR (timestamp = %s AND id < %s))' in sql
+    assert sql.endswith('ORDER BY timestamp DESC, id DESC LIMIT %s')
+    assert params == [7, 3, 'AAPL', before, before, 10, 21]
+
+    sql, params = TradeHistoryQuery(7, {'after': encode_cursor(before, 10)}).sql(paginate=False)
+    assert sql.endswith('ORDER BY timestamp ASC, id ASC')
+    assert params == [7, before, before, 10]
+
+
+def test_page_cursors_walk_back_and_forth():
+    rows = [trade(i, i) for i in range(5, 0, -1)]
+    query = TradeHistoryQuery(1, {'limit': '2', 'fields': 'id'})
+    trades, next_cursor, prev_cursor = query.page(rows[:3])
+    assert trades == [{'id': 5}, {'id': 4}]
+    assert prev_cursor is None
+    assert decode_cursor(next_cursor) == (rows[1]['timestamp'], 4)
+
+    # Page suivante (plus ancienne), puis retour en arrière avec `after`
+    older = TradeHistoryQuery(1, {'limit': '2', 'fields': 'id', 'before': next_cursor})
+    trades, next_cursor, prev_cursor = older.page(rows[2:5])
+    assert trades == [{'id': 3}, {'id': 2}]
+    newer = TradeHistoryQuery(1, {'limit': '2', 'fields': 'id', 'after': prev_cursor})
+    # Lignes dans l'ordre de sql() : croissant pour `after`
+    trades, _, prev_cursor = newer.page([trade(4, 4), trade(5, 5)])
+    assert trades == [{'id': 5}, {'id': 4}]
+    assert prev_cursor is None
+
+
+def test_project_formats_timestamp():
+    query = TradeHistoryQuery(1, {'fields': 'timestamp'})
+    assert query.project(trade(1, 5)) == {'timestamp': '2024-01-01T12:05:00'}
@@ -0,0 +1,114 @@
+"""Journal des mutations du serveur sans base : rejeu, fin tronquée, compaction, corruption"""
+import json
+import os
+
+import pytest
+
+from wal_store import CorruptLog, WriteAheadLog
+
+
+def make_wal(tmp_path):
+    return WriteAheadLog(str(tmp_path / 'data.json'), str(tmp_path / 'data.log'), flush_interval=0)
+
+
+def reopen(tmp_path):
+    """Rouvrir comme au démarrage ; retourne (wal, instantané, mutations rejouées)"""
+    wal = make_wal(tmp_path)
+    snapshots, records = [], []
+    wal.open(snapshots.append, records.append)
+    return wal, snapshots, records
+
+
+def write_records(tmp_path, values):
+    wal, _, _ = reopen(tmp_path)
+    for value in values:
+        wal.append({'value': value})
+    wal.sync()
+    wal.close()
+
+
+def test_replay_after_restart(tmp_path):
+    write_records(tmp_path, ['a', 'b', 'c'])
+    wal, snapshots, records = reopen(tmp_path)
+    assert snapshots == []
+    assert [(r['seq'], r['value']) for r in records] == [(1, 'a'), (2, 'b'), (3, 'c')]
+    # La numérotation reprend après le dernier enregistrement rejoué
+    assert wal.append({'value': 'd'}) == 4
+    wal.close()
+
+
+def test_torn_final_record_is_truncated(tmp_path):
+    write_records(tmp_path, ['a', 'b'])
+    log_path = tmp_path / 'data.log'
+    intact = log_path.read_bytes()
+    with open(log_path, 'ab') as f:
+        f.write(b'{"value":"c","se')
+
+    wal, _, records = reopen(tmp_path)
+    assert [r['value'] for r in records] == ['a', 'b']
+    assert log_path.read_bytes() == intact
+    wal.append({'value': 'c'})
+    wal.sync()
+    wal.close()
+    assert [r['value'] for r in reopen(tmp_path)[2]] == ['a', 'b', 'c']
+
+
+def test_corrupt_middle_record_fails_without_truncating(tmp_path):
+    write_records(tmp_path, ['a', 'b', 'c'])
+    log_path = tmp_path / 'data.log'
+    lines = log_path.read_bytes().splitlines(keepends=True)
+    damaged = lines[0] + b'#garbage#\n' + lines[2]
+    log_path.write_bytes(damaged)
+
+    with pytest.raises(CorruptLog):
+        reopen(tmp_path)
+    # Rien n'est retiré : les enregistrements suivants restent récupérables
+    assert log_path.read_bytes() == damaged
+
+
+def test_sequence_gap_is_corruption(tmp_path):
+    write_records(tmp_path, ['a', 'b', 'c'])
+    log_path = tmp_path / 'data.log'
+    lines = log_path.read_bytes().splitlines(keepends=True)
+    log_path.write_bytes(lines[0] + lines[2])
+
+    with pytest.raises(CorruptLog):
+        reopen(tmp_path)
+
+
+def test_compaction_replaces_log_with_snapshot(tmp_path):
+    wal, _, _ = reopen(tmp_path)
+    wal.append({'value': 'a'})
+    wal.append({'value': 'b'})
+    wal.compact({'values': ['a', 'b']})
+    assert os.path.getsize(tmp_path / 'data.log') == 0
+    wal.append({'value': 'c'})
+    wal.sync()
+    wal.close()
+
+    wal, snapshots, records = reopen(tmp_path)
+    assert snapshots == [{'values': ['a', 'b'], 'log_seq': 2}]
+    assert [(r['seq'], r['value']) for r in records] == [(3, 'c')]
+    wal.close()
+
+
+def test_records_covered_by_snapshot_are_skipped(tmp_path):
+    # Compaction interrompue après l'instantané, avant de vider le journal
+    write_records(tmp_path, ['a', 'b', 'c'])
+    (tmp_path / 'data.json').write_text(json.dumps({'values': ['a', 'b'], 'log_seq': 2}))
+    _, _, records = reopen(tmp_path)
+    assert [r['value'] for r in records] == ['c']
+
+
+def test_quarantine_moves_files_aside(tmp_path):
+    write_records(tmp_path, ['a'])
+    (tmp_path / 'data.json').write_text('{"values": [')
+    wal = make_wal(tmp_path)
+    with pytest.raises(ValueError):
+        wal.open(lambda data: None, lambda record: None)
+
+    moved = wal.quarantine()
+    assert len(moved) == 2
+    assert not (tmp_path / 'data.json').exists() and not (tmp_path / 'data.log').exists()
+    assert sorted(os.path.basename(path).split('.corrupt-')[0] for path in moved) == ['data.json', 'data.log']
+    assert open(moved[0]).read() == '{"values": ['
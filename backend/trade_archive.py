@@ -0,0 +1,496 @@
+import heapq
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+
+# Une colonne par fichier .npy (lu par np.load(mmap_mode='r'), sans copie) :
+# prix en entiers de 1e-5 (DECIMAL(15,5)), PnL en centimes (DECIMAL(15,2)),
+# `ts` en secondes epoch (analyses) et `wall` en secondes de l'heure de session
+# MySQL, telle que la renvoie le curseur (API, curseurs de pagination).
+ARCHIVE_COLUMNS = {
+    'id': np.int64,
+    'user_id': np.int32,
+    'challenge_id': np.int32,
+    'type': np.int8,
+    'price': np.int64,
+    'quantity': np.int32,
+    'ts': np.int64,
+    'wall': np.int64,
+    'pnl': np.int64,
+}
+TRADE_TYPES = ('BUY', 'SELL')
+# PnL NULL en base
+PNL_NULL = np.iinfo(np.int64).min
+WALL_EPOCH = datetime(1970, 1, 1)
+QUANTITY_MAX = int(np.iinfo(ARCHIVE_COLUMNS['quantity']).max)
+MANIFEST = 'manifest.json'
+ARCHIVE_LOCK = 'tradesense_trade_archive'
+
+ARCHIVE_CANDIDATES_QUERY = """
+    SELECT c.id FROM challenges c
+    WHERE c.status IN ('passed', 'failed')
+      AND c.updated_at < NOW() - INTERVAL %s DAY AND c.id > %s
+      AND EXISTS (SELECT 1 FROM trades t WHERE t.challenge_id = c.id)
+    ORDER BY c.id
+    LIMIT %s
+"""
+
+
+def archive_rows_query(challenge_ids):
+    """Trades des défis à archiver, déjà convertis par MySQL dans les types des colonnes
+
+    `quantity` est lue telle quelle (DECIMAL sur les anciens schémas) : check_quantities
+    refuse une valeur non entière plutôt que de la tronquer.
+    """
+    placeholders = ', '.join(['%s'] * len(challenge_ids))
+    return f"""
+        SELECT id, user_id, challenge_id, symbol, type, CAST(price * 100000 AS SIGNED), quantity,
+               UNIX_TIMESTAMP(timestamp), TIMESTAMPDIFF(SECOND, '1970-01-01', timestamp),
+               CAST(pnl * 100 AS SIGNED)
+        FROM trades
+        WHERE challenge_id IN ({placeholders})
+    """, list(challenge_ids)
+
+
+def check_quantities(rows):
+    """Lever ValueError si une quantité n'est pas un entier représentable en int32"""
+    for row in rows:
+        quantity = row[6]
+        if quantity != int(quantity) or not 0 <= quantity <= QUANTITY_MAX:
+            raise ValueError(f"Trade {row[0]} : quantité {quantity} non archivable (entier int32 attendu)")
+
+
+def delete_archived_query(challenge_ids, last_id):
+    """Supprimer les trades archivés ; `last_id` protège un trade arrivé après la lecture (défi rouvert)"""
+    placeholders = ', '.join(['%s'] * len(challenge_ids))
+    return (f"DELETE FROM trades WHERE challenge_id IN ({placeholders}) AND id <= %s",
+            list(challenge_ids) + [last_id])
+
+
+def fsync_dir(path):
+    """Rendre durables les créations et renommages faits dans `path`"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def to_wall(value):
+    """datetime (naïf, heure de session) -> secondes de la colonne `wall`"""
+    return int((value.replace(tzinfo=None) - WALL_EPOCH).total_seconds())
+
+
+def row_key(row):
+    return row['timestamp'], row['id']
+
+
+class ArchivePart:
+    """Fichier colonne immuable d'un mois : trades triés par (user_id, challenge_id, wall, id)"""
+
+    def __init__(self, root, entry):
+        self.path = os.path.join(root, entry['path'])
+        self.entry = entry
+        self._columns = {}
+        self._symbols = None
+        self._symbol_array = None
+
+    def column(self, name):
+        array = self._columns.get(name)
+        if array is None:
+            array = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+            self._columns[name] = array
+        return array
+
+    @property
+    def symbols(self):
+        if self._symbols is None:
+            with open(os.path.join(self.path, 'symbols.json'), encoding='utf-8') as f:
+                self._symbols = json.load(f)
+        return self._symbols
+
+    @property
+    def symbol_array(self):
+        if self._symbol_array is None:
+            self._symbol_array = np.asarray(self.symbols, dtype='U20')
+        return self._symbol_array
+
+    def user_slice(self, user_id):
+        if not self.entry['first_user'] <= user_id <= self.entry['last_user']:
+            return 0, 0
+        users = self.column('user_id')
+        return int(np.searchsorted(users, user_id, 'left')), int(np.searchsorted(users, user_id, 'right'))
+
+    def select(self, history):
+        """Indices des trades de la requête d'historique, dans l'ordre de la page"""
+        entry = self.entry
+        if history.date_from is not None and entry['last_wall'] < to_wall(history.date_from):
+            return np.empty(0, dtype=np.int64)
+        if history.date_to is not None and entry['first_wall'] >= to_wall(history.date_to):
+            return np.empty(0, dtype=np.int64)
+        lo, hi = self.user_slice(history.user_id)
+        if lo == hi:
+            return np.empty(0, dtype=np.int64)
+
+        if history.challenge_id is not None:
+            # Trades d'un défi contigus dans la tranche de l'utilisateur
+            challenges = self.column('challenge_id')[lo:hi]
+            lo, hi = (lo + int(np.searchsorted(challenges, history.challenge_id, 'left')),
+                      lo + int(np.searchsorted(challenges, history.challenge_id, 'right')))
+        wall = self.column('wall')[lo:hi]
+        ids = self.column('id')[lo:hi]
+        mask = np.ones(hi - lo, dtype=bool)
+        if history.symbol is not None:
+            if history.symbol not in self.symbols:
+                return np.empty(0, dtype=np.int64)
+            mask &= self.column('symbol')[lo:hi] == self.symbols.index(history.symbol)
+        if history.date_from is not None:
+            mask &= wall >= to_wall(history.date_from)
+        if history.date_to is not None:
+            mask &= wall < to_wall(history.date_to)
+        if history.before is not None:
+            at = to_wall(history.before[0])
+            mask &= (wall < at) | ((wall == at) & (ids < history.before[1]))
+        elif history.after is not None:
+            at = to_wall(history.after[0])
+            mask &= (wall > at) | ((wall == at) & (ids > history.after[1]))
+
+        selected = np.flatnonzero(mask)
+        order = selected[np.lexsort((ids[selected], wall[selected]))]
+        if history.after is None:
+            order = order[::-1]
+        return order + lo
+
+    def rows(self, indices):
+        """Lignes au format du curseur MySQL (dictionnaires, Decimal, datetime naïf)"""
+        columns = {name: self.column(name)[indices].tolist() for name in ARCHIVE_COLUMNS}
+        symbols = self.symbols
+        codes = self.column('symbol')[indices].tolist()
+        return [{
+            'id': columns['id'][i],
+            'user_id': columns['user_id'][i],
+            'challenge_id': columns['challenge_id'][i],
+            'symbol': symbols[codes[i]],
+            'type': TRADE_TYPES[columns['type'][i]],
+            'price': Decimal(columns['price'][i]).scaleb(-5),
+            'quantity': columns['quantity'][i],
+            'timestamp': WALL_EPOCH + timedelta(seconds=columns['wall'][i]),
+            'pnl': None if columns['pnl'][i] == PNL_NULL else Decimal(columns['pnl'][i]).scaleb(-2),
+        } for i in range(len(codes))]
+
+    def iter_rows(self, indices, size=500):
+        for offset in range(0, len(indices), size):
+            yield from self.rows(indices[offset:offset + size])
+
+    def challenge_slice(self, user_id, challenge_id):
+        lo, hi = self.user_slice(user_id)
+        challenges = self.column('challenge_id')[lo:hi]
+        return (lo + int(np.searchsorted(challenges, challenge_id, 'left')),
+                lo + int(np.searchsorted(challenges, challenge_id, 'right')))
+
+
+class ArchiveSnapshot:
+    """Parties de l'archive publiées à une génération donnée (immuable)"""
+
+    def __init__(self, generation, parts):
+        self.generation = generation
+        self.parts = parts
+
+    def history_rows(self, history, paginate=True):
+        """Trades archivés d'une requête d'historique, dans l'ordre de TradeHistoryQuery.sql()
+
+        Avec `paginate`, une liste d'au plus `limit + 1` lignes ; sinon un itérateur sur
+        tout l'historique archivé, fusionné partie par partie sans tout charger.
+        """
+        selections = [(part, part.select(history)) for part in self.parts]
+        selections = [(part, indices) for part, indices in selections if len(indices)]
+        descending = history.after is None
+        if paginate:
+            # Choisir la page sur les clés (wall, id) avant de construire les lignes
+            selections = [(part, indices[:history.limit + 1]) for part, indices in selections]
+            if len(selections) > 1:
+                wall = np.concatenate([part.column('wall')[indices] for part, indices in selections])
+                ids = np.concatenate([part.column('id')[indices] for part, indices in selections])
+                owner = np.repeat(np.arange(len(selections)), [len(indices) for _, indices in selections])
+                order = np.lexsort((ids, wall))
+                kept = (order[::-1] if descending else order)[:history.limit + 1]
+                offsets = np.concatenate(([0], np.cumsum([len(indices) for _, indices in selections])))
+                selections = [(part, indices[np.sort(kept[owner[kept] == n]) - offsets[n]])
+                              for n, (part, indices) in enumerate(selections)]
+            rows = []
+            for part, indices in selections:
+                rows.extend(part.rows(indices))
+            rows.sort(key=row_key, reverse=descending)
+            return rows
+        return heapq.merge(*(part.iter_rows(indices) for part, indices in selections),
+                           key=row_key, reverse=descending)
+
+    def merge_page(self, history, rows):
+        """Compléter une page lue en base (history.sql()) avec les trades archivés"""
+        archived = self.history_rows(history)
+        if not archived:
+            return rows
+        live = {row['id'] for row in rows}
+        rows = list(rows) + [row for row in archived if row['id'] not in live]
+        rows.sort(key=row_key, reverse=history.after is None)
+        return rows[:history.limit + 1]
+
+    def merged_batches(self, batches, history):
+        """Fusionner les paquets d'un curseur (history.sql(paginate=False)) avec l'archive"""
+        merger = _BatchMerger(self.history_rows(history, paginate=False), history.after is None)
+        for rows in batches:
+            yield merger.merge(rows)
+        yield from merger.rest()
+
+    async def amerged_batches(self, batches, history):
+        """Version asynchrone de merged_batches"""
+        merger = _BatchMerger(self.history_rows(history, paginate=False), history.after is None)
+        async for rows in batches:
+            yield merger.merge(rows)
+        for rows in merger.rest():
+            yield rows
+
+    def challenge_columns(self, user_id, challenge_id):
+        """Colonnes (ts, pnl, symbol, id) archivées d'un défi, comme columns_from_rows, triées par (ts, id)"""
+        ts, pnl, symbols, ids = [], [], [], []
+        for part in self.parts:
+            lo, hi = part.challenge_slice(user_id, challenge_id)
+            if lo == hi:
+                continue
+            ts.append(part.column('ts')[lo:hi])
+            cents = part.column('pnl')[lo:hi]
+            pnl.append(np.where(cents == PNL_NULL, 0, cents) / 100.0)
+            symbols.append(part.symbol_array[part.column('symbol')[lo:hi]])
+            ids.append(part.column('id')[lo:hi])
+        if not ts:
+            return None
+        ts = np.concatenate(ts).astype(np.float64)
+        ids = np.concatenate(ids)
+        order = np.lexsort((ids, ts))
+        return ts[order], np.concatenate(pnl)[order], np.concatenate(symbols)[order], ids[order]
+
+    def archived_ids(self, ids):
+        """Ids déjà présents dans l'archive (archivage interrompu avant la suppression en base)"""
+        ids = np.asarray(ids, dtype=np.int64)
+        found = np.zeros(len(ids), dtype=bool)
+        for part in self.parts:
+            overlap = (ids >= part.entry['first_id']) & (ids <= part.entry['last_id'])
+            if overlap.any():
+                found |= overlap & np.isin(ids, part.column('id'))
+        return set(ids[found].tolist())
+
+
+class TradeArchive:
+    """Trades des défis terminés, déplacés de la table `trades` vers des fichiers colonnes
+
+    Un répertoire par mois (`AAAA-MM/part-<premier id>-<dernier id>/`), un fichier
+    .npy par colonne et les symboles encodés par dictionnaire (symbols.json). Les
+    parties ne sont jamais modifiées : chaque archivage en ajoute de nouvelles et
+    réécrit atomiquement manifest.json, relu par les lecteurs quand il change.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.snapshot = ArchiveSnapshot(0, [])
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Instantané à jour de l'archive (manifeste relu s'il a changé)
+
+        Une requête lit tout (génération pour l'ETag, trades) dans le même instantané.
+        """
+        try:
+            stat = os.stat(os.path.join(self.root, MANIFEST))
+        except FileNotFoundError:
+            self.snapshot, self._stamp = ArchiveSnapshot(0, []), None
+            return self.snapshot
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    with open(os.path.join(self.root, MANIFEST), encoding='utf-8') as f:
+                        manifest = json.load(f)
+                    known = {part.entry['path']: part for part in self.snapshot.parts}
+                    parts = [known.get(entry['path']) or ArchivePart(self.root, entry)
+                             for entry in manifest['parts']]
+                    self.snapshot = ArchiveSnapshot(manifest['generation'], parts)
+                    self._stamp = stamp
+        return self.snapshot
+
+    def append(self, rows):
+        """Écrire les lignes de archive_rows_query dans de nouvelles parties ; retourne le nombre écrit
+
+        Un seul processus à la fois (verrou MySQL pris par archive_closed_challenges).
+        Une quantité non entière lève ValueError avant toute écriture.
+        """
+        check_quantities(rows)
+        snapshot = self.refresh()
+        skip = snapshot.archived_ids([row[0] for row in rows])
+        rows = [row for row in rows if row[0] not in skip]
+        if not rows:
+            return 0
+
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        wall = np.array([row[8] for row in rows], dtype=np.int64)
+        months = wall.astype('datetime64[s]').astype('datetime64[M]').astype(str)
+        entries = []
+        for month in np.unique(months):
+            selected = np.flatnonzero(months == month)
+            entries.append(self._write_part(month, [rows[i] for i in selected]))
+
+        manifest = {
+            'generation': snapshot.generation + 1,
+            'parts': [part.entry for part in snapshot.parts] + entries,
+        }
+        tmp = os.path.join(self.root, f'.{MANIFEST}.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.root, MANIFEST))
+        # Manifeste durable avant que l'appelant ne supprime les trades de la base
+        fsync_dir(self.root)
+        self.refresh()
+        return len(ids)
+
+    def _write_part(self, month, rows):
+        columns = {
+            'id': [row[0] for row in rows],
+            'user_id': [row[1] for row in rows],
+            'challenge_id': [row[2] for row in rows],
+            'type': [TRADE_TYPES.index(row[4]) for row in rows],
+            'price': [row[5] for row in rows],
+            'quantity': [row[6] for row in rows],
+            'ts': [int(row[7]) for row in rows],
+            'wall': [row[8] for row in rows],
+            'pnl': [PNL_NULL if row[9] is None else row[9] for row in rows],
+        }
+        columns = {name: np.array(values, dtype=ARCHIVE_COLUMNS[name]) for name, values in columns.items()}
+        symbols, codes = np.unique(np.array([row[3] for row in rows], dtype=object), return_inverse=True)
+        columns['symbol'] = codes.astype(np.min_scalar_type(max(len(symbols) - 1, 0)))
+        order = np.lexsort((columns['id'], columns['wall'], columns['challenge_id'], columns['user_id']))
+
+        name = f"part-{int(columns['id'].min())}-{int(columns['id'].max())}"
+        path = os.path.join(month, name)
+        final = os.path.join(self.root, path)
+        tmp = os.path.join(self.root, month, f'.{name}.tmp')
+        # Restes d'une écriture interrompue : absents du manifeste, donc jamais lus
+        for stale in (tmp, final):
+            if os.path.exists(stale):
+                shutil.rmtree(stale)
+        os.makedirs(tmp)
+        for column, values in columns.items():
+            with open(os.path.join(tmp, f'{column}.npy'), 'wb') as f:
+                np.save(f, np.ascontiguousarray(values[order]))
+                f.flush()
+                os.fsync(f.fileno())
+        with open(os.path.join(tmp, 'symbols.json'), 'w', encoding='utf-8') as f:
+            json.dump(symbols.tolist(), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp, final)
+        fsync_dir(os.path.join(self.root, month))
+
+        users = columns['user_id']
+        return {
+            'path': path.replace(os.sep, '/'),
+            'month': month,
+            'rows': len(rows),
+            'first_id': int(columns['id'].min()),
+            'last_id': int(columns['id'].max()),
+            'first_user': int(users.min()),
+            'last_user': int(users.max()),
+            'first_wall': int(columns['wall'].min()),
+            'last_wall': int(columns['wall'].max()),
+        }
+
+    def stats(self):
+        snapshot = self.refresh()
+        parts = snapshot.parts
+        return {
+            'generation': snapshot.generation,
+            'parts': len(parts),
+            'rows': sum(part.entry['rows'] for part in parts),
+            'months': sorted({part.entry['month'] for part in parts}),
+        }
+
+
+class _BatchMerger:
+    """Fusion de paquets triés (curseur) avec un itérateur trié (archive), sans doublon d'id"""
+
+    def __init__(self, archived, descending, size=500):
+        self.archived = iter(archived)
+        self.descending = descending
+        self.size = size
+        self.head = next(self.archived, None)
+
+    def _before(self, row, key):
+        return row_key(row) >= key if self.descending else row_key(row) <= key
+
+    def merge(self, rows):
+        if not rows:
+            return rows
+        last = row_key(rows[-1])
+        taken = []
+        while self.head is not None and self._before(self.head, last):
+            taken.append(self.head)
+            self.head = next(self.archived, None)
+        if not taken:
+            return rows
+        live = {row['id'] for row in rows}
+        merged = list(rows) + [row for row in taken if row['id'] not in live]
+        merged.sort(key=row_key, reverse=self.descending)
+        return merged
+
+    def rest(self):
+        while self.head is not None:
+            batch = [self.head]
+            batch.extend(row for _, row in zip(range(self.size - 1), self.archived))
+            self.head = next(self.archived, None)
+            yield batch
+
+
+def archive_closed_challenges(cursor_factory, archive, min_age_days=30, batch_size=200):
+    """Déplacer vers l'archive les trades des défis terminés depuis `min_age_days` jours
+
+    Par lots de `batch_size` défis : lecture des trades, écriture des parties, puis
+    suppression en base. Un arrêt entre les deux est rattrapé au passage suivant
+    (ids déjà archivés ignorés). Retourne (défis, trades archivés).
+    """
+    challenges = moved = 0
+    with cursor_factory() as (connection, cursor):
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (ARCHIVE_LOCK,))
+        if not cursor.fetchall()[0][0]:
+            raise RuntimeError('Archivage déjà en cours')
+        try:
+            last = 0
+            while True:
+                cursor.execute(ARCHIVE_CANDIDATES_QUERY, (min_age_days, last, batch_size))
+                ids = [row[0] for row in cursor.fetchall()]
+                if not ids:
+                    break
+                last = ids[-1]
+                cursor.execute(*archive_rows_query(ids))
+                rows = cursor.fetchall()
+                if not rows:
+                    continue
+                archive.append(rows)
+                cursor.execute(*delete_archived_query(ids, max(row[0] for row in rows)))
+                moved += cursor.rowcount
+                connection.commit()
+                challenges += len(ids)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (ARCHIVE_LOCK,))
+            cursor.fetchall()
+    return challenges, moved
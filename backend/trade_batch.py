@@ -0,0 +1,131 @@
+import json
+from numbers import Real
+
+TRADE_TYPES = ('BUY', 'SELL')
+TRADE_COLUMNS = ('user_id', 'challenge_id', 'symbol', 'type', 'price', 'quantity', 'pnl')
+
+
+class BatchTooLarge(ValueError):
+    """Le lot dépasse le nombre maximal de trades autorisés"""
+
+
+def parse_trade_batch(body, content_type=''):
+    """Décoder un lot de trades (tableau JSON, objet {"trades": [...]} ou NDJSON)
+
+    Retourne une liste d'éléments ; une ligne NDJSON illisible devient une
+    exception `ValueError` placée à sa position pour être signalée par élément.
+    """
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+
+    if 'ndjson' in (content_type or '').lower():
+        items = []
+        for line in body.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                items.append(ValueError(f"JSON invalide: {e.msg}"))
+        return items
+
+    data = json.loads(body)
+    if isinstance(data, dict):
+        data = data.get('trades')
+    if not isinstance(data, list):
+        raise ValueError('Un tableau de trades est attendu')
+    return data
+
+
+def _is_number(value):
+    return isinstance(value, Real) and not isinstance(value, bool)
+
+
+def validate_trade(item):
+    """Valider un trade du lot et retourner (ligne à insérer, erreur)"""
+    if isinstance(item, Exception):
+        return None, str(item)
+    if not isinstance(item, dict):
+        return None, 'Objet trade attendu'
+
+    user_id = item.get('userId')
+    challenge_id = item.get('challengeId')
+    symbol = item.get('symbol')
+    trade_type = item.get('type')
+    price = item.get('price')
+    quantity = item.get('quantity')
+    pnl = item.get('pnl', 0)
+
+    if not isinstance(user_id, int) or isinstance(user_id, bool) or user_id <= 0:
+        return None, 'userId invalide'
+    if not isinstance(challenge_id, int) or isinstance(challenge_id, bool) or challenge_id <= 0:
+        return None, 'challengeId invalide'
+    if not isinstance(symbol, str) or not symbol.strip() or len(symbol) > 20:
+        return None, 'symbol invalide'
+    if not isinstance(trade_type, str) or trade_type.upper() not in TRADE_TYPES:
+        return None, 'type doit être BUY ou SELL'
+    if not _is_number(price) or price <= 0:
+        return None, 'price invalide'
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+        return None, 'quantity invalide'
+    if pnl is None:
+        pnl = 0
+    if not _is_number(pnl):
+        return None, 'pnl invalide'
+
+    return (user_id, challenge_id, symbol.strip(), trade_type.upper(), price, quantity, pnl), None
+
+
+def validate_trade_batch(items, max_items):
+    """Valider tout le lot : retourne (lignes valides avec leur index, erreurs par index)"""
+    if len(items) > max_items:
+        raise BatchTooLarge(f"Lot limité à {max_items} trades")
+
+    rows = []
+    errors = {}
+    for index, item in enumerate(items):
+        row, error = validate_trade(item)
+        if error:
+            errors[index] = error
+        else:
+            rows.append((index, row))
+    return rows, errors
+
+
+def insert_trade_rows(cursor, rows, chunk_size):
+    """Insérer les lignes par INSERT multi-lignes, un ordre par tranche
+
+    Retourne l'id attribué à chaque ligne. Un INSERT multi-lignes reçoit des
+    valeurs AUTO_INCREMENT consécutives à partir de `lastrowid`.
+    L'appelant reste responsable du commit, pour que tout le lot soit atomique.
+    """
+    ids = {}
+    columns = ', '.join(TRADE_COLUMNS)
+    row_placeholder = '(' + ', '.join(['%s'] * len(TRADE_COLUMNS)) + ')'
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        query = f"INSERT INTO trades ({columns}) VALUES " + ', '.join([row_placeholder] * len(chunk))
+        params = [value for _, row in chunk for value in row]
+        cursor.execute(query, params)
+        first_id = cursor.lastrowid
+        for offset, (index, _) in enumerate(chunk):
+            ids[index] = first_id + offset
+    return ids
+
+
+def build_batch_response(total, ids, errors):
+    """Construire la réponse avec le résultat de chaque élément dans l'ordre d'origine"""
+    results = []
+    for index in range(total):
+        if index in ids:
+            results.append({'index': index, 'id': ids[index]})
+        else:
+            results.append({'index': index, 'error': errors.get(index, 'Non inséré')})
+    return {
+        'success': not errors,
+        'inserted': len(ids),
+        'failed': total - len(ids),
+        'results': results
+    }
@@ -0,0 +1,176 @@
+import base64
+from datetime import datetime
+
+TRADE_FIELDS = ('id', 'user_id', 'challenge_id', 'symbol', 'type', 'price', 'quantity', 'timestamp', 'pnl')
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Index composites couvrant les requêtes d'historique (filtre utilisateur + tri par (timestamp, id))
+TRADE_INDEXES = {
+    'idx_trades_user_ts': ('user_id', 'timestamp', 'id'),
+    'idx_trades_user_challenge_ts': ('user_id', 'challenge_id', 'timestamp', 'id'),
+    'idx_trades_user_symbol_ts': ('user_id', 'symbol', 'timestamp', 'id'),
+    # Analyses par défi (GET /api/challenge/<id>/analytics) et fenêtres du classement :
+    # lecture triée sans filesort, pnl et symbol lus dans l'index sans revenir à la table
+    'idx_trades_challenge_ts_pnl': ('challenge_id', 'timestamp', 'id', 'pnl', 'symbol'),
+}
+
+
+def ensure_indexes(cursor, database, table, indexes, unique=False):
+    """Créer les index manquants (MySQL ne supporte pas CREATE INDEX IF NOT EXISTS)"""
+    cursor.execute(
+        "SELECT DISTINCT index_name FROM information_schema.statistics "
+        "WHERE table_schema = %s AND table_name = %s",
+        (database, table)
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+    for name, columns in indexes.items():
+        if name not in existing:
+            kind = 'UNIQUE INDEX' if unique else 'INDEX'
+            cursor.execute(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})")
+
+
+def drop_indexes(cursor, database, table, names):
+    """Supprimer les index `names` encore présents (remplacés par des index composites)"""
+    cursor.execute(
+        "SELECT DISTINCT index_name FROM information_schema.statistics "
+        "WHERE table_schema = %s AND table_name = %s",
+        (database, table)
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+    for name in names:
+        if name in existing:
+            cursor.execute(f"DROP INDEX {name} ON {table}")
+
+
+def encode_cursor(timestamp, trade_id):
+    """Encoder la position (timestamp, id) d'un trade en curseur opaque"""
+    raw = f"{timestamp.isoformat() if timestamp else ''}|{trade_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Décoder un curseur produit par encode_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        timestamp, trade_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(trade_id)
+    except (ValueError, UnicodeError):
+        raise ValueError('Curseur invalide')
+
+
+def _parse_datetime(value, name):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} doit être une date ISO 8601")
+
+
+class TradeHistoryQuery:
+    """Requête paginée par jeu de clés (timestamp, id) sur l'historique d'un utilisateur"""
+
+    def __init__(self, user_id, args):
+        self.user_id = user_id
+
+        try:
+            self.limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+        except (TypeError, ValueError):
+            raise ValueError('limit doit être un entier')
+        if not 1 <= self.limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit doit être compris entre 1 et {MAX_PAGE_SIZE}")
+
+        before = args.get('before')
+        after = args.get('after')
+        if before and after:
+            raise ValueError('before et after sont exclusifs')
+        self.before = decode_cursor(before) if before else None
+        self.after = decode_cursor(after) if after else None
+
+        challenge_id = args.get('challenge_id')
+        try:
+            self.challenge_id = int(challenge_id) if challenge_id else None
+        except ValueError:
+            raise ValueError('challenge_id doit être un entier')
+        self.symbol = args.get('symbol') or None
+        self.date_from = _parse_datetime(args['from'], 'from') if args.get('from') else None
+        self.date_to = _parse_datetime(args['to'], 'to') if args.get('to') else None
+
+        fields = args.get('fields')
+        if fields:
+            requested = [f.strip() for f in fields.split(',') if f.strip()]
+            unknown = [f for f in requested if f not in TRADE_FIELDS]
+            if unknown:
+                raise ValueError(f"Champs inconnus: {', '.join(unknown)}")
+            self.fields = tuple(dict.fromkeys(requested))
+        else:
+            self.fields = TRADE_FIELDS
+
+    def sql(self, paginate=True):
+        """Construire la requête SQL et ses paramètres"""
+        # id et timestamp sont toujours lus pour calculer les curseurs
+        columns = list(dict.fromkeys(('id', 'timestamp') + self.fields))
+        conditions = ['user_id = %s']
+        params = [self.user_id]
+
+        if self.challenge_id is not None:
+            conditions.append('challenge_id = %s')
+            params.append(self.challenge_id)
+        if self.symbol is not None:
+            conditions.append('symbol = %s')
+            params.append(self.symbol)
+        if self.date_from is not None:
+            conditions.append('timestamp >= %s')
+            params.append(self.date_from)
+        if self.date_to is not None:
+            conditions.append('timestamp < %s')
+            params.append(self.date_to)
+
+        # Comparaison de tuple développée pour que MySQL utilise l'index en plage
+        if self.before is not None:
+            conditions.append('(timestamp < %s OR (timestamp = %s AND id < %s))')
+            params.extend([self.before[0], self.before[0], self.before[1]])
+        elif self.after is not None:
+            conditions.append('(timestamp > %s OR (timestamp = %s AND id > %s))')
+            params.extend([self.after[0], self.after[0], self.after[1]])
+
+        order = 'ASC' if self.after is not None else 'DESC'
+        query = (
+            f"SELECT {', '.join(columns)} FROM trades "
+            f"WHERE {' AND '.join(conditions)} "
+            f"ORDER BY timestamp {order}, id {order}"
+        )
+        if paginate:
+            # Une ligne de plus pour savoir s'il reste une page
+            query += ' LIMIT %s'
+            params.append(self.limit + 1)
+        return query, params
+
+    def project(self, row):
+        """Ne garder que les champs demandés et formater la date"""
+        trade = {field: row[field] for field in self.fields}
+        if 'timestamp' in trade:
+            trade['timestamp'] = trade['timestamp'].isoformat() if trade['timestamp'] else None
+        return trade
+
+    def page(self, rows):
+        """Mettre en forme une page de lignes (dictionnaires) lues avec sql()
+
+        Retourne (trades du plus récent au plus ancien, curseur suivant, curseur précédent) :
+        le curseur suivant s'utilise avec `before` (plus ancien), le précédent avec `after`.
+        """
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if self.after is not None:
+            rows.reverse()
+
+        next_cursor = prev_cursor = None
+        if rows:
+            first, last = rows[0], rows[-1]
+            if has_more or self.after is not None:
+                next_cursor = encode_cursor(last['timestamp'], last['id'])
+            if self.before is not None or (self.after is not None and has_more):
+                prev_cursor = encode_cursor(first['timestamp'], first['id'])
+
+        return [self.project(row) for row in rows], next_cursor, prev_cursor
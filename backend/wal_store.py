@@ -0,0 +1,207 @@
+import json
+import os
+import threading
+import time
+
+
+class CorruptLog(ValueError):
+    """Enregistrement illisible ou hors séquence ailleurs qu'en fin de journal"""
+
+
+class WriteAheadLog:
+    """Journal NDJSON en ajout seul + instantané compacté, pour le serveur sans base
+
+    Chaque mutation est ajoutée au journal avec un numéro de séquence. Un thread
+    d'écriture regroupe les enregistrements en attente et les rend durables par un
+    seul fsync (group commit). Le compactage écrit l'instantané complet de façon
+    atomique (fichier temporaire + rename) puis vide le journal ; l'instantané garde
+    le dernier numéro de séquence inclus pour ne jamais rejouer deux fois.
+    """
+
+    def __init__(self, snapshot_path, log_path, flush_interval=0.002, compact_threshold=10000):
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path
+        self.flush_interval = flush_interval
+        self.compact_threshold = compact_threshold
+
+        self._cond = threading.Condition()
+        self._pending = []
+        self._seq = 0
+        self._durable_seq = 0
+        self._records_since_snapshot = 0
+        self._log = None
+        self._writer = None
+        self._closed = False
+        self._error = None
+
+    def open(self, load_snapshot, apply_record):
+        """Charger l'instantané puis rejouer le journal ; retourne False s'il n'y a aucun instantané
+
+        Seul un dernier enregistrement tronqué est retiré du journal ; un instantané illisible
+        lève ValueError et un enregistrement corrompu avant la fin lève CorruptLog.
+        """
+        snapshot_seq = 0
+        has_snapshot = os.path.exists(self.snapshot_path)
+        if has_snapshot:
+            with open(self.snapshot_path, 'r') as f:
+                data = json.load(f)
+            snapshot_seq = data.get('log_seq', 0)
+            load_snapshot(data)
+
+        self._seq = snapshot_seq
+        replayed = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'rb') as f:
+                lines = f.read().splitlines(keepends=True)
+            valid_bytes = 0
+            for number, line in enumerate(lines, 1):
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('ligne incomplète')
+                    record = json.loads(line)
+                except ValueError as e:
+                    if number == len(lines):
+                        # Dernier enregistrement tronqué par un arrêt brutal : il n'a jamais été acquitté
+                        print(f"Journal: dernier enregistrement tronqué ignoré ({e})")
+                        break
+                    raise CorruptLog(f"{self.log_path}: ligne {number} illisible ({e})")
+                if record['seq'] > snapshot_seq:
+                    if record['seq'] != self._seq + 1:
+                        raise CorruptLog(f"{self.log_path}: ligne {number}, séquence {record['seq']} "
+                                         f"après {self._seq}")
+                    apply_record(record)
+                    self._seq = record['seq']
+                    replayed += 1
+                valid_bytes += len(line)
+            if valid_bytes < sum(len(line) for line in lines):
+                with open(self.log_path, 'r+b') as f:
+                    f.truncate(valid_bytes)
+
+        self._records_since_snapshot = replayed
+        self._start('ab')
+        if replayed:
+            print(f"Journal rejoué: {replayed} mutations")
+        return has_snapshot
+
+    def quarantine(self):
+        """Renommer instantané et journal illisibles en `*.corrupt-<horodatage>` ; retourne les nouveaux chemins
+
+        Rien n'est supprimé : les données peuvent être récupérées à la main.
+        """
+        suffix = time.strftime('.corrupt-%Y%m%d-%H%M%S')
+        moved = []
+        for path in (self.snapshot_path, self.log_path):
+            if os.path.exists(path):
+                os.replace(path, path + suffix)
+                moved.append(path + suffix)
+        self._fsync_dir()
+        return moved
+
+    def reset(self):
+        """Repartir d'un journal vide (état reconstruit par l'appelant, à compacter ensuite)"""
+        self._seq = 0
+        self._records_since_snapshot = 0
+        self._start('wb')
+
+    def _start(self, mode):
+        self._durable_seq = self._seq
+        self._log = open(self.log_path, mode)
+        self._writer = threading.Thread(target=self._write_loop, name='wal-writer', daemon=True)
+        self._writer.start()
+
+    def append(self, record):
+        """Ajouter une mutation au tampon ; retourne son numéro de séquence"""
+        with self._cond:
+            self._seq += 1
+            record['seq'] = self._seq
+            self._pending.append(json.dumps(record, separators=(',', ':')) + '\n')
+            self._records_since_snapshot += 1
+            self._cond.notify_all()
+            return self._seq
+
+    def sync(self, seq=None):
+        """Attendre que la mutation `seq` (par défaut la dernière) soit écrite et fsyncée"""
+        with self._cond:
+            target = self._seq if seq is None else seq
+            while self._durable_seq < target:
+                if self._error is not None:
+                    raise self._error
+                self._cond.wait()
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+            if self.flush_interval:
+                # Laisser les écrivains concurrents rejoindre le même fsync
+                time.sleep(self.flush_interval)
+            with self._cond:
+                batch = self._pending
+                self._pending = []
+                last_seq = self._seq
+            try:
+                self._log.write(''.join(batch).encode('utf-8'))
+                self._log.flush()
+                os.fsync(self._log.fileno())
+            except OSError as e:
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                print(f"Erreur d'écriture du journal: {e}")
+                return
+            with self._cond:
+                self._durable_seq = last_seq
+                self._cond.notify_all()
+
+    def should_compact(self):
+        return self._records_since_snapshot >= self.compact_threshold
+
+    def compact(self, data):
+        """Écrire un instantané atomique contenant tout ce qui est journalisé, puis vider le journal
+
+        `data` doit refléter exactement l'état après la dernière mutation ajoutée.
+        """
+        with self._cond:
+            seq = self._seq
+        self.sync(seq)
+
+        data = dict(data, log_seq=seq)
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._fsync_dir()
+
+        with self._cond:
+            # Le thread d'écriture est inactif : tout est durable jusqu'à `seq` et rien n'a été ajouté depuis
+            if self._seq == seq:
+                self._log.truncate(0)
+                self._log.seek(0)
+                self._records_since_snapshot = 0
+
+    def _fsync_dir(self):
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+        if self._log is not None:
+            self._log.close()
@@ -165,6 +165,7 @@ export const UserProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
     setAllChallenges([]);
     setTrades([]);
     localStorage.removeItem('user');
+    localStorage.removeItem('sessionToken');
   };
 
   const setActiveChallenge = (challenge: Challenge) => {
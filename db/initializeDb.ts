@@ -1,6 +1,7 @@
 import mysql from 'mysql2/promise';
-import fs from 'fs/promises';
-import path from 'path';
+
+// Crée seulement la base : les tables et index sont créés par les migrations du backend
+// (backend/migrations.py, lancées au démarrage ou par `cd backend && python migrate.py`)
 
 async function initializeDatabase() {
   let connection: mysql.Connection | null = null;
@@ -23,18 +24,7 @@ async function initializeDatabase() {
     // Utiliser la base de données
     await connection.query('USE examen;');
     
-    console.log('Base de données examen sélectionnée.');
-    
-    // Lire le fichier de schéma SQL
-    const schemaPath = path.join(__dirname, 'schema.sql');
-    const schemaSql = await fs.readFile(schemaPath, 'utf8');
-    
-    console.log('Fichier de schéma lu. Exécution des requêtes...');
-    
-    // Exécuter les requêtes du schéma
-    await connection.query(schemaSql);
-    
-    console.log('Schéma de base de données créé avec succès !');
+    console.log('Base de données examen prête. Créez les tables avec : cd backend && python migrate.py');
     
     // Fermer la connexion
     await connection.end();
@@ -31,6 +31,11 @@ export class FrontendAuthService {
 
       console.log('Login result body:', result);
 
+      // Jeton de session exigé par les routes d'un utilisateur, d'un défi et des trades
+      if (result?.token) {
+        localStorage.setItem('sessionToken', result.token);
+      }
+
       if (!response.ok) {
         return {
           success: false,
@@ -3,10 +3,18 @@ import { ChallengeStatus } from '../types';
 export class UserDataService {
   private static readonly BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:5000/api';
 
+  // En-tête Authorization avec le jeton de session reçu au login
+  private static authHeaders(): Record<string, string> {
+    const token = localStorage.getItem('sessionToken');
+    return token ? { Authorization: `Bearer ${token}` } : {};
+  }
+
   // Fonction pour récupérer les défis d'un utilisateur depuis le backend
   static async getUserChallenges(userId: number): Promise<any[]> {
     try {
-      const response = await fetch(`${this.BASE_URL}/user/${userId}/challenges`);
+      const response = await fetch(`${this.BASE_URL}/user/${userId}/challenges`, {
+        headers: this.authHeaders(),
+      });
       
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
@@ -47,7 +55,9 @@ export class UserDataService {
   // Fonction pour récupérer les transactions d'un utilisateur depuis le backend
   static async getUserTrades(userId: number): Promise<any[]> {
     try {
-      const response = await fetch(`${this.BASE_URL}/user/${userId}/trades`);
+      const response = await fetch(`${this.BASE_URL}/user/${userId}/trades`, {
+        headers: this.authHeaders(),
+      });
       
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
@@ -94,6 +104,7 @@ export class UserDataService {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...this.authHeaders(),
         },
         body: JSON.stringify({
           ...challengeData,
@@ -136,6 +147,7 @@ export class UserDataService {
         method: 'PUT',
         headers: {
           'Content-Type': 'application/json',
+          ...this.authHeaders(),
         },
         body: JSON.stringify(updates),
       });
@@ -161,6 +173,7 @@ export class UserDataService {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...this.authHeaders(),
         },
         body: JSON.stringify({
           userId,